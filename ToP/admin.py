@@ -51,3 +51,11 @@ admin.site.register(UnitPositionChild)
 
 
 
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "status", "priority", "attempts", "max_attempts", "run_after", "created_at", "finished_at")
+    list_filter = ("status", "task")
+    search_fields = ("task", "last_error")
+    readonly_fields = ("locked_by", "locked_at", "created_at", "finished_at", "last_error")
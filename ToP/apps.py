@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ToP'
+
+    def ready(self):
+        from . import signals  # noqa: F401
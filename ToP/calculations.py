@@ -1,6 +1,8 @@
 import datetime
 import math
+import numpy as np
 from .models import *
+from .utils.pricing_trace_utils import trace_event
 from datetime import datetime
 import traceback
 
@@ -20,7 +22,7 @@ def calculate_max_tenor_years(project_config, tenor_years):
     return tenor_years, max_tenor_years
 
 
-def calculate_gas_payments(policy, tenor_years, periods_per_year, contract_date, delivery_date, delivery_payment_index):
+def calculate_gas_payments(policy, tenor_years, periods_per_year, contract_date, delivery_date, delivery_payment_index, fees=None, offsets=None):
 
     num_pmts = policy.gas_num_pmts
     # print(f"num_pmts = {num_pmts}")
@@ -28,10 +30,11 @@ def calculate_gas_payments(policy, tenor_years, periods_per_year, contract_date,
     main_delivery_payment_index = delivery_payment_index
     years_till_delivery = calculate_years_till_delivery(contract_date, delivery_date)
     tenor_years = float(tenor_years)
-    # Select gas fee
-    fees = GasPolicyFees.objects.filter(gas_policy=policy)
-    fees = {str(fee.term_period): float(fee.fee_amount) for fee in fees}
-    fees = {float(k):v for k, v in fees.items()}
+    # Select gas fee (fees/offsets may come pre-loaded from the pricing snapshot)
+    if fees is None:
+        fees = GasPolicyFees.objects.filter(gas_policy=policy)
+        fees = {str(fee.term_period): float(fee.fee_amount) for fee in fees}
+        fees = {float(k):v for k, v in fees.items()}
 
 
     diffs = {abs(years_till_delivery-k):v for k, v in fees.items()}
@@ -40,9 +43,10 @@ def calculate_gas_payments(policy, tenor_years, periods_per_year, contract_date,
 
 
     try:
-        offsets = GasPolicyOffsets.objects.filter(gas_policy=policy)
-        offsets = {str(offset.term_period): float(offset.offset_value) for offset in offsets}
-        offsets = {float(k):v for k, v in offsets.items()}
+        if offsets is None:
+            offsets = GasPolicyOffsets.objects.filter(gas_policy=policy)
+            offsets = {str(offset.term_period): float(offset.offset_value) for offset in offsets}
+            offsets = {float(k):v for k, v in offsets.items()}
         diffs = {abs(years_till_delivery-k):v for k, v in offsets.items()}
         offset = diffs[min(diffs.keys())] * periods_per_year
         
@@ -83,7 +87,7 @@ def calculate_gas_payments(policy, tenor_years, periods_per_year, contract_date,
 
 
 # Calculate maintenance payments 
-def calculate_maintenance_payments(policy, maintenance_fee, tenor_years, periods_per_year, contract_date, delivery_date, delivery_payment_index, currency_rate):
+def calculate_maintenance_payments(policy, maintenance_fee, tenor_years, periods_per_year, contract_date, delivery_date, delivery_payment_index, currency_rate, schedulings=None, offsets=None):
 
     num_pmts = policy.maintenance_num_pmts 
     # print(f"policy.maintenance_num_pmts = {policy.maintenance_num_pmts}")
@@ -91,18 +95,22 @@ def calculate_maintenance_payments(policy, maintenance_fee, tenor_years, periods
     tenor_years = float(tenor_years)
 
     years_till_delivery = calculate_years_till_delivery(contract_date, delivery_date)
-    schedulings = MaintenancePolicyScheduling.objects.filter(maintenance_policy=policy)
-    scheduling = {str(scheduling.term_period): str(scheduling.scheduling) for scheduling in schedulings}   
-    scheduling = {float(k):v for k, v in scheduling.items()}
+    if schedulings is None:
+        schedulings = MaintenancePolicyScheduling.objects.filter(maintenance_policy=policy)
+        scheduling = {str(scheduling.term_period): str(scheduling.scheduling) for scheduling in schedulings}   
+        scheduling = {float(k):v for k, v in scheduling.items()}
+    else:
+        scheduling = dict(schedulings)
 
     diffs = {abs(years_till_delivery-k):v for k, v in scheduling.items()}
     scheduling = diffs[min(diffs.keys())]
 
 
     try:
-        offsets = MaintenancePolicyOffsets.objects.filter(maintenance_policy=policy)
-        offsets = {str(offset.term_period): float(offset.offset_value) for offset in offsets}
-        offsets = {float(k):v for k, v in offsets.items()}
+        if offsets is None:
+            offsets = MaintenancePolicyOffsets.objects.filter(maintenance_policy=policy)
+            offsets = {str(offset.term_period): float(offset.offset_value) for offset in offsets}
+            offsets = {float(k):v for k, v in offsets.items()}
         diffs = {abs(years_till_delivery-k):v for k, v in offsets.items()}
         offset = diffs[min(diffs.keys())] * periods_per_year
     
@@ -177,22 +185,43 @@ def excel_formula(Z6, E7, C11, J6, Z7, G7, Y7, *, eps=1e-12):
     return result
 
 
+# -------------------------------------------------------------------------------------------------------------------------------- Installment solver
+# O(n) form of the excel_formula loop: J6 (= sum(pmt_percentages[0:i])) is kept
+# as a running left-to-right total, which is exactly what `sum` would return.
+
+def solve_installments(pmt_percentages, values, cumulatives, tenor_years, start=1):
+    running = sum(pmt_percentages[0:start])
+
+    for i in range(start, (tenor_years*4) + 1):
+        pmt_percentages[i] = excel_formula(cumulatives[i], i, tenor_years, running, cumulatives[i+1], pmt_percentages[i], values[i+1])
+        running += pmt_percentages[i]
+
+    return pmt_percentages
+
+
 # -------------------------------------------------------------------------------------------------------------------------------- Apply constraints
 # 
 
 
-def apply_constraints(dp, pmt_percentages, tenor_years, periods_per_year, input_pmts, constraints, contract_date, delivery_date, scheme, special_offer = None):
+def apply_constraints(dp, pmt_percentages, tenor_years, periods_per_year, input_pmts, constraints, contract_date, delivery_date, scheme, special_offer = None, snapshot = None):
 
     
     if dp == "": 
         dp = 0
     
-    project = constraints.project_config.project
+    if snapshot is not None:
+        # ProjectPricingSnapshot: no DB access
+        if special_offer:
+            exteded_payments = snapshot.special_offer_plan(tenor_years)
+        else:
+            exteded_payments = snapshot.extended_plan(tenor_years, scheme)
+    else:
+        project = constraints.project_config.project
 
-    exteded_payments = ProjectExtendedPayments.objects.filter(project = project, year = tenor_years, scheme = scheme).first()
-        
-    if special_offer: 
-        exteded_payments = ProjectExtendedPaymentsSpecialOffer.objects.filter(project = project, year = tenor_years).first()
+        exteded_payments = ProjectExtendedPayments.objects.filter(project = project, year = tenor_years, scheme = scheme).first()
+            
+        if special_offer: 
+            exteded_payments = ProjectExtendedPaymentsSpecialOffer.objects.filter(project = project, year = tenor_years).first()
     
     if exteded_payments:
         var_dp = exteded_payments.dp1 + exteded_payments.dp2 
@@ -240,33 +269,15 @@ def apply_constraints(dp, pmt_percentages, tenor_years, periods_per_year, input_
 
 
     if exteded_payments:
-        values = []
-        cumulatives = []
-
-        # Add DP1 and DP2
-        values.append(exteded_payments.dp1 or 0)
-        values.append(exteded_payments.dp2 or 0)
-        cumulatives.append(exteded_payments.cumulative_dp1 or 0)
-        cumulatives.append(exteded_payments.cumulative_dp2 or 0)
-
-        # Add Installments and Cumulatives
-        for i in range(1, 49):
-            val = getattr(exteded_payments, f'installment_{i}', 0) or 0
-            cum = getattr(exteded_payments, f'cumulative_{i}', 0) or 0
-            values.append(val)
-            cumulatives.append(cum)
+        # DP1, DP2, then Installments / Cumulatives 1..48
+        values, cumulatives = exteded_payments.payment_rows()
 
 
-    print(f"pmt_percentages before = {pmt_percentages}")
+    trace_event("constraints_input", tenor_years=tenor_years, scheme=scheme, special_offer=bool(special_offer), pmt_percentages=pmt_percentages)
     if not special_offer:
-
-        for i in range (1, (tenor_years*4) +1):
-            pmt_percentages[i] = excel_formula(cumulatives[i],i,tenor_years, sum(pmt_percentages[0:i]), cumulatives[i+1], pmt_percentages[i], values[i+1])
-            print()
+        solve_installments(pmt_percentages, values, cumulatives, tenor_years, start=1)
     else:
-        for i in range (0, (tenor_years*4) +1):
-            pmt_percentages[i] = excel_formula(cumulatives[i],i,tenor_years, sum(pmt_percentages[0:i]), cumulatives[i+1], pmt_percentages[i], values[i+1])
-            print()
+        solve_installments(pmt_percentages, values, cumulatives, tenor_years, start=0)
 
 
  
@@ -290,7 +301,7 @@ def apply_constraints(dp, pmt_percentages, tenor_years, periods_per_year, input_
 
     delivery_payment_index = math.floor(years_till_delivery * periods_per_year)
 
-    print(f"pmt_percentages after = {pmt_percentages}")
+    trace_event("constraints_output", pmt_percentages=pmt_percentages, delivery_payment_index=delivery_payment_index)
     return pmt_percentages, delivery_payment_index
 
 
@@ -339,7 +350,6 @@ def calculate_percentage_change(
 ):
     base_npv = float(base_npv)
     new_npv = float(new_npv)  
-    print(f"constant_discount_2 = {constant_discount}") 
 
     # --- Constant discount logic ---
     if constant_discount != 0 and special_offer and constant_discount != None:
@@ -353,22 +363,22 @@ def calculate_percentage_change(
         max_discount = float(max_discount)
         percentage_change = 0
 
-        print(f"new_npv = {new_npv}")
-        print(f"base_npv = {base_npv}")
-
         if math.isclose(base_npv, new_npv, rel_tol=0, abs_tol=epsilon):
             percentage_change = 0
-            print("≈ Equal → percentage_change forced to 0")
 
         elif base_npv >= new_npv:
             percentage_change = (base_npv / new_npv) - 1
-            print("yes")
         else:
             percentage_change = ((base_npv / new_npv) - 1) * (max_discount / (1 - base_npv))
-            print("no")
-
-        print(f"percentage_change = {percentage_change}")
 
+    trace_event(
+        "percentage_change",
+        base_npv=base_npv,
+        new_npv=new_npv,
+        max_discount=max_discount,
+        constant_discount=constant_discount,
+        percentage_change=percentage_change,
+    )
     return percentage_change
 
 
@@ -390,9 +400,6 @@ def calculate_price_with_interest(
     max_discount = float(max_discount)
     base_price = float(base_price)
 
-    print(f"special_offer = {special_offer}")
-    print(f"constant_discount = {constant_discount}")
-
     # --- If constant discount applies in special offer mode, use it directly ---
     if constant_discount != 0 and special_offer and constant_discount != None:
         percentage_change = -1 * constant_discount
@@ -402,7 +409,6 @@ def calculate_price_with_interest(
         if special_offer and real_discount is True:
             max_discount = 1 - base_npv
 
-        print(f"max_discount = {max_discount}")
 
         # Default
         percentage_change = 0.0
@@ -410,39 +416,133 @@ def calculate_price_with_interest(
         # ✅ Treat nearly equal NPVs as equal → no change
         if math.isclose(base_npv, new_npv, rel_tol=0.0, abs_tol=epsilon):
             percentage_change = 0.0
-            print("≈ Equal → percentage_change forced to 0")
 
         elif base_npv >= new_npv:
             # Guard against division by ~0
             denom = new_npv if not math.isclose(new_npv, 0.0, rel_tol=0.0, abs_tol=epsilon) else epsilon
-            print(f"base_npv={base_npv}")
-            print(f"new_npv={new_npv}")
             percentage_change = (base_npv / denom) - 1.0
         else:
             # Guard against division by ~0
             denom = new_npv if not math.isclose(new_npv, 0.0, rel_tol=0.0, abs_tol=epsilon) else epsilon
-            print(f"base_npv={base_npv}")
-            print(f"new_npv={new_npv}")
             # Note: keep the same formula you had, just without rounding new_npv
             percentage_change = ((base_npv / denom) - 1.0) * (max_discount / (1.0 - base_npv))
 
-    print(f"percentage_change = {percentage_change}")
-
     # ---- Apply additional discount (if any) and round up to nearest 1000 ----
     if not additional_disc:  # covers 0, None, '', etc.
         result = (1.0 + percentage_change) * base_price
         rounded_result = math.ceil(result / 1000.0) * 1000.0
-        print(f"rounded_result = {rounded_result}")
-        return rounded_result
     else:
         # additional_disc is percentage (e.g., 5 → 5%)
         result = (1.0 + (percentage_change - (float(additional_disc) / 100.0))) * base_price
         rounded_result = math.ceil(result / 1000.0) * 1000.0
-        print(f"rounded_result = {rounded_result}")
-        return rounded_result
 
+    trace_event(
+        "price_with_interest",
+        base_price=base_price,
+        percentage_change=percentage_change,
+        additional_discount=additional_disc,
+        special_offer=bool(special_offer),
+        real_discount=real_discount,
+        price_with_interest=rounded_result,
+    )
+    return rounded_result
 
- 
+
+
+
+# --------------------------------------------------------------------------------------------------------------------------------
+# Vectorized (batch) pricing helpers
+#
+# Same formulas as the scalar functions above, applied element-wise on NumPy
+# arrays. Discount factors are built with Python's `**` and sums are taken
+# with a sequential `cumsum`, so every value is bit-identical to the scalar path.
+
+def build_discount_factors(rate, n, sign=1):
+    """ [(1 + rate) ** (sign * 1), ..., (1 + rate) ** (sign * n)] as a float64 array. """
+    rate = float(rate)
+    return np.array([(1 + rate) ** (sign * i) for i in range(1, n + 1)], dtype=np.float64)
+
+
+def sequential_sum(matrix, axis=-1):
+    """ Left-to-right sum (same rounding as Python's built-in `sum`). """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.shape[axis] == 0:
+        return np.zeros(np.delete(matrix.shape, axis), dtype=np.float64)
+    return np.take(np.cumsum(matrix, axis=axis), -1, axis=axis)
+
+
+def calculate_percentage_change_many(
+    base_npv,
+    new_npv,
+    max_discount,
+    special_offer=0,
+    real_discount=False,
+    constant_discount=0,
+    epsilon=1e-4
+):
+    base_npv = np.asarray(base_npv, dtype=np.float64)
+    new_npv = np.asarray(new_npv, dtype=np.float64)
+
+    if constant_discount != 0 and special_offer and constant_discount != None:
+        return np.full(np.broadcast(base_npv, new_npv).shape, -1 * constant_discount, dtype=np.float64)
+
+    if special_offer and real_discount is True:
+        max_discount = 1 - base_npv
+    max_discount = np.asarray(max_discount, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = (base_npv / new_npv) - 1
+        percentage_change = np.where(
+            np.abs(base_npv - new_npv) <= epsilon,
+            0.0,
+            np.where(base_npv >= new_npv, ratio, ratio * (max_discount / (1 - base_npv))),
+        )
+
+    return percentage_change
+
+
+def calculate_price_with_interest_many(
+    base_npv,
+    new_npv,
+    max_discount,
+    base_prices,
+    additional_disc=0,
+    special_offer=0,
+    real_discount=False,
+    constant_discount=0,
+    epsilon=1e-4
+):
+    """
+    `base_npv`, `new_npv` and `additional_disc` (percent, 0 = none) share one
+    plan shape; `base_prices` is a 1-D array of unit prices.
+    Returns an array of shape (len(base_prices), *plan_shape).
+    """
+    base_npv = np.asarray(base_npv, dtype=np.float64)
+    new_npv = np.asarray(new_npv, dtype=np.float64)
+    base_prices = np.asarray(base_prices, dtype=np.float64)
+    additional_disc = np.nan_to_num(np.asarray(additional_disc, dtype=np.float64))
+
+    if constant_discount != 0 and special_offer and constant_discount != None:
+        percentage_change = np.full(np.broadcast(base_npv, new_npv).shape, -1 * constant_discount, dtype=np.float64)
+    else:
+        max_discount = float(max_discount)
+        if special_offer and real_discount is True:
+            max_discount = 1 - base_npv
+        max_discount = np.asarray(max_discount, dtype=np.float64)
+
+        denom = np.where(np.abs(new_npv) <= epsilon, epsilon, new_npv)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = (base_npv / denom) - 1.0
+            percentage_change = np.where(
+                np.abs(base_npv - new_npv) <= epsilon,
+                0.0,
+                np.where(base_npv >= new_npv, ratio, ratio * (max_discount / (1.0 - base_npv))),
+            )
+
+    # (pc - 0.0) == pc exactly, so plans without an additional discount match the scalar branch.
+    factor = 1.0 + (percentage_change - (additional_disc / 100.0))
+    result = factor[np.newaxis, ...] * base_prices.reshape((-1,) + (1,) * factor.ndim)
+    return np.ceil(result / 1000.0) * 1000.0
 
 
 
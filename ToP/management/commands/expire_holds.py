@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ToP.services.hold_expiry_service import HOLD_EXPIRY_BATCH_SIZE, HoldExpiryService
+
+
+class Command(BaseCommand):
+    help = "Releases expired unit holds in batches and syncs the unblocks to the ERP."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=HOLD_EXPIRY_BATCH_SIZE, help="Requests released per transaction.")
+        parser.add_argument("--loop", action="store_true", help="Keep running (worker mode).")
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds between passes in --loop mode.")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = HoldExpiryService.run(batch_size=max(1, options["batch_size"]))
+            self.stdout.write(self.style.SUCCESS(
+                f"Hold expiry: {stats['expired']} released in {stats['batches']} batch(es), "
+                f"{stats['erp_unblocks']} ERP unblock(s) sent."
+            ))
+
+            if not options["loop"]:
+                break
+            # don't keep an idle connection open between passes
+            connection.close()
+            time.sleep(max(1.0, options["interval"]))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ToP.services.market_research_cube_service import MarketResearchCubeService
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the market research dashboard cube (MarketUnitCube) from MarketUnitData."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", action="append", default=[], help="Only refresh this project (repeatable).")
+
+    def handle(self, *args, **options):
+        if options["project"]:
+            cells = MarketResearchCubeService.refresh_projects(options["project"])
+        else:
+            cells = MarketResearchCubeService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Market cube: {cells} cell(s) materialized."))
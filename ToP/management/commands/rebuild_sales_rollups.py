@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ToP.services.sales_rollup_service import SalesRollupService
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily sales rollups (SalesDailyRollup) from SalesRequestAnalytical."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="Only rebuild this company id.")
+
+    def handle(self, *args, **options):
+        rows = SalesRollupService.rebuild(company_id=options["company"])
+        self.stdout.write(self.style.SUCCESS(f"Sales rollups: {rows} row(s) materialized."))
@@ -4,6 +4,25 @@ from ToP.services.company_auto_sync_service import CompanyAutoSyncService
 class Command(BaseCommand):
     help = "Runs auto sync for companies that enabled it."
 
+    def add_arguments(self, parser):
+        parser.add_argument("--parallel", action="store_true", help="Run due companies concurrently (scheduler mode).")
+        parser.add_argument("--workers", type=int, default=None, help="Max concurrent companies (default: AUTO_SYNC_MAX_WORKERS).")
+        parser.add_argument("--jitter", type=float, default=None, help="Max random start delay per company, in seconds.")
+        parser.add_argument("--source-timeout", type=float, default=None, help="Timeout budget per source (sheet / ERP), in seconds.")
+
     def handle(self, *args, **options):
-        CompanyAutoSyncService.run()
-        self.stdout.write(self.style.SUCCESS("Auto sync run completed."))
+        report = CompanyAutoSyncService.run(
+            parallel=options["parallel"],
+            max_workers=options["workers"],
+            jitter_seconds=options["jitter"],
+            source_timeout=options["source_timeout"],
+        )
+
+        for r in report["companies"]:
+            if "duration_ms" in r:
+                self.stdout.write(f"Company {r['company_id']}: {r['status']} in {r['duration_ms']} ms")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Auto sync run completed: {report['companies_synced']}/{report['companies_checked']} "
+            f"companies in {report['duration_ms']} ms ({report['mode']})."
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ToP.services.job_queue_service import JOB_CLAIM_BATCH, JobQueueService
+
+
+class Command(BaseCommand):
+    help = "Drains the background job queue (emails, PDFs, Pusher, ERP / Sheets side effects, imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=None, help="Concurrent jobs (default: JOB_QUEUE_WORKER_THREADS).")
+        parser.add_argument("--batch", type=int, default=JOB_CLAIM_BATCH, help="Jobs claimed per round trip.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs (worker mode).")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty in --loop mode.")
+        parser.add_argument("--purge-days", type=int, default=None, help="Delete finished jobs older than N days, then continue.")
+
+    def handle(self, *args, **options):
+        if options["purge_days"] is not None:
+            purged = JobQueueService.purge_finished(options["purge_days"])
+            self.stdout.write(f"Purged {purged} finished job(s).")
+
+        while True:
+            stats = JobQueueService.drain(threads=options["threads"], batch=max(1, options["batch"]))
+            if stats["succeeded"] or stats["failed"] or stats["requeued"] or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Jobs: {stats['succeeded']} succeeded, {stats['failed']} failed attempt(s), "
+                    f"{stats['requeued']} stale requeued. Queue: {JobQueueService.status_counts()}"
+                ))
+
+            if not options["loop"]:
+                break
+            connection.close()
+            time.sleep(max(0.5, options["interval"]))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.21 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+from ToP.utils.payments_plans_utils import build_payment_rows, pack_payment_rows
+
+
+def compile_existing_rows(apps, schema_editor):
+    for model_name in ("ProjectExtendedPayments", "ProjectExtendedPaymentsSpecialOffer"):
+        model = apps.get_model("ToP", model_name)
+        for plan in model.objects.all().iterator():
+            plan.compiled_rows = pack_payment_rows(*build_payment_rows(plan))
+            plan.save(update_fields=["compiled_rows"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0094_erpholdpostfieldmapping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectextendedpayments',
+            name='compiled_rows',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='projectextendedpaymentsspecialoffer',
+            name='compiled_rows',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(compile_existing_rows, migrations.RunPython.noop),
+    ]
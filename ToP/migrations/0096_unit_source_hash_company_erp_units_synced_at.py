@@ -0,0 +1,23 @@
+# Generated by Django 4.2.21 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0095_projectextendedpayments_compiled_rows_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unit',
+            name='source_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='erp_units_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.21 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0096_unit_source_hash_company_erp_units_synced_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='erp_pagination',
+            field=models.CharField(choices=[('none', 'None (single response)'), ('page', 'Page number'), ('offset', 'Offset / limit'), ('cursor', 'Cursor')], default='none', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='erp_page_size',
+            field=models.PositiveIntegerField(default=500),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.21 on 2026-10-17 13:10
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_expires_at(apps, schema_editor):
+    SalesRequest = apps.get_model("ToP", "SalesRequest")
+    Project = apps.get_model("ToP", "Project")
+    ProjectConfiguration = apps.get_model("ToP", "ProjectConfiguration")
+    ProjectWebConfiguration = apps.get_model("ToP", "ProjectWebConfiguration")
+
+    timers = {}
+    pending = []
+    for sr in SalesRequest.objects.select_related("unit").exclude(unit=None).exclude(company=None).iterator():
+        key = (sr.company_id, sr.unit.project)
+        if key not in timers:
+            project = Project.objects.filter(company_id=sr.company_id, name=sr.unit.project).first()
+            timer = None
+            if project and ProjectConfiguration.objects.filter(project=project).exists():
+                web_config = ProjectWebConfiguration.objects.filter(project=project).first()
+                if web_config and web_config.default_timer_in_minutes is not None:
+                    timer = web_config.default_timer_in_minutes
+            timers[key] = timer
+
+        timer = timers[key]
+        if timer is None:
+            continue
+        sr.expires_at = sr.date + timedelta(minutes=timer + (sr.extended_minutes or 0))
+        pending.append(sr)
+
+    SalesRequest.objects.bulk_update(pending, ["expires_at"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0097_company_erp_pagination_company_erp_page_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesrequest',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.21 on 2026-10-17 17:40
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Lower
+
+
+DIMENSIONS = (
+    "project_name", "developer_name", "location", "asset_type", "unit_type",
+    "finishing_specs", "payment_yrs", "date_of_update",
+)
+
+
+def build_cube(apps, schema_editor):
+    MarketUnitData = apps.get_model("ToP", "MarketUnitData")
+    MarketUnitCube = apps.get_model("ToP", "MarketUnitCube")
+
+    rows = (
+        MarketUnitData.objects.annotate(_project_key=Lower(Coalesce("project_name", Value(""))))
+        .values("_project_key", *DIMENSIONS)
+        .annotate(
+            units=Count("id"),
+            price_sum=Sum("unit_price"), price_n=Count("unit_price"),
+            price_min=Min("unit_price"), price_max=Max("unit_price"),
+            psm_sum=Sum("psm"), psm_n=Count("psm"),
+            bua_sum=Sum("bua"), bua_n=Count("bua"), bua_min=Min("bua"), bua_max=Max("bua"),
+            dp_sum=Sum("down_payment"), dp_n=Count("down_payment"),
+        )
+        .order_by()
+    )
+
+    cells = []
+    for row in rows.iterator():
+        project_key = row.pop("_project_key")
+        for measure in ("price_sum", "psm_sum", "bua_sum", "dp_sum"):
+            row[measure] = row[measure] or 0
+        cells.append(MarketUnitCube(project_key=project_key, **row))
+    MarketUnitCube.objects.bulk_create(cells, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0099_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketUnitCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_key', models.CharField(db_index=True, max_length=255)),
+                ('project_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('developer_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('location', models.CharField(blank=True, max_length=255, null=True)),
+                ('asset_type', models.CharField(blank=True, max_length=255, null=True)),
+                ('unit_type', models.CharField(blank=True, max_length=255, null=True)),
+                ('finishing_specs', models.CharField(blank=True, max_length=255, null=True)),
+                ('payment_yrs', models.CharField(blank=True, max_length=255, null=True)),
+                ('date_of_update', models.DateField(blank=True, null=True)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('price_sum', models.FloatField(default=0)),
+                ('price_n', models.PositiveIntegerField(default=0)),
+                ('price_min', models.FloatField(blank=True, null=True)),
+                ('price_max', models.FloatField(blank=True, null=True)),
+                ('psm_sum', models.FloatField(default=0)),
+                ('psm_n', models.PositiveIntegerField(default=0)),
+                ('bua_sum', models.FloatField(default=0)),
+                ('bua_n', models.PositiveIntegerField(default=0)),
+                ('bua_min', models.FloatField(blank=True, null=True)),
+                ('bua_max', models.FloatField(blank=True, null=True)),
+                ('dp_sum', models.FloatField(default=0)),
+                ('dp_n', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_cube, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0100_marketunitcube'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesrequestanalytical',
+            index=models.Index(fields=['company', 'is_approved', 'date', 'id'], name='top_sra_approved_date_idx'),
+        ),
+    ]
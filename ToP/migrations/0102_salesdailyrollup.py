@@ -0,0 +1,86 @@
+# Generated by Django 4.2.21 on 2026-10-17 20:10
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.timezone import localdate
+
+
+def build_rollups(apps, schema_editor):
+    SalesRequestAnalytical = apps.get_model("ToP", "SalesRequestAnalytical")
+    SalesDailyRollup = apps.get_model("ToP", "SalesDailyRollup")
+
+    groups = {}
+    rows = SalesRequestAnalytical.objects.order_by().values_list(
+        "company_id", "project_id", "sales_man_id", "date",
+        "is_approved", "is_fake", "base_price", "final_price", "discount",
+    )
+    for company_id, project_id, sales_man_id, dt, is_approved, is_fake, base, final, discount in rows.iterator(
+        chunk_size=1000
+    ):
+        outcome = "approved" if is_approved else ("fake" if is_fake else "other")
+        key = (company_id, project_id, sales_man_id, localdate(dt), outcome)
+        acc = groups.get(key)
+        if acc is None:
+            acc = groups[key] = {
+                "requests": 0, "base_price_sum": 0.0, "final_price_sum": Decimal("0"),
+                "discount_sum": Decimal("0"), "discounted_requests": 0, "last_request_at": dt,
+            }
+        acc["requests"] += 1
+        if base is not None:
+            acc["base_price_sum"] += base
+        if final is not None:
+            acc["final_price_sum"] += final
+        if discount is not None and discount > 0:
+            acc["discount_sum"] += discount
+            acc["discounted_requests"] += 1
+        if dt > acc["last_request_at"]:
+            acc["last_request_at"] = dt
+
+    SalesDailyRollup.objects.bulk_create(
+        [
+            SalesDailyRollup(
+                company_id=company_id, project_id=project_id, sales_man_id=sales_man_id,
+                day=day, outcome=outcome, **acc,
+            )
+            for (company_id, project_id, sales_man_id, day, outcome), acc in groups.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ToP', '0101_salesrequestanalytical_top_sra_approved_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('outcome', models.CharField(choices=[('approved', 'Approved'), ('fake', 'Fake / expired'), ('other', 'Other')], max_length=10)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('base_price_sum', models.FloatField(default=0)),
+                ('final_price_sum', models.DecimalField(decimal_places=5, default=0, max_digits=28)),
+                ('discount_sum', models.DecimalField(decimal_places=5, default=0, max_digits=20)),
+                ('discounted_requests', models.PositiveIntegerField(default=0)),
+                ('last_request_at', models.DateTimeField(blank=True, null=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ToP.company')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ToP.project')),
+                ('sales_man', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['company', 'day'], name='top_sales_rollup_day_idx'),
+                    models.Index(fields=['company', 'sales_man', 'outcome'], name='top_sales_rollup_salesman_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.21 on 2026-10-17 21:30
+
+from django.db import migrations, models
+import django.utils.timezone
+from django.utils.timezone import localdate
+
+
+def fill_days(apps, schema_editor):
+    AttendanceLog = apps.get_model("ToP", "AttendanceLog")
+
+    batch = []
+    for log in AttendanceLog.objects.only("id", "timestamp").iterator(chunk_size=1000):
+        log.day = localdate(log.timestamp)
+        batch.append(log)
+        if len(batch) >= 1000:
+            AttendanceLog.objects.bulk_update(batch, ["day"])
+            batch = []
+    if batch:
+        AttendanceLog.objects.bulk_update(batch, ["day"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0102_salesdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancelog',
+            name='day',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_days, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendancelog',
+            name='day',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='attendancelog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='attendancelog',
+            index=models.Index(fields=['user', 'timestamp'], name='top_attendance_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancelog',
+            index=models.Index(fields=['day', 'user'], name='top_attendance_day_user_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.21 on 2026-10-18 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0104_companyinventoryversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectPricingVersion',
+            fields=[
+                ('project', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='ToP.project')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
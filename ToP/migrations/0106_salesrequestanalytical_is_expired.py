@@ -0,0 +1,23 @@
+# Generated by Django 4.2.21 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ToP', '0105_projectpricingversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesrequestanalytical',
+            name='is_expired',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='salesdailyrollup',
+            name='outcome',
+            field=models.CharField(choices=[('approved', 'Approved'), ('fake', 'Fake'), ('expired', 'Expired'), ('other', 'Other')], max_length=10),
+        ),
+    ]
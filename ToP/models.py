@@ -8,6 +8,9 @@ import os
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .utils.payments_plans_utils import build_payment_rows, pack_payment_rows, unpack_payment_rows
 
 
 
@@ -21,6 +24,12 @@ class CompanyType(models.TextChoices):
     ERP = "erp", "ERP"
     GOOGLE_SHEETS = "google_sheets", "Google Sheets"
 
+class ERPPagination(models.TextChoices):
+    NONE = "none", "None (single response)"
+    PAGE = "page", "Page number"
+    OFFSET = "offset", "Offset / limit"
+    CURSOR = "cursor", "Cursor"
+
 class Company(models.Model):
     name = models.CharField(max_length=255, unique=True)
     num_users = models.IntegerField(default=0)
@@ -65,6 +74,8 @@ class Company(models.Model):
     erp_hold_url_key = models.CharField(max_length=120, blank=True, null=True)
     erp_approve_url_key = models.CharField(max_length=120, blank=True, null=True)
     erp_url_leads_key = models.CharField(max_length=120, blank=True, null=True)
+    erp_pagination = models.CharField(max_length=10, choices=ERPPagination.choices, default=ERPPagination.NONE)
+    erp_page_size = models.PositiveIntegerField(default=500)
 
     # ===== Google Sheets fields (only for company_type='google_sheets') =====
     google_sheet_url = models.URLField(blank=True, null=True)
@@ -76,12 +87,28 @@ class Company(models.Model):
     auto_sync = models.BooleanField(default=False)
     auto_sync_timer = models.IntegerField(default=0)
     last_auto_sync_at = models.DateTimeField(null=True, blank=True)
+    erp_units_synced_at = models.DateTimeField(null=True, blank=True)  # last successful ERP unit fetch (delta cursor)
     auto_sync_running = models.BooleanField(default=False) 
 
     def __str__(self):
         return self.name
 
 
+class CompanyInventoryVersion(models.Model):
+    """
+    Per-company inventory version (UnitSnapshotService). Incremented inside every transaction
+    that writes units; kept off Company so a full Company.save() can never roll it back.
+    No FK constraint: bumps fired while a company is being deleted must not block the delete.
+    """
+    company = models.OneToOneField(
+        Company, on_delete=models.DO_NOTHING, db_constraint=False, primary_key=True, related_name="+"
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.company_id}: v{self.version}"
+
+
 class ERPUnitFieldMapping(models.Model):
     company = models.ForeignKey(
         "Company",
@@ -163,6 +190,21 @@ class Project(models.Model):
         return self.name
 
 
+class ProjectPricingVersion(models.Model):
+    """
+    Per-project pricing version (ProjectPricingSnapshotService). Incremented inside every
+    transaction that writes pricing configuration, so every worker sees the bump at commit.
+    No FK constraint: bumps fired while a project is being deleted must not block the delete.
+    """
+    project = models.OneToOneField(
+        Project, on_delete=models.DO_NOTHING, db_constraint=False, primary_key=True, related_name="+"
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.project_id}: v{self.version}"
+
+
 # ---------------- Project Web Configuration ----------------
 class ProjectWebConfiguration(models.Model):
     PAYMENT_SCHEME_CHOICES = [
@@ -223,7 +265,28 @@ class ProjectWebConfiguration(models.Model):
 
 
 
-class ProjectExtendedPayments(models.Model):
+class ExtendedPaymentRowsMixin:
+    """
+    Shared by the extended payment plan models (regular + special offer).
+    `compiled_rows` packs DP1, DP2, installment_1..48 and their cumulatives
+    into one float array; it is rebuilt on every save().
+    """
+
+    def compile_payment_rows(self):
+        self.compiled_rows = pack_payment_rows(*build_payment_rows(self))
+
+    def payment_rows(self):
+        """ (values, cumulatives) in apply_constraints order: DP1, DP2, installment_1..48. """
+        return unpack_payment_rows(self.compiled_rows) or build_payment_rows(self)
+
+    def save(self, *args, **kwargs):
+        self.compile_payment_rows()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"compiled_rows"}
+        super().save(*args, **kwargs)
+
+
+class ProjectExtendedPayments(ExtendedPaymentRowsMixin, models.Model):
     project = models.ForeignKey('Project', on_delete=models.CASCADE)
     year = models.PositiveIntegerField(default=1)  # NEW
     scheme = models.CharField(max_length=255, default = "flat") 
@@ -239,6 +302,8 @@ class ProjectExtendedPayments(models.Model):
         locals()[f'installment_{i}'] = models.FloatField(null=True, blank=True)
         locals()[f'cumulative_{i}'] = models.FloatField(null=True, blank=True)
 
+    compiled_rows = models.BinaryField(null=True, blank=True, editable=False)
+
     class Meta:
         unique_together = ('project', 'year', 'scheme')
 
@@ -247,7 +312,7 @@ class ProjectExtendedPayments(models.Model):
 
 
 
-class ProjectExtendedPaymentsSpecialOffer(models.Model):
+class ProjectExtendedPaymentsSpecialOffer(ExtendedPaymentRowsMixin, models.Model):
     project = models.ForeignKey('Project', on_delete=models.CASCADE)
     year = models.PositiveIntegerField(default=1)
     dp1 = models.FloatField(null=True, blank=True)
@@ -260,6 +325,8 @@ class ProjectExtendedPaymentsSpecialOffer(models.Model):
     for i in range(1, 49):
         locals()[f'installment_{i}'] = models.FloatField(null=True, blank=True)
         locals()[f'cumulative_{i}'] = models.FloatField(null=True, blank=True)
+
+    compiled_rows = models.BinaryField(null=True, blank=True, editable=False)
         
     def __str__(self):
         return f"Special Offer {self.year} years for {self.project.name} "
@@ -522,6 +589,17 @@ class Unit(models.Model):
     # New Field: Source
     source = models.CharField(max_length=255, blank=True, null=True)
 
+    # Hash of the source row last applied by a warehouse / sheet sync (delta sync)
+    source_hash = models.CharField(max_length=40, blank=True, null=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        # a local write makes the unit differ from the source row last applied; syncs write
+        # through bulk_create / bulk_update, so this only runs for local changes
+        self.source_hash = None
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"source_hash"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.unit_code
     
@@ -546,6 +624,9 @@ class SalesRequest(models.Model):
     # --- NEW FIELD ---
     extended_minutes = models.IntegerField(default=0, null=True, blank=True)
 
+    # When the hold auto-expires (date + project timer + extensions); maintained by HoldExpiryService
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+
     # --- NEW HELPER PROPERTY ---
     @property
     def expiration_date(self):
@@ -583,6 +664,13 @@ class SalesRequestAnalytical(models.Model):
     client_name = models.CharField(max_length=255, null=True, blank=True)
     is_approved = models.BooleanField(default=False)
     is_fake = models.BooleanField(default=False)
+    is_expired = models.BooleanField(default=False)   # hold released by HoldExpiryService (is_fake too)
+
+    class Meta:
+        indexes = [
+            # approved-sales report: keyset pages on (date, id) within a company
+            models.Index(fields=["company", "is_approved", "date", "id"], name="top_sra_approved_date_idx"),
+        ]
 
     def __str__(self):
         unit_code = self.unit_code
@@ -590,6 +678,42 @@ class SalesRequestAnalytical(models.Model):
         return f"SalesRequest by {sales_man} for Unit {unit_code}"
 
 
+class SalesDailyRollup(models.Model):
+    """
+    Daily aggregate of SalesRequestAnalytical per company x project x salesman x outcome.
+    Maintained by SalesRollupService (recomputes the touched company-days after writes);
+    `rebuild_sales_rollups` backfills. Sums skip NULL prices, like SUM() on the raw rows.
+    """
+
+    class Outcome(models.TextChoices):
+        APPROVED = "approved", "Approved"
+        FAKE = "fake", "Fake"             # rejected requests (is_fake)
+        EXPIRED = "expired", "Expired"    # holds released by HoldExpiryService (is_expired)
+        OTHER = "other", "Other"
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    sales_man = models.ForeignKey('User', on_delete=models.CASCADE, related_name="+")
+    day = models.DateField()   # local (TIME_ZONE) date of SalesRequestAnalytical.date
+    outcome = models.CharField(max_length=10, choices=Outcome.choices)
+
+    requests = models.PositiveIntegerField(default=0)
+    base_price_sum = models.FloatField(default=0)
+    final_price_sum = models.DecimalField(max_digits=28, decimal_places=5, default=0)
+    discount_sum = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    discounted_requests = models.PositiveIntegerField(default=0)   # requests with discount > 0
+    last_request_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["company", "day"], name="top_sales_rollup_day_idx"),
+            models.Index(fields=["company", "sales_man", "outcome"], name="top_sales_rollup_salesman_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.sales_man_id} {self.outcome} ({self.requests})"
+
+
 
 
 class MarketProjectLocation(models.Model):
@@ -673,6 +797,41 @@ class MarketUnitData(models.Model):
 
     def __str__(self):
         return f"{self.project_name} - {self.unit_type}"
+
+
+class MarketUnitCube(models.Model):
+    """
+    Materialized aggregate of MarketUnitData for the market dashboard, one row per
+    combination of the filter dimensions (+ project, for distinct-project counts).
+    Rebuilt per project by MarketResearchCubeService after imports / edits.
+    Averages are stored as sum + non-null count so any slice can be rolled up.
+    """
+    project_key = models.CharField(max_length=255, db_index=True)   # lower(project_name), refresh key
+    project_name = models.CharField(max_length=255, null=True, blank=True)
+    developer_name = models.CharField(max_length=255, null=True, blank=True)
+    location = models.CharField(max_length=255, null=True, blank=True)
+    asset_type = models.CharField(max_length=255, null=True, blank=True)
+    unit_type = models.CharField(max_length=255, null=True, blank=True)
+    finishing_specs = models.CharField(max_length=255, null=True, blank=True)
+    payment_yrs = models.CharField(max_length=255, null=True, blank=True)
+    date_of_update = models.DateField(null=True, blank=True)
+
+    units = models.PositiveIntegerField(default=0)
+    price_sum = models.FloatField(default=0)
+    price_n = models.PositiveIntegerField(default=0)
+    price_min = models.FloatField(null=True, blank=True)
+    price_max = models.FloatField(null=True, blank=True)
+    psm_sum = models.FloatField(default=0)
+    psm_n = models.PositiveIntegerField(default=0)
+    bua_sum = models.FloatField(default=0)
+    bua_n = models.PositiveIntegerField(default=0)
+    bua_min = models.FloatField(null=True, blank=True)
+    bua_max = models.FloatField(null=True, blank=True)
+    dp_sum = models.FloatField(default=0)
+    dp_n = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.project_name} - {self.unit_type} ({self.units})"
     
 
 
@@ -986,7 +1145,9 @@ class AttendanceLog(models.Model):
     )
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_logs')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default (not auto_now_add) so save() can derive `day` from the final value
+    timestamp = models.DateTimeField(default=now, editable=False)
+    day = models.DateField(editable=False)   # local (TIME_ZONE) date of timestamp; the dashboard groups by it
     action = models.CharField(max_length=3, choices=ACTION_CHOICES)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
@@ -994,6 +1155,16 @@ class AttendanceLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=["user", "timestamp"], name="top_attendance_user_ts_idx"),
+            models.Index(fields=["day", "user"], name="top_attendance_day_user_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.day = timezone.localdate(self.timestamp)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"day"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.email} - {self.action} - {self.timestamp}"
@@ -1037,3 +1208,42 @@ class PivotUnitsSnapshot(models.Model):
 
     def __str__(self):
         return f"PivotUnitsSnapshot({self.company_id})"
+
+
+class BackgroundJob(models.Model):
+    """
+    Durable background job (emails, PDFs, Pusher, ERP / Sheets side effects, CSV imports).
+    Rows double as the status table; see ToP/services/job_queue_service.py.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    class Priority(models.IntegerChoices):
+        HIGH = 10, "High"
+        NORMAL = 50, "Normal"
+        LOW = 90, "Low"
+
+    task = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    priority = models.PositiveSmallIntegerField(choices=Priority.choices, default=Priority.NORMAL)  # lower runs first
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=now)
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "priority", "run_after"], name="top_job_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"BackgroundJob({self.id}, {self.task}, {self.status})"
@@ -1,8 +1,13 @@
 import base64
 import uuid
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
 from django.core.files.base import ContentFile
+from django.db.models import Q
 from django.utils import timezone
 from ..models import AttendanceLog
+from ..utils.attendance_utils import decode_attendance_cursor, encode_attendance_cursor
 
 class AttendanceActionService:
     @staticmethod
@@ -72,29 +77,91 @@ class AttendanceActionService:
         return count
 
 
+ATTENDANCE_PAGE_SIZE = 20
+ATTENDANCE_MAX_PAGE_SIZE = 200
+
+
 class AttendanceQueryService:
+    """
+    Management dashboard rows: one per (user, local day) with the first check-in and the last check-out.
+
+    - Date range / user / name filters run in SQL on AttendanceLog.day, and the (day, user)
+      keys are grouped and paged in the database by keyset (day DESC, user DESC),
+      so a page costs the same however long the history gets.
+    - Only the logs of the page's keys are loaded to resolve ids, coordinates and photos.
+    - A malformed cursor raises ValueError (the view answers 400).
+    """
+
     @staticmethod
-    def get_all_grouped_data():
-        queryset = AttendanceLog.objects.select_related('user').all().order_by('timestamp')
-        return AttendanceQueryService._group_logs_by_day(queryset)
+    def get_grouped_page(
+        *,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        user_id: Optional[int] = None,
+        name: str = "",
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        limit = max(1, min(int(limit or ATTENDANCE_PAGE_SIZE), ATTENDANCE_MAX_PAGE_SIZE))
+
+        logs = AttendanceLog.objects.all()
+        if start:
+            logs = logs.filter(day__gte=start)
+        if end:
+            logs = logs.filter(day__lte=end)
+        if user_id:
+            logs = logs.filter(user_id=user_id)
+        if name:
+            logs = logs.filter(user__full_name__icontains=name)
+
+        if cursor:
+            after = decode_attendance_cursor(cursor)
+            if after is None:
+                # never fall back to the first page: the client would silently repeat rows
+                raise ValueError("Invalid cursor")
+            day, last_user_id = after
+            logs = logs.filter(Q(day__lt=day) | Q(day=day, user_id__lt=last_user_id))
+
+        keys = list(
+            logs.order_by("-day", "-user_id").values_list("day", "user_id").distinct()[: limit + 1]
+        )
+        has_more = len(keys) > limit
+        keys = keys[:limit]
+
+        if not keys:
+            return {"rows": [], "next_cursor": None, "limit": limit}
+
+        # logs of the page's users over the page's days (keys come newest first)
+        page_logs = (
+            AttendanceLog.objects.filter(
+                day__range=(keys[-1][0], keys[0][0]),
+                user_id__in={user_id for _, user_id in keys},
+            )
+            .select_related("user")
+            .order_by("timestamp", "id")
+        )
+        grouped = AttendanceQueryService._group_logs_by_day(page_logs)
+
+        return {
+            "rows": [grouped[(user_id, day)] for day, user_id in keys if (user_id, day) in grouped],
+            "next_cursor": encode_attendance_cursor(*keys[-1]) if has_more else None,
+            "limit": limit,
+        }
 
     @staticmethod
-    def _group_logs_by_day(queryset):
+    def _group_logs_by_day(queryset) -> Dict[Tuple[int, date], Dict[str, Any]]:
         grouped_data = {}
 
         for log in queryset:
-            log_date = log.timestamp.date()
-            date_str = log_date.strftime('%Y-%m-%d') 
-            
-            key = (log.user_id, date_str)
+            log_date = log.day
+            key = (log.user_id, log_date)
 
             if key not in grouped_data:
                 grouped_data[key] = {
                     'user_name': log.user.full_name,
                     'user_role': "Business Team",
-                    'date_obj': log_date, 
                     'date_str': log_date.strftime('%d/%m/%Y'), 
-                    'filter_date': date_str, 
+                    'filter_date': log_date.strftime('%Y-%m-%d'), 
                     'check_in_lat': None,
                     'check_in_lng': None,
                     'check_out_lat': None,
@@ -127,10 +194,4 @@ class AttendanceQueryService:
                 if log.photo:
                     grouped_data[key]['check_out_photo'] = log.photo.url
 
-        results = list(grouped_data.values())
-        results.sort(key=lambda x: x['date_obj'], reverse=True)
-        
-        for r in results:
-            del r['date_obj']
-            
-        return results
\ No newline at end of file
+        return grouped_data
@@ -1,7 +1,12 @@
 import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.timezone import now
-from django.db import transaction
+from django.db import connection, transaction
 
 from ..models import Company
 from .unit_warehouse_service import UnitWarehouseService
@@ -9,6 +14,13 @@ from .unit_warehouse_service import UnitWarehouseService
 logger = logging.getLogger(__name__)
 
 
+AUTO_SYNC_LAST_RUN_CACHE_KEY = "auto_sync:last_run"
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_JITTER_SECONDS = 5.0
+DEFAULT_SOURCE_TIMEOUT_SECONDS = 120.0
+
+
 class CompanyAutoSyncService:
     """
     Cron-friendly auto sync service.
@@ -18,17 +30,59 @@ class CompanyAutoSyncService:
     - Sync Sheets if configured
     - Sync ERP if configured
     - Uses DB row locking to prevent concurrent runs per company
+
+    Scheduler mode (parallel=True):
+    - Due companies run concurrently in a bounded thread pool
+    - Each company starts after a random jitter so ERPs are not hit at the same instant
+    - Each source (sheet / ERP) gets a timeout budget; a source that overruns is
+      reported as timed out and the company's running flag is only cleared when
+      it actually finishes, so runs never overlap
+    - Every run returns (and caches) per-company / per-source duration metrics
     """
 
     @staticmethod
-    def run():
-        qs = Company.objects.filter(auto_sync=True, auto_sync_timer__gt=0)
+    def run(*, parallel: bool = False, max_workers: int = None, jitter_seconds: float = None, source_timeout: float = None):
+        started = time.perf_counter()
+        started_at = now()
+
+        if parallel:
+            results = CompanyAutoSyncService._run_parallel(
+                max_workers=max_workers or getattr(settings, "AUTO_SYNC_MAX_WORKERS", DEFAULT_MAX_WORKERS),
+                jitter_seconds=(
+                    jitter_seconds if jitter_seconds is not None
+                    else getattr(settings, "AUTO_SYNC_JITTER_SECONDS", DEFAULT_JITTER_SECONDS)
+                ),
+                source_timeout=source_timeout or getattr(settings, "AUTO_SYNC_SOURCE_TIMEOUT_SECONDS", DEFAULT_SOURCE_TIMEOUT_SECONDS),
+            )
+        else:
+            results = []
+            qs = Company.objects.filter(auto_sync=True, auto_sync_timer__gt=0)
 
-        for company in qs:
-            try:
-                CompanyAutoSyncService._run_for_company(company.id)
-            except Exception as e:
-                logger.exception(f"[AUTO_SYNC] Company {company.id} failed: {e}")
+            for company in qs:
+                try:
+                    results.append(CompanyAutoSyncService._run_for_company(company.id))
+                except Exception as e:
+                    logger.exception(f"[AUTO_SYNC] Company {company.id} failed: {e}")
+                    results.append({"company_id": company.id, "status": "failed", "error": str(e)})
+
+        report = {
+            "started_at": started_at.isoformat(),
+            "mode": "parallel" if parallel else "serial",
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "companies_checked": len(results),
+            "companies_synced": sum(1 for r in results if r.get("status") in ("ok", "partial", "timeout")),
+            "companies": results,
+        }
+        cache.set(AUTO_SYNC_LAST_RUN_CACHE_KEY, report, None)
+        logger.info(
+            f"[AUTO_SYNC] {report['mode']} run: {report['companies_synced']}/{report['companies_checked']} "
+            f"companies synced in {report['duration_ms']} ms"
+        )
+        return report
+
+    @staticmethod
+    def last_run_report():
+        return cache.get(AUTO_SYNC_LAST_RUN_CACHE_KEY)
 
     @staticmethod
     def _due(last_run, minutes: int) -> bool:
@@ -36,57 +90,190 @@ class CompanyAutoSyncService:
             return True
         return now() >= (last_run + timedelta(minutes=minutes))
 
+    # =====================================================
+    # Scheduler mode
+    # =====================================================
+
+    @staticmethod
+    def _run_parallel(*, max_workers: int, jitter_seconds: float, source_timeout: float):
+        # Cheap pre-filter so idle tenants never occupy a worker; the locked re-check still decides
+        due_ids = [
+            c.id
+            for c in Company.objects.filter(auto_sync=True, auto_sync_timer__gt=0, auto_sync_running=False)
+            .only("id", "auto_sync_timer", "last_auto_sync_at")
+            if CompanyAutoSyncService._due(c.last_auto_sync_at, c.auto_sync_timer)
+        ]
+        if not due_ids:
+            return []
+
+        # Sources run in their own pool so a worker can stop waiting on an overrunning source.
+        # A company has at most one live source, so sizing by company count means no source ever queues.
+        source_pool = ThreadPoolExecutor(max_workers=len(due_ids), thread_name_prefix="auto-sync-source")
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="auto-sync") as pool:
+                futures = {
+                    pool.submit(
+                        CompanyAutoSyncService._run_company_worker,
+                        company_id,
+                        random.uniform(0, jitter_seconds) if jitter_seconds > 0 else 0.0,
+                        source_pool,
+                        source_timeout,
+                    ): company_id
+                    for company_id in due_ids
+                }
+
+                results = []
+                for future, company_id in futures.items():
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        logger.exception(f"[AUTO_SYNC] Company {company_id} failed: {e}")
+                        results.append({"company_id": company_id, "status": "failed", "error": str(e)})
+                return results
+        finally:
+            # don't block the run on stragglers; they release their company when done
+            source_pool.shutdown(wait=False)
+
+    @staticmethod
+    def _run_company_worker(company_id: int, jitter: float, source_pool, source_timeout: float):
+        try:
+            if jitter:
+                time.sleep(jitter)
+            result = CompanyAutoSyncService._run_for_company(
+                company_id, source_pool=source_pool, source_timeout=source_timeout
+            )
+            result["jitter_ms"] = round(jitter * 1000, 1)
+            return result
+        finally:
+            connection.close()
+
+    # =====================================================
+    # One company
+    # =====================================================
+
     @staticmethod
-    def _run_for_company(company_id: int):
+    def _run_for_company(company_id: int, source_pool=None, source_timeout: float = None):
+        started = time.perf_counter()
+
         with transaction.atomic():
             c = Company.objects.select_for_update().get(id=company_id)
 
             # Prevent overlapping runs
             if c.auto_sync_running:
-                return
+                return {"company_id": company_id, "status": "running"}
 
             if not c.auto_sync or c.auto_sync_timer <= 0:
-                return
+                return {"company_id": company_id, "status": "disabled"}
 
             if not CompanyAutoSyncService._due(c.last_auto_sync_at, c.auto_sync_timer):
-                return
+                return {"company_id": company_id, "status": "not_due"}
 
             # Mark running (inside lock)
             c.auto_sync_running = True
             c.save(update_fields=["auto_sync_running"])
 
         # run imports OUTSIDE the lock to avoid holding DB lock during network IO
-        sheet_ok = False
-        erp_ok = False
-        errors = []
+        outcome = {"sheet_ok": False, "erp_ok": False, "errors": []}
+        sources = {}
+        straggler = None
 
         try:
-            if c.google_sheet_url:
-                res = UnitWarehouseService.trigger_import(company=c, source_type="sheet")
-                sheet_ok = bool(res.get("success"))
-                if not sheet_ok:
-                    errors.append(f"SHEET: {res.get('error') or res}")
-
-            if c.erp_url:
-                res = UnitWarehouseService.trigger_import(company=c, source_type="erp")
-                erp_ok = bool(res.get("success"))
-                if not erp_ok:
-                    errors.append(f"ERP: {res.get('error') or res}")
+            for label, source_type, enabled in (
+                ("SHEET", "sheet", bool(c.google_sheet_url)),
+                ("ERP", "erp", bool(c.erp_url)),
+            ):
+                if not enabled:
+                    continue
+
+                t0 = time.perf_counter()
+                if source_pool is None:
+                    res = UnitWarehouseService.trigger_import(company=c, source_type=source_type)
+                else:
+                    future = source_pool.submit(CompanyAutoSyncService._run_source, c, source_type)
+                    try:
+                        res = future.result(timeout=source_timeout)
+                    except FutureTimeoutError:
+                        sources[source_type] = {
+                            "success": False,
+                            "timed_out": True,
+                            "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+                        }
+                        outcome["errors"].append(f"{label}: timed out after {source_timeout}s")
+                        straggler = (future, source_type)
+                        break
+
+                ok = bool(res.get("success"))
+                outcome[f"{source_type}_ok"] = ok
+                if not ok:
+                    outcome["errors"].append(f"{label}: {res.get('error') or res}")
+                sources[source_type] = {
+                    "success": ok,
+                    "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+                    "stats": res.get("stats"),
+                }
 
         finally:
-            # Clear running flag + update last run timestamp (only if any source ran)
             ran_any = bool(c.google_sheet_url) or bool(c.erp_url)
 
+            if straggler is None:
+                CompanyAutoSyncService._release(company_id, ran_any, outcome)
+            else:
+                # keep the running flag until the overrunning source really returns
+                future, source_type = straggler
+                future.add_done_callback(
+                    lambda f: CompanyAutoSyncService._release_late(f, source_type, company_id, ran_any, outcome)
+                )
+
+        if straggler is not None:
+            status = "timeout"
+        elif outcome["errors"]:
+            status = "partial" if (outcome["sheet_ok"] or outcome["erp_ok"]) else "failed"
+        else:
+            status = "ok"
+
+        return {
+            "company_id": company_id,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "sources": sources,
+            "errors": outcome["errors"],
+        }
+
+    @staticmethod
+    def _run_source(company: Company, source_type: str):
+        try:
+            return UnitWarehouseService.trigger_import(company=company, source_type=source_type)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _release_late(future, source_type: str, company_id: int, ran_any: bool, outcome: dict):
+        # a late success still counts as a run (no immediate retry storm on slow sources)
+        try:
+            res = future.result()
+        except Exception as e:
+            res = {"success": False, "error": str(e)}
+        if res.get("success"):
+            outcome[f"{source_type}_ok"] = True
+        CompanyAutoSyncService._release(company_id, ran_any, outcome, close_connection=True)
+
+    @staticmethod
+    def _release(company_id: int, ran_any: bool, outcome: dict, close_connection: bool = False):
+        # Clear running flag + update last run timestamp (only if any source ran)
+        try:
             with transaction.atomic():
                 c2 = Company.objects.select_for_update().get(id=company_id)
                 c2.auto_sync_running = False
 
-                if ran_any and (sheet_ok or erp_ok or not errors):
+                if ran_any and (outcome["sheet_ok"] or outcome["erp_ok"] or not outcome["errors"]):
                     # even if one source failed, you may still want to mark last run to avoid hammering.
                     # adjust rule if you prefer "only mark last run if both succeeded".
                     c2.last_auto_sync_at = now()
 
                 c2.save(update_fields=["auto_sync_running", "last_auto_sync_at"])
 
-            if errors:
-                logger.error(f"[AUTO_SYNC] Company {company_id} partial errors: {errors}")
+            if outcome["errors"]:
+                logger.error(f"[AUTO_SYNC] Company {company_id} partial errors: {outcome['errors']}")
+        finally:
+            if close_connection:
+                connection.close()
@@ -1,7 +1,7 @@
 # ToP/services/csv_inventory_service.py
 
+import logging
 import uuid
-import threading
 
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
@@ -10,26 +10,41 @@ from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 
 from ..models import Company, Unit, Project, ModificationRecords
+from .inventory_delta_sync_service import InventoryDeltaSyncService
+from .job_queue_service import JobQueueService
+from .unit_snapshot_service import UnitSnapshotService
 from ..utils.csv_inventory_utils import (
     progress_get,
     progress_set_processing,
     progress_set_completed,
     progress_set_error,
     validate_csv_file_or_response,
-    read_csv_rows,
+    iter_csv_rows,
+    count_csv_rows,
     normalize_row,
     clean_numeric, 
     convert_date_format
 )
+from ..utils.erp_stream_utils import chunked
+
+logger = logging.getLogger(__name__)
+
+
+CSV_IMPORT_CHUNK_SIZE = 1000     # rows per preload + bulk write; also the progress step
+CSV_IMPORT_MAX_REPORTED_ERRORS = 100   # row errors kept in the progress result (all are counted)
+
 
 class CsvInventoryService:
     """
     Unified CSV Inventory feature service:
-    - start_upload()   -> validate + save temp + spawn thread
-    - run_import()     -> read csv + replace/update + upsert units + progress
+    - start_upload()   -> validate + save temp + queue background job
+    - run_import()     -> stream csv in chunks + replace/update + bulk upsert units + progress
     - get_progress()   -> read cache progress
 
-    Behavior is preserved exactly.
+    Behavior is preserved exactly: each row is applied like the old per-row
+    update_or_create(unit_code, company, defaults=...) (same defaults, last row wins),
+    but rows are streamed and written per chunk with one preload, bulk_update of the
+    changed columns only and bulk_create for new units.
     """
 
     # =========================
@@ -78,22 +93,17 @@ class CsvInventoryService:
             else:
                 return JsonResponse({"error": "Permission Denied for Replace All"}, status=403)
 
-        # 5) Start background thread (same behavior)
+        # 5) Queue the import (background job; progress is still reported under task_id)
         task_id = str(uuid.uuid4())
 
-        thread = threading.Thread(
-            target=cls.run_import,
-            kwargs={
-                "task_id": task_id,
-                "file_path": file_path,
-                "company_id": company.id,
-                "user_id": user.id,
-                "upload_mode": upload_mode,
-                "is_replace_mode": is_replace_mode,
-            },
-        )
-        thread.daemon = True
-        thread.start()
+        JobQueueService.enqueue("inventory.csv_import", {
+            "task_id": task_id,
+            "file_path": file_path,
+            "company_id": company.id,
+            "user_id": user.id,
+            "upload_mode": upload_mode,
+            "is_replace_mode": is_replace_mode,
+        })
 
         return JsonResponse({"task_id": task_id, "status": "started"})
 
@@ -104,19 +114,24 @@ class CsvInventoryService:
         """
         try:
             user, company = cls._load_user_and_company(user_id, company_id)
-            rows = read_csv_rows(file_path)  # utf-8-sig + DictReader
-            total_rows = len(rows)
+            total_rows = count_csv_rows(file_path)  # utf-8-sig, streamed
 
             cls._handle_replace_mode(company=company, user=user, is_replace_mode=is_replace_mode)
 
-            cls._process_rows(
+            result = cls._process_rows(
                 task_id=task_id,
-                rows=rows,
+                rows=iter_csv_rows(file_path),
                 total_rows=total_rows,
                 company=company,
             )
+            if result["error_count"]:
+                logger.warning(
+                    "[CSV_IMPORT] %s: %s row(s) skipped for company %s, first: %s",
+                    task_id, result["error_count"], company_id, result["errors"][:5],
+                )
 
-            progress_set_completed(task_id)
+            progress_set_completed(task_id, result=result)
+            return result
 
         except Exception as e:
             progress_set_error(task_id, str(e))
@@ -141,6 +156,7 @@ class CsvInventoryService:
     def _handle_replace_mode(*, company, user, is_replace_mode: bool):
         if is_replace_mode:
             Unit.objects.filter(company=company).delete()
+            UnitSnapshotService.bump(company.id)
             ModificationRecords.objects.create(
                 user=user,
                 type="REPLACE",
@@ -154,185 +170,207 @@ class CsvInventoryService:
             )
 
     @classmethod
-    def _process_rows(cls, *, task_id: str, rows, total_rows: int, company):
-        last_project_name = None
-        proj_obj = None
-
-        for index, row in enumerate(rows):
-            # Same logic: update progress every 10 rows or last row
-            progress_set_processing(task_id, index=index, total_rows=total_rows)
-
-            row = normalize_row(row)
-
-            unit_code = row.get("Unit Code", "").strip()
-            if not unit_code:
-                continue
-
-            current_project_name = row.get("Project", "").strip()
+    def _process_rows(cls, *, task_id: str, rows, total_rows: int, company, chunk_size: int = CSV_IMPORT_CHUNK_SIZE):
+        """
+        Applies the rows chunk by chunk; returns the import totals with the row errors
+        (unit code + reason) collected across chunks, capped at CSV_IMPORT_MAX_REPORTED_ERRORS.
+        """
+        projects = {}
+        # one 2-column read for the whole import; apply() keeps it current across chunks
+        stored_hashes = InventoryDeltaSyncService.load_stored_hashes(company)
+        processed = 0
+        result = {"created": 0, "updated": 0, "unchanged": 0, "skipped": 0, "error_count": 0, "errors": []}
+
+        for chunk in chunked(rows, chunk_size):
+            # {unit_code: defaults}; a code repeated in the chunk keeps its last row, like sequential upserts
+            defaults_by_code = {}
+            for row in chunk:
+                row = normalize_row(row)
+
+                unit_code = row.get("Unit Code", "").strip()
+                if not unit_code:
+                    continue
+
+                current_project_name = row.get("Project", "").strip()
+                key = current_project_name.lower()
+                if key not in projects:
+                    projects[key] = (
+                        Project.objects.filter(name__iexact=current_project_name).first()
+                        if current_project_name
+                        else None
+                    )
+
+                defaults_by_code[unit_code] = cls._unit_defaults(
+                    row=row,
+                    project_name=current_project_name,
+                    proj_obj=projects[key],
+                )
 
-            if current_project_name != last_project_name:
-                proj_obj = (
-                    Project.objects.filter(name__iexact=current_project_name).first()
-                    if current_project_name
-                    else None
+            if defaults_by_code:
+                # full=True: diff every row against the preloaded units, never trust stored hashes
+                # (units change outside imports, and update_or_create always rewrote them)
+                stats = InventoryDeltaSyncService.apply(
+                    company=company,
+                    rows=defaults_by_code,
+                    full=True,
+                    overwrite_nulls=True,
+                    stored_hashes=stored_hashes,
                 )
-                last_project_name = current_project_name
+                for key in ("created", "updated", "unchanged", "skipped"):
+                    result[key] += getattr(stats, key)
+                result["error_count"] += len(stats.errors)
+                room = CSV_IMPORT_MAX_REPORTED_ERRORS - len(result["errors"])
+                if room > 0:
+                    result["errors"].extend(stats.errors[:room])
 
-            cls._upsert_unit(
-                company=company,
-                unit_code=unit_code,
-                row=row,
-                project_name=current_project_name,
-                proj_obj=proj_obj,
-            )
+            processed += len(chunk)
+            progress_set_processing(task_id, index=processed - 1, total_rows=max(total_rows, processed), every=1)
+
+        return result
 
     @staticmethod
-    def _upsert_unit(*, company, unit_code: str, row, project_name: str, proj_obj):
+    def _unit_defaults(*, row, project_name: str, proj_obj):
         """
         IMPORTANT: defaults dict is kept IDENTICAL to your original implementation.
         """
-        Unit.objects.update_or_create(
-            unit_code=unit_code,
-            company=company,
-            defaults={
-                'city': row.get('City', None),
-                'project': project_name,
-                'project_company': proj_obj,
-
-                'sales_phasing': row.get('Sales Phasing', None),
-                'construction_phasing': row.get('Construction Phasing', None),
-                'handover_phasing': row.get('Handover Phasing', None),
-                'plot_type': row.get('Plot Type', None),
-                'building_style': row.get('Building Style', None),
-                'building_type': row.get('Building Type', None),
-                'unit_type': row.get('Unit Type', None),
-                'unit_model': row.get('Unit Model', None),
-                'mirror': row.get('Mirror', None),
-                'unit_position': row.get('Unit Position', None),
-                'building_number': row.get('Building Number', None),
-                'floor': row.get('Floor', None),
-                'sap_code': row.get('SAP Code', None),
-
-                'finishing_specs': row.get('Finishing Specs', None),
-                'num_bedrooms': row.get('Num Bedrooms', '0'),
-                'num_bathrooms': row.get('Num Bathrooms', '0'),
-                'num_parking_slots': clean_numeric(row.get('Num Parking Slots', '0')),
-
-                'footprint': float(row.get('Foot print', 0)) if row.get('Foot print') else None,
-                'internal_area': float(row.get('Internal Area', 0)) if row.get('Internal Area') else None,
-                'covered_terraces': float(row.get('Covered Terraces', 0)) if row.get('Covered Terraces') else None,
-                'uncovered_terraces': float(row.get('Uncovered Terraces', 0)) if row.get('Uncovered Terraces') else None,
-                'penthouse_area': float(row.get('Penthouse Area', 0)) if row.get('Penthouse Area') else None,
-                'garage_area': float(row.get('Garage Area', 0)) if row.get('Garage Area') else None,
-                'basement_area': float(row.get('Basement Area', 0)) if row.get('Basement Area') else None,
-                'net_area': float(row.get('Net Area', 0)) if row.get('Net Area') else None,
-                'common_area': float(row.get('Common Area', 0)) if row.get('Common Area') else None,
-                'gross_area': float(row.get('Gross Area', 0)) if row.get('Gross Area') else None,
-                'roof_pergola_area': float(row.get('Roof Pergola Area', 0)) if row.get('Roof Pergola Area') else None,
-                'roof_terraces_area': float(row.get('Roof Terraces Area', 0)) if row.get('Roof Terraces Area') else None,
-                'bua': float(row.get('BUA', 0)) if row.get('BUA') else None,
-                'land_area': float(row.get('Land Area', 0)) if row.get('Land Area') else None,
-                'garden_area': float(row.get('Garden Area', 0)) if row.get('Garden Area') else None,
-                'total_area': float(row.get('Total Area', 0)) if row.get('Total Area') else None,
-
-                'net_area_psm': float(row.get('Net Area PSM', 0)) if row.get('Net Area PSM') else None,
-                'covered_terraces_psm': float(row.get('Covered Terraces PSM', 0)) if row.get('Covered Terraces PSM') else None,
-                'uncovered_terraces_psm': float(row.get('Uncovered Terraces PSM', 0)) if row.get('Uncovered Terraces PSM') else None,
-                'penthouse_psm': float(row.get('Penthouse PSM', 0)) if row.get('Penthouse PSM') else None,
-                'garage_psm': float(row.get('Garage PSM', 0)) if row.get('Garage PSM') else None,
-                'basement_psm': float(row.get('Basement PSM', 0)) if row.get('Basement PSM') else None,
-                'common_area_psm': float(row.get('Common Area PSM', 0)) if row.get('Common Area PSM') else None,
-                'roof_pergola_psm': float(row.get('Roof Pergola PSM', 0)) if row.get('Roof Pergola PSM') else None,
-                'roof_terraces_psm': float(row.get('Roof Terraces PSM', 0)) if row.get('Roof Terraces PSM') else None,
-                'land_psm': float(row.get('Land PSM', 0)) if row.get('Land PSM') else None,
-                'garden_psm': float(row.get('Garden PSM', 0)) if row.get('Garden PSM') else None,
-
-                'base_price': float(row.get('Unit Base Price', 0)) if row.get('Unit Base Price') else None,
-                'base_psm': float(row.get('Base PSM', 0)) if row.get('Base PSM') else None,
-
-                'main_view': row.get('Main View', None),
-                'secondary_view': row.get('Secondary View', None),
-                'levels': row.get('Levels', None),
-                'north_breeze': row.get('North Breeze', None),
-                'corners': row.get('Corners', None),
-                'accessibility': row.get('Accessibility', None),
-                'special_premiums': row.get('Special Premiums & Discounts', None),
-                'special_discounts': row.get('Special Premiums & Discounts', None),
-
-                'total_premium_percent': float(row.get('Total Premium Percent', 0))
-                    if row.get('Total Premium Percent') else None,
-                'total_premium_value': float(row.get('Total Premium Value', 0))
-                    if row.get('Total Premium Value') else None,
-
-                'interest_free_unit_price': float(row.get('Interest Free Unit Price', 0))
-                    if row.get('Interest Free Unit Price') else None,
-                'interest_free_psm': float(row.get('Interest Free PSM', 0))
-                    if row.get('Interest Free PSM') else None,
-                'interest_free_years': clean_numeric(row.get('Interest Free Years', '0')),
-
-                'down_payment_percent': float(row.get('Down Payment Percent', 0))
-                    if row.get('Down Payment %') else None,
-                'down_payment': float(row.get('Down Payment', 0))
-                    if row.get('Down Payment') else None,
-                'contract_percent': float(row.get('Contract Percent', 0))
-                    if row.get('Contract %') else None,
-                'contract_payment': float(row.get('Contract Payment', 0))
-                    if row.get('Contract Payment') else None,
-                'delivery_percent': float(row.get('Delivery Percent', 0))
-                    if row.get('Delivery %') else None,
-                'delivery_payment': float(row.get('Delivery Payment', 0))
-                    if row.get('Delivery Payment') else None,
-                'cash_price': float(row.get('Cash Price', 0))
-                    if row.get('Cash Price') else None,
-
-                'maintenance_percent': float(row.get('Maintenance Percent', 0))
-                    if row.get('Maintenance Percent') else None,
-                'maintenance_value': float(row.get('Maintenance Value', 0))
-                    if row.get('Maintenance Value') else None,
-
-                'club': row.get('Club', None),
-                'gas': float(row.get('Gas', 0)) if row.get('Gas') else None,
-                'parking_price': float(row.get('Parking Price', 0))
-                    if row.get('Parking Price') else None,
-
-                'status': row.get('Status', None),
-                'owner': row.get('Owner', None),
-                'blocking_reason': row.get('Blocking Reason', None),
-
-                'release_date': convert_date_format(row.get('Release Date')),
-                'blocking_date': convert_date_format(row.get('Blocking Date')),
-                'reservation_date': convert_date_format(row.get('Reservation Date')),
-                'contract_date': convert_date_format(row.get('Contract Date')),
-                'contract_payment_plan': row.get('Contract Payment Plan', None),
-                'creation_date': convert_date_format(row.get('Creation Date')),
-                'contract_value': float(row.get('Contract Value', 0))
-                    if row.get('Contract Value') else None,
-                'collected_amount': float(row.get('Collected Amount', 0))
-                    if row.get('Collected Amount') else None,
-                'collected_percent': float(row.get('Collected Percent', 0))
-                    if row.get('Collected Percent') else None,
-
-                'contract_delivery_date': convert_date_format(row.get('Contract Delivery Date')),
-                'grace_period_months': clean_numeric(row.get('Grace Period Months', '0')),
-                'construction_delivery_date': convert_date_format(row.get('Construction Delivery Date')),
-                'development_delivery_date': convert_date_format(row.get('Development Delivery Date')),
-                'client_handover_date': convert_date_format(row.get('Client Handover Date')),
-
-                'contractor_type': row.get('Contractor Type', None),
-                'contractor': row.get('Contractor', None),
-                'customer': row.get('Customer', None),
-                'broker': row.get('Broker', None),
-                'bulks': row.get('Bulks', None),
-                'direct_indirect_sales': row.get('Direct Indirect Sales', None),
-
-                'sales_value': float(row.get('Sales Value', 0))
-                    if row.get('Sales Value') else None,
-                'psm': float(row.get('PSM', 0))
-                    if row.get('PSM') else None,
-                'area_range': row.get('Area Range', None),
-                'release_year': clean_numeric(row.get('Release Year', '0')),
-                'sales_year': clean_numeric(row.get('Sales Year', '0')),
-                'adj_status': row.get('Adj Status', None),
-                'ams': row.get('AMS', None),
-            }
-        )
+        return {
+            'city': row.get('City', None),
+            'project': project_name,
+            'project_company': proj_obj,
+
+            'sales_phasing': row.get('Sales Phasing', None),
+            'construction_phasing': row.get('Construction Phasing', None),
+            'handover_phasing': row.get('Handover Phasing', None),
+            'plot_type': row.get('Plot Type', None),
+            'building_style': row.get('Building Style', None),
+            'building_type': row.get('Building Type', None),
+            'unit_type': row.get('Unit Type', None),
+            'unit_model': row.get('Unit Model', None),
+            'mirror': row.get('Mirror', None),
+            'unit_position': row.get('Unit Position', None),
+            'building_number': row.get('Building Number', None),
+            'floor': row.get('Floor', None),
+            'sap_code': row.get('SAP Code', None),
+
+            'finishing_specs': row.get('Finishing Specs', None),
+            'num_bedrooms': row.get('Num Bedrooms', '0'),
+            'num_bathrooms': row.get('Num Bathrooms', '0'),
+            'num_parking_slots': clean_numeric(row.get('Num Parking Slots', '0')),
+
+            'footprint': float(row.get('Foot print', 0)) if row.get('Foot print') else None,
+            'internal_area': float(row.get('Internal Area', 0)) if row.get('Internal Area') else None,
+            'covered_terraces': float(row.get('Covered Terraces', 0)) if row.get('Covered Terraces') else None,
+            'uncovered_terraces': float(row.get('Uncovered Terraces', 0)) if row.get('Uncovered Terraces') else None,
+            'penthouse_area': float(row.get('Penthouse Area', 0)) if row.get('Penthouse Area') else None,
+            'garage_area': float(row.get('Garage Area', 0)) if row.get('Garage Area') else None,
+            'basement_area': float(row.get('Basement Area', 0)) if row.get('Basement Area') else None,
+            'net_area': float(row.get('Net Area', 0)) if row.get('Net Area') else None,
+            'common_area': float(row.get('Common Area', 0)) if row.get('Common Area') else None,
+            'gross_area': float(row.get('Gross Area', 0)) if row.get('Gross Area') else None,
+            'roof_pergola_area': float(row.get('Roof Pergola Area', 0)) if row.get('Roof Pergola Area') else None,
+            'roof_terraces_area': float(row.get('Roof Terraces Area', 0)) if row.get('Roof Terraces Area') else None,
+            'bua': float(row.get('BUA', 0)) if row.get('BUA') else None,
+            'land_area': float(row.get('Land Area', 0)) if row.get('Land Area') else None,
+            'garden_area': float(row.get('Garden Area', 0)) if row.get('Garden Area') else None,
+            'total_area': float(row.get('Total Area', 0)) if row.get('Total Area') else None,
+
+            'net_area_psm': float(row.get('Net Area PSM', 0)) if row.get('Net Area PSM') else None,
+            'covered_terraces_psm': float(row.get('Covered Terraces PSM', 0)) if row.get('Covered Terraces PSM') else None,
+            'uncovered_terraces_psm': float(row.get('Uncovered Terraces PSM', 0)) if row.get('Uncovered Terraces PSM') else None,
+            'penthouse_psm': float(row.get('Penthouse PSM', 0)) if row.get('Penthouse PSM') else None,
+            'garage_psm': float(row.get('Garage PSM', 0)) if row.get('Garage PSM') else None,
+            'basement_psm': float(row.get('Basement PSM', 0)) if row.get('Basement PSM') else None,
+            'common_area_psm': float(row.get('Common Area PSM', 0)) if row.get('Common Area PSM') else None,
+            'roof_pergola_psm': float(row.get('Roof Pergola PSM', 0)) if row.get('Roof Pergola PSM') else None,
+            'roof_terraces_psm': float(row.get('Roof Terraces PSM', 0)) if row.get('Roof Terraces PSM') else None,
+            'land_psm': float(row.get('Land PSM', 0)) if row.get('Land PSM') else None,
+            'garden_psm': float(row.get('Garden PSM', 0)) if row.get('Garden PSM') else None,
+
+            'base_price': float(row.get('Unit Base Price', 0)) if row.get('Unit Base Price') else None,
+            'base_psm': float(row.get('Base PSM', 0)) if row.get('Base PSM') else None,
+
+            'main_view': row.get('Main View', None),
+            'secondary_view': row.get('Secondary View', None),
+            'levels': row.get('Levels', None),
+            'north_breeze': row.get('North Breeze', None),
+            'corners': row.get('Corners', None),
+            'accessibility': row.get('Accessibility', None),
+            'special_premiums': row.get('Special Premiums & Discounts', None),
+            'special_discounts': row.get('Special Premiums & Discounts', None),
+
+            'total_premium_percent': float(row.get('Total Premium Percent', 0))
+                if row.get('Total Premium Percent') else None,
+            'total_premium_value': float(row.get('Total Premium Value', 0))
+                if row.get('Total Premium Value') else None,
+
+            'interest_free_unit_price': float(row.get('Interest Free Unit Price', 0))
+                if row.get('Interest Free Unit Price') else None,
+            'interest_free_psm': float(row.get('Interest Free PSM', 0))
+                if row.get('Interest Free PSM') else None,
+            'interest_free_years': clean_numeric(row.get('Interest Free Years', '0')),
+
+            'down_payment_percent': float(row.get('Down Payment Percent', 0))
+                if row.get('Down Payment %') else None,
+            'down_payment': float(row.get('Down Payment', 0))
+                if row.get('Down Payment') else None,
+            'contract_percent': float(row.get('Contract Percent', 0))
+                if row.get('Contract %') else None,
+            'contract_payment': float(row.get('Contract Payment', 0))
+                if row.get('Contract Payment') else None,
+            'delivery_percent': float(row.get('Delivery Percent', 0))
+                if row.get('Delivery %') else None,
+            'delivery_payment': float(row.get('Delivery Payment', 0))
+                if row.get('Delivery Payment') else None,
+            'cash_price': float(row.get('Cash Price', 0))
+                if row.get('Cash Price') else None,
+
+            'maintenance_percent': float(row.get('Maintenance Percent', 0))
+                if row.get('Maintenance Percent') else None,
+            'maintenance_value': float(row.get('Maintenance Value', 0))
+                if row.get('Maintenance Value') else None,
+
+            'club': row.get('Club', None),
+            'gas': float(row.get('Gas', 0)) if row.get('Gas') else None,
+            'parking_price': float(row.get('Parking Price', 0))
+                if row.get('Parking Price') else None,
+
+            'status': row.get('Status', None),
+            'owner': row.get('Owner', None),
+            'blocking_reason': row.get('Blocking Reason', None),
+
+            'release_date': convert_date_format(row.get('Release Date')),
+            'blocking_date': convert_date_format(row.get('Blocking Date')),
+            'reservation_date': convert_date_format(row.get('Reservation Date')),
+            'contract_date': convert_date_format(row.get('Contract Date')),
+            'contract_payment_plan': row.get('Contract Payment Plan', None),
+            'creation_date': convert_date_format(row.get('Creation Date')),
+            'contract_value': float(row.get('Contract Value', 0))
+                if row.get('Contract Value') else None,
+            'collected_amount': float(row.get('Collected Amount', 0))
+                if row.get('Collected Amount') else None,
+            'collected_percent': float(row.get('Collected Percent', 0))
+                if row.get('Collected Percent') else None,
+
+            'contract_delivery_date': convert_date_format(row.get('Contract Delivery Date')),
+            'grace_period_months': clean_numeric(row.get('Grace Period Months', '0')),
+            'construction_delivery_date': convert_date_format(row.get('Construction Delivery Date')),
+            'development_delivery_date': convert_date_format(row.get('Development Delivery Date')),
+            'client_handover_date': convert_date_format(row.get('Client Handover Date')),
+
+            'contractor_type': row.get('Contractor Type', None),
+            'contractor': row.get('Contractor', None),
+            'customer': row.get('Customer', None),
+            'broker': row.get('Broker', None),
+            'bulks': row.get('Bulks', None),
+            'direct_indirect_sales': row.get('Direct Indirect Sales', None),
+
+            'sales_value': float(row.get('Sales Value', 0))
+                if row.get('Sales Value') else None,
+            'psm': float(row.get('PSM', 0))
+                if row.get('PSM') else None,
+            'area_range': row.get('Area Range', None),
+            'release_year': clean_numeric(row.get('Release Year', '0')),
+            'sales_year': clean_numeric(row.get('Sales Year', '0')),
+            'adj_status': row.get('Adj Status', None),
+            'ams': row.get('AMS', None),
+        }
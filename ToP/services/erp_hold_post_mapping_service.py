@@ -3,6 +3,7 @@ from typing import Dict, List
 from django.db import transaction
 
 from ..models import Company, ERPHoldPostFieldMapping
+from ..utils.erp_mapping_plan_utils import HeaderMapper, erp_mapping_plan_cache
 
 
 @dataclass
@@ -29,6 +30,23 @@ class ERPHoldPostMappingService:
         # ERP expected key -> our internal key
         return {m.provided_name.strip(): m.needed_name.strip() for m in qs}
 
+    @staticmethod
+    def get_header_mapper(*, company: Company) -> HeaderMapper:
+        return erp_mapping_plan_cache.header_mapper(
+            "hold_post", company.id, ERPHoldPostMappingService.get_mapping_dict(company=company)
+        )
+
+    @staticmethod
+    def build_erp_payload(*, company: Company, payload: Dict, mapper: HeaderMapper = None) -> Dict:
+        """
+        Renames our internal payload keys to the ERP's keys (inverted mapping,
+        compiled once per company + mapping contents). Unmapped keys are kept.
+        Pass `mapper` when building many payloads for the same company.
+        """
+        mapper = mapper or ERPHoldPostMappingService.get_header_mapper(company=company)
+        internal_to_external = mapper.inverted
+        return {internal_to_external.get(k, k): v for k, v in payload.items()}
+
     @staticmethod
     def get_common_hold_post_keys() -> List[str]:
         """
@@ -1,63 +1,66 @@
 import requests
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+from django.conf import settings
 
-from ..models import Company
-from ..utils.csv_inventory_utils import convert_date_format  # Import the fix
+from ..models import Company, ERPPagination
 
 # NEW: Mapping functionality (Admin-defined mappings per company)
 from ..services.erp_unit_mapping_service import ERPUnitMappingService
-from ..utils.erp_mapping_utils import apply_header_mapping
+from ..utils.erp_mapping_plan_utils import erp_mapping_plan_cache, map_erp_unit_item
+from ..utils.erp_stream_utils import JsonArrayStream, chunked, iter_text_chunks
+from ..utils.integration_clients_utils import integration_clients
 
 logger = logging.getLogger(__name__)
 
 
+ERP_STREAM_CHUNK_SIZE = 500          # mapped units handed to merge_inventory at a time
+ERP_STREAM_READ_BYTES = 64 * 1024
+ERP_DEFAULT_PAGE_SIZE = 500
+ERP_MAX_PAGES = 10000
+ERP_CONNECT_TIMEOUT = 10
+ERP_READ_TIMEOUT = 60
+
+DEFAULT_PAGINATION_PARAMS = {
+    "page": "page",
+    "page_size": "page_size",
+    "offset": "offset",
+    "limit": "limit",
+    "cursor": "cursor",
+}
+
+
 class ERPImportService:
     """
     Connects to external ERP systems to fetch Unit data.
     """
 
     @staticmethod
-    def fetch_units(company: Company) -> List[Dict[str, Any]]:
+    def fetch_units(company: Company, updated_since=None) -> List[Dict[str, Any]]:
         """
         Requests data from company.erp_url and maps it to Unit Warehouse format.
         Now supports dynamic header mapping per company before the default mapping.
+        updated_since is sent as settings.ERP_UNITS_UPDATED_SINCE_PARAM (when configured)
+        so ERPs that support it return only changed units.
+        """
+        return [
+            unit
+            for chunk in ERPImportService.iter_unit_chunks(company, updated_since=updated_since)
+            for unit in chunk
+        ]
+
+    @staticmethod
+    def iter_unit_chunks(company: Company, updated_since=None, chunk_size: int = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Streaming variant of fetch_units: yields mapped units in lists of `chunk_size`
+        while pages are still downloading (constant memory, see _iter_raw_items).
         """
         if not company.erp_url:
             raise ValueError("ERP URL is not configured for this company.")
 
-        # 1. Prepare Headers (Auth)
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": "ToP-Warehouse/1.0"
-        }
-        if company.erp_url_key:
-            headers["Authorization"] = f"Bearer {company.erp_url_key}"
-            headers["x-api-key"] = company.erp_url_key
+        chunk_size = chunk_size or getattr(settings, "ERP_STREAM_CHUNK_SIZE", ERP_STREAM_CHUNK_SIZE)
 
-        # 2. Make Request
-        try:
-            response = requests.get(company.erp_url, headers=headers, timeout=60)
-            response.raise_for_status()
-            data = response.json()
-        except requests.RequestException as e:
-            raise ValueError(f"ERP Connection Failed: {str(e)}")
-
-        # 3. Validate Response Structure
-        results = []
-        if isinstance(data, list):
-            results = data
-        elif isinstance(data, dict) and "results" in data:
-            results = data["results"]
-        elif isinstance(data, dict) and "data" in data:
-            results = data["data"]
-        else:
-            if isinstance(data, dict) and (data.get("unit_code") or data.get("id")):
-                results = [data]
-            else:
-                raise ValueError("ERP response format not recognized. Expected list or {'results': []}.")
-
-        # ✅ 4. Load custom mapping for this company
+        # ✅ Load custom mapping for this company
         # Example: {"price": "interest_free_unit_price"}
         try:
             custom_map = ERPUnitMappingService.get_mapping_dict(company=company)
@@ -66,170 +69,142 @@ class ERPImportService:
             logger.exception("Failed to load ERP header mapping for company=%s. Error=%s", getattr(company, "id", None), str(e))
             custom_map = {}
 
-        # 5. Map Fields (Apply custom mapping first, then run default mapper)
-        standardized_units = []
-        for item in results:
-            # ✅ Step A: rename keys based on Admin-defined mappings
-            if custom_map:
-                try:
-                    item = apply_header_mapping(item, custom_map)
-                except Exception as e:
-                    logger.exception("Failed to apply header mapping on ERP item. Error=%s", str(e))
-                    # fallback to original item
+        def standardized_units():
+            # Company mapping + alias probing are compiled once per key set (usually once per import)
+            plans = {}
+            for item in ERPImportService._iter_raw_items(company, updated_since):
+                if not isinstance(item, dict):
+                    continue
+                keys = tuple(item)
+                plan = plans.get(keys)
+                if plan is None:
+                    plan = erp_mapping_plan_cache.unit_plan(company.id, custom_map, keys)
+                    plans[keys] = plan
+
+                unit_data = plan.apply(item)
+                if unit_data.get('unit_code'):
+                    yield unit_data
 
-            # ✅ Step B: run your existing robust mapper (snake/camel/title-case supported)
-            unit_data = ERPImportService._map_erp_item(item)
-            if unit_data.get('unit_code'):
-                standardized_units.append(unit_data)
+        yield from chunked(standardized_units(), chunk_size)
 
-        return standardized_units
+    # --- Streaming / Pagination ---
+
+    @staticmethod
+    def _iter_raw_items(company: Company, updated_since=None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields raw ERP items page by page, parsing each response body incrementally.
+
+        company.erp_pagination:
+          - none   : one request, whole list (default, same contract as before)
+          - page   : ?page=1,2,... &page_size=N   until a short page
+          - offset : ?offset=0,N,... &limit=N     until a short page
+          - cursor : follows next_cursor / cursor / next (token or absolute URL) from the envelope
+        Parameter names can be overridden with settings.ERP_PAGINATION_PARAMS.
+        """
+        # 1. Prepare Headers (Auth)
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "ToP-Warehouse/1.0"
+        }
+        if company.erp_url_key:
+            headers["Authorization"] = f"Bearer {company.erp_url_key}"
+            headers["x-api-key"] = company.erp_url_key
+
+        names = {**DEFAULT_PAGINATION_PARAMS, **getattr(settings, "ERP_PAGINATION_PARAMS", {})}
+        mode = (company.erp_pagination or ERPPagination.NONE).lower()
+        page_size = company.erp_page_size or ERP_DEFAULT_PAGE_SIZE
+
+        base_params = {}
+        since_param = getattr(settings, "ERP_UNITS_UPDATED_SINCE_PARAM", None)
+        if updated_since and since_param:
+            base_params[since_param] = updated_since.isoformat()
+
+        url = company.erp_url
+        page, offset, cursor = 1, 0, None
+        previous_first = None
+
+        session = integration_clients.session(company, "erp")
+        for _ in range(ERP_MAX_PAGES):
+            params = dict(base_params)
+            if mode == ERPPagination.PAGE:
+                params.update({names["page"]: page, names["page_size"]: page_size})
+            elif mode == ERPPagination.OFFSET:
+                params.update({names["offset"]: offset, names["limit"]: page_size})
+            elif mode == ERPPagination.CURSOR and cursor:
+                params[names["cursor"]] = cursor
+
+            # 2. Make Request (streamed; read timeout applies per chunk, not to the whole body)
+            try:
+                response = session.get(
+                    url, headers=headers, params=params or None,
+                    stream=True, timeout=(ERP_CONNECT_TIMEOUT, ERP_READ_TIMEOUT),
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise ValueError(f"ERP Connection Failed: {str(e)}")
+
+            # 3. Validate Response Structure while parsing
+            count = 0
+            first = None
+            with response:
+                stream = JsonArrayStream(
+                    iter_text_chunks(response.iter_content(ERP_STREAM_READ_BYTES), response.encoding or "utf-8")
+                )
+                try:
+                    for item in stream:
+                        if stream.single_object is not None and not (item.get("unit_code") or item.get("id")):
+                            raise ValueError("ERP response format not recognized. Expected list or {'results': []}.")
+                        if count == 0:
+                            # An ERP that ignores the paging params returns the same page forever
+                            if previous_first is not None and item == previous_first:
+                                logger.warning("ERP pagination for company=%s returned a repeated page; stopping.", company.id)
+                                return
+                            first = item
+                        count += 1
+                        yield item
+                except requests.RequestException as e:
+                    raise ValueError(f"ERP Connection Failed: {str(e)}")
+
+            if mode == ERPPagination.NONE or count == 0:
+                return
+            previous_first = first
+
+            if mode == ERPPagination.PAGE:
+                if count < page_size:
+                    return
+                page += 1
+            elif mode == ERPPagination.OFFSET:
+                if count < page_size:
+                    return
+                offset += count
+            elif mode == ERPPagination.CURSOR:
+                next_value = ERPImportService._next_cursor(stream.envelope or {})
+                if not next_value:
+                    return
+                if str(next_value).startswith(("http://", "https://")):
+                    url, cursor = str(next_value), None
+                    base_params = {}  # absolute next links already carry their query
+                else:
+                    cursor = next_value
+
+        logger.warning("ERP pagination for company=%s hit the %s page limit.", company.id, ERP_MAX_PAGES)
+
+    @staticmethod
+    def _next_cursor(envelope: Dict[str, Any]):
+        for holder in (envelope, envelope.get("meta") or {}, envelope.get("pagination") or {}, envelope.get("links") or {}):
+            if not isinstance(holder, dict):
+                continue
+            for key in ("next_cursor", "nextCursor", "cursor", "next"):
+                if holder.get(key):
+                    return holder[key]
+        return None
 
     @staticmethod
     def _map_erp_item(item: Dict[str, Any]) -> Dict[str, Any]:
         """
         Maps generic ERP keys to Django Unit Model keys.
-        Checks for snake_case, camelCase, and Title Case variations.
+        Checks for snake_case, camelCase, and Title Case variations (see ERP_UNIT_FIELD_ALIASES).
+        Imports use the compiled UnitMappingPlan instead; this is the per-item reference path.
         """
-        def get_val(*keys):
-            for k in keys:
-                if k in item and item[k] is not None:
-                    return item[k]
-            return None
-
-        # Helper to get date and convert immediately
-        def get_date_val(*keys):
-            raw = get_val(*keys)
-            return convert_date_format(raw)
-
-        # --- MAPPING START ---
-        mapped = {}
-
-        # Primary Key & Basics
-        mapped['unit_code'] = get_val("unit_code", "unitCode", "Unit Code", "id", "Code", "code")
-        mapped['city'] = get_val("city", "City", "location")
-        mapped['project'] = get_val("project", "Project", "project_name", "projectName")
-
-        # Phasing & Type
-        mapped['sales_phasing'] = get_val("sales_phasing", "salesPhasing", "Sales Phasing", "phase")
-        mapped['construction_phasing'] = get_val("construction_phasing", "constructionPhasing", "Construction Phasing")
-        mapped['handover_phasing'] = get_val("handover_phasing", "handoverPhasing", "Handover Phasing")
-        mapped['plot_type'] = get_val("plot_type", "plotType", "Plot Type")
-        mapped['building_style'] = get_val("building_style", "buildingStyle", "Bld. Style")
-        mapped['building_type'] = get_val("building_type", "buildingType", "Bld. Type")
-        mapped['unit_type'] = get_val("unit_type", "unitType", "Unit Type", "type")
-
-        # Specs
-        mapped['num_bedrooms'] = get_val("num_bedrooms", "bedrooms", "Num Bedrooms", "Bedrooms")
-        mapped['num_bathrooms'] = get_val("num_bathrooms", "bathrooms", "Num Bathrooms", "Bathrooms")
-        mapped['num_parking_slots'] = get_val("num_parking_slots", "parking_slots", "No. of Parking Slots")
-
-        # Areas
-        mapped['footprint'] = get_val("footprint", "Foot print")
-        mapped['net_area'] = get_val("net_area", "netArea", "Unit Area (Net Area)")
-        mapped['gross_area'] = get_val("sellable_area", "gross_area", "sellableArea", "Gross Area", "Sellable Area")
-        mapped['total_area'] = get_val("total_area", "totalArea", "Total Area")
-        mapped['internal_area'] = get_val("internal_area", "internalArea", "Internal Area")
-        mapped['covered_terraces'] = get_val("covered_terraces", "coveredTerraces", "Covered Terraces")
-        mapped['uncovered_terraces'] = get_val("uncovered_terraces", "uncoveredTerraces", "Uncovered Terraces")
-        mapped['penthouse_area'] = get_val("penthouse_area", "penthouseArea", "Penthouse Area")
-        mapped['garage_area'] = get_val("garage_area", "garageArea", "Garage Area")
-        mapped['basement_area'] = get_val("basement_area", "basementArea", "Basement Area")
-        mapped['common_area'] = get_val("common_area", "commonArea", "Common Area")
-        mapped['roof_pergola_area'] = get_val("roof_pergola_area", "roofPergolaArea", "Roof Pergola Area")
-        mapped['roof_terraces_area'] = get_val("roof_terraces_area", "roofTerracesArea", "Roof Terraces Area")
-        mapped['bua'] = get_val("bua", "BUA", "B.U.A.")
-        mapped['land_area'] = get_val("land_area", "landArea", "Land Area")
-        mapped['garden_area'] = get_val("garden_area", "gardenArea", "Garden Area")
-
-        # Pricing (Base)
-        mapped['base_price'] = get_val("base_price", "basePrice", "Unit Base Price", "price", "list_price")
-        mapped['cash_price'] = get_val("cash_price", "cashPrice", "Cash Price")
-        mapped['final_price'] = get_val("final_price", "finalPrice")
-        mapped['discount'] = get_val("discount")
-
-        # Maintenance & Extras
-        mapped['maintenance_percent'] = get_val("maintenance_percent", "maintenancePercent", "Maintenance %")
-        mapped['maintenance_value'] = get_val("maintenance_value", "maintenanceValue", "Maintenance Value")
-        mapped['gas'] = get_val("gas", "Gas")
-        mapped['parking_price'] = get_val("parking_price", "parkingPrice", "Parking Price")
-        mapped['club'] = get_val("club", "Club")
-
-        # Status
-        mapped['status'] = get_val("status", "Status", "availability")
-        mapped['blocking_reason'] = get_val("blocking_reason", "blockingReason", "Blocking Reason")
-
-        # --- DATES (Converted) ---
-        mapped['contract_date'] = get_date_val("contract_date", "contractDate", "Contract Date")
-        mapped['delivery_date'] = get_date_val("delivery_date", "deliveryDate", "Delivery Date")
-        mapped['release_date'] = get_date_val("release_date", "releaseDate", "Release Date")
-        mapped['blocking_date'] = get_date_val("blocking_date", "blockingDate", "Blocking Date")
-        mapped['reservation_date'] = get_date_val("reservation_date", "reservationDate", "Reservation Date")
-
-        mapped['contract_delivery_date'] = get_date_val("contract_delivery_date", "contractDeliveryDate", "Contract Delivery Date")
-        mapped['construction_delivery_date'] = get_date_val("construction_delivery_date", "constructionDeliveryDate", "Construction Delivery Date")
-        mapped['development_delivery_date'] = get_date_val("development_delivery_date", "developmentDeliveryDate", "Development Delivery Date")
-        mapped['client_handover_date'] = get_date_val("client_handover_date", "clientHandoverDate", "Client Handover Date")
-
-        # Detailed Specs / Additional Fields
-        mapped['unit_model'] = get_val("unit_model", "unitModel", "Unit Model")
-        mapped['mirror'] = get_val("mirror", "Mirror")
-        mapped['unit_position'] = get_val("unit_position", "unitPosition", "Unit Position")
-        mapped['building_number'] = get_val("building_number", "buildingNumber", "Building Number", "building")
-        mapped['floor'] = get_val("floor", "Floor")
-        mapped['sap_code'] = get_val("sap_code", "sapCode", "SAP Code")
-        mapped['finishing_specs'] = get_val("finishing_specs", "finishingSpecs", "Finishing Specs")
-
-        # PSM
-        mapped['net_area_psm'] = get_val("net_area_psm", "netAreaPSM", "Net Area PSM")
-        mapped['base_psm'] = get_val("base_psm", "basePSM", "Base PSM")
-        mapped['psm'] = get_val("psm", "PSM")
-
-        # Views & Orientation
-        mapped['main_view'] = get_val("main_view", "mainView", "Main View")
-        mapped['secondary_view'] = get_val("secondary_view", "secondaryView", "Secondary View")
-        mapped['levels'] = get_val("levels", "Levels")
-        mapped['north_breeze'] = get_val("north_breeze", "northBreeze", "North Breeze")
-        mapped['corners'] = get_val("corners", "Corners")
-        mapped['accessibility'] = get_val("accessibility", "Accessibility")
-
-        # Premiums
-        mapped['special_premiums'] = get_val("special_premiums", "specialPremiums")
-        mapped['special_discounts'] = get_val("special_discounts", "specialDiscounts")
-        mapped['phasing'] = get_val("phasing")
-        mapped['total_premium_percent'] = get_val("total_premium_percent", "totalPremiumPercent", "Total Premium %")
-        mapped['total_premium_value'] = get_val("total_premium_value", "totalPremiumValue", "Total Premium Value")
-
-        # Payment Plans / Analytics
-        mapped['interest_free_unit_price'] = get_val("interest_free_unit_price", "interestFreeUnitPrice", "Interest Free Unit Price")
-        mapped['interest_free_psm'] = get_val("interest_free_psm", "interestFreePSM", "Interest Free PSM")
-        mapped['interest_free_years'] = get_val("interest_free_years", "interestFreeYears", "Interest Free Yrs.")
-        mapped['down_payment_percent'] = get_val("down_payment_percent", "downPaymentPercent", "Down Payment %")
-        mapped['down_payment'] = get_val("down_payment", "downPayment", "Down Payment")
-        mapped['contract_percent'] = get_val("contract_percent", "contractPercent", "Contract %")
-        mapped['contract_payment'] = get_val("contract_payment", "contractPayment", "Contract Payment")
-        mapped['delivery_percent'] = get_val("delivery_percent", "deliveryPercent", "Delivery %")
-        mapped['delivery_payment'] = get_val("delivery_payment", "deliveryPayment", "Delivery Payment")
-
-        # Contract Details
-        mapped['contract_payment_plan'] = get_val("contract_payment_plan", "contractPaymentPlan")
-        mapped['contract_value'] = get_val("contract_value", "contractValue")
-        mapped['collected_amount'] = get_val("collected_amount", "collectedAmount")
-        mapped['collected_percent'] = get_val("collected_percent", "collectedPercent")
-        mapped['grace_period_months'] = get_val("grace_period_months", "gracePeriodMonths")
-
-        # Stakeholders & Analytics
-        mapped['contractor_type'] = get_val("contractor_type", "contractorType")
-        mapped['contractor'] = get_val("contractor")
-        mapped['customer'] = get_val("customer")
-        mapped['broker'] = get_val("broker")
-        mapped['bulks'] = get_val("bulks")
-        mapped['direct_indirect_sales'] = get_val("direct_indirect_sales", "directIndirectSales")
-        mapped['sales_value'] = get_val("sales_value", "salesValue")
-        mapped['area_range'] = get_val("area_range", "areaRange")
-        mapped['release_year'] = get_val("release_year", "releaseYear")
-        mapped['sales_year'] = get_val("sales_year", "salesYear")
-        mapped['adj_status'] = get_val("adj_status", "adjStatus")
-        mapped['ams'] = get_val("ams", "AMS")
-
         # Return dict without None values so partial updates work
-        return {k: v for k, v in mapped.items() if v is not None}
+        return map_erp_unit_item(item)
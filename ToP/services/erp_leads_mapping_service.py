@@ -3,6 +3,7 @@ from typing import Dict, List
 from django.db import transaction
 
 from ..models import Company, ERPLeadsFieldMapping
+from ..utils.erp_mapping_plan_utils import HeaderMapper, erp_mapping_plan_cache
 
 
 @dataclass
@@ -26,6 +27,10 @@ class ERPLeadsMappingService:
         qs = ERPLeadsFieldMapping.objects.filter(company=company, is_active=True)
         return {m.provided_name.strip(): m.needed_name.strip() for m in qs}
 
+    @staticmethod
+    def get_header_mapper(*, company: Company) -> HeaderMapper:
+        return erp_mapping_plan_cache.header_mapper("leads", company.id, ERPLeadsMappingService.get_mapping_dict(company=company))
+
     @staticmethod
     def get_common_leads_keys() -> List[str]:
         """
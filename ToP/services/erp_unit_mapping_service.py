@@ -4,6 +4,7 @@ from typing import Dict, List
 
 from django.db import transaction
 from ..models import Company, Unit, ERPUnitFieldMapping
+from ..utils.erp_mapping_plan_utils import HeaderMapper, erp_mapping_plan_cache
 
 
 @dataclass
@@ -34,6 +35,13 @@ class ERPUnitMappingService:
         qs = ERPUnitFieldMapping.objects.filter(company=company, is_active=True)
         return {m.provided_name.strip(): m.needed_name.strip() for m in qs}
 
+    @staticmethod
+    def get_header_mapper(*, company: Company) -> HeaderMapper:
+        """
+        Compiled mapping (cached per company + mapping contents), equivalent to apply_header_mapping.
+        """
+        return erp_mapping_plan_cache.header_mapper("unit", company.id, ERPUnitMappingService.get_mapping_dict(company=company))
+
     @staticmethod
     @transaction.atomic
     def save_mappings(*, company: Company, mappings: List[dict]) -> ServiceResult:
@@ -3,12 +3,23 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+from django.db.models import Q
+from django.utils.text import slugify
 from django.utils.timezone import localtime
 
 from ..models import Company, SalesRequestAnalytical, CompanyType, Unit
-from ..utils.historical_sales_requests_analysis_utils import resolve_historical_analysis_scope
+from ..utils.historical_sales_requests_analysis_utils import (
+    decode_report_cursor,
+    encode_report_cursor,
+    resolve_historical_analysis_scope,
+)
+
+
+HISTORICAL_PAGE_SIZE = 500
+HISTORICAL_MAX_PAGE_SIZE = 2000
+HISTORICAL_EXPORT_BATCH_SIZE = 1000
 
 
 @dataclass
@@ -24,6 +35,8 @@ class HistoricalSalesRequestsAnalysisService:
     - No HttpRequest dependency.
     - Views pass primitives (user, company_id as int|None).
     - Returns stable JSON payload for AJAX.
+    - Approved rows are keyset-paginated; exports stream page by page. Unit areas are
+      joined per page with one unit_code__in query.
     """
 
     @staticmethod
@@ -55,81 +68,110 @@ class HistoricalSalesRequestsAnalysisService:
             },
         )
 
+    # --------------------------
+    # Report scope
+    # --------------------------
     @staticmethod
-    def get_approved_rows(*, user, company_id: Optional[int]) -> ServiceResult:
+    def _resolve_company(*, user, company_id: Optional[int]):
+        """
+        (scope, company, early_result). early_result is set when the report cannot be built:
+        an error, or (admin without a selected company) the empty success payload.
+        """
         scope = resolve_historical_analysis_scope(user=user)
 
         if scope.role == "other":
-            return ServiceResult(success=False, status=403, error="Not authorized")
-
-        selected_company: Optional[Company] = None
+            return scope, None, ServiceResult(success=False, status=403, error="Not authorized")
 
         if scope.role == "admin_like":
             if not company_id:
-                return ServiceResult(success=True, status=200, payload={"success": True, "meta": None, "rows": []})
+                empty = {"success": True, "meta": None, "rows": [], "next_cursor": None}
+                return scope, None, ServiceResult(success=True, status=200, payload=empty)
 
             selected_company = Company.objects.filter(id=company_id).first()
             if not selected_company:
-                return ServiceResult(success=False, status=404, error="Company not found")
-
-        elif scope.role in ("manager", "sales"):
-            selected_company = scope.company
-            if not selected_company:
-                return ServiceResult(success=False, status=404, error="Company not found for this user")
-
-        qs = (
-            SalesRequestAnalytical.objects
-            .filter(is_approved=True)
-            .select_related("sales_man", "company")   # ✅ no unit relation anymore
-            .order_by("-date")
-        )
-
-        if scope.role == "sales":
-            qs = qs.filter(sales_man=user)
+                return scope, None, ServiceResult(success=False, status=404, error="Company not found")
+            return scope, selected_company, None
 
-        if selected_company:
-            qs = qs.filter(company=selected_company)
+        selected_company = scope.company
+        if not selected_company:
+            return scope, None, ServiceResult(success=False, status=404, error="Company not found for this user")
+        return scope, selected_company, None
 
+    @staticmethod
+    def _build_meta(selected_company: Company) -> Dict[str, Any]:
         # -----------------------------------------------------------
         # NEW LOGIC: Handle Multi-Select Company Type
         # -----------------------------------------------------------
         # Ensure comp_type is a list
-        raw_type = selected_company.comp_type if selected_company else []
+        raw_type = selected_company.comp_type
         comp_type = raw_type if isinstance(raw_type, list) else [raw_type] if raw_type else []
 
         # Check capabilities based on list membership
-        has_erp = 'erp' in comp_type
         has_native = 'native' in comp_type
         has_sheets = 'google_sheets' in comp_type
 
         # Show base price if it's NOT purely ERP (i.e., has Native or Sheets)
-        # or if you simply want to show it whenever those modules are active:
         show_base_price = has_native or has_sheets
 
+        return {
+            "company_id": selected_company.id,
+            "company_name": selected_company.name,
+            "comp_type": comp_type,  # Renamed key as requested
+            "show_base_price": show_base_price,
+        }
+
+    @staticmethod
+    def _approved_queryset(*, scope, user, selected_company: Company):
+        qs = (
+            SalesRequestAnalytical.objects
+            .filter(is_approved=True, company=selected_company)
+            .select_related("sales_man")   # ✅ no unit relation anymore
+            .order_by("-date", "-id")
+        )
+
+        if scope.role == "sales":
+            qs = qs.filter(sales_man=user)
+
+        return qs
+
+    # --------------------------
+    # Rows
+    # --------------------------
+    @staticmethod
+    def _unit_areas(*, selected_company: Company, unit_codes: List[str]) -> Dict[str, Tuple]:
+        """ {unit_code: (land_area, gross_area)} for a page of rows, one query. """
+        codes = sorted({code for code in unit_codes if code})
+        if not codes:
+            return {}
+        return {
+            code: (land_area, gross_area)
+            for code, land_area, gross_area in Unit.objects.filter(
+                company=selected_company, unit_code__in=codes
+            ).values_list("unit_code", "land_area", "gross_area")
+        }
+
+    @staticmethod
+    def _build_rows(records: List[SalesRequestAnalytical], *, selected_company: Company, show_base_price: bool) -> List[Dict[str, Any]]:
+        areas = HistoricalSalesRequestsAnalysisService._unit_areas(
+            selected_company=selected_company,
+            unit_codes=[r.unit_code for r in records],
+        )
+
         rows: List[Dict[str, Any]] = []
-        for r in qs:
+        for r in records:
             unit_code = (r.unit_code or "")
 
             base_price = None
-            
-            # NEW: Initialize unit fields
-            land_area = None
-            gross_area = None
-            
             if show_base_price:
                 base_price = float(r.base_price) if r.base_price is not None else None
-                
-            # Always attempt to fetch Unit details if we have a code and company
-            # This allows fetching areas even if base_price is hidden, or vice versa
-            if unit_code and selected_company:
-                unit_obj = Unit.objects.filter(
-                    unit_code=unit_code, 
-                    company=selected_company
-                ).first()
-                
-                if unit_obj:
-                    land_area = float(unit_obj.land_area) if unit_obj.land_area else 0
-                    gross_area = float(unit_obj.gross_area) if unit_obj.gross_area else 0
+
+            # Areas are looked up even if base_price is hidden, or vice versa
+            land_area = None
+            gross_area = None
+            unit_areas = areas.get(unit_code)
+            if unit_areas:
+                land_area = float(unit_areas[0]) if unit_areas[0] else 0
+                gross_area = float(unit_areas[1]) if unit_areas[1] else 0
 
             sales_price = float(r.final_price) if r.final_price is not None else None
 
@@ -150,17 +192,121 @@ class HistoricalSalesRequestsAnalysisService:
                 "gross_area": gross_area,
             })
 
+        return rows
+
+    @staticmethod
+    def _page(qs, cursor: Optional[Tuple], limit: int) -> List[SalesRequestAnalytical]:
+        """ Next `limit` rows after the (date, id) cursor, newest first. """
+        if cursor:
+            date, pk = cursor
+            qs = qs.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+        return list(qs[:limit])
+
+    @staticmethod
+    def get_approved_rows(
+        *, user, company_id: Optional[int], cursor: Optional[str] = None, limit: Optional[int] = None
+    ) -> ServiceResult:
+        """
+        One page of approved requests (newest first), keyset-paginated on (date, id):
+        pass payload["next_cursor"] back as `cursor` until it is None.
+        """
+        scope, selected_company, early = HistoricalSalesRequestsAnalysisService._resolve_company(
+            user=user, company_id=company_id
+        )
+        if early:
+            return early
+
+        after = None
+        if cursor:
+            after = decode_report_cursor(cursor)
+            if after is None:
+                return ServiceResult(success=False, status=400, error="Invalid cursor")
+
+        limit = min(max(int(limit or HISTORICAL_PAGE_SIZE), 1), HISTORICAL_MAX_PAGE_SIZE)
+
+        meta = HistoricalSalesRequestsAnalysisService._build_meta(selected_company)
+        qs = HistoricalSalesRequestsAnalysisService._approved_queryset(
+            scope=scope, user=user, selected_company=selected_company
+        )
+
+        records = HistoricalSalesRequestsAnalysisService._page(qs, after, limit + 1)
+        has_more = len(records) > limit
+        records = records[:limit]
+
+        rows = HistoricalSalesRequestsAnalysisService._build_rows(
+            records, selected_company=selected_company, show_base_price=meta["show_base_price"]
+        )
+        next_cursor = encode_report_cursor(records[-1].date, records[-1].id) if has_more else None
+
         return ServiceResult(
             success=True,
             status=200,
             payload={
                 "success": True,
-                "meta": {
-                    "company_id": selected_company.id if selected_company else None,
-                    "company_name": selected_company.name if selected_company else None,
-                    "comp_type": comp_type,  # Renamed key as requested
-                    "show_base_price": show_base_price,
-                },
+                "meta": meta,
+                "rows": rows,
+                "next_cursor": next_cursor,
+            },
+        )
+
+    # --------------------------
+    # Export
+    # --------------------------
+    @staticmethod
+    def _iter_rows(qs, *, selected_company: Company, show_base_price: bool) -> Iterator[Dict[str, Any]]:
+        """ Every row, newest first, one keyset page (+ one unit lookup) at a time. """
+        after = None
+        while True:
+            records = HistoricalSalesRequestsAnalysisService._page(qs, after, HISTORICAL_EXPORT_BATCH_SIZE)
+            if not records:
+                return
+            yield from HistoricalSalesRequestsAnalysisService._build_rows(
+                records, selected_company=selected_company, show_base_price=show_base_price
+            )
+            if len(records) < HISTORICAL_EXPORT_BATCH_SIZE:
+                return
+            after = (records[-1].date, records[-1].id)
+
+    @staticmethod
+    def export_approved_rows(*, user, company_id: Optional[int]) -> ServiceResult:
+        """
+        payload: filename (no extension), header and a lazy `rows` iterator of value lists,
+        for the views' streaming CSV / XLSX writers. Columns follow the page table.
+        """
+        scope, selected_company, early = HistoricalSalesRequestsAnalysisService._resolve_company(
+            user=user, company_id=company_id
+        )
+        if early:
+            if early.success:
+                return ServiceResult(success=False, status=400, error="company_id is required")
+            return early
+
+        meta = HistoricalSalesRequestsAnalysisService._build_meta(selected_company)
+        qs = HistoricalSalesRequestsAnalysisService._approved_queryset(
+            scope=scope, user=user, selected_company=selected_company
+        )
+
+        columns: List[Tuple[str, str]] = []
+        if scope.role != "sales":
+            columns.append(("salesman", "Salesman"))
+        columns += [("client_id", "Client ID"), ("unit_code", "Unit Code"), ("date", "Date")]
+        if meta["show_base_price"]:
+            columns += [("land_area", "Land Area"), ("gross_area", "Gross Area"), ("base_price", "Base Price")]
+        columns.append(("sales_price", "Sales Price"))
+
+        rows = (
+            [row[key] for key, _ in columns]
+            for row in HistoricalSalesRequestsAnalysisService._iter_rows(
+                qs, selected_company=selected_company, show_base_price=meta["show_base_price"]
+            )
+        )
+
+        return ServiceResult(
+            success=True,
+            status=200,
+            payload={
+                "filename": f"approved_sales_{slugify(selected_company.name) or selected_company.id}",
+                "header": [label for _, label in columns],
                 "rows": rows,
             },
-        )
\ No newline at end of file
+        )
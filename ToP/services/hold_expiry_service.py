@@ -0,0 +1,238 @@
+# ToP/services/hold_expiry_service.py
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.functions import Lower, Trim
+from django.utils.timezone import localdate, now
+
+from ..models import (
+    Company,
+    SalesRequest,
+    SalesRequestAnalytical,
+    Project,
+    ProjectConfiguration,
+    ProjectWebConfiguration,
+    Unit,
+)
+from ..utils.integration_clients_utils import integration_clients
+from .erp_hold_post_mapping_service import ERPHoldPostMappingService
+from .job_queue_service import JobQueueService
+from .sales_rollup_service import SalesRollupService
+from .unit_snapshot_service import UnitSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+HOLD_EXPIRY_BATCH_SIZE = 500
+HOLD_EXPIRY_MIN_INTERVAL_SECONDS = 60     # opportunistic runs from web requests are throttled to this
+HOLD_EXPIRY_THROTTLE_KEY = "hold_expiry:last_run"
+ERP_UNBLOCK_TIMEOUT = 10
+
+
+class HoldExpiryService:
+    """
+    Batched hold-expiry engine.
+
+    - Every SalesRequest stores `expires_at` (date + project timer + extensions), computed
+      when the request is saved and refreshed when the project's timer / config changes.
+    - run() releases every expired hold in set-based passes: one UPDATE for the units,
+      one bulk INSERT into SalesRequestAnalytical and one DELETE per batch.
+    - ERP unblocks are queued as one background job per company (erp.unblock_units).
+
+    Meant for the `expire_holds` management command / worker; web requests only call
+    the throttled run_if_due().
+    """
+
+    # =====================================================
+    # Expiry timestamps
+    # =====================================================
+
+    @staticmethod
+    def timer_minutes_for(company_id, project_name) -> Optional[int]:
+        """
+        Hold timer of the project a unit belongs to (matched by company + unit.project name),
+        or None when the project / its configuration / its timer is missing (never auto-expires).
+        """
+        project = Project.objects.filter(company_id=company_id, name=project_name).first()
+        if not project:
+            return None
+
+        if not ProjectConfiguration.objects.filter(project=project).exists():
+            return None
+
+        web_config = ProjectWebConfiguration.objects.filter(project=project).first()
+        if not web_config or web_config.default_timer_in_minutes is None:
+            return None
+
+        return web_config.default_timer_in_minutes
+
+    @staticmethod
+    def compute_expires_at(sales_request: SalesRequest, timer_minutes: Optional[int] = ...):
+        unit = sales_request.unit
+        if not unit or not sales_request.company_id:
+            return None
+
+        if timer_minutes is ...:
+            timer_minutes = HoldExpiryService.timer_minutes_for(sales_request.company_id, unit.project)
+        if timer_minutes is None:
+            return None
+
+        extra_minutes = sales_request.extended_minutes or 0
+        return sales_request.date + timedelta(minutes=timer_minutes + extra_minutes)
+
+    @staticmethod
+    def refresh_for_project(project: Project) -> int:
+        """ Recomputes expires_at for the open requests of a project after its timer / config changed. """
+        if not project:
+            return 0
+
+        timer = HoldExpiryService.timer_minutes_for(project.company_id, project.name)
+        requests_qs = SalesRequest.objects.filter(
+            company_id=project.company_id, unit__project=project.name
+        ).select_related("unit")
+
+        changed = []
+        for sales_request in requests_qs:
+            expires_at = HoldExpiryService.compute_expires_at(sales_request, timer_minutes=timer)
+            if expires_at != sales_request.expires_at:
+                sales_request.expires_at = expires_at
+                changed.append(sales_request)
+
+        SalesRequest.objects.bulk_update(changed, ["expires_at"], batch_size=HOLD_EXPIRY_BATCH_SIZE)
+        return len(changed)
+
+    # =====================================================
+    # Expiry pass
+    # =====================================================
+
+    @staticmethod
+    def run_if_due(*, min_interval: int = None) -> Optional[Dict[str, int]]:
+        """
+        Cheap, throttled entry point for web requests (at most one pass per interval).
+        """
+        interval = min_interval or getattr(settings, "HOLD_EXPIRY_MIN_INTERVAL_SECONDS", HOLD_EXPIRY_MIN_INTERVAL_SECONDS)
+        if not cache.add(HOLD_EXPIRY_THROTTLE_KEY, now().isoformat(), interval):
+            return None
+        return HoldExpiryService.run()
+
+    @staticmethod
+    def run(*, batch_size: int = HOLD_EXPIRY_BATCH_SIZE, as_of=None) -> Dict[str, int]:
+        as_of = as_of or now()
+        stats = {"expired": 0, "batches": 0, "erp_unblocks": 0}
+        erp_jobs: List[Tuple[Company, str]] = []
+
+        while True:
+            released = HoldExpiryService._expire_batch(as_of, batch_size)
+            if not released:
+                break
+            stats["batches"] += 1
+            stats["expired"] += len(released)
+            erp_jobs.extend((sr.company, sr.unit_id) for sr in released if sr.company.erp_hold_url)
+            if len(released) < batch_size:
+                break
+
+        stats["erp_unblocks"] = len(erp_jobs)
+        HoldExpiryService._queue_erp_unblocks(erp_jobs)
+        return stats
+
+    @staticmethod
+    def _expire_batch(as_of, batch_size: int) -> List[SalesRequest]:
+        with transaction.atomic():
+            # same normalisation as the per-request check it replaced (str(status).strip().lower())
+            candidates = SalesRequest.objects.annotate(
+                unit_status_normalized=Trim(Lower("unit__status")),
+            ).filter(
+                expires_at__lte=as_of,
+                unit_status_normalized="hold",
+                company__isnull=False,
+            ).order_by("expires_at", "id")
+
+            # Lock the batch; concurrent workers skip rows another worker is already releasing
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            else:
+                candidates = candidates.select_for_update()
+            ids = list(candidates.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return []
+
+            batch = list(
+                SalesRequest.objects.filter(id__in=ids).select_related("unit", "company").order_by("expires_at", "id")
+            )
+            unit_codes = [sr.unit_id for sr in batch]
+
+            # A. Update Local Units
+            Unit.objects.filter(unit_code__in=unit_codes).update(
+                status="Available", final_price=0, discount=0, source_hash=None
+            )
+            UnitSnapshotService.bump_many(sr.company_id for sr in batch)
+
+            # B. Move to Analytical History (Mark as Expired)
+            SalesRequestAnalytical.objects.bulk_create([
+                SalesRequestAnalytical(
+                    sales_man_id=sr.sales_man_id,
+                    client_id=sr.client_id,
+                    unit_code=sr.unit_id,
+                    date=sr.date,
+                    company_id=sr.company_id,
+                    client_name=sr.client_name,
+                    project_id=sr.project_id,
+                    final_price=sr.final_price,
+                    discount=sr.discount,
+                    is_approved=False,
+                    is_fake=True,
+                    is_expired=True,  # rolled up as Outcome.EXPIRED, apart from rejected requests
+                )
+                for sr in batch
+            ], batch_size=batch_size)
+            SalesRollupService.schedule_refresh((sr.company_id, localdate(sr.date)) for sr in batch)
+
+            # C. Delete Active Requests
+            SalesRequest.objects.filter(id__in=ids).delete()
+
+        return batch
+
+    # =====================================================
+    # ERP
+    # =====================================================
+
+    @staticmethod
+    def _queue_erp_unblocks(jobs: List[Tuple[Company, str]]) -> None:
+        by_company: Dict[int, List[str]] = defaultdict(list)
+        for company, unit_code in jobs:
+            by_company[company.id].append(unit_code)
+
+        for company_id, unit_codes in by_company.items():
+            JobQueueService.enqueue("erp.unblock_units", {"company_id": company_id, "unit_codes": unit_codes})
+
+    @staticmethod
+    def unblock_company_units(company: Company, unit_codes: List[str]) -> List[str]:
+        """ Posts one unblock per unit over the company's pooled session; returns the codes that failed. """
+        headers = {"Content-Type": "application/json"}
+        if company.erp_hold_url_key:
+            headers["Authorization"] = f"Bearer {company.erp_hold_url_key}"
+
+        # the mapping is compiled once for the whole batch
+        mapper = ERPHoldPostMappingService.get_header_mapper(company=company)
+        session = integration_clients.session(company, "erp")
+        failed = []
+        for unit_code in unit_codes:
+            erp_payload = ERPHoldPostMappingService.build_erp_payload(
+                company=company, payload={"unit_code": unit_code, "type": "unblock"}, mapper=mapper
+            )
+            try:
+                session.post(company.erp_hold_url, json=erp_payload, headers=headers, timeout=ERP_UNBLOCK_TIMEOUT)
+            except requests.RequestException as e:
+                # Log error but don't fail the local unblock
+                logger.warning("[HOLD_EXPIRY] ERP unblock failed company=%s unit=%s: %s", company.id, unit_code, e)
+                failed.append(unit_code)
+        return failed
@@ -2,8 +2,6 @@
 
 import json
 import traceback
-import threading
-import requests
 
 from ..models import (
     Sales,
@@ -14,16 +12,12 @@ from ..models import (
     ProjectWebConfiguration,
 )
 
-from ..utils.notifications_utils import (
-    email_thread_target,
-    notify_company_controllers,
-    send_pusher_notification,
-)
-
-
 from ..services.erp_unit_mapping_service import ERPUnitMappingService
 from ..services.erp_hold_post_mapping_service import ERPHoldPostMappingService
-from ..utils.erp_mapping_utils import apply_header_mapping
+from ..services.job_queue_service import JobQueueService
+from ..services.job_tasks import sales_request_snapshot
+from ..utils.integration_clients_utils import integration_clients
+from ..utils.pricing_trace_utils import pricing_trace, trace_event
 
 class HoldRequestsManagementService:
     """
@@ -250,7 +244,8 @@ class HoldRequestsManagementService:
 
             # 3b. Verify Availability on ERP
             # We must ensure it hasn't been sold on the ERP side recently
-            erp_check_result = HoldRequestsManagementService._check_and_block_erp(company, unit_code)
+            with pricing_trace("erp_hold_check", company_id=company.id, unit_code=unit_code):
+                erp_check_result = HoldRequestsManagementService._check_and_block_erp(company, unit_code)
             if not erp_check_result["success"]:
                 return erp_check_result
 
@@ -281,20 +276,21 @@ class HoldRequestsManagementService:
             payment_plan_data=data,
         )
 
-        # 7. Notifications (Async)
+        # 7. Notifications (background job queue; started right after commit)
         # Email
         try:
-            threading.Thread(
-                target=email_thread_target,
-                args=(notify_company_controllers, company, sales_request, data, is_erp_enabled),
-            ).start()
+            JobQueueService.enqueue("notifications.hold_request_email", {
+                "snapshot": sales_request_snapshot(sales_request),
+                "cached_data": data,
+                "is_erp": is_erp_enabled,
+            })
         except Exception:
             traceback.print_exc()
 
         # Pusher
         try:
             payload = HoldRequestsManagementService._build_pusher_payload(company, sales_request)
-            threading.Thread(target=send_pusher_notification, args=(payload,)).start()
+            JobQueueService.enqueue("notifications.pusher", {"payload": payload})
         except Exception:
             traceback.print_exc()
 
@@ -320,7 +316,7 @@ class HoldRequestsManagementService:
         # A. Fetch Info
         try:
             # Assuming GET /units/{code}
-            response = requests.get(
+            response = integration_clients.session(company, "erp").get(
                 f"{company.erp_url}{unit_code}", 
                 headers=headers,
                 timeout=30,
@@ -331,9 +327,7 @@ class HoldRequestsManagementService:
             # Check Status
             # ✅ Apply same mapping logic (provided_name -> needed_name) BEFORE reading keys
             try:
-                custom_map = ERPUnitMappingService.get_mapping_dict(company=company)
-                if custom_map:
-                    erp_data = apply_header_mapping(erp_data, custom_map)
+                erp_data = ERPUnitMappingService.get_header_mapper(company=company).apply(erp_data)
             except Exception:
                 traceback.print_exc()
                 # fallback: keep erp_data as-is
@@ -347,7 +341,7 @@ class HoldRequestsManagementService:
             ).strip().lower()
             
             
-            print(f'status = {status}') 
+            trace_event("erp_hold_status", company_id=company.id, unit_code=unit_code, status=status)
             if status != "available":
                  return {
                     "success": False,
@@ -375,20 +369,11 @@ class HoldRequestsManagementService:
             # Your internal payload (what your code uses)
             payload = {"unit_code": unit_code, "type": "block"}
 
-            # Load mapping: ERP key -> internal key (ced_name -> unit_code)
-            external_to_internal = ERPHoldPostMappingService.get_mapping_dict(company=company)
-
-            # Invert it to internal -> ERP key
-            internal_to_external = {v: k for k, v in (external_to_internal or {}).items()}
-
-            # Build ERP payload keys
-            erp_payload = {}
-            for k, v in payload.items():
-                erp_key = internal_to_external.get(k, k)   # default keep same key if no mapping
-                erp_payload[erp_key] = v
+            # Build ERP payload keys (internal -> ERP key, e.g. unit_code -> ced_name; unmapped keys kept)
+            erp_payload = ERPHoldPostMappingService.build_erp_payload(company=company, payload=payload)
     
     
-            block_response = requests.post(
+            block_response = integration_clients.session(company, "erp").post(
                 company.erp_hold_url,
                 json=erp_payload,
                 headers=post_headers,
@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
 from typing import Any, Dict
 
 from ..models import Project, Unit
 
 from ..strategies.inventory_strategy import get_inventory_strategy
+from .unit_snapshot_service import UnitSnapshotService
 
 from ..utils.home_utils import (
     init_home_context,
@@ -93,6 +95,7 @@ class TOPHomeService:
             # Viewer: do NOT force Available-only, use JSON statuses instead
             if is_company_viewer(user):
                 allowed_statuses = viewer_allowed_statuses(user)
+                units_kind = "home:viewer:" + hashlib.sha1("|".join(sorted(allowed_statuses or [])).encode("utf-8")).hexdigest()[:16]
                 units_obj = strategy.get_all_units(active_only=False)
                 if allowed_statuses:
                     # filter in python (no strategy changes required)
@@ -103,12 +106,17 @@ class TOPHomeService:
                     units_obj = []
             else:
                 # existing behavior unchanged for sales/saleshead
+                units_kind = "home:active" if is_client_user else "home:all"
                 units_obj = strategy.get_all_units(active_only=is_client_user)
-                
+
             context["units"] = units_obj
 
-            # B) units_json serialization (same rules)
-            context["units_json"] = serialize_units_for_js(units_obj=units_obj, project_map=project_map)
+            # B) units_json serialization (same rules), cached per company inventory version
+            context["units_json"] = UnitSnapshotService.get_json(
+                user_company.id,
+                units_kind,
+                lambda: serialize_units_for_js(units_obj=units_obj, project_map=project_map),
+            )
 
             # C) unit search (same behavior) - only when POST has unit_query
             if unit_query:
@@ -1,9 +1,16 @@
 import csv
 import io
+from typing import Dict, List, Tuple
+
 from django.shortcuts import get_object_or_404
 from django.db import transaction, IntegrityError
+from django.db.models import Case, CharField, Value, When
 # Added SalesRequest to imports
 from ..models import Company, Unit, SalesRequestAnalytical, UnitPosition, UnitPositionChild, SalesRequest
+from .unit_snapshot_service import UnitSnapshotService
+
+RENAME_CHUNK_SIZE = 500
+
 
 class ImportHubService:
     """
@@ -34,6 +41,8 @@ class ImportHubService:
         
         # Execute Delete
         units_to_delete.delete()
+        if count:
+            UnitSnapshotService.bump(company.id)
 
         return {
             "success": True,
@@ -46,6 +55,12 @@ class ImportHubService:
         """
         Renames units based on a CSV file with columns: 'Old Unit Code', 'New Unit Code'.
         Performs a Clone -> Relink -> Delete operation since unit_code is a PK.
+
+        The whole mapping is validated in memory first (missing codes, collisions,
+        chains, cycles), then applied set-based per chunk: one bulk INSERT of the
+        clones, one UPDATE per referencing table and one DELETE.
+        Chains (A -> B, B -> C) are applied tail first so B is free before A takes it;
+        cycles (A -> B, B -> A) cannot be applied without a temporary code and are skipped.
         """
         if not company_id:
             raise ValueError("Missing Company ID")
@@ -67,14 +82,16 @@ class ImportHubService:
             "renamed": 0,
             "skipped_not_found": 0,
             "skipped_duplicate": 0,
+            "skipped_cycle": 0,
             "errors": []
         }
 
         company = get_object_or_404(Company, id=company_id)
 
+        mapping: List[Tuple[int, str, str]] = []
         for row in reader:
             # Flexible key access based on normalized headers
-            row_lower = {k.strip().lower(): v.strip() for k, v in row.items()}
+            row_lower = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
             old_code = row_lower.get('old unit code')
             new_code = row_lower.get('new unit code')
 
@@ -86,48 +103,135 @@ class ImportHubService:
             if old_code == new_code:
                 continue
 
-            try:
-                with transaction.atomic():
-                    # 1. Validation: Check if Old Unit exists in this company
-                    try:
-                        old_unit = Unit.objects.get(unit_code=old_code, company=company)
-                    except Unit.DoesNotExist:
-                        stats["skipped_not_found"] += 1
-                        stats["errors"].append(f"Row {stats['processed']}: Old unit '{old_code}' not found in this warehouse.")
-                        continue
-
-                    # 2. Validation: Check if New Unit Code already exists (Global check to prevent PK collision)
-                    if Unit.objects.filter(unit_code=new_code).exists():
-                        stats["skipped_duplicate"] += 1
-                        stats["errors"].append(f"Row {stats['processed']}: New unit code '{new_code}' already exists.")
-                        continue
-
-                    # 3. CLONE: Create new unit with old data
-                    # We iterate over fields to copy values, skipping the PK
-                    new_unit = Unit(unit_code=new_code)
-                    for field in Unit._meta.fields:
-                        if field.name != 'unit_code':
-                            setattr(new_unit, field.name, getattr(old_unit, field.name))
-                    
-                    new_unit.save()
-
-                    # 4. RELINK: Update references in related models
-                    
-                    # A. Update Text-Based References (Loose Coupling)
-                    SalesRequestAnalytical.objects.filter(unit_code=old_code).update(unit_code=new_code)
-                    UnitPosition.objects.filter(unit_code=old_code).update(unit_code=new_code)
-                    UnitPositionChild.objects.filter(unit_code=old_code).update(unit_code=new_code)
-
-                    # B. Update ForeignKey References (Strict Coupling - SalesRequest)
-                    # We MUST do this before deleting old_unit, or the link becomes NULL
-                    SalesRequest.objects.filter(unit=old_unit).update(unit=new_unit)
-
-                    # 5. DELETE: Remove the old unit
-                    old_unit.delete()
-
-                    stats["renamed"] += 1
-
-            except Exception as e:
-                stats["errors"].append(f"Error renaming '{old_code}' to '{new_code}': {str(e)}")
-
-        return {"success": True, "stats": stats}
\ No newline at end of file
+            mapping.append((stats["processed"], old_code, new_code))
+
+        waves = ImportHubService._plan_renames(company, mapping, stats)
+
+        for wave in waves:
+            for start in range(0, len(wave), RENAME_CHUNK_SIZE):
+                chunk = dict(wave[start:start + RENAME_CHUNK_SIZE])
+                try:
+                    stats["renamed"] += ImportHubService._apply_renames(company, chunk)
+                except Exception as e:
+                    for old_code, new_code in chunk.items():
+                        stats["errors"].append(f"Error renaming '{old_code}' to '{new_code}': {str(e)}")
+
+        return {"success": True, "stats": stats}
+
+    # =====================================================
+    # Rename helpers
+    # =====================================================
+
+    @staticmethod
+    def _plan_renames(company, mapping: List[Tuple[int, str, str]], stats: dict) -> List[List[Tuple[str, str]]]:
+        """
+        Validates the mapping and groups the accepted renames into waves: every rename in
+        wave N targets a code that is free once waves < N are applied.
+        Errors use the same row numbers / messages as the row-by-row implementation.
+        """
+        olds = {old for _, old, _ in mapping}
+        news = {new for _, _, new in mapping}
+        existing_olds = set(
+            Unit.objects.filter(company=company, unit_code__in=olds).values_list("unit_code", flat=True)
+        )
+        taken = set(Unit.objects.filter(unit_code__in=news).values_list("unit_code", flat=True))
+
+        renames: Dict[str, str] = {}
+        rows: Dict[str, int] = {}
+        claimed = set()
+        for row_no, old_code, new_code in mapping:
+            # a code renamed earlier in the file no longer exists under its old name
+            if old_code not in existing_olds or old_code in renames:
+                stats["skipped_not_found"] += 1
+                stats["errors"].append(f"Row {row_no}: Old unit '{old_code}' not found in this warehouse.")
+                continue
+            if new_code in claimed:
+                stats["skipped_duplicate"] += 1
+                stats["errors"].append(f"Row {row_no}: New unit code '{new_code}' already exists.")
+                continue
+            renames[old_code] = new_code
+            rows[old_code] = row_no
+            claimed.add(new_code)
+
+        # Wave of each rename: 0 when the target is free, else one after the rename vacating it
+        wave_of: Dict[str, int] = {}
+        for start in renames:
+            path: List[str] = []
+            code = start
+            while code in renames and code not in wave_of and code not in path:
+                path.append(code)
+                code = renames[code]
+
+            if code in path:
+                # cycle: no member can move without a temporary code
+                cycle_at = path.index(code)
+                for member in path[cycle_at:]:
+                    wave_of[member] = None
+                    stats["skipped_cycle"] += 1
+                    stats["errors"].append(
+                        f"Row {rows[member]}: Renaming '{member}' to '{renames[member]}' is part of a rename cycle."
+                    )
+                path = path[:cycle_at]
+                resolved = None
+            elif code in wave_of:
+                resolved = wave_of[code]
+            else:
+                # end of the chain: a code nobody renames away; usable only if it does not exist
+                resolved = -1 if code not in taken else None
+
+            for member in reversed(path):
+                resolved = None if resolved is None else resolved + 1
+                wave_of[member] = resolved
+                if resolved is None:
+                    stats["skipped_duplicate"] += 1
+                    stats["errors"].append(f"Row {rows[member]}: New unit code '{renames[member]}' already exists.")
+
+        waves: List[List[Tuple[str, str]]] = []
+        for old_code, wave in wave_of.items():
+            if wave is None:
+                continue
+            while len(waves) <= wave:
+                waves.append([])
+            waves[wave].append((old_code, renames[old_code]))
+        for wave in waves:
+            wave.sort(key=lambda pair: rows[pair[0]])
+        return waves
+
+    @staticmethod
+    def _apply_renames(company, renames: Dict[str, str]) -> int:
+        """ Clone -> Relink -> Delete for a chunk of {old_code: new_code}, as set-based statements. """
+        olds = list(renames)
+
+        def relabel(column: str):
+            return Case(
+                *[When(**{column: old}, then=Value(new)) for old, new in renames.items()],
+                output_field=CharField(),
+            )
+
+        with transaction.atomic():
+            old_units = list(Unit.objects.select_for_update().filter(company=company, unit_code__in=olds))
+            if not old_units:
+                return 0
+            olds = [u.unit_code for u in old_units]
+
+            # 1. CLONE: new units with the old data (PK swapped)
+            clones = []
+            for old_unit in old_units:
+                new_unit = Unit(unit_code=renames[old_unit.unit_code])
+                for field in Unit._meta.fields:
+                    if field.name != 'unit_code':
+                        setattr(new_unit, field.attname, getattr(old_unit, field.attname))
+                clones.append(new_unit)
+            Unit.objects.bulk_create(clones, batch_size=RENAME_CHUNK_SIZE)
+
+            # 2. RELINK: text references, then the SalesRequest FK (before the delete, or it becomes NULL)
+            SalesRequestAnalytical.objects.filter(unit_code__in=olds).update(unit_code=relabel("unit_code"))
+            UnitPosition.objects.filter(unit_code__in=olds).update(unit_code=relabel("unit_code"))
+            UnitPositionChild.objects.filter(unit_code__in=olds).update(unit_code=relabel("unit_code"))
+            SalesRequest.objects.filter(unit_id__in=olds).update(unit_id=relabel("unit_id"))
+
+            # 3. DELETE: remove the old units
+            Unit.objects.filter(company=company, unit_code__in=olds).delete()
+            UnitSnapshotService.bump(company.id)
+
+        return len(old_units)
@@ -0,0 +1,219 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from django.db import models, transaction
+
+from ..models import Company, Unit
+from ..utils.inventory_delta_utils import normalize_field_value, row_content_hash
+from .unit_snapshot_service import UnitSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+DELTA_BATCH_SIZE = 500
+
+
+# =====================================================
+# Result DTO
+# =====================================================
+
+@dataclass
+class InventoryDeltaStats:
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    changed_columns: Dict[str, int] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "deleted": self.deleted,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "changed_columns": dict(self.changed_columns),
+            "errors": list(self.errors),
+        }
+
+
+# =====================================================
+# Service
+# =====================================================
+
+class InventoryDeltaSyncService:
+    """
+    Applies a full or partial source snapshot to a company's units as a delta.
+
+    - Every unit stores `source_hash` = hash of the normalized source row last applied.
+      Rows whose hash did not change are skipped without loading the unit (merge syncs only);
+      local writes (Unit.save, hold expiry) clear it so the next sync re-diffs those units.
+    - Changed rows are diffed column by column and written with bulk_update
+      restricted to the columns that actually changed.
+    - authoritative=True: the row is the whole truth (columns missing from it are
+      reset to model defaults), used by the sheet "replace" sync. It always diffs every
+      row, so units changed by a write that bypassed save() are still brought back in line.
+      authoritative=False: None values never overwrite (merge semantics).
+      overwrite_nulls=True keeps the merge semantics for absent columns but lets an
+      explicit None in the row clear the column (update_or_create(defaults=...) semantics).
+    - delete_missing=True removes company units absent from the snapshot.
+    - full=True ignores stored hashes and diffs every row (repair / first run).
+    """
+
+    @staticmethod
+    def apply(
+        *,
+        company: Company,
+        rows: Dict[str, Dict[str, Any]],
+        authoritative: bool = False,
+        delete_missing: bool = False,
+        full: bool = False,
+        batch_size: int = DELTA_BATCH_SIZE,
+        stored_hashes: Dict[str, str] = None,
+        overwrite_nulls: bool = False,
+    ) -> InventoryDeltaStats:
+        stats = InventoryDeltaStats()
+        full = full or authoritative
+        columns = InventoryDeltaSyncService._source_columns()
+
+        # ---------- Normalize + hash incoming rows ----------
+        incoming: Dict[str, Dict[str, Any]] = {}
+        hashes: Dict[str, str] = {}
+        for unit_code, raw in rows.items():
+            try:
+                values = InventoryDeltaSyncService._normalize_row(raw, columns, authoritative, overwrite_nulls)
+            except Exception as e:
+                stats.skipped += 1
+                stats.errors.append(f"{unit_code}: {e}")
+                continue
+            values[Unit._meta.get_field("company").attname] = company.pk
+            incoming[unit_code] = values
+            hashes[unit_code] = row_content_hash(values)
+
+        # ---------- Classify against stored hashes (2 columns only) ----------
+        # Chunked callers pass one preloaded map for the whole run; it is kept current below.
+        if stored_hashes is None:
+            stored_hashes = InventoryDeltaSyncService.load_stored_hashes(company)
+        stored = stored_hashes
+
+        to_create: List[str] = []
+        to_diff: List[str] = []
+        for unit_code, h in hashes.items():
+            if unit_code not in stored:
+                to_create.append(unit_code)
+            elif full or stored[unit_code] != h:
+                to_diff.append(unit_code)
+            else:
+                stats.unchanged += 1
+
+        missing = [code for code in stored if code not in incoming] if delete_missing else []
+
+        with transaction.atomic():
+            # ---------- Updates: load only the changed units ----------
+            groups: Dict[tuple, List[Unit]] = defaultdict(list)
+            for start in range(0, len(to_diff), batch_size):
+                chunk = to_diff[start:start + batch_size]
+                for unit in Unit.objects.filter(company=company, unit_code__in=chunk):
+                    changed = InventoryDeltaSyncService._apply_diff(
+                        unit, incoming[unit.unit_code], columns
+                    )
+                    if not changed and unit.source_hash == hashes[unit.unit_code]:
+                        stats.unchanged += 1
+                        continue
+                    unit.source_hash = hashes[unit.unit_code]
+                    if changed:
+                        stats.updated += 1
+                        for col in changed:
+                            stats.changed_columns[col] = stats.changed_columns.get(col, 0) + 1
+                    else:
+                        # hash drifted (first run / format change) but the data is identical
+                        stats.unchanged += 1
+                    groups[tuple(sorted(changed)) + ("source_hash",)].append(unit)
+
+            for update_fields, units in groups.items():
+                Unit.objects.bulk_update(units, fields=list(update_fields), batch_size=batch_size)
+
+            # ---------- Creates ----------
+            if to_create:
+                new_units = []
+                for unit_code in to_create:
+                    unit = Unit(unit_code=unit_code, source_hash=hashes[unit_code])
+                    for attname, value in incoming[unit_code].items():
+                        setattr(unit, attname, value)
+                    new_units.append(unit)
+                Unit.objects.bulk_create(new_units, batch_size=batch_size)
+                stats.created = len(new_units)
+
+            # ---------- Deletes ----------
+            for start in range(0, len(missing), batch_size):
+                chunk = missing[start:start + batch_size]
+                Unit.objects.filter(company=company, unit_code__in=chunk).delete()
+            stats.deleted = len(missing)
+
+        if stats.created or stats.updated or stats.deleted:
+            UnitSnapshotService.bump(company.id)
+
+        for unit_code in to_create + to_diff:
+            stored[unit_code] = hashes[unit_code]
+        for unit_code in missing:
+            stored.pop(unit_code, None)
+
+        return stats
+
+    @staticmethod
+    def load_stored_hashes(company: Company) -> Dict[str, str]:
+        return dict(
+            Unit.objects.filter(company=company).values_list("unit_code", "source_hash")
+        )
+
+    # =====================================================
+    # Helpers
+    # =====================================================
+
+    @staticmethod
+    def _source_columns() -> Dict[str, models.Field]:
+        """ {name or attname: field} for every concrete Unit column a source may write. """
+        columns = {}
+        for f in Unit._meta.concrete_fields:
+            if f.primary_key or f.name == "source_hash":
+                continue
+            columns[f.name] = f
+            columns[f.attname] = f
+        return columns
+
+    @staticmethod
+    def _normalize_row(raw: Dict[str, Any], columns: Dict[str, models.Field], authoritative: bool,
+                       overwrite_nulls: bool = False) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+
+        if authoritative:
+            # columns absent from the row fall back to the model default, exactly like Unit(**row)
+            for f in set(columns.values()):
+                values[f.attname] = f.get_default()
+
+        for key, value in raw.items():
+            f = columns.get(key)
+            if f is None:
+                continue
+            if f.is_relation and isinstance(value, models.Model):
+                value = value.pk
+            if value is None and not (authoritative or overwrite_nulls):
+                continue
+            values[f.attname] = normalize_field_value(f, value)
+
+        return values
+
+    @staticmethod
+    def _apply_diff(unit: Unit, values: Dict[str, Any], columns: Dict[str, models.Field]) -> List[str]:
+        changed = []
+        for attname, new_value in values.items():
+            f = columns[attname]
+            current = normalize_field_value(f, getattr(unit, attname))
+            if current != new_value:
+                setattr(unit, attname, new_value)
+                changed.append(f.attname)
+        return changed
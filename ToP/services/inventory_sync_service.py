@@ -2,11 +2,11 @@ from typing import List, Dict, Any
 from dataclasses import dataclass
 
 
-from django.db import transaction
 from django.core.exceptions import ValidationError
 
 from ..models import Company, Unit, Project, CompanyType
-from ..utils.google_sheets_utils import gspread_client, resolve_worksheet
+from ..utils.google_sheets_utils import gspread_client, resolve_worksheet, sheet_index_cache
+from .inventory_delta_sync_service import InventoryDeltaSyncService
 from ..utils.sheet_parsers import (
     get_from_row,
     to_str,
@@ -26,6 +26,9 @@ class InventorySyncResult:
     synced_count: int = 0
     deleted_count: int = 0
     row_errors: List[Dict[str, Any]] = None
+    created_count: int = 0
+    updated_count: int = 0
+    unchanged_count: int = 0
 
     def to_dict(self):
         return {
@@ -33,6 +36,9 @@ class InventorySyncResult:
             "message": self.message,
             "synced_count": self.synced_count,
             "deleted_count": self.deleted_count,
+            "created_count": self.created_count,
+            "updated_count": self.updated_count,
+            "unchanged_count": self.unchanged_count,
             "row_errors": self.row_errors or [],
         }
 
@@ -44,7 +50,7 @@ class InventorySyncResult:
 class InventorySyncService:
 
     @classmethod
-    def sync_company(cls, company: Company) -> InventorySyncResult:
+    def sync_company(cls, company: Company, full: bool = False) -> InventorySyncResult:
 
         if not company.google_sheet_url:
             return InventorySyncResult(False, "Missing Google Sheet URL")
@@ -62,14 +68,21 @@ class InventorySyncService:
         except Exception as e:
             return InventorySyncResult(False, f"Google Sheets error: {e}")
 
+        # refresh the write-back index (unit -> row) from the rows we already have
+        sheet_index_cache.prime(company, rows)
+
         # ---------- Parse Rows ----------
         new_units: List[Unit] = []
         row_errors: List[Dict[str, Any]] = []
         seen_codes = set()
 
+        projects_by_name = {}
+        for project in Project.objects.order_by("pk"):
+            projects_by_name.setdefault((project.name or "").strip().lower(), project)
+
         for idx, row in enumerate(rows, start=2):
             try:
-                unit = cls._parse_row(row, company, seen_codes)
+                unit = cls._parse_row(row, company, seen_codes, projects_by_name)
                 new_units.append(unit)
             except Exception as e:
                 row_errors.append({
@@ -78,17 +91,36 @@ class InventorySyncService:
                     "reason": str(e)
                 })
 
-        # ---------- Atomic Replace ----------
+        # ---------- Delta Replace ----------
+        # The sheet stays authoritative (same end state as delete + re-insert), but only
+        # new / changed / removed units are written and unchanged units keep their rows.
+        columns = [
+            f.attname for f in Unit._meta.concrete_fields
+            if not f.primary_key and f.name != "source_hash"
+        ]
+        snapshot = {
+            unit.unit_code: {attname: getattr(unit, attname) for attname in columns}
+            for unit in new_units
+        }
+
         try:
-            with transaction.atomic():
-                qs = Unit.objects.filter(company=company)
-                deleted = qs.count()
-                qs.delete()
-                Unit.objects.bulk_create(new_units, batch_size=1000)
+            delta = InventoryDeltaSyncService.apply(
+                company=company,
+                rows=snapshot,
+                authoritative=True,
+                delete_missing=True,
+                full=full,
+            )
         except Exception as e:
             return InventorySyncResult(False, f"Database error: {e}")
 
-        msg = f"Successfully synced {len(new_units)} units."
+        for err in delta.errors:
+            row_errors.append({"row": None, "unit_code": err.split(":", 1)[0], "reason": err})
+
+        msg = (
+            f"Successfully synced {len(new_units)} units "
+            f"({delta.created} new, {delta.updated} updated, {delta.unchanged} unchanged)."
+        )
         if row_errors:
             msg += f" {len(row_errors)} rows skipped."
 
@@ -96,8 +128,11 @@ class InventorySyncService:
             True,
             msg,
             len(new_units),
-            deleted,
-            row_errors
+            delta.deleted,
+            row_errors,
+            created_count=delta.created,
+            updated_count=delta.updated,
+            unchanged_count=delta.unchanged,
         )
 
     # =====================================================
@@ -108,7 +143,8 @@ class InventorySyncService:
     def _parse_row(
         row: Dict[str, Any],
         company: Company,
-        seen_codes: set
+        seen_codes: set,
+        projects_by_name: Dict[str, Project] = None
     ) -> Unit:
         # -------------------------------
         # Extract Unit Code
@@ -251,7 +287,10 @@ class InventorySyncService:
         # -------------------------------
         if project_name:
             try:
-                proj = Project.objects.filter(name__iexact=project_name).first()
+                if projects_by_name is not None:
+                    proj = projects_by_name.get(project_name.strip().lower())
+                else:
+                    proj = Project.objects.filter(name__iexact=project_name).first()
                 if proj:
                     unit_kwargs["project_company"] = proj
             except Exception:
@@ -0,0 +1,254 @@
+# ToP/services/job_queue_service.py
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils.timezone import now
+
+from ..models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+
+JOB_QUEUE_INLINE_WORKERS = 4          # in-process pool used right after enqueue
+JOB_QUEUE_WORKER_THREADS = 4          # pool used by the run_job_worker command
+JOB_RETRY_BASE_SECONDS = 5
+JOB_RETRY_MAX_SECONDS = 15 * 60
+JOB_STALE_SECONDS = 30 * 60           # "running" longer than this -> the worker died; requeue
+JOB_CLAIM_BATCH = 20
+
+
+# =====================================================
+# Task registry
+# =====================================================
+
+_TASKS: Dict[str, Dict[str, Any]] = {}
+
+
+def job_task(name: str, *, priority: int = BackgroundJob.Priority.NORMAL, max_attempts: int = 5):
+    """
+    Registers a job handler. Handlers take the JSON payload as keyword arguments and
+    raise to request a retry; they must only receive ids / plain data (never model instances).
+    """
+    def decorator(func: Callable[..., Any]):
+        _TASKS[name] = {"func": func, "priority": priority, "max_attempts": max_attempts}
+        return func
+    return decorator
+
+
+def _task(name: str) -> Optional[Dict[str, Any]]:
+    if name not in _TASKS:
+        # handlers import services; load them lazily to keep this module import-cycle free
+        from . import job_tasks  # noqa: F401
+    return _TASKS.get(name)
+
+
+# =====================================================
+# Service
+# =====================================================
+
+class JobQueueService:
+    """
+    Small DB-backed job queue.
+
+    - enqueue() stores a BackgroundJob row (durable: survives a worker restart) and, after
+      the surrounding transaction commits, hands it to a bounded in-process pool so side
+      effects still start immediately without spawning a thread per request.
+    - The run_job_worker command drains the table: claims due jobs by priority with
+      SKIP LOCKED, runs them in a bounded pool, retries failures with exponential backoff
+      and requeues jobs left "running" by a dead process.
+    - Set JOB_QUEUE_INLINE = False to leave all execution to the worker processes.
+    """
+
+    _inline_pool: Optional[ThreadPoolExecutor] = None
+    _inline_lock = threading.Lock()
+
+    # -----------------------------
+    # Producer
+    # -----------------------------
+    @staticmethod
+    def enqueue(task: str, payload: Dict[str, Any] = None, *, priority: int = None, delay: float = 0,
+                max_attempts: int = None) -> BackgroundJob:
+        spec = _task(task)
+        if spec is None:
+            raise ValueError(f"Unknown background job task '{task}'.")
+
+        job = BackgroundJob.objects.create(
+            task=task,
+            payload=payload or {},
+            priority=priority if priority is not None else spec["priority"],
+            max_attempts=max_attempts or spec["max_attempts"],
+            run_after=now() + timedelta(seconds=delay),
+        )
+
+        if not delay and getattr(settings, "JOB_QUEUE_INLINE", True):
+            transaction.on_commit(lambda: JobQueueService._dispatch_inline(job.id))
+        return job
+
+    @classmethod
+    def _dispatch_inline(cls, job_id: int) -> None:
+        with cls._inline_lock:
+            if cls._inline_pool is None:
+                cls._inline_pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "JOB_QUEUE_INLINE_WORKERS", JOB_QUEUE_INLINE_WORKERS),
+                    thread_name_prefix="job-inline",
+                )
+        cls._inline_pool.submit(cls._run_inline, job_id)
+
+    @staticmethod
+    def _run_inline(job_id: int) -> None:
+        try:
+            job = JobQueueService._claim_one(job_id, JobQueueService.worker_id("inline"))
+            if job:
+                JobQueueService.run_job(job)
+        except Exception:
+            logger.exception("[JOBS] inline dispatch of job %s failed", job_id)
+        finally:
+            connection.close()
+
+    # -----------------------------
+    # Claiming
+    # -----------------------------
+    @staticmethod
+    def worker_id(prefix: str = "worker") -> str:
+        return f"{prefix}:{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"[:100]
+
+    @staticmethod
+    def _claim_one(job_id: int, worker: str) -> Optional[BackgroundJob]:
+        claimed = BackgroundJob.objects.filter(
+            id=job_id, status=BackgroundJob.Status.QUEUED, run_after__lte=now()
+        ).update(status=BackgroundJob.Status.RUNNING, locked_by=worker, locked_at=now())
+        if not claimed:
+            return None
+        return BackgroundJob.objects.get(id=job_id)
+
+    @staticmethod
+    def claim_batch(worker: str, limit: int = JOB_CLAIM_BATCH) -> List[BackgroundJob]:
+        with transaction.atomic():
+            qs = BackgroundJob.objects.filter(
+                status=BackgroundJob.Status.QUEUED, run_after__lte=now()
+            ).order_by("priority", "run_after", "id")
+            if connection.features.has_select_for_update_skip_locked:
+                qs = qs.select_for_update(skip_locked=True)
+            else:
+                qs = qs.select_for_update()
+            ids = list(qs.values_list("id", flat=True)[:limit])
+            if not ids:
+                return []
+            BackgroundJob.objects.filter(id__in=ids).update(
+                status=BackgroundJob.Status.RUNNING, locked_by=worker, locked_at=now()
+            )
+        jobs = {job.id: job for job in BackgroundJob.objects.filter(id__in=ids)}
+        return [jobs[i] for i in ids if i in jobs]
+
+    @staticmethod
+    def requeue_stale(stale_seconds: int = None) -> int:
+        stale_seconds = stale_seconds or getattr(settings, "JOB_STALE_SECONDS", JOB_STALE_SECONDS)
+        cutoff = now() - timedelta(seconds=stale_seconds)
+        stale = BackgroundJob.objects.filter(status=BackgroundJob.Status.RUNNING, locked_at__lt=cutoff)
+        count = 0
+        for job in stale:
+            JobQueueService._record_failure(job, "Worker died or timed out while running the job.")
+            count += 1
+        return count
+
+    # -----------------------------
+    # Execution
+    # -----------------------------
+    @staticmethod
+    def run_job(job: BackgroundJob) -> bool:
+        spec = _task(job.task)
+        job.attempts += 1
+        started = time.perf_counter()
+
+        try:
+            if spec is None:
+                raise LookupError(f"No handler registered for task '{job.task}'.")
+            spec["func"](**(job.payload or {}))
+        except Exception as e:
+            logger.warning("[JOBS] %s #%s attempt %s failed: %s", job.task, job.id, job.attempts, e)
+            JobQueueService._record_failure(job, f"{e}\n{traceback.format_exc()}"[-4000:], counted=True)
+            return False
+
+        job.status = BackgroundJob.Status.SUCCEEDED
+        job.finished_at = now()
+        job.last_error = ""
+        job.save(update_fields=["status", "attempts", "finished_at", "last_error"])
+        logger.info("[JOBS] %s #%s done in %.1f ms", job.task, job.id, (time.perf_counter() - started) * 1000)
+        return True
+
+    @staticmethod
+    def _record_failure(job: BackgroundJob, error: str, counted: bool = False) -> None:
+        if not counted:
+            job.attempts += 1
+        job.last_error = error
+        job.locked_by = ""
+        job.locked_at = None
+
+        if job.attempts >= job.max_attempts:
+            job.status = BackgroundJob.Status.FAILED
+            job.finished_at = now()
+        else:
+            job.status = BackgroundJob.Status.QUEUED
+            job.run_after = now() + timedelta(seconds=JobQueueService.backoff_seconds(job.attempts))
+        job.save(update_fields=["status", "attempts", "last_error", "locked_by", "locked_at", "run_after", "finished_at"])
+
+    @staticmethod
+    def backoff_seconds(attempts: int) -> float:
+        base = getattr(settings, "JOB_RETRY_BASE_SECONDS", JOB_RETRY_BASE_SECONDS)
+        cap = getattr(settings, "JOB_RETRY_MAX_SECONDS", JOB_RETRY_MAX_SECONDS)
+        delay = min(cap, base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)  # jitter so retries of a burst spread out
+
+    # -----------------------------
+    # Worker
+    # -----------------------------
+    @staticmethod
+    def drain(*, threads: int = None, batch: int = JOB_CLAIM_BATCH, max_jobs: int = None) -> Dict[str, int]:
+        """ Runs due jobs until the queue is empty (or max_jobs ran). Returns counters. """
+        threads = max(1, threads or getattr(settings, "JOB_QUEUE_WORKER_THREADS", JOB_QUEUE_WORKER_THREADS))
+        stats = {"requeued": JobQueueService.requeue_stale(), "succeeded": 0, "failed": 0}
+        worker = JobQueueService.worker_id()
+
+        def _run(job):
+            try:
+                return JobQueueService.run_job(job)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="job-worker") as pool:
+            while max_jobs is None or stats["succeeded"] + stats["failed"] < max_jobs:
+                jobs = JobQueueService.claim_batch(worker, limit=batch)
+                if not jobs:
+                    break
+                for ok in pool.map(_run, jobs):
+                    stats["succeeded" if ok else "failed"] += 1
+        return stats
+
+    @staticmethod
+    def status_counts() -> Dict[str, int]:
+        counts = {s: 0 for s in BackgroundJob.Status.values}
+        for row in BackgroundJob.objects.values("status").annotate(n=Count("id")):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    @staticmethod
+    def purge_finished(older_than_days: int = 7) -> int:
+        cutoff = now() - timedelta(days=older_than_days)
+        deleted, _ = BackgroundJob.objects.filter(
+            status__in=[BackgroundJob.Status.SUCCEEDED, BackgroundJob.Status.FAILED], finished_at__lt=cutoff
+        ).delete()
+        return deleted
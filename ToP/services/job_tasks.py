@@ -0,0 +1,183 @@
+# ToP/services/job_tasks.py
+"""
+Background job handlers (see JobQueueService). Payloads are JSON: ids and plain data only.
+Handlers raise to get retried with backoff; notifiers that swallow their own errors
+(emails) therefore run once.
+"""
+
+from __future__ import annotations
+
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+
+from django.utils.dateparse import parse_datetime
+
+from ..models import BackgroundJob, Company, Project, SalesRequest, Unit, User
+from ..utils.google_sheets_utils import cancel_google_sheet_reservation, update_google_sheet_sales_data
+from ..utils.integration_clients_utils import integration_clients
+from ..utils.notifications_utils import (
+    notify_company_controllers,
+    notify_company_managers_approval,
+    notify_salesman_with_cached_plan,
+    trigger_pusher_notification,
+)
+from .csv_inventory_service import CsvInventoryService
+from .hold_expiry_service import HoldExpiryService
+from .job_queue_service import job_task
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# Sales request snapshots
+# =====================================================
+
+def sales_request_snapshot(sales_request: SalesRequest) -> Dict[str, Any]:
+    """
+    What the notifiers / write-back read from a SalesRequest. Approvals delete the request
+    right after enqueueing, so jobs carry this instead of relying on the row.
+    """
+    return {
+        "id": sales_request.id,
+        "company_id": sales_request.company_id,
+        "sales_man_id": sales_request.sales_man_id,
+        "project_id": sales_request.project_id,
+        "unit_code": sales_request.unit_id,
+        "client_id": sales_request.client_id,
+        "client_name": sales_request.client_name,
+        "client_phone_number": sales_request.client_phone_number,
+        "final_price": sales_request.final_price,
+        "discount": sales_request.discount,
+        "date": sales_request.date,
+        "extended_minutes": sales_request.extended_minutes,
+    }
+
+
+def _decimal(value) -> Optional[Decimal]:
+    if value in (None, ""):
+        return None
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def restore_sales_request(snapshot: Dict[str, Any]) -> SalesRequest:
+    """ The live row when it still exists, otherwise an unsaved instance built from the snapshot. """
+    live = (
+        SalesRequest.objects.select_related("unit", "project", "sales_man", "company")
+        .filter(id=snapshot.get("id"))
+        .first()
+    )
+    if live:
+        return live
+
+    unit_code = snapshot.get("unit_code")
+    date = snapshot.get("date")
+    return SalesRequest(
+        id=snapshot.get("id"),
+        company=Company.objects.filter(id=snapshot.get("company_id")).first(),
+        sales_man=User.objects.filter(id=snapshot.get("sales_man_id")).first(),
+        project=Project.objects.filter(id=snapshot.get("project_id")).first(),
+        unit=(Unit.objects.filter(unit_code=unit_code).first() or Unit(unit_code=unit_code)) if unit_code else None,
+        client_id=snapshot.get("client_id") or "",
+        client_name=snapshot.get("client_name"),
+        client_phone_number=snapshot.get("client_phone_number"),
+        final_price=_decimal(snapshot.get("final_price")),
+        discount=_decimal(snapshot.get("discount")),
+        date=parse_datetime(date) if isinstance(date, str) else date,
+        extended_minutes=snapshot.get("extended_minutes") or 0,
+    )
+
+
+def _company(company_id) -> Company:
+    return Company.objects.get(id=company_id)
+
+
+# =====================================================
+# Notifications
+# =====================================================
+
+@job_task("notifications.hold_request_email", max_attempts=1)
+def hold_request_email(*, snapshot, cached_data=None, is_erp=False):
+    sales_request = restore_sales_request(snapshot)
+    notify_company_controllers(sales_request.company, sales_request, cached_data, is_erp)
+
+
+@job_task("notifications.approved_plan_salesman", max_attempts=1)
+def approved_plan_salesman_email(*, snapshot, cached_data):
+    sales_request = restore_sales_request(snapshot)
+    notify_salesman_with_cached_plan(sales_request.company, sales_request, cached_data)
+
+
+@job_task("notifications.approved_plan_managers", max_attempts=1)
+def approved_plan_managers_email(*, snapshot, cached_data):
+    sales_request = restore_sales_request(snapshot)
+    notify_company_managers_approval(sales_request.company, sales_request, cached_data)
+
+
+@job_task("notifications.pusher", priority=BackgroundJob.Priority.HIGH, max_attempts=3)
+def pusher_notification(*, payload):
+    trigger_pusher_notification(payload)
+
+
+# =====================================================
+# ERP
+# =====================================================
+
+# approve is a non-idempotent POST: a read timeout after the request went out may already have
+# approved it, so it is never re-sent; a failure stays visible as a FAILED job (last_error)
+@job_task("erp.approve", max_attempts=1)
+def erp_approve(*, company_id, cached_data):
+    company = _company(company_id)
+    if not company.erp_approve_url:
+        return
+
+    headers = {"Content-Type": "application/json"}
+    if company.erp_approve_url_key:
+        headers["Authorization"] = f"Bearer {company.erp_approve_url_key}"
+    resp = integration_clients.session(company, "erp").post(
+        company.erp_approve_url, json=cached_data, headers=headers, timeout=30
+    )
+    resp.raise_for_status()
+
+
+@job_task("erp.unblock_units", max_attempts=3)
+def erp_unblock_units(*, company_id, unit_codes: List[str]):
+    company = _company(company_id)
+    if not company.erp_hold_url:
+        return
+
+    failed = HoldExpiryService.unblock_company_units(company, unit_codes)
+    if failed:
+        # unblocking is idempotent on the ERP side, so the retry simply re-sends the batch
+        raise RuntimeError(f"ERP unblock failed for {len(failed)} unit(s): {failed[:20]}")
+
+
+# =====================================================
+# Google Sheets
+# =====================================================
+
+@job_task("sheets.approval_writeback", max_attempts=5)
+def sheets_approval_writeback(*, snapshot, cached_data):
+    sales_request = restore_sales_request(snapshot)
+    update_google_sheet_sales_data(sales_request.company, sales_request, cached_data)
+
+
+@job_task("sheets.cancel_writeback", max_attempts=5)
+def sheets_cancel_writeback(*, company_id, unit_code, interest_free_price=None):
+    cancel_google_sheet_reservation(
+        company=_company(company_id),
+        unit_code=unit_code,
+        interest_free_price=interest_free_price,
+    )
+
+
+# =====================================================
+# Imports
+# =====================================================
+
+@job_task("inventory.csv_import", priority=BackgroundJob.Priority.LOW, max_attempts=1)
+def csv_inventory_import(**kwargs):
+    CsvInventoryService.run_import(**kwargs)
@@ -0,0 +1,317 @@
+# ToP/services/market_research_cube_service.py
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Lower
+
+from ..models import MarketUnitCube, MarketUnitData
+
+logger = logging.getLogger(__name__)
+
+# projects waiting for a refresh in this thread (row signals add to it once per row)
+_pending = threading.local()
+
+
+CUBE_BATCH_SIZE = 1000
+
+# grouping columns of the cube (filter dimensions + project for distinct-project counts)
+CUBE_DIMENSIONS = (
+    "project_name",
+    "developer_name",
+    "location",
+    "asset_type",
+    "unit_type",
+    "finishing_specs",
+    "payment_yrs",
+    "date_of_update",
+)
+
+CUBE_MEASURES = (
+    "units",
+    "price_sum", "price_n", "price_min", "price_max",
+    "psm_sum", "psm_n",
+    "bua_sum", "bua_n", "bua_min", "bua_max",
+    "dp_sum", "dp_n",
+)
+
+# dashboard filter -> cube column (filters outside this map need the live queries)
+CUBE_FILTERS = {
+    "developers": "developer_name",
+    "locations": "location",
+    "asset_types": "asset_type",
+    "unit_types": "unit_type",
+    "finishing_specs": "finishing_specs",
+    "payment_years": "payment_yrs",
+}
+RANGE_FILTERS = ("min_price", "max_price", "min_bua", "max_bua")
+
+
+class MarketResearchCubeService:
+    """
+    Materialized market research aggregates (MarketUnitCube).
+
+    - One cube row per (project, developer, location, asset type, unit type, finishing,
+      payment years, update date) with count / sum / min / max measures. The update date
+      is kept at day grain so both the monthly trend and the 30-day KPI roll up from it.
+    - Refreshed per project (case-insensitive name) after imports / edits:
+      one DELETE + one GROUP BY insert for the touched projects. MarketUnitData
+      saves / deletes schedule it through ToP.signals, bulk writers call schedule_refresh().
+    - Dashboard APIs read the cells matching the dimension filters in one query and
+      roll them up in memory. Price / BUA range filters cut through the cells, so
+      cells() returns None and callers fall back to the live queries.
+    """
+
+    # =====================================================
+    # Refresh
+    # =====================================================
+
+    @staticmethod
+    def schedule_refresh(project_names: Iterable[Optional[str]]) -> None:
+        """
+        Refreshes the given projects once the surrounding transaction commits.
+
+        Names are collected per thread and the first commit callback refreshes all of them,
+        so a bulk delete firing one post_delete per row still costs one refresh.
+        """
+        names = set(project_names)
+        if not names:
+            return
+        if not hasattr(_pending, "names"):
+            _pending.names = set()
+        _pending.names |= names
+        transaction.on_commit(MarketResearchCubeService._refresh_pending)
+
+    @staticmethod
+    def _refresh_pending() -> None:
+        # names left by a rolled-back transaction ride along with the next refresh (harmless)
+        names = getattr(_pending, "names", None)
+        if names:
+            _pending.names = set()
+            MarketResearchCubeService._refresh_quietly(names)
+
+    @staticmethod
+    def schedule_rebuild() -> None:
+        transaction.on_commit(lambda: MarketResearchCubeService._refresh_quietly(None))
+
+    @staticmethod
+    def _refresh_quietly(names) -> None:
+        # the cube is derived data: a failed refresh must not fail the edit that triggered it
+        try:
+            if names is None:
+                MarketResearchCubeService.rebuild()
+            else:
+                MarketResearchCubeService.refresh_projects(names)
+        except Exception:
+            logger.exception("[MARKET_CUBE] refresh failed (run `rebuild_market_cube` to repair)")
+
+    @staticmethod
+    def refresh_projects(project_names: Iterable[Optional[str]]) -> int:
+        keys = {(name or "").lower() for name in project_names}
+        if not keys:
+            return 0
+
+        units = MarketUnitData.objects.annotate(
+            _project_key=Lower(Coalesce("project_name", Value("")))
+        ).filter(_project_key__in=keys)
+
+        with transaction.atomic():
+            MarketUnitCube.objects.filter(project_key__in=keys).delete()
+            return MarketResearchCubeService._materialize(units)
+
+    @staticmethod
+    def rebuild() -> int:
+        units = MarketUnitData.objects.annotate(_project_key=Lower(Coalesce("project_name", Value(""))))
+        with transaction.atomic():
+            MarketUnitCube.objects.all().delete()
+            return MarketResearchCubeService._materialize(units)
+
+    @staticmethod
+    def _materialize(units) -> int:
+        rows = (
+            units.values("_project_key", *CUBE_DIMENSIONS)
+            .annotate(
+                units=Count("id"),
+                price_sum=Sum("unit_price"),
+                price_n=Count("unit_price"),
+                price_min=Min("unit_price"),
+                price_max=Max("unit_price"),
+                psm_sum=Sum("psm"),
+                psm_n=Count("psm"),
+                bua_sum=Sum("bua"),
+                bua_n=Count("bua"),
+                bua_min=Min("bua"),
+                bua_max=Max("bua"),
+                dp_sum=Sum("down_payment"),
+                dp_n=Count("down_payment"),
+            )
+            .order_by()
+        )
+
+        cells = []
+        for row in rows.iterator():
+            project_key = row.pop("_project_key")
+            for measure in ("price_sum", "psm_sum", "bua_sum", "dp_sum"):
+                row[measure] = row[measure] or 0
+            cells.append(MarketUnitCube(project_key=project_key, **row))
+        MarketUnitCube.objects.bulk_create(cells, batch_size=CUBE_BATCH_SIZE)
+        return len(cells)
+
+    # =====================================================
+    # Lookup
+    # =====================================================
+
+    @staticmethod
+    def cells(filters: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """ Cube rows matching the dimension filters (one query), or None when a range filter is set. """
+        if any(filters.get(key) for key in RANGE_FILTERS):
+            return None
+
+        q = Q()
+        for key, column in CUBE_FILTERS.items():
+            if filters.get(key):
+                q &= Q(**{f"{column}__in": filters[key]})
+        return list(MarketUnitCube.objects.filter(q).values(*CUBE_DIMENSIONS, *CUBE_MEASURES))
+
+    # =====================================================
+    # Roll-ups (same payloads as the live dashboard queries)
+    # =====================================================
+
+    @staticmethod
+    def _avg(total: float, n: int) -> Optional[float]:
+        return total / n if n else None
+
+    @staticmethod
+    def _extreme(cells, column: str, pick):
+        values = [c[column] for c in cells if c[column] is not None]
+        return pick(values) if values else None
+
+    @staticmethod
+    def _group(cells, dimension: str, measures: Dict[str, tuple]) -> List[Dict[str, Any]]:
+        """
+        GROUP BY dimension (NULL group dropped, like `.filter(<dim>__isnull=False)`).
+        measures: {output name: ("count",) | ("avg", sum column, n column)}
+        """
+        acc: Dict[Any, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for c in cells:
+            key = c[dimension]
+            if key is None:
+                continue
+            bucket = acc[key]
+            bucket["units"] += c["units"]
+            for spec in measures.values():
+                if spec[0] == "avg":
+                    bucket[spec[1]] += c[spec[1]]
+                    bucket[spec[2]] += c[spec[2]]
+
+        out = []
+        for key, bucket in acc.items():
+            item = {dimension: key}
+            for name, spec in measures.items():
+                if spec[0] == "count":
+                    item[name] = int(bucket["units"])
+                else:
+                    item[name] = MarketResearchCubeService._avg(bucket[spec[1]], int(bucket[spec[2]]))
+            out.append(item)
+        return out
+
+    @staticmethod
+    def _desc(name: str):
+        # ORDER BY <name> DESC: NULLs last
+        return lambda item: (item[name] is None, -(item[name] or 0))
+
+    @staticmethod
+    def kpis(cells: List[Dict[str, Any]]) -> Dict[str, Any]:
+        def total(column: str):
+            return sum(c[column] for c in cells)
+
+        avg = MarketResearchCubeService._avg
+        recent_since = datetime.now().date() - timedelta(days=30)
+
+        return {
+            "total_units": total("units"),
+            "total_projects": len({c["project_name"] for c in cells}),
+            "total_developers": len({c["developer_name"] for c in cells}),
+            "total_locations": len({c["location"] for c in cells}),
+            "avg_price": avg(total("price_sum"), total("price_n")),
+            "avg_psm": avg(total("psm_sum"), total("psm_n")),
+            "avg_bua": avg(total("bua_sum"), total("bua_n")),
+            "avg_dp": avg(total("dp_sum"), total("dp_n")),
+            "min_price": MarketResearchCubeService._extreme(cells, "price_min", min),
+            "max_price": MarketResearchCubeService._extreme(cells, "price_max", max),
+            "recent_updates": sum(
+                c["units"] for c in cells if c["date_of_update"] and c["date_of_update"] >= recent_since
+            ),
+        }
+
+    @staticmethod
+    def charts(cells: List[Dict[str, Any]]) -> Dict[str, Any]:
+        group = MarketResearchCubeService._group
+        desc = MarketResearchCubeService._desc
+        count = ("count",)
+        avg_price = ("avg", "price_sum", "price_n")
+
+        monthly: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for c in cells:
+            if c["date_of_update"] is not None:
+                monthly[c["date_of_update"].strftime("%Y-%m")].append(c)
+        monthly_trends = []
+        for month in sorted(monthly):
+            month_cells = monthly[month]
+            monthly_trends.append({
+                "month": month,
+                "count": sum(c["units"] for c in month_cells),
+                "avg_price": MarketResearchCubeService._avg(
+                    sum(c["price_sum"] for c in month_cells), sum(c["price_n"] for c in month_cells)
+                ),
+            })
+
+        return {
+            "price_by_asset": sorted(
+                group(cells, "asset_type", {"avg_price": avg_price, "count": count}), key=desc("avg_price")
+            ),
+            "units_by_developer": sorted(
+                group(cells, "developer_name", {"count": count, "avg_price": avg_price}), key=desc("count")
+            )[:10],
+            "units_by_location": sorted(
+                group(cells, "location", {"count": count, "avg_price": avg_price}), key=desc("count")
+            )[:15],
+            "price_by_finishing": sorted(
+                group(cells, "finishing_specs", {"avg_price": avg_price, "count": count}), key=desc("avg_price")
+            ),
+            "unit_type_distribution": sorted(
+                group(cells, "unit_type", {"count": count}), key=desc("count")
+            ),
+            "payment_analysis": sorted(
+                group(cells, "payment_yrs", {"count": count, "avg_down_payment": ("avg", "dp_sum", "dp_n")}),
+                key=lambda item: item["payment_yrs"],
+            ),
+            "monthly_trends": monthly_trends[-12:],
+        }
+
+    @staticmethod
+    def filter_data(cells: List[Dict[str, Any]]) -> Dict[str, Any]:
+        group = MarketResearchCubeService._group
+        extreme = MarketResearchCubeService._extreme
+
+        def options(dimension: str):
+            return sorted(group(cells, dimension, {"count": ("count",)}), key=lambda item: item[dimension])
+
+        return {
+            "developers": options("developer_name"),
+            "locations": options("location"),
+            "asset_types": options("asset_type"),
+            "unit_types": options("unit_type"),
+            "finishing_specs": options("finishing_specs"),
+            "min_price": extreme(cells, "price_min", min),
+            "max_price": extreme(cells, "price_max", max),
+            "min_bua": extreme(cells, "bua_min", min),
+            "max_bua": extreme(cells, "bua_max", max),
+        }
@@ -9,6 +9,7 @@ from typing import Any, Dict, Optional, List, Iterable, Tuple
 from collections import defaultdict
 
 from django.db.models import Avg, Min, Max, Count, QuerySet
+from django.db.models.functions import TruncMonth
 
 from ..models import (
     MarketUnitData,
@@ -17,6 +18,7 @@ from ..models import (
     MarketProjectDeveloper,
 )
 
+from .market_research_cube_service import MarketResearchCubeService
 from ..utils.market_research_utils import (
     build_base_context,
     get_filters_from_request,
@@ -319,23 +321,19 @@ class MarketResearchService:
     def dashboard_kpis(*, request) -> ServiceResult:
         try:
             filters = get_filters_from_request(request)
-            qs = apply_filters(MarketUnitData.objects.all(), filters)
 
-            # One aggregate instead of multiple
-            stats = qs.aggregate(
-                avg_price=Avg("unit_price"),
-                avg_psm=Avg("psm"),
-                avg_bua=Avg("bua"),
-                avg_dp=Avg("down_payment"),
-                min_price=Min("unit_price"),
-                max_price=Max("unit_price"),
-            )
+            # Materialized cube (one lookup); range filters need the unit rows
+            cells = MarketResearchCubeService.cells(filters)
+            if cells is not None:
+                stats = MarketResearchCubeService.kpis(cells)
+            else:
+                stats = MarketResearchService._live_kpi_stats(apply_filters(MarketUnitData.objects.all(), filters))
 
             payload = {
-                "total_units": qs.count(),
-                "total_projects": qs.values("project_name").distinct().count(),
-                "total_developers": qs.values("developer_name").distinct().count(),
-                "total_locations": qs.values("location").distinct().count(),
+                "total_units": stats["total_units"],
+                "total_projects": stats["total_projects"],
+                "total_developers": stats["total_developers"],
+                "total_locations": stats["total_locations"],
 
                 "avg_price": round(stats["avg_price"] or 0, 0),
                 "avg_psm": round(stats["avg_psm"] or 0, 0),
@@ -345,9 +343,7 @@ class MarketResearchService:
                 "min_price": stats["min_price"] or 0,
                 "max_price": stats["max_price"] or 0,
 
-                "recent_updates": qs.filter(
-                    date_of_update__gte=datetime.now().date() - timedelta(days=30)
-                ).count(),
+                "recent_updates": stats["recent_updates"],
 
                 "price_range": (
                     f"{format_number(stats['min_price'])} - {format_number(stats['max_price'])}"
@@ -359,6 +355,26 @@ class MarketResearchService:
         except Exception as e:
             return MarketResearchService._fail(500, str(e), traceback.format_exc())
 
+    @staticmethod
+    def _live_kpi_stats(qs: QuerySet) -> Dict[str, Any]:
+        # One aggregate instead of multiple
+        stats = qs.aggregate(
+            avg_price=Avg("unit_price"),
+            avg_psm=Avg("psm"),
+            avg_bua=Avg("bua"),
+            avg_dp=Avg("down_payment"),
+            min_price=Min("unit_price"),
+            max_price=Max("unit_price"),
+        )
+        stats.update(
+            total_units=qs.count(),
+            total_projects=qs.values("project_name").distinct().count(),
+            total_developers=qs.values("developer_name").distinct().count(),
+            total_locations=qs.values("location").distinct().count(),
+            recent_updates=qs.filter(date_of_update__gte=datetime.now().date() - timedelta(days=30)).count(),
+        )
+        return stats
+
     # ---------------------------------------------------------
     # 8) Dashboard Charts Data API
     # ---------------------------------------------------------
@@ -368,66 +384,79 @@ class MarketResearchService:
             filters = get_filters_from_request(request)
             qs = apply_filters(MarketUnitData.objects.all(), filters)
 
-            payload = {
-                "price_by_asset": list(
-                    qs.values("asset_type")
-                      .annotate(avg_price=Avg("unit_price"), count=Count("id"))
-                      .filter(asset_type__isnull=False)
-                      .order_by("-avg_price")
-                ),
-                "units_by_developer": list(
-                    qs.values("developer_name")
-                      .annotate(count=Count("id"), avg_price=Avg("unit_price"))
-                      .filter(developer_name__isnull=False)
-                      .order_by("-count")[:10]
-                ),
-                "price_vs_bua": list(
-                    qs.filter(
-                        unit_price__isnull=False,
-                        bua__isnull=False,
-                        bua__gt=0,
-                        unit_price__gt=0
-                    ).values("unit_price", "bua", "asset_type", "project_name")[:500]
-                ),
-                "units_by_location": list(
-                    qs.values("location")
-                      .annotate(count=Count("id"), avg_price=Avg("unit_price"))
-                      .filter(location__isnull=False)
-                      .order_by("-count")[:15]
-                ),
-                "price_by_finishing": list(
-                    qs.values("finishing_specs")
-                      .annotate(avg_price=Avg("unit_price"), count=Count("id"))
-                      .filter(finishing_specs__isnull=False)
-                      .order_by("-avg_price")
-                ),
-                "unit_type_distribution": list(
-                    qs.values("unit_type")
-                      .annotate(count=Count("id"))
-                      .filter(unit_type__isnull=False)
-                      .order_by("-count")
-                ),
-                "payment_analysis": list(
-                    qs.values("payment_yrs")
-                      .annotate(count=Count("id"), avg_down_payment=Avg("down_payment"))
-                      .filter(payment_yrs__isnull=False)
-                      .order_by("payment_yrs")
-                ),
-            }
-
-            monthly_data = list(
-                qs.filter(date_of_update__isnull=False)
-                  .extra(select={"month": "DATE_FORMAT(date_of_update, '%%Y-%%m')"})
-                  .values("month")
-                  .annotate(count=Count("id"), avg_price=Avg("unit_price"))
-                  .order_by("month")
+            cells = MarketResearchCubeService.cells(filters)
+            if cells is not None:
+                payload = MarketResearchCubeService.charts(cells)
+            else:
+                payload = MarketResearchService._live_chart_groups(qs)
+
+            # scatter points are individual units, not aggregates
+            payload["price_vs_bua"] = list(
+                qs.filter(
+                    unit_price__isnull=False,
+                    bua__isnull=False,
+                    bua__gt=0,
+                    unit_price__gt=0
+                ).values("unit_price", "bua", "asset_type", "project_name")[:500]
             )
-            payload["monthly_trends"] = monthly_data[-12:] if len(monthly_data) > 12 else monthly_data
 
             return MarketResearchService._ok(payload)
         except Exception as e:
             return MarketResearchService._fail(500, str(e), traceback.format_exc())
 
+    @staticmethod
+    def _live_chart_groups(qs: QuerySet) -> Dict[str, Any]:
+        payload = {
+            "price_by_asset": list(
+                qs.values("asset_type")
+                  .annotate(avg_price=Avg("unit_price"), count=Count("id"))
+                  .filter(asset_type__isnull=False)
+                  .order_by("-avg_price")
+            ),
+            "units_by_developer": list(
+                qs.values("developer_name")
+                  .annotate(count=Count("id"), avg_price=Avg("unit_price"))
+                  .filter(developer_name__isnull=False)
+                  .order_by("-count")[:10]
+            ),
+            "units_by_location": list(
+                qs.values("location")
+                  .annotate(count=Count("id"), avg_price=Avg("unit_price"))
+                  .filter(location__isnull=False)
+                  .order_by("-count")[:15]
+            ),
+            "price_by_finishing": list(
+                qs.values("finishing_specs")
+                  .annotate(avg_price=Avg("unit_price"), count=Count("id"))
+                  .filter(finishing_specs__isnull=False)
+                  .order_by("-avg_price")
+            ),
+            "unit_type_distribution": list(
+                qs.values("unit_type")
+                  .annotate(count=Count("id"))
+                  .filter(unit_type__isnull=False)
+                  .order_by("-count")
+            ),
+            "payment_analysis": list(
+                qs.values("payment_yrs")
+                  .annotate(count=Count("id"), avg_down_payment=Avg("down_payment"))
+                  .filter(payment_yrs__isnull=False)
+                  .order_by("payment_yrs")
+            ),
+        }
+
+        # TruncMonth instead of the MySQL-only DATE_FORMAT extra()
+        monthly_data = [
+            {"month": row["month"].strftime("%Y-%m"), "count": row["count"], "avg_price": row["avg_price"]}
+            for row in qs.filter(date_of_update__isnull=False)
+                         .annotate(month=TruncMonth("date_of_update"))
+                         .values("month")
+                         .annotate(count=Count("id"), avg_price=Avg("unit_price"))
+                         .order_by("month")
+        ]
+        payload["monthly_trends"] = monthly_data[-12:] if len(monthly_data) > 12 else monthly_data
+        return payload
+
     # ---------------------------------------------------------
     # 9) Dashboard Filter Data API
     # ---------------------------------------------------------
@@ -435,39 +464,26 @@ class MarketResearchService:
     def dashboard_filter_data(*, request) -> ServiceResult:
         try:
             filters = get_filters_from_request(request)
-            qs = apply_filters(MarketUnitData.objects.all(), filters)
 
-            price_range = qs.aggregate(min_price=Min("unit_price"), max_price=Max("unit_price"))
-            bua_range = qs.aggregate(min_bua=Min("bua"), max_bua=Max("bua"))
+            cells = MarketResearchCubeService.cells(filters)
+            if cells is not None:
+                options = MarketResearchCubeService.filter_data(cells)
+            else:
+                options = MarketResearchService._live_filter_options(apply_filters(MarketUnitData.objects.all(), filters))
 
             payload = {
-                "developers": list(
-                    qs.values("developer_name").annotate(count=Count("id"))
-                      .filter(developer_name__isnull=False).order_by("developer_name")
-                ),
-                "locations": list(
-                    qs.values("location").annotate(count=Count("id"))
-                      .filter(location__isnull=False).order_by("location")
-                ),
-                "asset_types": list(
-                    qs.values("asset_type").annotate(count=Count("id"))
-                      .filter(asset_type__isnull=False).order_by("asset_type")
-                ),
-                "unit_types": list(
-                    qs.values("unit_type").annotate(count=Count("id"))
-                      .filter(unit_type__isnull=False).order_by("unit_type")
-                ),
-                "finishing_specs": list(
-                    qs.values("finishing_specs").annotate(count=Count("id"))
-                      .filter(finishing_specs__isnull=False).order_by("finishing_specs")
-                ),
+                "developers": options["developers"],
+                "locations": options["locations"],
+                "asset_types": options["asset_types"],
+                "unit_types": options["unit_types"],
+                "finishing_specs": options["finishing_specs"],
                 "price_range": {
-                    "min": price_range["min_price"] or 0,
-                    "max": price_range["max_price"] or 10000000000,
+                    "min": options["min_price"] or 0,
+                    "max": options["max_price"] or 10000000000,
                 },
                 "bua_range": {
-                    "min": bua_range["min_bua"] or 0,
-                    "max": bua_range["max_bua"] or 10000,
+                    "min": options["min_bua"] or 0,
+                    "max": options["max_bua"] or 10000,
                 },
             }
 
@@ -475,6 +491,24 @@ class MarketResearchService:
         except Exception as e:
             return MarketResearchService._fail(500, str(e), traceback.format_exc())
 
+    @staticmethod
+    def _live_filter_options(qs: QuerySet) -> Dict[str, Any]:
+        options = qs.aggregate(
+            min_price=Min("unit_price"), max_price=Max("unit_price"), min_bua=Min("bua"), max_bua=Max("bua")
+        )
+        for key, field in (
+            ("developers", "developer_name"),
+            ("locations", "location"),
+            ("asset_types", "asset_type"),
+            ("unit_types", "unit_type"),
+            ("finishing_specs", "finishing_specs"),
+        ):
+            options[key] = list(
+                qs.values(field).annotate(count=Count("id"))
+                  .filter(**{f"{field}__isnull": False}).order_by(field)
+            )
+        return options
+
     # ---------------------------------------------------------
     # 10) Dashboard Export API
     # ---------------------------------------------------------
@@ -8,8 +8,11 @@ from typing import Any, Dict, Optional, List, Tuple, Set
 
 from django.core.paginator import Paginator
 from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.utils import timezone
 
+from .market_research_cube_service import MarketResearchCubeService
 from ..models import (
     MarketUnitData,
     MarketProject,
@@ -19,6 +22,18 @@ from ..models import (
 )
 
 
+MARKET_IMPORT_BATCH_SIZE = 500
+# columns the CSV import writes (plus derived psm / months_from_update); payment_yrs is set per group
+MARKET_IMPORT_FIELDS = [
+    "project_name", "developer_name", "location", "asset_type", "unit_type", "finishing_specs",
+    "bua", "land_area", "garden", "unit_price", "psm",
+    "payment_yrs_raw", "down_payment", "delivery_percentage", "cash_discount",
+    "delivery_date", "maintenance", "phase",
+    "date_of_update", "source_of_info", "notes", "offering", "dp_percentage",
+    "updated_by", "months_from_update",
+]
+
+
 @dataclass
 class ServiceResult:
     success: bool
@@ -149,6 +164,10 @@ class MarketResearchUnitsManagmentService:
                     MarketResearchUnitsManagmentService._recompute_payment_yrs_group(unit.project_name, unit.unit_type)
                     group_updates = MarketResearchUnitsManagmentService._get_group_payment_yrs(unit.project_name, unit.unit_type)
 
+            # the post_save receiver refreshes the unit's project; a rename also changes the old one
+            if old_project != unit.project_name:
+                MarketResearchCubeService.schedule_refresh({old_project})
+
             return ServiceResult(
                 True,
                 200,
@@ -265,6 +284,7 @@ class MarketResearchUnitsManagmentService:
 
             deleted_count = MarketUnitData.objects.all().count()
             MarketUnitData.objects.all().delete()
+            MarketResearchCubeService.schedule_rebuild()
 
             return ServiceResult(True, 200, payload={"success": True, "deleted": deleted_count})
         except Exception as e:
@@ -304,7 +324,8 @@ class MarketResearchUnitsManagmentService:
         created = 0
         updated = 0
         skipped = 0
-        touched_groups: Set[Tuple[str, str]] = set()
+        parsed: List[Tuple[Tuple, Dict[str, Any], Optional[int]]] = []
+        fallback_projects: Dict[str, Optional[MarketProject]] = {}
 
         for raw_row in reader:
             row = MarketResearchUnitsManagmentService._canonicalize_row(raw_row)
@@ -320,8 +341,12 @@ class MarketResearchUnitsManagmentService:
 
             project_obj = project_map.get(project_key)
             if not project_obj and project_name_in:
-                # fallback db lookup (still normalized)
-                project_obj = MarketProject.objects.select_related("developer", "location").filter(name__iexact=project_name_in).first()
+                # fallback db lookup (still normalized); remembered so a name costs one query per import
+                if project_name_in not in fallback_projects:
+                    fallback_projects[project_name_in] = (
+                        MarketProject.objects.select_related("developer", "location").filter(name__iexact=project_name_in).first()
+                    )
+                project_obj = fallback_projects[project_name_in]
 
             # canonical project name (if found)
             project_name = project_obj.name if project_obj else project_name_in
@@ -346,88 +371,143 @@ class MarketResearchUnitsManagmentService:
             delivery_date = (row.get("delivery_date") or "").strip()
             payment_raw = payment_yrs_raw
 
-            existing = MarketUnitData.objects.filter(
-                project_name__iexact=project_name,
-                unit_type__iexact=unit_type,
-                bua=bua,
-                unit_price=unit_price,
-                down_payment=down_payment,
-                delivery_date=delivery_date,
-                payment_yrs_raw=payment_raw,
-            ).first()
-
-            if existing:
-                unit = existing
-                updated += 1
-            else:
-                unit = MarketUnitData()
-                created += 1
+            # ✅ read updated_by from CSV (no override) - fallback to current user if empty
+            csv_updated_by = MarketResearchUnitsManagmentService._normalize_text(row.get("updated_by"))
 
-            # Assign imported fields
-            unit.project_name = project_name
-            unit.developer_name = developer_name
-            unit.location = location_name
+            values = {
+                "project_name": project_name,
+                "developer_name": developer_name,
+                "location": location_name,
 
-            unit.asset_type = asset_type
-            unit.unit_type = unit_type
-            unit.finishing_specs = finishing_specs
+                "asset_type": asset_type,
+                "unit_type": unit_type,
+                "finishing_specs": finishing_specs,
 
-            unit.bua = bua
-            unit.land_area = MarketResearchUnitsManagmentService._parse_float(row.get("land_area"))
-            unit.garden = MarketResearchUnitsManagmentService._parse_float(row.get("garden"))
-            unit.unit_price = unit_price
+                "bua": bua,
+                "land_area": MarketResearchUnitsManagmentService._parse_float(row.get("land_area")),
+                "garden": MarketResearchUnitsManagmentService._parse_float(row.get("garden")),
+                "unit_price": unit_price,
 
-            unit.payment_yrs_raw = payment_raw
-            unit.down_payment = down_payment
-            unit.delivery_percentage = MarketResearchUnitsManagmentService._parse_float(row.get("delivery_percentage"))
-            unit.cash_discount = MarketResearchUnitsManagmentService._parse_float(row.get("cash_discount"))
+                "payment_yrs_raw": payment_raw,
+                "down_payment": down_payment,
+                "delivery_percentage": MarketResearchUnitsManagmentService._parse_float(row.get("delivery_percentage")),
+                "cash_discount": MarketResearchUnitsManagmentService._parse_float(row.get("cash_discount")),
 
-            unit.delivery_date = delivery_date
-            unit.maintenance = MarketResearchUnitsManagmentService._parse_float(row.get("maintenance"))
-            unit.phase = MarketResearchUnitsManagmentService._parse_float(row.get("phase"))
+                "delivery_date": delivery_date,
+                "maintenance": MarketResearchUnitsManagmentService._parse_float(row.get("maintenance")),
+                "phase": MarketResearchUnitsManagmentService._parse_float(row.get("phase")),
 
-            # ✅ read date_of_update from CSV
-            unit.date_of_update = MarketResearchUnitsManagmentService._parse_date(row.get("date_of_update"))
+                # ✅ read date_of_update from CSV
+                "date_of_update": MarketResearchUnitsManagmentService._parse_date(row.get("date_of_update")),
 
-            unit.source_of_info = row.get("source_of_info") or ""
-            unit.notes = row.get("notes") or ""
-            unit.offering = row.get("offering") or ""
-            unit.dp_percentage = row.get("dp_percentage") or ""
+                "source_of_info": row.get("source_of_info") or "",
+                "notes": row.get("notes") or "",
+                "offering": row.get("offering") or "",
+                "dp_percentage": row.get("dp_percentage") or "",
 
-            # ✅ read updated_by from CSV (no override) - fallback to current user if empty
-            csv_updated_by = MarketResearchUnitsManagmentService._normalize_text(row.get("updated_by"))
-            unit.updated_by = csv_updated_by if csv_updated_by else MarketResearchUnitsManagmentService._user_full_name(user)
+                "updated_by": csv_updated_by if csv_updated_by else MarketResearchUnitsManagmentService._user_full_name(user),
+            }
 
             # ✅ read months_from_update from CSV (no calc) - if provided
             csv_months = MarketResearchUnitsManagmentService._parse_int(row.get("months_from_update"))
+
+            key = MarketResearchUnitsManagmentService._upsert_key(values)
+            parsed.append((key, values, csv_months))
+
+        # One read of the candidate rows instead of one lookup per CSV row
+        index = MarketResearchUnitsManagmentService._load_upsert_index({key[0] for key, _, _ in parsed})
+
+        to_create: List[MarketUnitData] = []
+        to_update: Dict[int, MarketUnitData] = {}
+        touched_groups: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+        for key, values, csv_months in parsed:
+            unit = index.get(key)
+            if unit is not None:
+                updated += 1
+            else:
+                # later rows with the same key update this one, like the row-by-row upsert did
+                unit = MarketUnitData()
+                index[key] = unit
+                to_create.append(unit)
+                created += 1
+
+            for field_name, value in values.items():
+                setattr(unit, field_name, value)
             if csv_months is not None:
                 unit.months_from_update = csv_months
 
             # Recompute derived fields:
             # - PSM: yes
-            # - payment_yrs: yes (group-based)
+            # - payment_yrs: once per touched group, below
             # - months_from_update: ONLY if CSV didn't provide it
             MarketResearchUnitsManagmentService._recompute_row(
                 unit,
                 compute_psm=True,
-                compute_payment=True,
+                compute_payment=False,
                 compute_months=(csv_months is None),
             )
 
-            unit.save()
+            if unit.pk is not None:
+                to_update[unit.pk] = unit
 
             if unit.project_name and unit.unit_type:
-                touched_groups.add((unit.project_name, unit.unit_type))
+                touched_groups.setdefault(
+                    (unit.project_name.lower(), unit.unit_type.lower()), (unit.project_name, unit.unit_type)
+                )
+
+        MarketUnitData.objects.bulk_create(to_create, batch_size=MARKET_IMPORT_BATCH_SIZE)
+        MarketUnitData.objects.bulk_update(
+            list(to_update.values()), MARKET_IMPORT_FIELDS, batch_size=MARKET_IMPORT_BATCH_SIZE
+        )
 
         # recompute payment_yrs for touched groups
-        for project_name, unit_type in touched_groups:
+        for project_name, unit_type in touched_groups.values():
             MarketResearchUnitsManagmentService._recompute_payment_yrs_group(project_name, unit_type)
 
+        MarketResearchCubeService.schedule_refresh({values["project_name"] for _, values, _ in parsed})
+
         return ServiceResult(True, 200, payload={"success": True, "created": created, "updated": updated, "skipped": skipped})
 
     # ======================================================
     # INTERNALS
     # ======================================================
+    @staticmethod
+    def _upsert_key(values: Dict[str, Any]) -> Tuple:
+        """
+        Import upsert key: project_name / unit_type case-insensitive (iexact), the rest exact.
+        None stays distinct from "" (iexact=None is an IS NULL lookup).
+        """
+        def ci(v):
+            return v.lower() if isinstance(v, str) else v
+
+        return (
+            ci(values.get("project_name")),
+            ci(values.get("unit_type")),
+            values.get("bua"),
+            values.get("unit_price"),
+            values.get("down_payment"),
+            values.get("delivery_date"),
+            values.get("payment_yrs_raw"),
+        )
+
+    @staticmethod
+    def _load_upsert_index(project_keys: Set[Any]) -> Dict[Tuple, MarketUnitData]:
+        """ {upsert key: row} for the existing rows of the imported projects (lowest id wins, like .first()). """
+        names = [k for k in project_keys if k is not None]
+        qs = MarketUnitData.objects.annotate(_project_ci=Lower("project_name"))
+        if None in project_keys:
+            qs = qs.filter(Q(_project_ci__in=names) | Q(project_name__isnull=True))
+        else:
+            qs = qs.filter(_project_ci__in=names)
+
+        index: Dict[Tuple, MarketUnitData] = {}
+        for unit in qs.order_by("id").iterator(chunk_size=2000):
+            index.setdefault(
+                MarketResearchUnitsManagmentService._upsert_key(unit.__dict__), unit
+            )
+        return index
+
     @staticmethod
     def _user_full_name(user) -> str:
         if not user:
@@ -4,15 +4,43 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
 import re
 from datetime import datetime, date
 from decimal import Decimal
 
 from django.utils import timezone
 from django.db import models, transaction
+from django.db.models import Count, Max, Min, Q, Sum
 from django.contrib.auth import get_user_model
 
 from ToP.models import Company, Unit, PivotUnitsSnapshot
+from ToP.services.unit_snapshot_service import UnitSnapshotService
+from ToP.utils.unit_snapshot_utils import dictionary_column, encode_columns, plain_column
+
+
+PIVOT_AGGREGATES = ("count", "dcount", "sum", "avg", "min", "max")
+PIVOT_NUMERIC_AGGREGATES = ("sum", "avg", "min", "max")
+PIVOT_BLANK = "(blank)"
+PIVOT_ALL = "(all)"
+PIVOT_KEY_SEPARATOR = " | "
+PIVOT_HIDDEN_FIELDS = ("source_hash",)   # sync bookkeeping, not unit data
+
+
+@dataclass
+class PivotSpec:
+    rows: List[str]
+    cols: List[str]
+    measures: List[Tuple[str, str]]        # (field, agg)
+    filters: Dict[str, List[str]]          # field -> allowed value labels ([] = nothing passes)
+
+    def cache_kind(self) -> str:
+        canonical = json.dumps(
+            [self.rows, self.cols, self.measures, sorted((f, sorted(v)) for f, v in self.filters.items())],
+            separators=(",", ":"),
+        )
+        return "pivot:agg:" + hashlib.sha1(canonical.encode("utf-8")).hexdigest()
 
 
 @dataclass
@@ -28,6 +56,7 @@ class PivotUnitsService:
     """
     Provides:
     - Data endpoint for the Pivot Builder (units + fields meta).
+    - Server-side pivot: grouped SQL over Unit, only the aggregated cells are returned.
     - Save/overwrite pivot snapshot (HTML) for managers to DB.
     - Load that snapshot for manager view (AJAX).
     """
@@ -103,9 +132,7 @@ class PivotUnitsService:
     @staticmethod
     def build_fields_meta() -> List[Dict[str, Any]]:
         fields_meta: List[Dict[str, Any]] = []
-        for f in Unit._meta.fields:
-            if getattr(f, "is_relation", False):
-                continue
+        for f in PivotUnitsService._pivot_fields().values():
             fields_meta.append(
                 {"name": f.name, "label": PivotUnitsService._field_label(f), "type": PivotUnitsService._field_type(f)}
             )
@@ -115,7 +142,7 @@ class PivotUnitsService:
     @staticmethod
     def serialize_units(units_qs) -> List[Dict[str, Any]]:
         out: List[Dict[str, Any]] = []
-        unit_fields = [f for f in Unit._meta.fields if not getattr(f, "is_relation", False)]
+        unit_fields = list(PivotUnitsService._pivot_fields().values())
 
         for u in units_qs:
             row: Dict[str, Any] = {}
@@ -144,17 +171,279 @@ class PivotUnitsService:
         if not allowed:
             return ServiceResult(success=False, status=403, error=err)
 
-        qs = Unit.objects.filter(company_id=company.id)
-        units = PivotUnitsService.serialize_units(qs)
+        payload = PivotUnitsService.build_rows_payload(company)
+        return ServiceResult(success=True, status=200, payload=payload)
+
+    # ---------------------------------------------------------------------
+    # Pivot data, columnar (cached per inventory version, ETag / gzip)
+    # ---------------------------------------------------------------------
+    @staticmethod
+    def build_columnar_payload(company: Company) -> Dict[str, Any]:
+        unit_fields = list(PivotUnitsService._pivot_fields().values())
+        names = [f.name for f in unit_fields]
+        encoders = {
+            f.name: plain_column if PivotUnitsService._field_type(f) == "number" else dictionary_column
+            for f in unit_fields
+        }
+
+        rows = list(Unit.objects.filter(company_id=company.id).values_list(*names))
+        return {
+            "success": True,
+            "format": "columnar",
+            "company": {"id": company.id, "name": company.name},
+            "count": len(rows),
+            "fields": PivotUnitsService.build_fields_meta(),
+            "columns": encode_columns(names, rows, encoders),
+        }
 
-        payload = {
+    @staticmethod
+    def build_rows_payload(company: Company) -> Dict[str, Any]:
+        units = PivotUnitsService.serialize_units(Unit.objects.filter(company_id=company.id))
+        return {
             "success": True,
             "company": {"id": company.id, "name": company.name},
             "count": len(units),
             "fields": PivotUnitsService.build_fields_meta(),
             "units": units,
         }
-        return ServiceResult(success=True, status=200, payload=payload)
+
+    @staticmethod
+    def get_pivot_units_snapshot(*, user, company_id: int, fmt: str = "columnar") -> ServiceResult:
+        """
+        payload["snapshot"]: EncodedSnapshot for snapshot_response().
+        fmt: "columnar" / "rows" (every unit) or "meta" (fields + unit count, for the server-side pivot).
+        """
+        allowed, company, err = PivotUnitsService.ensure_company_access(user=user, company_id=company_id)
+        if not allowed:
+            return ServiceResult(success=False, status=403, error=err)
+
+        if fmt == "meta":
+            snapshot = UnitSnapshotService.get(
+                company.id, "pivot:meta", lambda: PivotUnitsService.build_meta_payload(company)
+            )
+        elif fmt == "columnar":
+            snapshot = UnitSnapshotService.get(
+                company.id, "pivot", lambda: PivotUnitsService.build_columnar_payload(company)
+            )
+        else:
+            snapshot = UnitSnapshotService.get(
+                company.id, "pivot:rows", lambda: PivotUnitsService.build_rows_payload(company)
+            )
+        return ServiceResult(success=True, status=200, payload={"snapshot": snapshot})
+
+    @staticmethod
+    def build_meta_payload(company: Company) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "format": "meta",
+            "company": {"id": company.id, "name": company.name},
+            "count": Unit.objects.filter(company_id=company.id).count(),
+            "fields": PivotUnitsService.build_fields_meta(),
+        }
+
+    # ---------------------------------------------------------------------
+    # Server-side pivot (grouped SQL, cached per inventory version)
+    # ---------------------------------------------------------------------
+    @staticmethod
+    def _pivot_fields() -> Dict[str, models.Field]:
+        return {
+            f.name: f for f in Unit._meta.fields
+            if not getattr(f, "is_relation", False) and f.name not in PIVOT_HIDDEN_FIELDS
+        }
+
+    @staticmethod
+    def pivot_label(value: Any) -> str:
+        """ Group label of a raw value, as the builder shows it (Decimal -> JS number text, None / "" -> (blank)). """
+        if value is None or value == "":
+            return PIVOT_BLANK
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (Decimal, float)):
+            value = float(value)
+            if value.is_integer() and abs(value) < 1e21:
+                return str(int(value))
+            return repr(value)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def parse_pivot_spec(data: Dict[str, Any]) -> PivotSpec:
+        fields = PivotUnitsService._pivot_fields()
+
+        def _field(name) -> str:
+            if name not in fields:
+                raise ValueError(f"Unknown pivot field: {name}")
+            return name
+
+        measures = []
+        for m in data.get("measures") or []:
+            field, agg = _field(m.get("field")), m.get("agg")
+            if agg not in PIVOT_AGGREGATES:
+                raise ValueError(f"Unknown aggregate: {agg}")
+            if agg in PIVOT_NUMERIC_AGGREGATES and PivotUnitsService._field_type(fields[field]) != "number":
+                raise ValueError(f"{agg} needs a numeric field ({field}).")
+            measures.append((field, agg))
+        if not measures:
+            raise ValueError("At least one measure is required.")
+
+        return PivotSpec(
+            rows=[_field(f) for f in data.get("rows") or []],
+            cols=[_field(f) for f in data.get("cols") or []],
+            measures=measures,
+            filters={_field(f): [str(v) for v in values] for f, values in (data.get("filters") or {}).items()},
+        )
+
+    @staticmethod
+    def _measure_aggregates(spec: PivotSpec) -> Dict[str, Any]:
+        fields = PivotUnitsService._pivot_fields()
+        aggregates: Dict[str, Any] = {"_units": Count("pk")}
+        for field, agg in spec.measures:
+            if agg == "dcount":
+                continue  # distinct values come from grouping by the field itself
+            if isinstance(fields[field], (models.CharField, models.TextField)):
+                # blank strings are not counted, like NULLs
+                aggregates[f"n__{field}"] = Count(field, filter=~Q(**{field: ""}))
+            else:
+                aggregates[f"n__{field}"] = Count(field)
+            if agg in PIVOT_NUMERIC_AGGREGATES:
+                aggregates[f"s__{field}"] = Sum(field)
+                aggregates[f"lo__{field}"] = Min(field)
+                aggregates[f"hi__{field}"] = Max(field)
+        return aggregates
+
+    @staticmethod
+    def _merge_group(states: List[Dict[str, Any]], spec: PivotSpec, group: Dict[str, Any], labels: Dict[str, str]) -> None:
+        for state, (field, agg) in zip(states, spec.measures):
+            if agg == "dcount":
+                if labels[field] != PIVOT_BLANK:
+                    state["distinct"].add(labels[field])
+                continue
+
+            n = group[f"n__{field}"] or 0
+            if agg == "count" or not n:
+                state["count"] += n
+                continue
+
+            lo, hi = float(group[f"lo__{field}"]), float(group[f"hi__{field}"])
+            state["count"] += n
+            state["sum"] += float(group[f"s__{field}"])
+            state["min"] = lo if state["min"] is None else min(state["min"], lo)
+            state["max"] = hi if state["max"] is None else max(state["max"], hi)
+
+    @staticmethod
+    def _state_values(states: List[Dict[str, Any]], spec: PivotSpec) -> List[Any]:
+        out = []
+        for state, (_, agg) in zip(states, spec.measures):
+            if agg == "count":
+                out.append(state["count"])
+            elif agg == "dcount":
+                out.append(len(state["distinct"]))
+            elif agg == "sum":
+                out.append(state["sum"])
+            elif agg == "avg":
+                out.append(state["sum"] / state["count"] if state["count"] else None)
+            else:
+                out.append(state[agg])
+        return out
+
+    @staticmethod
+    def build_aggregate_payload(company: Company, spec: PivotSpec) -> Dict[str, Any]:
+        """
+        One GROUP BY over the row / column / filter fields (plus distinct-count fields),
+        then filter and roll up the groups in memory into cells, row / column totals and
+        the grand total. Groups are keyed by their labels, so values the builder shows
+        alike (NULL and "", 1.50 and 1.5) land in the same cell.
+        """
+        dcount_fields = [field for field, agg in spec.measures if agg == "dcount"]
+        dims = list(dict.fromkeys([*spec.rows, *spec.cols, *spec.filters, *dcount_fields]))
+        aggregates = PivotUnitsService._measure_aggregates(spec)
+
+        qs = Unit.objects.filter(company_id=company.id).order_by()
+        groups = qs.values(*dims).annotate(**aggregates) if dims else [qs.aggregate(**aggregates)]
+
+        allowed = {field: set(values) for field, values in spec.filters.items()}
+
+        def new_states():
+            return [{"count": 0, "sum": 0.0, "min": None, "max": None, "distinct": set()} for _ in spec.measures]
+
+        cells: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        row_totals: Dict[str, List[Dict[str, Any]]] = {}
+        col_totals: Dict[str, List[Dict[str, Any]]] = {}
+        grand = new_states()
+        units = 0
+
+        for group in groups:
+            if not group["_units"]:
+                continue
+            labels = {field: PivotUnitsService.pivot_label(group[field]) for field in dims}
+            if any(labels[field] not in values for field, values in allowed.items()):
+                continue
+
+            rk = PIVOT_KEY_SEPARATOR.join(labels[f] for f in spec.rows) if spec.rows else PIVOT_ALL
+            ck = PIVOT_KEY_SEPARATOR.join(labels[f] for f in spec.cols) if spec.cols else PIVOT_ALL
+            units += group["_units"]
+
+            for states in (
+                cells.setdefault((rk, ck), new_states()),
+                row_totals.setdefault(rk, new_states()),
+                col_totals.setdefault(ck, new_states()),
+                grand,
+            ):
+                PivotUnitsService._merge_group(states, spec, group, labels)
+
+        values = PivotUnitsService._state_values
+        return {
+            "success": True,
+            "format": "pivot",
+            "company": {"id": company.id, "name": company.name},
+            "units": units,
+            "measures": [{"field": field, "agg": agg} for field, agg in spec.measures],
+            "cells": [[rk, ck, values(states, spec)] for (rk, ck), states in cells.items()],
+            "row_totals": [[rk, values(states, spec)] for rk, states in row_totals.items()],
+            "col_totals": [[ck, values(states, spec)] for ck, states in col_totals.items()] if spec.cols else [],
+            "grand": values(grand, spec),
+        }
+
+    @staticmethod
+    def build_field_values_payload(company: Company, field: str) -> Dict[str, Any]:
+        raw = Unit.objects.filter(company_id=company.id).order_by().values_list(field, flat=True).distinct()
+        return {
+            "success": True,
+            "field": field,
+            "values": sorted({PivotUnitsService.pivot_label(v) for v in raw}),
+        }
+
+    @staticmethod
+    def get_pivot_aggregate(*, user, company_id: int, data: Dict[str, Any]) -> ServiceResult:
+        """ payload["snapshot"]: the aggregated pivot for this spec, cached until the inventory changes. """
+        allowed, company, err = PivotUnitsService.ensure_company_access(user=user, company_id=company_id)
+        if not allowed:
+            return ServiceResult(success=False, status=403, error=err)
+
+        try:
+            spec = PivotUnitsService.parse_pivot_spec(data)
+        except (ValueError, AttributeError, TypeError) as e:
+            return ServiceResult(success=False, status=400, error=str(e) or "Invalid pivot request.")
+
+        snapshot = UnitSnapshotService.get(
+            company.id, spec.cache_kind(), lambda: PivotUnitsService.build_aggregate_payload(company, spec)
+        )
+        return ServiceResult(success=True, status=200, payload={"snapshot": snapshot})
+
+    @staticmethod
+    def get_pivot_field_values(*, user, company_id: int, field: str) -> ServiceResult:
+        """ Distinct labels of one field (filter lists), cached like the pivot itself. """
+        allowed, company, err = PivotUnitsService.ensure_company_access(user=user, company_id=company_id)
+        if not allowed:
+            return ServiceResult(success=False, status=403, error=err)
+        if field not in PivotUnitsService._pivot_fields():
+            return ServiceResult(success=False, status=400, error=f"Unknown pivot field: {field}")
+
+        snapshot = UnitSnapshotService.get(
+            company.id, f"pivot:values:{field}", lambda: PivotUnitsService.build_field_values_payload(company, field)
+        )
+        return ServiceResult(success=True, status=200, payload={"snapshot": snapshot})
 
     # ---------------------------------------------------------------------
     # Snapshot storage ("Send Managers") -> DB (overwrite)
@@ -0,0 +1,378 @@
+# ToP/services/pricing_snapshot_service.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import (
+    ProjectPricingVersion,
+    ProjectConfiguration,
+    Constraints,
+    ProjectWebConfiguration,
+    BaseNPV,
+    ProjectExtendedPayments,
+    ProjectExtendedPaymentsSpecialOffer,
+    GasPolicy,
+    GasPolicyFees,
+    GasPolicyOffsets,
+    MaintenancePolicy,
+    MaintenancePolicyOffsets,
+    MaintenancePolicyScheduling,
+)
+
+
+# Snapshots are keyed by the DB version, so a per-process cache (LocMem) never
+# serves a stale one; the timeout only bounds memory held by old versions.
+SNAPSHOT_CACHE_TIMEOUT = 60 * 10
+
+# Every model whose save/delete must invalidate the project's snapshot.
+PRICING_SNAPSHOT_MODELS = (
+    ProjectConfiguration,
+    Constraints,
+    ProjectWebConfiguration,
+    BaseNPV,
+    ProjectExtendedPayments,
+    ProjectExtendedPaymentsSpecialOffer,
+    GasPolicy,
+    GasPolicyFees,
+    GasPolicyOffsets,
+    MaintenancePolicy,
+    MaintenancePolicyOffsets,
+    MaintenancePolicyScheduling,
+)
+
+
+# -----------------------------
+# Immutable snapshot containers
+# -----------------------------
+# Field names mirror the models so the calculation code reads them unchanged.
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    id: int
+    project_id: int
+    interest_rate: Any
+    default_scheme: str
+    base_dp: Any
+    base_tenor_years: Optional[int]
+    max_tenor_years: Optional[int]
+    base_payment_frequency: str
+    use_static_base_npv: bool
+
+
+@dataclass(frozen=True)
+class ConstraintsSnapshot:
+    dp_min: Any
+    max_discount: Any
+    max_exception_discount: Any
+
+
+@dataclass(frozen=True)
+class WebConfigSnapshot:
+    show_maintenance: bool
+    show_gas: bool
+    show_payment_scheme: bool
+    show_additional_discount: bool
+    additional_discount: Any
+    dp_for_additional_discount: Optional[int]
+    real_discount: bool
+
+
+@dataclass(frozen=True)
+class ExtendedPlanSnapshot:
+    year: int
+    scheme: Optional[str]
+    dp1: Optional[float]
+    dp2: Optional[float]
+    cumulative_dp1: Optional[float]
+    cumulative_dp2: Optional[float]
+    disable_additional_discount: bool
+    constant_discount: Optional[float]
+    values: Tuple[float, ...]
+    cumulatives: Tuple[float, ...]
+
+    def payment_rows(self):
+        return list(self.values), list(self.cumulatives)
+
+
+@dataclass(frozen=True)
+class GasPolicySnapshot:
+    is_applied: bool
+    gas_num_pmts: Optional[int]
+    scheduling: Optional[str]
+    fees: Tuple[Tuple[float, float], ...]
+    offsets: Tuple[Tuple[float, float], ...]
+
+
+@dataclass(frozen=True)
+class MaintenancePolicySnapshot:
+    is_applied: bool
+    maintenance_num_pmts: int
+    split_two_one_on_delivery: bool
+    schedulings: Tuple[Tuple[float, str], ...]
+    offsets: Tuple[Tuple[float, float], ...]
+
+
+@dataclass(frozen=True)
+class ProjectPricingSnapshot:
+    project_id: int
+    version: int
+    project_config: ConfigSnapshot
+    project_constraints: Optional[ConstraintsSnapshot]
+    project_web_config: Optional[WebConfigSnapshot]
+    base_npvs: Tuple[Tuple[float, Any], ...]
+    extended_payments: Tuple[ExtendedPlanSnapshot, ...]
+    special_offers: Tuple[ExtendedPlanSnapshot, ...]
+    gas_policy: Optional[GasPolicySnapshot]
+    maintenance_policy: Optional[MaintenancePolicySnapshot]
+
+    def extended_plan(self, year, scheme) -> Optional[ExtendedPlanSnapshot]:
+        for plan in self.extended_payments:
+            if plan.year == year and plan.scheme == scheme:
+                return plan
+        return None
+
+    def special_offer_plan(self, year) -> Optional[ExtendedPlanSnapshot]:
+        for plan in self.special_offers:
+            if plan.year == year:
+                return plan
+        return None
+
+
+class ProjectPricingSnapshotService:
+    """
+    Per-project, versioned pricing configuration cached in Django's cache.
+
+    - current_version(): counter in the database (ProjectPricingVersion), read per
+      lookup, so a bump in one worker is seen by all of them.
+    - get()/get_for_config(): one indexed version read plus a cache read on the hot path.
+    - invalidate(): bumps the project's version (called from ToP.signals on
+      save/delete of any model in PRICING_SNAPSHOT_MODELS).
+    """
+
+    # -------------------------
+    # Cache keys
+    # -------------------------
+    @staticmethod
+    def _snapshot_key(project_id, version) -> str:
+        return f"pricing_snapshot:{project_id}:{version}"
+
+    @staticmethod
+    def _config_alias_key(project_config_id) -> str:
+        return f"pricing_snapshot:config:{project_config_id}"
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    @staticmethod
+    def current_version(project_id) -> int:
+        version = (
+            ProjectPricingVersion.objects.filter(project_id=project_id)
+            .values_list("version", flat=True)
+            .first()
+        )
+        return version or 0
+
+    @staticmethod
+    def get(project_id) -> Optional[ProjectPricingSnapshot]:
+        if not project_id:
+            return None
+
+        version = ProjectPricingSnapshotService.current_version(project_id)
+        key = ProjectPricingSnapshotService._snapshot_key(project_id, version)
+
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = ProjectPricingSnapshotService.build(project_id, version)
+            if snapshot is not None:
+                cache.set(key, snapshot, SNAPSHOT_CACHE_TIMEOUT)
+        return snapshot
+
+    @staticmethod
+    def project_id_for_config(project_config_id) -> Optional[int]:
+        alias_key = ProjectPricingSnapshotService._config_alias_key(project_config_id)
+        project_id = cache.get(alias_key)
+        if project_id is None:
+            project_id = (
+                ProjectConfiguration.objects.filter(id=project_config_id)
+                .values_list("project_id", flat=True)
+                .first()
+            )
+            if project_id is not None:
+                cache.set(alias_key, project_id, None)
+        return project_id
+
+    @staticmethod
+    def get_for_config(project_config_id) -> Optional[ProjectPricingSnapshot]:
+        project_id = ProjectPricingSnapshotService.project_id_for_config(project_config_id)
+        return ProjectPricingSnapshotService.get(project_id)
+
+    @staticmethod
+    def invalidate(project_id) -> None:
+        if not project_id:
+            return
+        # in the writing transaction: the new version becomes visible together with the rows
+        rows = ProjectPricingVersion.objects.filter(project_id=project_id).update(version=F("version") + 1)
+        if rows:
+            return
+        try:
+            with transaction.atomic():
+                ProjectPricingVersion.objects.create(project_id=project_id, version=1)
+        except IntegrityError:
+            # created concurrently
+            ProjectPricingVersion.objects.filter(project_id=project_id).update(version=F("version") + 1)
+
+    @staticmethod
+    def forget_config(project_config_id) -> None:
+        cache.delete(ProjectPricingSnapshotService._config_alias_key(project_config_id))
+
+    @staticmethod
+    def project_id_for(instance) -> Optional[int]:
+        """ Resolve the owning project id of any PRICING_SNAPSHOT_MODELS instance. """
+        try:
+            if hasattr(instance, "project_id"):
+                return instance.project_id
+            if hasattr(instance, "project_config_id"):
+                return (
+                    ProjectConfiguration.objects.filter(id=instance.project_config_id)
+                    .values_list("project_id", flat=True)
+                    .first()
+                )
+            if hasattr(instance, "gas_policy_id"):
+                return (
+                    GasPolicy.objects.filter(id=instance.gas_policy_id)
+                    .values_list("project_config__project_id", flat=True)
+                    .first()
+                )
+            if hasattr(instance, "maintenance_policy_id"):
+                return (
+                    MaintenancePolicy.objects.filter(id=instance.maintenance_policy_id)
+                    .values_list("project_config__project_id", flat=True)
+                    .first()
+                )
+        except Exception:
+            # parent already gone in a cascade; its own signal invalidates the project
+            return None
+        return None
+
+    # -------------------------
+    # Loading
+    # -------------------------
+    @staticmethod
+    def build(project_id, version) -> Optional[ProjectPricingSnapshot]:
+        config = (
+            ProjectConfiguration.objects
+            .select_related("constraints", "gaspolicy", "maintenancepolicy", "project__projectwebconfiguration")
+            .filter(project_id=project_id)
+            .first()
+        )
+        if config is None:
+            return None
+
+        # missing reverse one-to-ones raise RelatedObjectDoesNotExist (an AttributeError)
+        constraints = getattr(config, "constraints", None)
+        web_config = getattr(config.project, "projectwebconfiguration", None)
+        gas_policy = getattr(config, "gaspolicy", None)
+        maintenance_policy = getattr(config, "maintenancepolicy", None)
+
+        base_npvs = tuple(
+            (float(npv.term_period), npv.npv_value)
+            for npv in BaseNPV.objects.filter(project_config=config).order_by("id")
+        )
+
+        extended_payments = tuple(
+            ProjectPricingSnapshotService._plan_snapshot(plan)
+            for plan in ProjectExtendedPayments.objects.filter(project_id=project_id).order_by("id")
+        )
+        special_offers = tuple(
+            ProjectPricingSnapshotService._plan_snapshot(plan)
+            for plan in ProjectExtendedPaymentsSpecialOffer.objects.filter(project_id=project_id).order_by("id")
+        )
+
+        gas_snapshot = None
+        if gas_policy is not None:
+            gas_snapshot = GasPolicySnapshot(
+                is_applied=gas_policy.is_applied,
+                gas_num_pmts=gas_policy.gas_num_pmts,
+                scheduling=gas_policy.scheduling,
+                fees=tuple(
+                    (float(str(f.term_period)), float(f.fee_amount))
+                    for f in GasPolicyFees.objects.filter(gas_policy=gas_policy).order_by("id")
+                ),
+                offsets=tuple(
+                    (float(str(o.term_period)), float(o.offset_value))
+                    for o in GasPolicyOffsets.objects.filter(gas_policy=gas_policy).order_by("id")
+                ),
+            )
+
+        maintenance_snapshot = None
+        if maintenance_policy is not None:
+            maintenance_snapshot = MaintenancePolicySnapshot(
+                is_applied=maintenance_policy.is_applied,
+                maintenance_num_pmts=maintenance_policy.maintenance_num_pmts,
+                split_two_one_on_delivery=maintenance_policy.split_two_one_on_delivery,
+                schedulings=tuple(
+                    (float(str(s.term_period)), str(s.scheduling))
+                    for s in MaintenancePolicyScheduling.objects.filter(maintenance_policy=maintenance_policy).order_by("id")
+                ),
+                offsets=tuple(
+                    (float(str(o.term_period)), float(o.offset_value))
+                    for o in MaintenancePolicyOffsets.objects.filter(maintenance_policy=maintenance_policy).order_by("id")
+                ),
+            )
+
+        return ProjectPricingSnapshot(
+            project_id=project_id,
+            version=version,
+            project_config=ConfigSnapshot(
+                id=config.id,
+                project_id=config.project_id,
+                interest_rate=config.interest_rate,
+                default_scheme=config.default_scheme,
+                base_dp=config.base_dp,
+                base_tenor_years=config.base_tenor_years,
+                max_tenor_years=config.max_tenor_years,
+                base_payment_frequency=config.base_payment_frequency,
+                use_static_base_npv=config.use_static_base_npv,
+            ),
+            project_constraints=ConstraintsSnapshot(
+                dp_min=constraints.dp_min,
+                max_discount=constraints.max_discount,
+                max_exception_discount=constraints.max_exception_discount,
+            ) if constraints is not None else None,
+            project_web_config=WebConfigSnapshot(
+                show_maintenance=web_config.show_maintenance,
+                show_gas=web_config.show_gas,
+                show_payment_scheme=web_config.show_payment_scheme,
+                show_additional_discount=web_config.show_additional_discount,
+                additional_discount=web_config.additional_discount,
+                dp_for_additional_discount=web_config.dp_for_additional_discount,
+                real_discount=web_config.real_discount,
+            ) if web_config is not None else None,
+            base_npvs=base_npvs,
+            extended_payments=extended_payments,
+            special_offers=special_offers,
+            gas_policy=gas_snapshot,
+            maintenance_policy=maintenance_snapshot,
+        )
+
+    @staticmethod
+    def _plan_snapshot(plan) -> ExtendedPlanSnapshot:
+        values, cumulatives = plan.payment_rows()
+        return ExtendedPlanSnapshot(
+            year=plan.year,
+            scheme=getattr(plan, "scheme", None),
+            dp1=plan.dp1,
+            dp2=plan.dp2,
+            cumulative_dp1=plan.cumulative_dp1,
+            cumulative_dp2=plan.cumulative_dp2,
+            disable_additional_discount=getattr(plan, "disable_additional_discount", False),
+            constant_discount=getattr(plan, "constant_discount", None),
+            values=tuple(values),
+            cumulatives=tuple(cumulatives),
+        )
@@ -6,7 +6,7 @@ import traceback
 from dataclasses import dataclass
 from typing import Any, Dict, Optional, List, Tuple
 
-from django.db.models import Min, Max
+from django.db.models import Min, Max, Q
 
 from ..models import (
     Company,
@@ -18,8 +18,9 @@ from ..models import (
 
 from ..utils.sales_performance_utils import (
     PREMIUM_FIELD_MAPPING,
-    build_status_counts,
     attach_percentages,
+    pop_status_counts,
+    status_count_aggregates,
 )
 
 from ..utils.viewer_permissions import is_company_viewer, viewer_company
@@ -42,6 +43,9 @@ class SalesPerformanceService:
     - price range breakdown API
     - unit model breakdown API
     - premium analysis API
+
+    Status histograms come from conditional aggregates (status_count_aggregates): one
+    query per chart whatever the number of price buckets, unit models or premium values.
     """
 
     # --------------------------
@@ -185,9 +189,7 @@ class SalesPerformanceService:
                 .exclude(interest_free_unit_price__isnull=True)
             )
 
-            if not units.exists():
-                return ServiceResult(True, 200, payload={"price_ranges": [], "totals": {}})
-
+            # no priced units => no min / max
             min_price, max_price = SalesPerformanceService._min_max_price(units)
 
             if min_price is None or max_price is None:
@@ -239,22 +241,19 @@ class SalesPerformanceService:
 
             units = Unit.objects.filter(company=project_company, project=project_name)
 
-            if not units.exists():
-                return ServiceResult(True, 200, payload={"unit_models": [], "totals": {}})
-
-            unit_models_data: List[Dict[str, Any]] = []
-            distinct_models = units.values_list("unit_model", flat=True).distinct()
+            # one GROUP BY unit_model (NULL / empty included) with every status count
+            rows = units.values("unit_model").annotate(**status_count_aggregates()).order_by()
 
-            for model in distinct_models:
-                model_units = units.filter(unit_model=model)
-                counts = build_status_counts(model_units)
+            unit_models_data: List[Dict[str, Any]] = [
+                {
+                    "unit_model": row["unit_model"],
+                    **pop_status_counts(row),
+                }
+                for row in rows
+            ]
 
-                unit_models_data.append(
-                    {
-                        "unit_model": model,
-                        **counts,
-                    }
-                )
+            if not unit_models_data:
+                return ServiceResult(True, 200, payload={"unit_models": [], "totals": {}})
 
             totals = SalesPerformanceService._sum_totals(unit_models_data)
             attach_percentages(unit_models_data, total_all=totals["all"])
@@ -307,37 +306,26 @@ class SalesPerformanceService:
 
             units = Unit.objects.filter(company=project_company, project=project_name)
 
-            if not units.exists():
+            # one GROUP BY over the premium field; the NULL / empty groups only tell "project has units"
+            rows = list(units.values(field_name).annotate(**status_count_aggregates()).order_by())
+
+            if not rows:
                 return ServiceResult(True, 200, payload={"premium_groups": [], "totals": {}})
 
-            distinct_values = (
-                units.exclude(**{f"{field_name}__isnull": True})
-                .exclude(**{field_name: ""})
-                .values_list(field_name, flat=True)
-                .distinct()
+            rows = [row for row in rows if row[field_name]]
+            premium_percents = SalesPerformanceService._get_premium_percents(
+                project=project,
+                premium_values=[row[field_name] for row in rows],
             )
 
-            premium_groups: List[Dict[str, Any]] = []
-
-            for value in distinct_values:
-                if not value:
-                    continue
-
-                premium_units = units.filter(**{field_name: value})
-                counts = build_status_counts(premium_units)
-
-                premium_percent = SalesPerformanceService._get_premium_percent(
-                    project=project,
-                    premium_value=value,
-                )
-
-                premium_groups.append(
-                    {
-                        "premium_value": value,
-                        **counts,
-                        "premium_percent": premium_percent,
-                    }
-                )
+            premium_groups: List[Dict[str, Any]] = [
+                {
+                    "premium_value": row[field_name],
+                    **pop_status_counts(row),
+                    "premium_percent": premium_percents.get(row[field_name].lower(), 0.0),
+                }
+                for row in rows
+            ]
 
             totals = SalesPerformanceService._sum_totals(premium_groups)
 
@@ -375,24 +363,31 @@ class SalesPerformanceService:
         for i in range(buckets):
             current_to = current_from + range_width if i < (buckets - 1) else max_price
 
-            range_units = units.filter(
-                interest_free_unit_price__gte=current_from,
-                interest_free_unit_price__lte=current_to,
-            )
-
-            counts = build_status_counts(range_units, price_mode=True)
-
             price_ranges.append(
                 {
                     "from": current_from,
                     "to": current_to,
-                    **counts,
                 }
             )
 
             # Preserve your exact next-range logic
             current_from = current_to + 1
 
+        # every range's status counts in a single aggregate query
+        aggregates: Dict[str, Any] = {}
+        for i, price_range in enumerate(price_ranges):
+            aggregates.update(status_count_aggregates(
+                prefix=f"r{i}_",
+                within=Q(
+                    interest_free_unit_price__gte=price_range["from"],
+                    interest_free_unit_price__lte=price_range["to"],
+                ),
+            ))
+        counts = units.aggregate(**aggregates)
+
+        for i, price_range in enumerate(price_ranges):
+            price_range.update(pop_status_counts(counts, prefix=f"r{i}_"))
+
         return price_ranges
 
     @staticmethod
@@ -405,8 +400,17 @@ class SalesPerformanceService:
         }
 
     @staticmethod
-    def _get_premium_percent(*, project, premium_value: str) -> float:
-        subgroup = PricingPremiumSubgroup.objects.filter(
-            name=premium_value, premium_group__project=project
-        ).first()
-        return float(subgroup.value) if subgroup else 0.0
+    def _get_premium_percents(*, project, premium_values: List[str]) -> Dict[str, float]:
+        """
+        {lowercased subgroup name: value}, first subgroup per name (one query). Keys are
+        lowercased because the per-value lookup matched names under the DB's collation.
+        """
+        percents: Dict[str, float] = {}
+        subgroups = (
+            PricingPremiumSubgroup.objects.filter(name__in=premium_values, premium_group__project=project)
+            .order_by("name", "id")
+            .values_list("name", "value")
+        )
+        for name, value in subgroups:
+            percents.setdefault(name.lower(), float(value))
+        return percents
@@ -6,18 +6,27 @@ from dataclasses import dataclass
 from typing import Any, Dict, Optional, List, Tuple
 
 from django.contrib.auth import get_user_model
+from django.db.models import Q, Sum
+from django.utils.timezone import localtime
 
 from ..models import (
     Company,
     Manager,
     Sales,
     Project,
+    SalesDailyRollup,
     SalesRequestAnalytical,
 )
+from ..utils.historical_sales_requests_analysis_utils import decode_report_cursor, encode_report_cursor
+from ..utils.sales_dashboard_utils import SalesDashboardFilters, local_day_range
 
 User = get_user_model()
 
 
+SALES_ROWS_PAGE_SIZE = 1000
+SALES_ROWS_MAX_PAGE_SIZE = 5000
+
+
 @dataclass
 class ServiceResult:
     success: bool
@@ -30,7 +39,8 @@ class SalesRequestAnalyticalService:
     """
     Service layer for Sales Dashboard & Analytical APIs.
     - No HttpRequest dependency.
-    - Views pass primitives (user, company_id).
+    - Views pass primitives (user, company_id) and parsed SalesDashboardFilters.
+    - KPIs / charts read the daily rollups; raw requests are only paged for the export.
     """
 
     # =========================================================
@@ -77,43 +87,155 @@ class SalesRequestAnalyticalService:
     # 2) Sales Data API
     # =========================================================
     @staticmethod
-    def get_sales_data(*, user) -> ServiceResult:
+    def _scoped_filters(*, user, filters: SalesDashboardFilters) -> Optional[SalesDashboardFilters]:
         """
-        Preserves behavior:
-        - Base queryset is SalesRequestAnalytical with sales_man select_related
-        - If Manager: filter by company (best-effort)
-        - Return values list
+        Manager -> company forced to Manager.company.
+        Returns None when no company applies (the dashboard shows nothing without one).
         """
-        queryset = SalesRequestAnalytical.objects.select_related("sales_man")
-
         if SalesRequestAnalyticalService._is_manager(user):
-            company = None
-            
             company = SalesRequestAnalyticalService._resolve_manager_company(user)
-            # if not company:
-            #     try:
-            #         cu = Sales.objects.select_related("company").get(user=user)
-            #         company = cu.company
-            #     except Sales.DoesNotExist:
-            #         company = None
-
-            if company:
-                queryset = queryset.filter(company=company)
-
-        data = list(
-            queryset.values(
-                "sales_man__full_name",
-                "sales_man_id",
-                "company_id",
-                "project_id",
-                "final_price",
-                "discount",
-                "is_approved",
-                "date",
+            filters.company_id = company.id if company else None
+        return filters if filters.company_id else None
+
+    @staticmethod
+    def get_sales_summary(*, user, filters: SalesDashboardFilters) -> ServiceResult:
+        """
+        KPIs, charts and salesman tables of the dashboard, summed from SalesDailyRollup:
+        O(days x salesmen) rows instead of every request.
+        - total_sales / approved_requests / avg_discount: approved requests only
+          (avg_discount averages the requests with a discount > 0, as a fraction)
+        - daily / monthly: approved final price per local day / month
+        - expired_requests: holds released by HoldExpiryService, kept out of unapproved_requests
+        - salesmen: per salesman request, approved, unapproved and expired counts + approved total
+        """
+        filters = SalesRequestAnalyticalService._scoped_filters(user=user, filters=filters)
+        if filters is None:
+            return ServiceResult(success=True, status=200, payload={"success": True, "summary": None})
+
+        qs = SalesDailyRollup.objects.filter(company_id=filters.company_id)
+        if filters.project_id:
+            qs = qs.filter(project_id=filters.project_id)
+        if filters.sales_man_id:
+            qs = qs.filter(sales_man_id=filters.sales_man_id)
+        if filters.start:
+            qs = qs.filter(day__gte=filters.start)
+        if filters.end:
+            qs = qs.filter(day__lte=filters.end)
+
+        approved = Q(outcome=SalesDailyRollup.Outcome.APPROVED)
+        expired = Q(outcome=SalesDailyRollup.Outcome.EXPIRED)
+
+        totals = qs.aggregate(
+            n_requests=Sum("requests"),
+            n_approved=Sum("requests", filter=approved),
+            n_expired=Sum("requests", filter=expired),
+            total_sales=Sum("final_price_sum", filter=approved),
+            discount_total=Sum("discount_sum", filter=approved),
+            n_discounted=Sum("discounted_requests", filter=approved),
+        )
+        requests = totals["n_requests"] or 0
+        approved_requests = totals["n_approved"] or 0
+        expired_requests = totals["n_expired"] or 0
+        discounted = totals["n_discounted"] or 0
+
+        daily = [
+            {"day": row["day"].isoformat(), "total": float(row["total"] or 0)}
+            for row in qs.filter(approved).values("day").annotate(total=Sum("final_price_sum")).order_by("day")
+        ]
+        monthly: Dict[str, float] = {}
+        for row in daily:
+            month = row["day"][:7]
+            monthly[month] = monthly.get(month, 0.0) + row["total"]
+
+        salesmen = [
+            {
+                "id": row["sales_man_id"],
+                "name": row["sales_man__full_name"],
+                "requests": row["n_requests"] or 0,
+                "approved": row["n_approved"] or 0,
+                "unapproved": (row["n_requests"] or 0) - (row["n_approved"] or 0) - (row["n_expired"] or 0),
+                "expired": row["n_expired"] or 0,
+                "approved_total": float(row["approved_total"] or 0),
+            }
+            for row in qs.values("sales_man_id", "sales_man__full_name")
+            .annotate(
+                n_requests=Sum("requests"),
+                n_approved=Sum("requests", filter=approved),
+                n_expired=Sum("requests", filter=expired),
+                approved_total=Sum("final_price_sum", filter=approved),
             )
+            .order_by("sales_man__full_name", "sales_man_id")
+        ]
+
+        return ServiceResult(
+            success=True,
+            status=200,
+            payload={
+                "success": True,
+                "summary": {
+                    "requests": requests,
+                    "approved_requests": approved_requests,
+                    "unapproved_requests": requests - approved_requests - expired_requests,
+                    "expired_requests": expired_requests,
+                    "total_sales": float(totals["total_sales"] or 0),
+                    "avg_discount": float(totals["discount_total"] / discounted) if discounted else None,
+                    "daily": daily,
+                    "monthly": [{"month": month, "total": total} for month, total in monthly.items()],
+                    "salesmen": salesmen,
+                },
+            },
+        )
+
+    @staticmethod
+    def get_sales_rows(
+        *, user, filters: SalesDashboardFilters, cursor: Optional[str] = None, limit: Optional[int] = None
+    ) -> ServiceResult:
+        """
+        Raw requests for the Excel export, keyset-paginated on (date, id), newest first:
+        pass payload["next_cursor"] back as `cursor` until it is None.
+        """
+        filters = SalesRequestAnalyticalService._scoped_filters(user=user, filters=filters)
+        if filters is None:
+            return ServiceResult(success=True, status=200, payload={"success": True, "rows": [], "next_cursor": None})
+
+        after = None
+        if cursor:
+            after = decode_report_cursor(cursor)
+            if after is None:
+                return ServiceResult(success=False, status=400, error="Invalid cursor")
+
+        limit = min(max(int(limit or SALES_ROWS_PAGE_SIZE), 1), SALES_ROWS_MAX_PAGE_SIZE)
+
+        qs = SalesRequestAnalytical.objects.filter(company_id=filters.company_id)
+        if filters.project_id:
+            qs = qs.filter(project_id=filters.project_id)
+        if filters.sales_man_id:
+            qs = qs.filter(sales_man_id=filters.sales_man_id)
+        lower, upper = local_day_range(filters.start, filters.end)
+        if lower:
+            qs = qs.filter(date__gte=lower)
+        if upper:
+            qs = qs.filter(date__lt=upper)
+        if after:
+            date, pk = after
+            qs = qs.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+
+        records = list(
+            qs.order_by("-date", "-id").values(
+                "id", "date", "sales_man__full_name", "final_price", "discount", "is_approved",
+            )[:limit + 1]
         )
+        has_more = len(records) > limit
+        records = records[:limit]
+        next_cursor = encode_report_cursor(records[-1]["date"], records[-1]["id"]) if has_more else None
+        for row in records:
+            row["date"] = localtime(row["date"])
 
-        return ServiceResult(success=True, status=200, payload={"all_sales": data})
+        return ServiceResult(
+            success=True,
+            status=200,
+            payload={"success": True, "rows": records, "next_cursor": next_cursor},
+        )
 
     # =========================================================
     # 3) Projects + Salesmen for Company
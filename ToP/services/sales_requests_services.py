@@ -1,14 +1,12 @@
 # ToP/services/sales_request_service.py
 
 import json
+import logging
 import traceback
-import threading
-import requests  # ✅ Added for direct API calls
 from copy import deepcopy
 from decimal import Decimal
 from datetime import datetime, timedelta
 from django.http import HttpResponse
-from xhtml2pdf import pisa
 
 from django.db.models import Count
 from django.shortcuts import get_object_or_404
@@ -28,7 +26,8 @@ from ..models import (
 )
 
 from django.template.loader import render_to_string
-from ..services.erp_hold_post_mapping_service import ERPHoldPostMappingService
+from ..services.job_queue_service import JobQueueService
+from ..services.job_tasks import sales_request_snapshot
 
 from ..utils.sales_pdf_utils import (
     build_sales_pdf_rows,
@@ -36,13 +35,9 @@ from ..utils.sales_pdf_utils import (
     get_unit_details,
 )
 
-from ..utils.google_sheets_utils import update_google_sheet_sales_data
+from ..utils.pdf_render_utils import html_to_pdf_bytes, pdf_content_key, pdf_render_pool
 
-from ..utils.notifications_utils import (
-    notify_salesman_with_cached_plan,
-    notify_company_managers_approval,
-    email_thread_target
-)
+logger = logging.getLogger(__name__)
 
 
 class SalesRequestManagementService:
@@ -159,43 +154,13 @@ class SalesRequestManagementService:
             # --- 2. ERP SYNC (If Connected) ---
             # Check comp_type for 'erp' and ensure URL exists
             if SalesRequestManagementService._is_module_active(company, "erp") and company.erp_hold_url:
-                headers = {}
-                try:
-                    if company.erp_hold_url_key:
-                        headers = {"Content-Type": "application/json"}
-                        headers["Authorization"] = f"Bearer {company.erp_hold_url}"
-                        
-                except Exception:
-                    pass
-    
                 try:
                     code_to_send = unit.unit_code if unit else ""
                     if code_to_send:
-                        # Internal payload (your code keys)
-                        payload = {"unit_code": code_to_send, "type": "unblock"}
-
-                        # ERP key -> internal key (e.g. "ced_name" -> "unit_code")
-                        external_to_internal = ERPHoldPostMappingService.get_mapping_dict(company=company)
-
-                        # Invert to internal -> ERP key
-                        internal_to_external = {v: k for k, v in (external_to_internal or {}).items()}
-
-                        # Build mapped ERP payload
-                        erp_payload = {
-                            internal_to_external.get(k, k): v
-                            for k, v in payload.items()
-                        }
-
-                        # Direct request (mapped)
-                        requests.post(
-                            company.erp_hold_url,
-                            json=erp_payload,
-                            headers=headers,
-                            timeout=15
-                        )
-                except Exception as e:
-                    print(f"Failed to unblock unit in ERP: {e}")
-                    pass
+                        # Queued: mapped {"unit_code", "type": "unblock"} payload, retried on ERP errors
+                        JobQueueService.enqueue("erp.unblock_units", {"company_id": company.id, "unit_codes": [code_to_send]})
+                except Exception:
+                    logger.exception("Failed to queue ERP unblock for company %s", company.id)
 
             # --- 3. ANALYTICAL RECORD ---
             if sales_request.is_approved is False:
@@ -542,27 +507,24 @@ class SalesRequestManagementService:
             cached_data["payment_type"] = filtered_labels
             cached_data["amount"] = [final_price * (p / 100) for p in filtered_payments]
 
-            # --- NOTIFICATIONS ---
+            # The request row is deleted below, so jobs carry a snapshot of it
+            snapshot = sales_request_snapshot(sales_request)
+
+            # --- NOTIFICATIONS (background job queue; both emails share one plan PDF render) ---
             try:
-                threading.Thread(
-                    target=email_thread_target,
-                    args=(notify_salesman_with_cached_plan, company, sales_request, cached_data),
-                ).start()
-
-                threading.Thread(
-                    target=email_thread_target,
-                    args=(notify_company_managers_approval, company, sales_request, cached_data),
-                ).start()
+                job_payload = {"snapshot": snapshot, "cached_data": cached_data}
+                JobQueueService.enqueue("notifications.approved_plan_salesman", job_payload)
+                JobQueueService.enqueue("notifications.approved_plan_managers", job_payload)
             except Exception:
                 traceback.print_exc()
 
-            # Google Sheet Update
+            # Google Sheet Update (queued; retried with backoff on Sheets errors)
             if SalesRequestManagementService._is_module_active(company, "google_sheets"):
                 try:
-                    update_google_sheet_sales_data(company, sales_request, cached_data)
+                    JobQueueService.enqueue("sheets.approval_writeback", {"snapshot": snapshot, "cached_data": cached_data})
                 except Exception as e:
                     if logger:
-                        logger.error(f"Failed to update Google Sheet: {str(e)}")
+                        logger.error(f"Failed to queue Google Sheet update: {str(e)}")
                     traceback.print_exc()
 
             # --- 1. LOCAL UPDATE: Update Unit Status ---
@@ -582,17 +544,9 @@ class SalesRequestManagementService:
                 unit.save()
 
             # --- 2. ERP SYNC (If Connected) ---
-            # Fix: Direct POST execution without relying on passed func
             if SalesRequestManagementService._is_module_active(company, "erp") and company.erp_approve_url:
-                headers = {"Content-Type": "application/json"}
                 try:
-                    if company.erp_approve_url_key:
-                        headers["Authorization"] = f"Bearer {company.erp_approve_url_key}"
-                except Exception:
-                    pass
-
-                try:
-                    requests.post(company.erp_approve_url, json=cached_data, headers=headers, timeout=30)
+                    JobQueueService.enqueue("erp.approve", {"company_id": company.id, "cached_data": cached_data})
                 except Exception as e:
                     print(f"ERP Post Error: {e}")
 
@@ -707,11 +661,12 @@ class SalesRequestManagementService:
             msg, code = result.get("error_http", ("Failed to generate PDF", 500))
             return HttpResponse(msg, status=code)
 
-        response = HttpResponse(content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="{result["filename"]}"'
-
-        pisa_status = pisa.CreatePDF(src=result["html"], dest=response)
-        if pisa_status.err:
+        # rendered in the PDF worker pool; repeat downloads of the same request come from cache
+        html = result["html"]
+        pdf_bytes = pdf_render_pool.render(pdf_content_key("sales_request", html), html_to_pdf_bytes, html)
+        if pdf_bytes is None:
             return HttpResponse("Failed to generate PDF", status=500)
 
+        response = HttpResponse(pdf_bytes, content_type="application/pdf")
+        response["Content-Disposition"] = f'attachment; filename="{result["filename"]}"'
         return response
\ No newline at end of file
@@ -0,0 +1,231 @@
+# ToP/services/sales_rollup_service.py
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils.timezone import get_current_timezone, localdate, make_aware
+
+from ..models import SalesDailyRollup, SalesRequestAnalytical
+
+logger = logging.getLogger(__name__)
+
+# company-days waiting for a refresh in this thread (row signals add to it once per row)
+_pending = threading.local()
+
+
+ROLLUP_BATCH_SIZE = 1000
+
+ROLLUP_SOURCE_FIELDS = (
+    "company_id",
+    "project_id",
+    "sales_man_id",
+    "date",
+    "is_approved",
+    "is_fake",
+    "is_expired",
+    "base_price",
+    "final_price",
+    "discount",
+)
+
+RollupKey = Tuple[Optional[int], date]   # (company_id, local day)
+
+
+class SalesRollupService:
+    """
+    Daily sales rollups (SalesDailyRollup) over SalesRequestAnalytical.
+
+    - Refreshed per (company, day): the touched company-days are deleted and re-aggregated
+      after commit. SalesRequestAnalytical saves / deletes schedule it through ToP.signals,
+      bulk writers (hold expiry) call schedule_refresh() themselves.
+    - Days are local dates (TIME_ZONE) computed in Python, so no DB time zone tables are needed.
+    - Reports sum the rollup rows: O(days x salesmen) instead of O(requests).
+    """
+
+    # =====================================================
+    # Refresh
+    # =====================================================
+
+    @staticmethod
+    def key_for(row) -> RollupKey:
+        return row.company_id, localdate(row.date)
+
+    @staticmethod
+    def stored_key(pk) -> Optional[RollupKey]:
+        """ Key of the row as stored, i.e. before a pending save moves it to another company-day. """
+        row = SalesRequestAnalytical.objects.filter(pk=pk).values_list("company_id", "date").first()
+        return (row[0], localdate(row[1])) if row else None
+
+    @staticmethod
+    def schedule_refresh(keys: Iterable[RollupKey]) -> None:
+        """
+        Refreshes the given company-days once the surrounding transaction commits.
+
+        Keys are collected per thread and the first commit callback refreshes all of them,
+        so deleting many requests (one post_delete each) still costs one refresh.
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        if not hasattr(_pending, "keys"):
+            _pending.keys = set()
+        _pending.keys |= keys
+        transaction.on_commit(SalesRollupService._refresh_pending)
+
+    @staticmethod
+    def _refresh_pending() -> None:
+        # keys left by a rolled-back transaction ride along with the next refresh (harmless)
+        keys = getattr(_pending, "keys", None)
+        if keys:
+            _pending.keys = set()
+            SalesRollupService._refresh_quietly(keys)
+
+    @staticmethod
+    def _refresh_quietly(keys) -> None:
+        # rollups are derived data: a failed refresh must not fail the write that triggered it
+        try:
+            SalesRollupService.refresh_days(keys)
+        except Exception:
+            logger.exception("[SALES_ROLLUP] refresh failed (run `rebuild_sales_rollups` to repair)")
+
+    @staticmethod
+    def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+        tz = get_current_timezone()
+        start = make_aware(datetime.combine(day, time.min), tz)
+        end = make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+        return start, end
+
+    @staticmethod
+    def refresh_days(keys: Iterable[RollupKey]) -> int:
+        days_by_company: Dict[Optional[int], set] = defaultdict(set)
+        for company_id, day in keys:
+            days_by_company[company_id].add(day)
+
+        created = 0
+        with transaction.atomic():
+            for company_id, days in days_by_company.items():
+                window = Q()
+                for day in days:
+                    start, end = SalesRollupService._day_bounds(day)
+                    window |= Q(date__gte=start, date__lt=end)
+
+                SalesDailyRollup.objects.filter(company_id=company_id, day__in=days).delete()
+                created += SalesRollupService._materialize(
+                    SalesRequestAnalytical.objects.filter(company_id=company_id).filter(window)
+                )
+        return created
+
+    @staticmethod
+    def rebuild(company_id: Optional[int] = None) -> int:
+        rows = SalesRequestAnalytical.objects.all()
+        rollups = SalesDailyRollup.objects.all()
+        if company_id:
+            rows = rows.filter(company_id=company_id)
+            rollups = rollups.filter(company_id=company_id)
+
+        with transaction.atomic():
+            rollups.delete()
+            return SalesRollupService._materialize(rows)
+
+    @staticmethod
+    def _outcome(is_approved: bool, is_fake: bool, is_expired: bool) -> str:
+        if is_approved:
+            return SalesDailyRollup.Outcome.APPROVED
+        if is_expired:
+            return SalesDailyRollup.Outcome.EXPIRED
+        if is_fake:
+            return SalesDailyRollup.Outcome.FAKE
+        return SalesDailyRollup.Outcome.OTHER
+
+    @staticmethod
+    def _materialize(rows) -> int:
+        groups: Dict[tuple, Dict[str, Any]] = {}
+
+        source = rows.order_by().values_list(*ROLLUP_SOURCE_FIELDS)
+        for (
+            company_id, project_id, sales_man_id, dt, is_approved, is_fake, is_expired, base, final, discount
+        ) in source.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+            key = (
+                company_id,
+                project_id,
+                sales_man_id,
+                localdate(dt),
+                SalesRollupService._outcome(is_approved, is_fake, is_expired),
+            )
+            acc = groups.get(key)
+            if acc is None:
+                acc = groups[key] = {
+                    "requests": 0,
+                    "base_price_sum": 0.0,
+                    "final_price_sum": Decimal("0"),
+                    "discount_sum": Decimal("0"),
+                    "discounted_requests": 0,
+                    "last_request_at": dt,
+                }
+            acc["requests"] += 1
+            if base is not None:
+                acc["base_price_sum"] += base
+            if final is not None:
+                acc["final_price_sum"] += final
+            if discount is not None and discount > 0:
+                acc["discount_sum"] += discount
+                acc["discounted_requests"] += 1
+            if dt > acc["last_request_at"]:
+                acc["last_request_at"] = dt
+
+        SalesDailyRollup.objects.bulk_create(
+            [
+                SalesDailyRollup(
+                    company_id=company_id,
+                    project_id=project_id,
+                    sales_man_id=sales_man_id,
+                    day=day,
+                    outcome=outcome,
+                    **acc,
+                )
+                for (company_id, project_id, sales_man_id, day, outcome), acc in groups.items()
+            ],
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+        return len(groups)
+
+    # =====================================================
+    # Reads
+    # =====================================================
+
+    @staticmethod
+    def salesman_totals(*, company_id: int, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Per salesman: total / approved / fake / expired request counts, last request time and
+        the base / final price sums over all of their requests. `fake` keeps counting expired
+        holds (they are is_fake too); `expired` is the expired share of it.
+        """
+        if not user_ids:
+            return {}
+
+        qs = (
+            SalesDailyRollup.objects.filter(company_id=company_id, sales_man_id__in=user_ids)
+            .values("sales_man_id")
+            .annotate(
+                total=Sum("requests"),
+                approved=Sum("requests", filter=Q(outcome=SalesDailyRollup.Outcome.APPROVED)),
+                fake=Sum(
+                    "requests",
+                    filter=Q(outcome__in=[SalesDailyRollup.Outcome.FAKE, SalesDailyRollup.Outcome.EXPIRED]),
+                ),
+                expired=Sum("requests", filter=Q(outcome=SalesDailyRollup.Outcome.EXPIRED)),
+                last_dt=Max("last_request_at"),
+                sum_base=Sum("base_price_sum"),
+                sum_final=Sum("final_price_sum"),
+            )
+            .order_by()
+        )
+        return {int(row["sales_man_id"]): row for row in qs}
@@ -5,10 +5,10 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
-from django.db.models import Count, Max, Sum, Q
 from django.shortcuts import get_object_or_404
 
-from ..models import Company, SalesTeam, SalesHead, Sales, Manager, SalesRequestAnalytical, User
+from ..models import Company, SalesTeam, SalesHead, Sales, Manager, User
+from .sales_rollup_service import SalesRollupService
 
 
 @dataclass
@@ -194,6 +194,7 @@ class SalesTeamReportService:
                     "total_requests": int(a.get("total", 0) or 0),
                     "approved_requests": int(a.get("approved", 0) or 0),
                     "fake_requests": int(a.get("fake", 0) or 0),
+                    "expired_requests": int(a.get("expired", 0) or 0),
                     "last_request": last_dt.isoformat() if last_dt else None,
                     "sum_base_price": float(a.get("sum_base") or 0),
                     "approved_sum_final_price": float(a.get("sum_final") or 0),
@@ -218,23 +219,5 @@ class SalesTeamReportService:
 
     @staticmethod
     def _aggregate_analytics(*, company_id: int, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
-        if not user_ids:
-            return {}
-
-        qs = (
-            SalesRequestAnalytical.objects.filter(company_id=company_id, sales_man_id__in=user_ids)
-            .values("sales_man_id")
-            .annotate(
-                total=Count("id"),
-                approved=Count("id", filter=Q(is_approved=True)),
-                fake=Count("id", filter=Q(is_fake=True)),
-                last_dt=Max("date"),
-                sum_base=Sum("base_price"),
-                sum_final=Sum("final_price"),
-            )
-        )
-
-        out: Dict[int, Dict[str, Any]] = {}
-        for row in qs:
-            out[int(row["sales_man_id"])] = row
-        return out
+        # summed from the daily rollups (SalesDailyRollup), not the raw request history
+        return SalesRollupService.salesman_totals(company_id=company_id, user_ids=user_ids)
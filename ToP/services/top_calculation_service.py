@@ -1,19 +1,16 @@
 import json
+import math
 import traceback
 from datetime import datetime
+
+import numpy as np
 from dateutil.relativedelta import relativedelta
 
-from ..models import (
-    Unit,
-    ProjectConfiguration,
-    Constraints,
-    ProjectWebConfiguration,
-    BaseNPV,
-    ProjectExtendedPayments,
-    ProjectExtendedPaymentsSpecialOffer,
-    GasPolicy,
-    MaintenancePolicy,
-)
+from ..models import Unit
+
+from .pricing_snapshot_service import ProjectPricingSnapshotService
+from ..utils.calculation_cache_utils import calculation_result_cache, canonical_calculation_key
+from ..utils.pricing_trace_utils import pricing_trace, trace_event
 
 from ..calculations import (
     calculate_max_tenor_years,
@@ -23,6 +20,10 @@ from ..calculations import (
     calculate_percentage_change,
     calculate_gas_payments,
     calculate_maintenance_payments,
+    build_discount_factors,
+    sequential_sum,
+    calculate_percentage_change_many,
+    calculate_price_with_interest_many,
 )
 
 PERIODS_PER_YEAR = {
@@ -48,6 +49,38 @@ class TopCalculationService:
     def calculate(*, user, data):
         parsed = TopCalculationService._parse_request_data(data)
 
+        # Superusers can force a trace for a single request with trace=1
+        force_trace = bool(getattr(user, "is_superuser", False)) and str(data.get("trace", "")) == "1"
+
+        with pricing_trace(
+            "top_calculation",
+            force=force_trace,
+            unit_code=parsed["unit_code"],
+            project_config_id=parsed["project_config_id"],
+        ):
+            trace_event("parsed_input", parsed=parsed)
+
+            # Repeated quotes (same parsed inputs + same pricing snapshot) are served from memory
+            project_id = ProjectPricingSnapshotService.project_id_for_config(parsed["project_config_id"])
+            cache_key = canonical_calculation_key(
+                parsed,
+                project_id,
+                ProjectPricingSnapshotService.current_version(project_id) if project_id else None,
+            )
+
+            result = calculation_result_cache.get(cache_key)
+            if result is None:
+                trace_event("result_cache_miss", cache_key=cache_key)
+                result = TopCalculationService._calculate_parsed(parsed)
+                calculation_result_cache.set(cache_key, result)
+            else:
+                trace_event("result_cache_hit", cache_key=cache_key)
+
+            trace_event("result", result=result)
+            return result
+
+    @staticmethod
+    def _calculate_parsed(parsed):
         payment_scheme = TopCalculationService._resolve_payment_scheme(
             parsed["payment_scheme_2"]
         )
@@ -68,7 +101,7 @@ class TopCalculationService:
 
         base_npv_ctx = TopCalculationService._resolve_base_npv(
             parsed,
-            project_ctx["project_config"],
+            project_ctx["snapshot"],
             tenor_ctx["tenor_years"]
         )
 
@@ -108,6 +141,251 @@ class TopCalculationService:
             delivery_date,
         )
 
+    # =====================================================
+    # BATCH ENTRY POINT
+    # =====================================================
+
+    @staticmethod
+    def calculate_many(*, units, tenors, schemes, project_config=None, contract_date=None):
+        """
+        Price every unit × tenor × scheme of one project at once
+        (e.g. when a price list is refreshed).
+
+        The project configuration is loaded once, each (scheme, tenor) plan is
+        solved once with `apply_constraints`, and NPVs / percentage change /
+        price with interest are computed as NumPy arrays. Values are identical
+        to `calculate` for the same unit, tenor and scheme with the project's
+        default inputs (base DP, no manual installments, no special offer).
+
+        Returns arrays indexed as:
+          - plan arrays  -> [scheme, tenor]
+          - price arrays -> [unit, scheme, tenor]
+        Combinations that `calculate` would reject (tenor above max, no
+        extended payments plan) are NaN and False in `valid`. No units -> nothing
+        is solved and every combination is invalid.
+        """
+        units = TopCalculationService._resolve_batch_units(units)
+        tenors = [float(t) for t in tenors]
+        schemes = list(schemes)
+
+        if not units:
+            return TopCalculationService._empty_batch_result(tenors, schemes)
+
+        if project_config is None:
+            snapshot = ProjectPricingSnapshotService.get(units[0].project_company_id if units else None)
+        else:
+            snapshot = ProjectPricingSnapshotService.get_for_config(project_config.id)
+
+        project_ctx = TopCalculationService._snapshot_project_context(snapshot)
+        project_config = project_ctx["project_config"]
+
+        if not contract_date:
+            contract_date = datetime.now().strftime("%Y-%m-%d")
+
+        periods_per_year = PERIODS_PER_YEAR[project_config.base_payment_frequency.lower()]
+
+        plans = {}
+        for s_idx, scheme_name in enumerate(schemes):
+            payment_scheme = TopCalculationService._resolve_payment_scheme(scheme_name)
+            for t_idx, tenor_years in enumerate(tenors):
+                plans[(s_idx, t_idx)] = TopCalculationService._solve_batch_plan(
+                    project_ctx,
+                    tenor_years,
+                    payment_scheme,
+                    periods_per_year,
+                    contract_date,
+                )
+
+        shape = (len(schemes), len(tenors))
+        valid = np.zeros(shape, dtype=bool)
+        max_n = max([len(p["pmts"]) - 1 for p in plans.values() if p] + [0])
+
+        dps = np.zeros(shape, dtype=np.float64)
+        installments = np.zeros(shape + (max_n,), dtype=np.float64)
+        additional_disc = np.zeros(shape, dtype=np.float64)
+        base_npv = np.zeros(shape, dtype=np.float64)
+
+        for (s_idx, t_idx), plan in plans.items():
+            if not plan:
+                continue
+            valid[s_idx, t_idx] = True
+            dps[s_idx, t_idx] = plan["pmts"][0]
+            installments[s_idx, t_idx, :len(plan["pmts"]) - 1] = plan["pmts"][1:]
+            additional_disc[s_idx, t_idx] = plan["additional_discount"] or 0
+            base_npv[s_idx, t_idx] = TopCalculationService._batch_base_npv(
+                project_ctx, plan["pmts"], tenors[t_idx], periods_per_year
+            )
+
+        # NPV of the solved plans at the project's quarterly rate
+        r = float(project_config.interest_rate)
+        quarterly_rate = (1 + r) ** (1 / 4) - 1
+        discount_factors = build_discount_factors(quarterly_rate, max_n)
+        new_npv = sequential_sum(installments / discount_factors) + dps
+
+        web_config = project_ctx["project_web_config"]
+        max_discount = float(project_ctx["project_constraints"].max_discount)
+
+        percentage_change = calculate_percentage_change_many(
+            base_npv, new_npv, max_discount, "undefined", web_config.real_discount, 0,
+        )
+
+        base_prices = np.array(
+            [float(u.interest_free_unit_price or 0) for u in units], dtype=np.float64
+        )
+        price_with_interest = calculate_price_with_interest_many(
+            base_npv,
+            new_npv,
+            max_discount,
+            base_prices,
+            additional_disc,
+            "undefined",
+            web_config.real_discount,
+            0,
+        )
+
+        percentage_change[~valid] = np.nan
+        new_npv[~valid] = np.nan
+        base_npv[~valid] = np.nan
+        price_with_interest[:, ~valid] = np.nan
+
+        return {
+            "unit_codes": [u.unit_code for u in units],
+            "tenors": tenors,
+            "schemes": schemes,
+            "valid": valid,
+            "base_npv": base_npv,
+            "new_npv": new_npv,
+            "percentage_change": percentage_change,
+            "price_with_interest": price_with_interest,
+            "calculated_pmt_percentages": {
+                key: plan["pmts"] for key, plan in plans.items() if plan
+            },
+            "delivery_payment_index": TopCalculationService._batch_delivery_indexes(
+                units, contract_date, periods_per_year
+            ),
+        }
+
+    @staticmethod
+    def _empty_batch_result(tenors, schemes):
+        """ Result of calculate_many for no units: same keys and array shapes, nothing priced. """
+        shape = (len(schemes), len(tenors))
+        return {
+            "unit_codes": [],
+            "tenors": tenors,
+            "schemes": schemes,
+            "valid": np.zeros(shape, dtype=bool),
+            "base_npv": np.full(shape, np.nan),
+            "new_npv": np.full(shape, np.nan),
+            "percentage_change": np.full(shape, np.nan),
+            "price_with_interest": np.full((0,) + shape, np.nan),
+            "calculated_pmt_percentages": {},
+            "delivery_payment_index": [],
+        }
+
+    @staticmethod
+    def _resolve_batch_units(units):
+        units = list(units)
+        codes = [u for u in units if isinstance(u, str)]
+        if not codes:
+            return units
+
+        by_code = Unit.objects.in_bulk(codes)
+        return [
+            by_code[u] if isinstance(u, str) else u
+            for u in units
+            if not isinstance(u, str) or u in by_code
+        ]
+
+    @staticmethod
+    def _snapshot_project_context(snapshot):
+        return {
+            "snapshot": snapshot,
+            "project_config": snapshot.project_config,
+            "project_constraints": snapshot.project_constraints,
+            "project_web_config": snapshot.project_web_config,
+        }
+
+    @staticmethod
+    def _solve_batch_plan(project_ctx, tenor_years, payment_scheme, periods_per_year, contract_date):
+        """ Same steps as `_calculate_payment_plan` with no manual installments. """
+        project_config = project_ctx["project_config"]
+
+        max_tenor_years = float(project_config.max_tenor_years or 0)
+        if max_tenor_years > 0 and tenor_years > max_tenor_years:
+            return None
+
+        snapshot = project_ctx["snapshot"]
+        payment_plan = snapshot.extended_plan(tenor_years, payment_scheme)
+        if not payment_plan:
+            return None
+
+        n = int(tenor_years) * periods_per_year
+        var_dp = payment_plan.dp1 + payment_plan.dp2
+
+        pmts = [55555] * (n + 1)
+        pmts[0] = var_dp
+
+        # apply_constraints needs a parseable delivery date; per-unit delivery
+        # indexes are computed separately by _batch_delivery_indexes.
+        reference_delivery_date = datetime.strptime(contract_date, "%Y-%m-%d").strftime("%B %d, %Y")
+
+        pmts, _ = apply_constraints(
+            var_dp,
+            pmts,
+            tenor_years,
+            periods_per_year,
+            {},
+            project_ctx["project_constraints"],
+            contract_date,
+            reference_delivery_date,
+            payment_scheme,
+            special_offer=None,
+            snapshot=snapshot,
+        )
+
+        additional_discount = None
+        web_config = project_ctx["project_web_config"]
+        if web_config.show_additional_discount:
+            additional_discount = float(web_config.additional_discount)
+            if payment_plan.disable_additional_discount:
+                additional_discount = 0
+            if pmts[0] < float(web_config.dp_for_additional_discount) / 100:
+                additional_discount = None
+
+        return {
+            "pmts": pmts,
+            "payment_plan": payment_plan,
+            "additional_discount": additional_discount,
+        }
+
+    @staticmethod
+    def _batch_base_npv(project_ctx, pmts, tenor_years, periods_per_year):
+        project_config = project_ctx["project_config"]
+
+        if project_config.use_static_base_npv:
+            base_npvs = dict(project_ctx["snapshot"].base_npvs)
+            if not base_npvs:
+                return 0.0
+            diffs = {abs(tenor_years - k): v for k, v in base_npvs.items()}
+            return float(diffs[min(diffs.keys())])
+
+        base_period_rate = calculate_period_rate(project_config.interest_rate, periods_per_year)
+        factors = build_discount_factors(base_period_rate, len(pmts) - 1, sign=-1)
+        terms = np.asarray([float(p) for p in pmts[1:]], dtype=np.float64) * factors
+        return float(sequential_sum(np.concatenate(([float(project_config.base_dp)], terms))))
+
+    @staticmethod
+    def _batch_delivery_indexes(units, contract_date, periods_per_year):
+        contract = datetime.strptime(contract_date, "%Y-%m-%d").date()
+        indexes = []
+        for u in units:
+            if u.development_delivery_date:
+                years = (u.development_delivery_date - contract).days / 365
+                indexes.append(math.floor(years * periods_per_year))
+            else:
+                indexes.append(None)
+        return indexes
+
     # =====================================================
     # REQUEST PARSING
     # =====================================================
@@ -195,16 +473,10 @@ class TopCalculationService:
 
     @staticmethod
     def _resolve_project_context(data, payment_scheme):
-        unit = Unit.objects.filter(unit_code=data["unit_code"]).first()
-        project_config = ProjectConfiguration.objects.filter(
-            id=data["project_config_id"]
-        ).first()
-        project_constraints = Constraints.objects.filter(
-            project_config=project_config
-        ).first()
-        project_web_config = ProjectWebConfiguration.objects.filter(
-            project=project_config.project
-        ).first()
+        # Cached, versioned per-project configuration (no DB hit on the hot path)
+        snapshot = ProjectPricingSnapshotService.get_for_config(data["project_config_id"])
+        project_config = snapshot.project_config
+        project_web_config = snapshot.project_web_config
 
         try:
             if project_web_config.show_payment_scheme is False:
@@ -216,12 +488,7 @@ class TopCalculationService:
         except:
             pass
 
-        return {
-            "unit": unit,
-            "project_config": project_config,
-            "project_constraints": project_constraints,
-            "project_web_config": project_web_config,
-        }
+        return TopCalculationService._snapshot_project_context(snapshot)
 
     # =====================================================
     # DELIVERY DATE
@@ -268,17 +535,14 @@ class TopCalculationService:
     # =====================================================
 
     @staticmethod
-    def _resolve_base_npv(parsed, project_config, tenor_years):
+    def _resolve_base_npv(parsed, snapshot, tenor_years):
         base_npv = 0
         have_static_npv = False
 
         if parsed["static_npv"]:
             have_static_npv = True
-            base_npvs = BaseNPV.objects.filter(project_config=project_config)
-            if base_npvs.exists():
-                base_npvs_dict = {
-                    float(npv.term_period): npv.npv_value for npv in base_npvs
-                }
+            if snapshot.base_npvs:
+                base_npvs_dict = dict(snapshot.base_npvs)
                 diffs = {
                     abs(tenor_years - k): v for k, v in base_npvs_dict.items()
                 }
@@ -308,11 +572,9 @@ class TopCalculationService:
         if excess_input > 0:
             installment_dict[n] = excess_input
 
-        payment_plan = ProjectExtendedPayments.objects.filter(
-            project=project_ctx["project_config"].project,
-            year=tenor_ctx["tenor_years"],
-            scheme=payment_scheme,
-        ).first()
+        payment_plan = project_ctx["snapshot"].extended_plan(
+            tenor_ctx["tenor_years"], payment_scheme
+        )
 
         if payment_plan:
             new_base_dp = (payment_plan.dp1 + payment_plan.dp2) * 100
@@ -341,6 +603,7 @@ class TopCalculationService:
                 delivery_date,
                 payment_scheme,
                 special_offer=None,
+                snapshot=project_ctx["snapshot"],
             )
         else:
             calculated_pmt_percentages, delivery_payment_index = apply_constraints(
@@ -354,6 +617,7 @@ class TopCalculationService:
                 delivery_date,
                 payment_scheme,
                 data["special_offer"],
+                snapshot=project_ctx["snapshot"],
             )
 
         return {
@@ -403,10 +667,9 @@ class TopCalculationService:
         try:
             if special_offer != "undefined":
                 special_offer_constant_discount = (
-                    ProjectExtendedPaymentsSpecialOffer.objects.filter(
-                        project=project_ctx["project_config"].project,
-                        year=tenor_ctx["tenor_years"],
-                    ).first().constant_discount
+                    project_ctx["snapshot"]
+                    .special_offer_plan(tenor_ctx["tenor_years"])
+                    .constant_discount
                 )
             else:
                 special_offer_constant_discount = 0
@@ -494,9 +757,7 @@ class TopCalculationService:
             sum_gas = 0
         else:
             try:
-                project_gas_policy = GasPolicy.objects.filter(
-                    project_config=project_ctx["project_config"]
-                ).first()
+                project_gas_policy = project_ctx["snapshot"].gas_policy
 
                 if project_gas_policy and project_gas_policy.is_applied:
                     gas_payments = calculate_gas_payments(
@@ -506,6 +767,8 @@ class TopCalculationService:
                         data["contract_date"],
                         delivery_date,
                         payment_ctx["delivery_payment_index"],
+                        fees=dict(project_gas_policy.fees),
+                        offsets=dict(project_gas_policy.offsets),
                     )
                 else:
                     gas_payments = [0] * (n + 1)
@@ -525,9 +788,7 @@ class TopCalculationService:
             maintenance = 0
         else:
             try:
-                project_maintenance_policy = MaintenancePolicy.objects.filter(
-                    project_config=project_ctx["project_config"]
-                ).first()
+                project_maintenance_policy = project_ctx["snapshot"].maintenance_policy
 
                 maintenance_fee_percent = float(data["maintenance_fee_percent"] or 0)
                 x = round(
@@ -546,6 +807,8 @@ class TopCalculationService:
                         delivery_date,
                         payment_ctx["delivery_payment_index"],
                         data["currency_rate"],
+                        schedulings=project_maintenance_policy.schedulings,
+                        offsets=dict(project_maintenance_policy.offsets),
                     )
                 else:
                     maintenance_payments = [0] * (n + 1)
@@ -1,5 +1,6 @@
+import hashlib
 import json
-from django.core.serializers.json import DjangoJSONEncoder
+from functools import partial
 
 from ..models import (
     Company,
@@ -12,6 +13,9 @@ from ..models import (
     UnitLayout,
 )
 from ..strategies.inventory_strategy import get_inventory_strategy
+from .unit_snapshot_service import UnitSnapshotService
+
+from ..utils.unit_snapshot_utils import dictionary_column, encode_columns, json_value
 
 from ..utils.viewer_permissions import (
     is_company_viewer,
@@ -22,6 +26,27 @@ from ..utils.viewer_permissions import (
 )
 
 
+CATALOG_EXPORT_FIELDS = (
+    "unit_code",
+    "project",
+    "building_type",
+    "unit_type",
+    "unit_model",
+    "gross_area",
+    "area_range",
+    "status",
+    "num_bedrooms",
+    "sales_phasing",
+    "interest_free_unit_price",
+    "development_delivery_date",
+    "finishing_specs",
+    "garden_area",
+    "land_area",
+    "penthouse_area",
+    "roof_terraces_area",
+)
+
+
 class UnitCatalogService:
     """
     Viewer rule:
@@ -161,15 +186,38 @@ class UnitCatalogService:
     # ======================================================
 
     @staticmethod
-    def _build_inventory_payload(target_company, active_only: bool, viewer_statuses):
-        units_list = []
+    def _snapshot_kind(active_only: bool, viewer_statuses) -> str:
+        if viewer_statuses is not None:
+            digest = hashlib.sha1("|".join(sorted(viewer_statuses)).encode("utf-8")).hexdigest()[:16]
+            return f"catalog:viewer:{digest}"
+        return "catalog:active" if active_only else "catalog:all"
 
+    @staticmethod
+    def _build_inventory_payload(target_company, active_only: bool, viewer_statuses) -> str:
+        """
+        The catalog's units as a columnar snapshot (JSON text, decoded in the page with
+        decodeColumnar). Cached per company inventory version and audience (active / all /
+        viewer status set), so repeat page loads skip the four queries and the encoding.
+        """
         if not target_company:
-            return units_list
+            return json.dumps(UnitCatalogService._empty_snapshot())
 
+        snapshot = UnitSnapshotService.get(
+            target_company.id,
+            UnitCatalogService._snapshot_kind(active_only, viewer_statuses),
+            lambda: UnitCatalogService._build_columnar_units(target_company, active_only, viewer_statuses),
+        )
+        return snapshot.body.decode("utf-8")
+
+    @staticmethod
+    def _empty_snapshot(company_name=None) -> dict:
+        return {"format": "columnar", "company_name": company_name, "count": 0, "columns": {}}
+
+    @staticmethod
+    def _build_columnar_units(target_company, active_only: bool, viewer_statuses) -> dict:
         # --- A. PRE-FETCH PROJECT MAP ---
         project_map = {
-            p.name: p.id for p in Project.objects.filter(company=target_company)
+            name: pk for pk, name in Project.objects.filter(company=target_company).values_list("id", "name")
         }
 
         # --- B. MAP PINS ---
@@ -192,7 +240,7 @@ class UnitCatalogService:
 
         # --- C. LAYOUT IMAGES ---
         layout_lookup = {}
-        all_layouts = UnitLayout.objects.filter(project__company=target_company)
+        all_layouts = UnitLayout.objects.filter(project__company=target_company).select_related("project")
 
         for layout in all_layouts:
             key = (
@@ -207,72 +255,48 @@ class UnitCatalogService:
         strategy = get_inventory_strategy(target_company)
         raw_units = strategy.get_all_units(active_only=active_only)
 
-        export_fields = [
-            "unit_code",
-            "project",
-            "building_type",
-            "unit_type",
-            "unit_model",
-            "gross_area",
-            "area_range",
-            "status",
-            "num_bedrooms",
-            "sales_phasing",
-            "interest_free_unit_price",
-            "development_delivery_date",
-            "finishing_specs",
-            "garden_area",
-            "land_area",
-            "penthouse_area",
-            "roof_terraces_area",
-        ]
-
         # ✅ Viewer filtering only if viewer_statuses is NOT None
         viewer_filter_enabled = viewer_statuses is not None
-        viewer_has_statuses = viewer_filter_enabled and len(viewer_statuses) > 0
+        if viewer_filter_enabled and not viewer_statuses:
+            # viewer exists but has no statuses => sees nothing
+            return UnitCatalogService._empty_snapshot(target_company.name)
 
-        for u in raw_units:
-            unit_dict = {field: getattr(u, field, None) for field in export_fields}
+        rows = []
+        for values in raw_units.values_list(*CATALOG_EXPORT_FIELDS):
+            unit = dict(zip(CATALOG_EXPORT_FIELDS, values))
 
             if viewer_filter_enabled:
-                st = (unit_dict.get("status") or "").strip()
-                if not st:
+                st = (unit["status"] or "").strip()
+                if not st or st not in viewer_statuses:
                     continue
-                if not viewer_has_statuses:
-                    # viewer exists but has no statuses => sees nothing
-                    continue
-                if st not in viewer_statuses:
-                    continue
-
-            unit_dict["company_name"] = target_company.name
-
-            proj_name = unit_dict.get("project")
-            unit_code = unit_dict.get("unit_code")
-
-            unit_dict["project_id"] = project_map.get(proj_name)
-            unit_dict["map_focus_code"] = pin_map.get(unit_code)
 
-            layout_key = (
-                proj_name,
-                unit_dict.get("building_type"),
-                unit_dict.get("unit_type"),
-                unit_dict.get("unit_model"),
-            )
-            unit_dict["layout_images"] = layout_lookup.get(layout_key, [])
-
-            units_list.append(unit_dict)
-
-        return units_list
+            proj_name = unit["project"]
+            layout_key = (proj_name, unit["building_type"], unit["unit_type"], unit["unit_model"])
+            rows.append(values + (
+                project_map.get(proj_name),
+                pin_map.get(unit["unit_code"]),
+                layout_lookup.get(layout_key, []),
+            ))
+
+        names = CATALOG_EXPORT_FIELDS + ("project_id", "map_focus_code", "layout_images")
+        # every column keeps the DjangoJSONEncoder representation the page's filters compare against
+        encode = partial(dictionary_column, convert=json_value)
+        return {
+            "format": "columnar",
+            "company_name": target_company.name,
+            "count": len(rows),
+            "columns": encode_columns(names, rows, {name: encode for name in names}),
+        }
 
     # ======================================================
     # STEP 3: FINAL CONTEXT
     # ======================================================
 
     @staticmethod
-    def _finalize_context(user_ctx, units_list):
+    def _finalize_context(user_ctx, units_json):
         if user_ctx.get("forbidden"):
             return {
-                "units_json": json.dumps([], cls=DjangoJSONEncoder),
+                "units_json": json.dumps(UnitCatalogService._empty_snapshot()),
                 "all_companies": [],
                 "is_unbound_user": False,
                 "selected_company_id": None,
@@ -284,7 +308,7 @@ class UnitCatalogService:
         target_company = user_ctx["target_company"]
 
         return {
-            "units_json": json.dumps(units_list, cls=DjangoJSONEncoder),
+            "units_json": units_json,
             "all_companies": user_ctx["all_companies"],
             "is_unbound_user": user_ctx["is_unbound_user"],
             "selected_company_id": target_company.id if target_company else None,
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import hashlib
 import traceback
 from dataclasses import dataclass
 from decimal import Decimal
@@ -41,6 +42,8 @@ from ..utils.unit_mapping_utils import (
     native_dropdown_values,
 )
 
+from .unit_snapshot_service import UnitSnapshotService
+
 # NOTE: We keep viewer utils imports because you are using them already in read-only logic.
 # But the NEW scoping requested here is for Uploader.
 from ..utils.viewer_permissions import (
@@ -200,6 +203,11 @@ class UnitMappingService:
     # --------------------------
     @staticmethod
     def get_project_masterplan(*, user, project_id: int) -> ServiceResult:
+        """
+        payload["snapshot"]: the masterplan JSON for the user's audience (client / manager,
+        available-only, viewer statuses), cached per company inventory version. Views serve
+        it with snapshot_response() (ETag -> 304 when nothing changed).
+        """
         try:
             project = Project.objects.select_related("company").get(id=project_id)
 
@@ -213,8 +221,6 @@ class UnitMappingService:
                 if not v_company or project.company_id != v_company.id:
                     return ServiceResult(False, 403, error="Not allowed")
 
-            masterplan = getattr(project, "masterplan", None)
-
             is_client, is_managerish = get_role_flags_for_masterplan(user)
 
             config = ProjectWebConfiguration.objects.filter(project=project).first()
@@ -233,89 +239,109 @@ class UnitMappingService:
             if viewer_mode:
                 filter_available_only = False
 
-            if not (masterplan and masterplan.image):
-                return ServiceResult(True, 200, payload={"has_masterplan": False})
-
-            positions = masterplan.unit_positions.all().prefetch_related("child_units")
-            unit_data_map = build_masterplan_unit_data_map(project=project)
-
             allowed_norm = None
             if viewer_statuses is not None:
                 allowed_norm = {x.strip().lower() for x in viewer_statuses}
 
-            unit_positions_data = []
+            audience = f"{int(is_client)}{int(is_managerish)}{int(filter_available_only)}"
+            if allowed_norm is not None:
+                audience += ":" + hashlib.sha1("|".join(sorted(allowed_norm)).encode("utf-8")).hexdigest()[:16]
+
+            snapshot = UnitSnapshotService.get(
+                project.company_id,
+                f"masterplan:{project.id}:{audience}",
+                lambda: UnitMappingService._build_project_masterplan(
+                    project,
+                    is_client=is_client,
+                    is_managerish=is_managerish,
+                    filter_available_only=filter_available_only,
+                    allowed_norm=allowed_norm,
+                ),
+            )
+            return ServiceResult(True, 200, payload={"snapshot": snapshot})
 
-            for pos in positions:
-                current_specs = []
-                display_status = "Available"
+        except Project.DoesNotExist:
+            return ServiceResult(False, 404, error="Project not found")
+        except Exception as e:
+            return ServiceResult(False, 500, error=str(e), trace=traceback.format_exc())
 
-                if pos.unit_type == "single":
-                    u_data = unit_data_map.get(pos.unit_code)
-                    if not u_data:
-                        continue
+    @staticmethod
+    def _build_project_masterplan(project, *, is_client, is_managerish, filter_available_only, allowed_norm) -> Dict[str, Any]:
+        masterplan = getattr(project, "masterplan", None)
+        if not (masterplan and masterplan.image):
+            return {"has_masterplan": False}
 
-                    if allowed_norm is not None:
-                        s = (u_data.get("status") or "").strip().lower()
-                        if s not in allowed_norm:
-                            continue
+        positions = masterplan.unit_positions.all().prefetch_related("child_units")
+        unit_data_map = build_masterplan_unit_data_map(project=project)
+
+        unit_positions_data = []
+
+        for pos in positions:
+            current_specs = []
+            display_status = "Available"
 
-                    if filter_available_only and (u_data["status"] != "Available" or u_data["is_locked"]):
+            if pos.unit_type == "single":
+                u_data = unit_data_map.get(pos.unit_code)
+                if not u_data:
+                    continue
+
+                if allowed_norm is not None:
+                    s = (u_data.get("status") or "").strip().lower()
+                    if s not in allowed_norm:
                         continue
 
-                    display_status = compute_display_status_for_client(
-                        is_client=is_client,
-                        is_managerish=is_managerish,
-                        raw_status=u_data["status"],
-                        is_locked=u_data["is_locked"],
-                    )
-                    current_specs.append(u_data)
-
-                elif pos.unit_type == "building":
-                    children = pos.child_units.all()
-                    has_visible_child = False
-
-                    for child in children:
-                        c_data = unit_data_map.get(child.unit_code)
-                        if not c_data:
-                            continue
+                if filter_available_only and (u_data["status"] != "Available" or u_data["is_locked"]):
+                    continue
+
+                display_status = compute_display_status_for_client(
+                    is_client=is_client,
+                    is_managerish=is_managerish,
+                    raw_status=u_data["status"],
+                    is_locked=u_data["is_locked"],
+                )
+                current_specs.append(u_data)
 
-                        if allowed_norm is not None:
-                            c = (c_data.get("status") or "").strip().lower()
-                            if c not in allowed_norm:
-                                continue
+            elif pos.unit_type == "building":
+                children = pos.child_units.all()
+                has_visible_child = False
 
-                        if filter_available_only and (c_data["status"] != "Available" or c_data["is_locked"]):
-                            continue
+                for child in children:
+                    c_data = unit_data_map.get(child.unit_code)
+                    if not c_data:
+                        continue
 
-                        has_visible_child = True
-                        current_specs.append(c_data)
+                    if allowed_norm is not None:
+                        c = (c_data.get("status") or "").strip().lower()
+                        if c not in allowed_norm:
+                            continue
 
-                    if not has_visible_child:
+                    if filter_available_only and (c_data["status"] != "Available" or c_data["is_locked"]):
                         continue
 
-                    display_status = "Available"
+                    has_visible_child = True
+                    current_specs.append(c_data)
 
-                unit_positions_data.append({
-                    "id": pos.id,
-                    "unit_code": pos.unit_code,
-                    "x_percent": pos.x_percent,
-                    "y_percent": pos.y_percent,
-                    "unit_type": pos.unit_type,
-                    "unit_status": display_status,
-                    "filter_data": current_specs,
-                })
+                if not has_visible_child:
+                    continue
 
-            return ServiceResult(True, 200, payload={
-                "has_masterplan": True,
-                "image_url": masterplan.image.url,
-                "unit_positions": unit_positions_data,
-                "is_client": is_client,
+                display_status = "Available"
+
+            unit_positions_data.append({
+                "id": pos.id,
+                "unit_code": pos.unit_code,
+                "x_percent": pos.x_percent,
+                "y_percent": pos.y_percent,
+                "unit_type": pos.unit_type,
+                "unit_status": display_status,
+                "filter_data": current_specs,
             })
 
-        except Project.DoesNotExist:
-            return ServiceResult(False, 404, error="Project not found")
-        except Exception as e:
-            return ServiceResult(False, 500, error=str(e), trace=traceback.format_exc())
+        return {
+            "has_masterplan": True,
+            "image_url": masterplan.image.url,
+            "unit_positions": unit_positions_data,
+            "is_client": is_client,
+        }
 
     # --------------------------
     # Save pin
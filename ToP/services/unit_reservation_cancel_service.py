@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import logging
 from dataclasses import dataclass
 from typing import Optional, Dict, Any, List
 
@@ -15,7 +16,9 @@ from ToP.models import (
     Uploader,
 )
 
-from ..utils.google_sheets_utils import cancel_google_sheet_reservation
+from .job_queue_service import JobQueueService
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -137,29 +140,19 @@ class UnitReservationCancelService:
                 unit.save(update_fields=["status", "reservation_date", "contract_payment_plan", "sales_value"])
 
                 # 4) Delete SalesRequestAnalytical for that unit_code scoped by company
-                deleted_count, _ = (
-                    SalesRequestAnalytical.objects
-                    .filter(unit_code=unit_code, company=company)
-                    .delete()
-                )
+                deleted_count, _ = SalesRequestAnalytical.objects.filter(unit_code=unit_code, company=company).delete()
                 
                 if company.has_google_sheets:
-                    # Note: Calls to external APIs (Google Sheets) inside a transaction 
-                    # will delay the commit. If high performance is needed, 
-                    # consider moving this to a background task (Celery).
+                    # Queued background job: runs after the transaction commits (never delays it)
+                    # and is retried with backoff if Sheets fails; the DB cancel always succeeds.
                     try:
-                        cancel_google_sheet_reservation(
-                            company=company,
-                            unit_code=unit.unit_code,
-                            interest_free_price=restored_price
-                        )
-                    except Exception as e:
-                        # Log the error but decide if you want to rollback the DB transaction.
-                        # Usually, we allow the DB cancel to succeed even if Sheets fails, 
-                        # but we return a warning message.
-                        print(f"⚠️ Google Sheet update failed: {e}")
-                        # If you want to FAIL the whole operation if Sheet fails, uncomment below:
-                        # raise e
+                        JobQueueService.enqueue("sheets.cancel_writeback", {
+                            "company_id": company.id,
+                            "unit_code": unit.unit_code,
+                            "interest_free_price": restored_price,
+                        })
+                    except Exception:
+                        logger.exception("Google Sheet update could not be queued for unit %s", unit.unit_code)
 
                 return ServiceResult.ok(
                     "Reservation cancelled successfully.",
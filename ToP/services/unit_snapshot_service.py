@@ -0,0 +1,131 @@
+# ToP/services/unit_snapshot_service.py
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import (
+    CompanyInventoryVersion,
+    Project,
+    ProjectMasterplan,
+    ProjectWebConfiguration,
+    Unit,
+    UnitLayout,
+    UnitPosition,
+    UnitPositionChild,
+)
+from ..utils.unit_snapshot_utils import EncodedSnapshot, encode_snapshot
+
+
+UNIT_SNAPSHOT_CACHE_TIMEOUT = 60 * 60 * 6
+
+# saving / deleting any of these moves the owning company's inventory version (see ToP.signals)
+UNIT_SNAPSHOT_MODELS = (
+    Unit,
+    Project,
+    ProjectMasterplan,
+    ProjectWebConfiguration,
+    UnitLayout,
+    UnitPosition,
+    UnitPositionChild,
+)
+
+
+class UnitSnapshotService:
+    """
+    Per-company inventory version + cached, pre-encoded unit snapshots.
+
+    - current_version(company_id): counter in the database (CompanyInventoryVersion), read per
+      request, so bumps from any process (web, sync / expiry commands, job worker) are seen.
+      bump() increments it inside the writing transaction; saves / deletes of UNIT_SNAPSHOT_MODELS
+      bump through ToP.signals, bulk writers (sheet / ERP / CSV sync, import hub, hold expiry)
+      call bump() themselves.
+    - get(company_id, kind, builder): the snapshot for the current version, built, JSON
+      encoded and compressed once, then served from the cache until the next bump.
+      The ETag derives from the version, so unchanged inventories answer 304.
+    - get_json(company_id, kind, builder): same, for JSON embedded in rendered pages.
+    """
+
+    # -------------------------
+    # Version
+    # -------------------------
+    @staticmethod
+    def _snapshot_key(company_id, kind: str, version) -> str:
+        return f"unit_snapshot:{kind}:{company_id}:{version}"
+
+    @staticmethod
+    def current_version(company_id) -> int:
+        version = (
+            CompanyInventoryVersion.objects.filter(company_id=company_id)
+            .values_list("version", flat=True)
+            .first()
+        )
+        return version or 0
+
+    @staticmethod
+    def bump(company_id) -> None:
+        if not company_id:
+            return
+        # in the writing transaction: the new version becomes visible together with the rows
+        rows = CompanyInventoryVersion.objects.filter(company_id=company_id).update(version=F("version") + 1)
+        if rows:
+            return
+        try:
+            with transaction.atomic():
+                CompanyInventoryVersion.objects.create(company_id=company_id, version=1)
+        except IntegrityError:
+            # created concurrently
+            CompanyInventoryVersion.objects.filter(company_id=company_id).update(version=F("version") + 1)
+
+    @staticmethod
+    def bump_many(company_ids: Iterable[Any]) -> None:
+        for company_id in set(company_ids):
+            UnitSnapshotService.bump(company_id)
+
+    @staticmethod
+    def company_id_for(instance) -> Optional[int]:
+        """ Owning company of any UNIT_SNAPSHOT_MODELS instance. """
+        try:
+            if isinstance(instance, UnitPositionChild):
+                instance = instance.position
+            if isinstance(instance, UnitPosition):
+                instance = instance.masterplan.project
+            if isinstance(instance, (ProjectMasterplan, ProjectWebConfiguration, UnitLayout)):
+                instance = instance.project
+        except ObjectDoesNotExist:
+            # parent already gone (cascade delete): the parent's own signal bumps the company
+            return None
+        return getattr(instance, "company_id", None)
+
+    # -------------------------
+    # Snapshots
+    # -------------------------
+    @staticmethod
+    def get(company_id, kind: str, builder: Callable[[], Dict[str, Any]]) -> EncodedSnapshot:
+        version = UnitSnapshotService.current_version(company_id)
+        key = UnitSnapshotService._snapshot_key(company_id, kind, version)
+
+        snapshot: Optional[EncodedSnapshot] = cache.get(key)
+        if snapshot is None:
+            payload = builder()
+            payload["version"] = version
+            snapshot = encode_snapshot(payload, etag_seed=f"{kind}:{company_id}:{version}")
+            cache.set(key, snapshot, UNIT_SNAPSHOT_CACHE_TIMEOUT)
+        return snapshot
+
+    @staticmethod
+    def get_json(company_id, kind: str, builder: Callable[[], str]) -> str:
+        """ Serialized JSON text embedded in a page (builder returns the text), cached like get(). """
+        version = UnitSnapshotService.current_version(company_id)
+        key = UnitSnapshotService._snapshot_key(company_id, kind, version)
+
+        text = cache.get(key)
+        if text is None:
+            text = builder()
+            cache.set(key, text, UNIT_SNAPSHOT_CACHE_TIMEOUT)
+        return text
@@ -1,18 +1,20 @@
 import logging
 import traceback
 import json
-from typing import List, Dict, Any
-from django.db import transaction
+from typing import List, Dict, Any, Iterable
+from django.conf import settings
+from django.utils.timezone import now
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 
 from ..models import Unit, Company, Project
-from ..utils.csv_inventory_utils import read_csv_rows, normalize_row, convert_date_format
+from ..utils.csv_inventory_utils import iter_csv_rows, normalize_row, convert_date_format
 from .erp_import_service import ERPImportService
+from .inventory_delta_sync_service import InventoryDeltaSyncService
 
 # Google Sheets imports (lazy load in method usually better, but here for structure)
 try:
-    from ..utils.google_sheets_utils import gspread_client, resolve_worksheet
+    from ..utils.google_sheets_utils import gspread_client, resolve_worksheet, sheet_index_cache
 except ImportError:
     gspread_client = None
 
@@ -26,16 +28,32 @@ class UnitWarehouseService:
     """
 
     @staticmethod
-    def trigger_import(company: Company, source_type: str, file_data=None) -> Dict[str, Any]:
+    def trigger_import(company: Company, source_type: str, file_data=None, full: bool = False) -> Dict[str, Any]:
         """
         Orchestrator: Fetches data based on source_type, then calls merge_inventory.
+        full=True re-fetches everything and re-diffs every unit (ignores stored hashes / ERP cursor).
         """
         units_payload = []
         
         try:
             # 1. FETCH DATA
             if source_type == "erp":
-                units_payload = ERPImportService.fetch_units(company)
+                # Only ask the ERP for rows changed since the last successful fetch when it supports it
+                erp_fetch_started_at = now()
+                since = None
+                if not full and getattr(settings, "ERP_UNITS_UPDATED_SINCE_PARAM", None):
+                    since = company.erp_units_synced_at
+
+                # Streamed + paginated: chunks are merged while the download is still running
+                result = UnitWarehouseService.merge_inventory_stream(
+                    company=company,
+                    source_label="ERP",
+                    chunks=ERPImportService.iter_unit_chunks(company, updated_since=since),
+                    full=full,
+                )
+                if result.get("success"):
+                    Company.objects.filter(pk=company.pk).update(erp_units_synced_at=erp_fetch_started_at)
+                return result
             
             elif source_type == "sheet":
                 units_payload = UnitWarehouseService._fetch_from_sheet(company)
@@ -52,7 +70,8 @@ class UnitWarehouseService:
             return UnitWarehouseService.merge_inventory(
                 company=company,
                 source_label=source_type.upper(),
-                units_data=units_payload
+                units_data=units_payload,
+                full=full,
             )
 
         except Exception as e:
@@ -74,6 +93,8 @@ class UnitWarehouseService:
         ws = resolve_worksheet(sh, company.google_sheet_gid, company.google_sheet_title)
         
         raw_rows = ws.get_all_records()
+        # refresh the write-back index (unit -> row) from the rows we already have
+        sheet_index_cache.prime(company, raw_rows)
         payload = []
 
         for row in raw_rows:
@@ -102,8 +123,7 @@ class UnitWarehouseService:
         payload = []
         
         try:
-            raw_rows = read_csv_rows(path)
-            for row in raw_rows:
+            for row in iter_csv_rows(path):
                 norm_row = normalize_row(row) # utility that normalizes keys
                 u_code = norm_row.get("Unit Code") # normalize_row usually standardizes to Title Case keys
                 
@@ -124,27 +144,78 @@ class UnitWarehouseService:
     # --- Merge Logic ---
 
     @staticmethod
-    def merge_inventory(company: Company, source_label: str, units_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def merge_inventory(company: Company, source_label: str, units_data: List[Dict[str, Any]], full: bool = False) -> Dict[str, Any]:
+        """
+        Upserts units into the database as a delta (see InventoryDeltaSyncService).
+        Only rows whose source content changed are loaded, and only changed columns are written.
+        """
+        return UnitWarehouseService.merge_inventory_stream(
+            company=company,
+            source_label=source_label,
+            chunks=[units_data],
+            full=full,
+        )
+
+    @staticmethod
+    def merge_inventory_stream(company: Company, source_label: str, chunks: Iterable[List[Dict[str, Any]]], full: bool = False) -> Dict[str, Any]:
         """
-        Upserts units into the database.
+        Same as merge_inventory, but consumes the payload chunk by chunk (each chunk commits on its own),
+        so a streamed source is written while it is still downloading and memory stays bounded.
         """
         stats = {
-            "total_received": len(units_data),
+            "total_received": 0,
             "created": 0,
             "updated": 0,
+            "unchanged": 0,
+            "deleted": 0,
             "skipped": 0,
-            "errors": []
+            "errors": [],
+            "changed_columns": {},
+            "chunks": 0,
         }
 
-        existing_units_map = {
-            u.unit_code: u 
-            for u in Unit.objects.filter(company=company)
-        }
+        # Project names resolved once instead of one query per row (first match wins, as before)
+        projects_by_name = {}
+        for project in Project.objects.order_by("pk"):
+            projects_by_name.setdefault((project.name or "").strip().lower(), project)
 
-        units_to_create = []
-        units_to_update = []
-        
-        for index, row_data in enumerate(units_data):
+        stored_hashes = InventoryDeltaSyncService.load_stored_hashes(company)
+
+        try:
+            for units_data in chunks:
+                offset = stats["total_received"]
+                stats["total_received"] += len(units_data)
+                stats["chunks"] += 1
+
+                rows = UnitWarehouseService._prepare_rows(units_data, projects_by_name, stats, offset)
+
+                try:
+                    delta = InventoryDeltaSyncService.apply(
+                        company=company, rows=rows, full=full, stored_hashes=stored_hashes
+                    )
+                except Exception as e:
+                    return {"success": False, "error": f"Database Commit Failed: {str(e)}", "stats": stats}
+
+                stats["created"] += delta.created
+                stats["updated"] += delta.updated
+                stats["unchanged"] += delta.unchanged
+                stats["skipped"] += delta.skipped
+                stats["errors"].extend(delta.errors)
+                for col, count in delta.changed_columns.items():
+                    stats["changed_columns"][col] = stats["changed_columns"].get(col, 0) + count
+
+        except Exception as e:
+            # the source failed mid-stream: chunks already merged stay committed
+            traceback.print_exc()
+            return {"success": False, "error": str(e), "stats": stats}
+
+        return {"success": True, "message": "Import completed successfully", "stats": stats}
+
+    @staticmethod
+    def _prepare_rows(units_data: List[Dict[str, Any]], projects_by_name: Dict[str, Project], stats: Dict[str, Any], offset: int = 0) -> Dict[str, Dict[str, Any]]:
+        rows: Dict[str, Dict[str, Any]] = {}
+
+        for index, row_data in enumerate(units_data, start=offset):
             try:
                 unit_code = str(row_data.get("unit_code", "")).strip()
                 if not unit_code:
@@ -152,64 +223,22 @@ class UnitWarehouseService:
                     continue
 
                 clean_data = UnitWarehouseService._clean_row_data(row_data)
-                clean_data['company'] = company
+                clean_data.pop("unit_code", None)
                 # clean_data['source'] = source_label # Uncomment if you have a 'source' field on Unit
 
                 # Resolve Project Link
                 if 'project' in clean_data and isinstance(clean_data['project'], str):
-                    proj_name = clean_data['project']
-                    project_obj = Project.objects.filter(name__iexact=proj_name).first()
-                    # Fallback: check if project belongs to this company specifically if needed
+                    project_obj = projects_by_name.get(clean_data['project'].strip().lower())
                     if project_obj:
                         clean_data['project_company'] = project_obj
 
-                if unit_code in existing_units_map:
-                    # UPDATE
-                    existing_unit = existing_units_map[unit_code]
-                    has_changes = False
-                    
-                    for field, new_value in clean_data.items():
-                        if field == 'unit_code': continue
-                        
-                        if new_value is not None: 
-                            current_val = getattr(existing_unit, field, None)
-                            if str(current_val) != str(new_value): # String comparison for safety
-                                setattr(existing_unit, field, new_value)
-                                has_changes = True
-                    
-                    if has_changes:
-                        units_to_update.append(existing_unit)
-                        stats["updated"] += 1
-                    else:
-                        stats["skipped"] += 1
-                else:
-                    # CREATE
-                    if 'unit_code' in clean_data: del clean_data['unit_code']
-                    new_unit = Unit(unit_code=unit_code, **clean_data)
-                    units_to_create.append(new_unit)
-                    stats["created"] += 1
+                # Repeated codes merge into one row (later non-empty values win)
+                rows.setdefault(unit_code, {}).update(clean_data)
 
             except Exception as e:
                 stats["errors"].append(f"Row {index}: {str(e)}")
 
-        # Batch Operations
-        SAFE_BATCH_SIZE = 50 
-        try:
-            with transaction.atomic():
-                if units_to_create:
-                    Unit.objects.bulk_create(units_to_create, batch_size=SAFE_BATCH_SIZE)
-                
-                if units_to_update:
-                    # Get fields to update (exclude PK/unique)
-                    update_fields = [f.name for f in Unit._meta.fields if f.name not in ['id', 'unit_code', 'company']]
-                    # Filter update_fields to only those present in our clean data logic if strictly necessary, 
-                    # but bulk_update requires a fixed list. Using all mutable fields is standard.
-                    Unit.objects.bulk_update(units_to_update, fields=update_fields, batch_size=SAFE_BATCH_SIZE)
-                    
-        except Exception as e:
-            return {"success": False, "error": f"Database Commit Failed: {str(e)}", "stats": stats}
-
-        return {"success": True, "message": "Import completed successfully", "stats": stats}
+        return rows
 
     @staticmethod
     def _clean_row_data(row_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+
+from .models import (
+    MarketUnitData, Project, ProjectConfiguration, ProjectWebConfiguration, SalesRequest, SalesRequestAnalytical, Unit,
+)
+from .services.hold_expiry_service import HoldExpiryService
+from .services.market_research_cube_service import MarketResearchCubeService
+from .services.pricing_snapshot_service import PRICING_SNAPSHOT_MODELS, ProjectPricingSnapshotService
+from .services.sales_rollup_service import SalesRollupService
+from .services.unit_snapshot_service import UNIT_SNAPSHOT_MODELS, UnitSnapshotService
+
+
+# ---------------- Pricing snapshot invalidation ----------------
+def invalidate_pricing_snapshot(sender, instance, **kwargs):
+    ProjectPricingSnapshotService.invalidate(ProjectPricingSnapshotService.project_id_for(instance))
+
+    if sender is ProjectConfiguration and kwargs.get("signal") is post_delete:
+        ProjectPricingSnapshotService.forget_config(instance.id)
+
+
+for _model in PRICING_SNAPSHOT_MODELS:
+    post_save.connect(invalidate_pricing_snapshot, sender=_model, dispatch_uid=f"pricing_snapshot_save_{_model.__name__}")
+    post_delete.connect(invalidate_pricing_snapshot, sender=_model, dispatch_uid=f"pricing_snapshot_delete_{_model.__name__}")
+
+
+# ---------------- Hold expiry timestamps ----------------
+def sync_sales_request_expiry(sender, instance, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not ({"date", "extended_minutes", "unit", "company"} & set(update_fields)):
+        return
+
+    expires_at = HoldExpiryService.compute_expires_at(instance)
+    if expires_at != instance.expires_at:
+        SalesRequest.objects.filter(pk=instance.pk).update(expires_at=expires_at)
+        instance.expires_at = expires_at
+
+
+def refresh_project_hold_expiry(sender, instance, **kwargs):
+    project_id = instance.project_id
+
+    def _refresh():
+        project = Project.objects.filter(pk=project_id).first()
+        if project:
+            HoldExpiryService.refresh_for_project(project)
+
+    transaction.on_commit(_refresh)
+
+
+post_save.connect(sync_sales_request_expiry, sender=SalesRequest, dispatch_uid="hold_expiry_sales_request_save")
+for _model in (ProjectConfiguration, ProjectWebConfiguration):
+    post_save.connect(refresh_project_hold_expiry, sender=_model, dispatch_uid=f"hold_expiry_save_{_model.__name__}")
+    post_delete.connect(refresh_project_hold_expiry, sender=_model, dispatch_uid=f"hold_expiry_delete_{_model.__name__}")
+
+
+# ---------------- Unit snapshot invalidation ----------------
+def bump_inventory_version(sender, instance, **kwargs):
+    UnitSnapshotService.bump(UnitSnapshotService.company_id_for(instance))
+
+
+for _model in UNIT_SNAPSHOT_MODELS:
+    post_save.connect(bump_inventory_version, sender=_model, dispatch_uid=f"unit_snapshot_save_{_model.__name__}")
+    if _model is not Unit:
+        # a Unit post_delete receiver would turn every bulk unit delete into a per-row delete;
+        # the unit delete paths (sync, CSV replace, import hub) bump explicitly instead
+        post_delete.connect(bump_inventory_version, sender=_model, dispatch_uid=f"unit_snapshot_delete_{_model.__name__}")
+
+
+# ---------------- Sales rollups ----------------
+def remember_sales_rollup_key(sender, instance, **kwargs):
+    # the stored company-day, so a save that moves the row also refreshes the day it left
+    update_fields = kwargs.get("update_fields")
+    if instance.pk is None or (update_fields is not None and not ({"date", "company"} & set(update_fields))):
+        instance._rollup_key_before = None
+        return
+    instance._rollup_key_before = SalesRollupService.stored_key(instance.pk)
+
+
+def refresh_sales_rollup(sender, instance, **kwargs):
+    keys = [SalesRollupService.key_for(instance)]
+    previous = getattr(instance, "_rollup_key_before", None)
+    if previous is not None:
+        keys.append(previous)
+    SalesRollupService.schedule_refresh(keys)
+
+
+# bulk_create (hold expiry) fires no post_save: that writer schedules its own refresh
+pre_save.connect(remember_sales_rollup_key, sender=SalesRequestAnalytical, dispatch_uid="sales_rollup_pre_save")
+post_save.connect(refresh_sales_rollup, sender=SalesRequestAnalytical, dispatch_uid="sales_rollup_save")
+post_delete.connect(refresh_sales_rollup, sender=SalesRequestAnalytical, dispatch_uid="sales_rollup_delete")
+
+
+# ---------------- Market research cube ----------------
+def refresh_market_cube(sender, instance, **kwargs):
+    MarketResearchCubeService.schedule_refresh([instance.project_name])
+
+
+post_save.connect(refresh_market_cube, sender=MarketUnitData, dispatch_uid="market_cube_save")
+post_delete.connect(refresh_market_cube, sender=MarketUnitData, dispatch_uid="market_cube_delete")
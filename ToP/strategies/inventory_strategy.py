@@ -1,8 +1,7 @@
-import requests
 from ..models import Unit
 
 from ..services.erp_leads_mapping_service import ERPLeadsMappingService
-from ..utils.erp_mapping_utils import apply_header_mapping
+from ..utils.integration_clients_utils import integration_clients
 
 # ==========================================
 # STRATEGY PATTERN IMPLEMENTATION
@@ -37,13 +36,11 @@ class InventoryStrategy:
                 headers["Authorization"] = f"Bearer {self.company.erp_url_leads_key}"
                 headers["x-api-key"] = self.company.erp_url_leads_key
 
-            response = requests.get(url, headers=headers, timeout=10)
+            response = integration_clients.session(self.company, "erp").get(url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
-                custom_map = ERPLeadsMappingService.get_mapping_dict(company=self.company)
-                if custom_map:
-                    data = apply_header_mapping(data, custom_map)
+                data = ERPLeadsMappingService.get_header_mapper(company=self.company).apply(data)
                 return data
             
         except Exception as e:
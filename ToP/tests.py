@@ -1,3 +1,242 @@
+import contextlib
+import io
+import math
+from datetime import date
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .models import (
+    Company,
+    Constraints,
+    Project,
+    ProjectConfiguration,
+    ProjectExtendedPayments,
+    ProjectWebConfiguration,
+    SalesRequest,
+    SalesRequestAnalytical,
+    Unit,
+    User,
+)
+from .services.import_hub_service import ImportHubService
+from .services.top_calculation_service import TopCalculationService
+
+
+# =====================================================
+# TopCalculationService.calculate_many
+# =====================================================
+
+class CalculateManyTests(TestCase):
+    """ calculate_many must price every unit x scheme x tenor exactly like per-unit calculate. """
+
+    SCHEMES = ["Flat", "Bullet"]
+    TENORS = [1, 3, 5, 8, 9]          # 9 is above max_tenor_years
+    MISSING_PLAN = ("bullet", 5)      # no extended payments row -> not priceable
+    CONTRACT_DATE = "2026-10-17"
+
+    def setUp(self):
+        cache.clear()
+        company = Company.objects.create(name="C")
+        project = Project.objects.create(company=company, name="P")
+        self.config = ProjectConfiguration.objects.create(
+            project=project,
+            interest_rate="0.25",
+            base_dp="0.10",
+            base_tenor_years=4,
+            max_tenor_years=8,
+            base_payment_frequency="quarterly",
+            use_static_base_npv=False,
+        )
+        Constraints.objects.create(project_config=self.config, max_discount="0.10")
+        ProjectWebConfiguration.objects.create(
+            project=project,
+            show_additional_discount=True,
+            additional_discount="2.5",
+            dp_for_additional_discount=10,
+            real_discount=False,
+            show_payment_scheme=True,
+        )
+
+        for scheme in ("flat", "bullet"):
+            for year in range(1, 9):
+                if (scheme, year) == self.MISSING_PLAN:
+                    continue
+                row = {"dp1": 0.05, "dp2": 0.05, "cumulative_dp1": 0.05, "cumulative_dp2": 0.10}
+                cumulative = 0.10
+                for i in range(1, 49):
+                    value = 0.9 / (year * 4) if i <= year * 4 else 0
+                    if scheme == "bullet" and i % 4 == 0 and i <= year * 4:
+                        value *= 1.3
+                    cumulative = min(1.0, cumulative + value)
+                    row[f"installment_{i}"] = value
+                    row[f"cumulative_{i}"] = cumulative
+                ProjectExtendedPayments.objects.create(project=project, year=year, scheme=scheme, **row)
+
+        self.units = [
+            Unit.objects.create(
+                unit_code=f"U{i}",
+                project="P",
+                project_company=project,
+                company=company,
+                interest_free_unit_price=price,
+                development_delivery_date=date(2029, 3, 31),
+            )
+            for i, price in enumerate([1_250_000, 7_654_321, 42_000_000])
+        ]
+
+    def _calculate(self, unit, scheme, tenor):
+        data = {
+            "unit_base_price": str(unit.interest_free_unit_price),
+            "project_config_interest_rate": "0.25000",
+            "project_config_base_dp": "0.10000",
+            "project_config_base_tenor": "4",
+            "project_config_max_tenor": "8",
+            "project_config_payment_frequency": "Quarterly",
+            "project_config_default_scheme": scheme,
+            "project_constraints_max_discount": "0.10000",
+            "unit_maintenance_percent": "",
+            "unit_code": unit.unit_code,
+            "currency_rate": "1",
+            "tenor_years": str(tenor),
+            "project_config_id": str(self.config.id),
+            "delivery_date": "March 31, 2029",
+            "dp": "0.1",
+            "contract_date": self.CONTRACT_DATE,
+            "special_offers": "",
+            "project_config_static_npv": "False",
+            "installment_data": "[]",
+            "indixes": "[]",
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            return TopCalculationService.calculate(user=None, data=data)
+
+    def _calculate_many(self, units):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return TopCalculationService.calculate_many(
+                units=units,
+                tenors=self.TENORS,
+                schemes=self.SCHEMES,
+                project_config=self.config,
+                contract_date=self.CONTRACT_DATE,
+            )
+
+    def test_matches_per_unit_calculate(self):
+        batch = self._calculate_many(self.units)
+
+        for u_idx, unit in enumerate(self.units):
+            for s_idx, scheme in enumerate(self.SCHEMES):
+                for t_idx, tenor in enumerate(self.TENORS):
+                    if (scheme.lower(), tenor) == self.MISSING_PLAN:
+                        continue
+
+                    single = self._calculate(unit, scheme, tenor)
+                    if single.get("tenor_years_error"):
+                        self.assertFalse(batch["valid"][s_idx, t_idx])
+                        self.assertTrue(math.isnan(batch["price_with_interest"][u_idx, s_idx, t_idx]))
+                        continue
+
+                    self.assertTrue(batch["valid"][s_idx, t_idx])
+                    self.assertEqual(single["price_with_interest"], batch["price_with_interest"][u_idx, s_idx, t_idx])
+                    self.assertEqual(single["percentage_change"], batch["percentage_change"][s_idx, t_idx])
+                    self.assertEqual(single["new_npv"], batch["new_npv"][s_idx, t_idx])
+                    self.assertEqual(single["delivery_payment_index"], batch["delivery_payment_index"][u_idx])
+
+    def test_invalid_combinations_are_nan(self):
+        batch = self._calculate_many(self.units)
+
+        s_idx = self.SCHEMES.index("Bullet")
+        t_idx = self.TENORS.index(self.MISSING_PLAN[1])
+        above_max = self.TENORS.index(9)
+
+        for s, t in ((s_idx, t_idx), (0, above_max), (1, above_max)):
+            self.assertFalse(batch["valid"][s, t])
+            self.assertTrue(math.isnan(batch["new_npv"][s, t]))
+            self.assertTrue(math.isnan(batch["percentage_change"][s, t]))
+            self.assertTrue(all(math.isnan(v) for v in batch["price_with_interest"][:, s, t]))
+        self.assertEqual(int(batch["valid"].sum()), len(self.SCHEMES) * (len(self.TENORS) - 1) - 1)
+
+    def test_no_units(self):
+        for config in (self.config, None):
+            with contextlib.redirect_stdout(io.StringIO()):
+                batch = TopCalculationService.calculate_many(
+                    units=[], tenors=self.TENORS, schemes=self.SCHEMES, project_config=config
+                )
+
+            shape = (len(self.SCHEMES), len(self.TENORS))
+            self.assertEqual(batch["unit_codes"], [])
+            self.assertEqual(batch["valid"].shape, shape)
+            self.assertFalse(batch["valid"].any())
+            self.assertEqual(batch["new_npv"].shape, shape)
+            self.assertEqual(batch["price_with_interest"].shape, (0,) + shape)
+            self.assertEqual(batch["delivery_payment_index"], [])
+
+
+# =====================================================
+# ImportHubService.rename_units_bulk
+# =====================================================
+
+class RenameUnitsTests(TestCase):
+    """ Chains, cycles and no-ops in the rename CSV, checked against the final unit rows. """
+
+    def setUp(self):
+        self.company = Company.objects.create(name="C")
+        for code in ("A", "B", "X", "Y"):
+            Unit.objects.create(unit_code=code, company=self.company, project="P", status="Available", city=code)
+
+        sales_man = User.objects.create(email="s@example.com", full_name="S")
+        SalesRequest.objects.create(unit_id="A", company=self.company, sales_man=sales_man, client_id="1")
+        SalesRequestAnalytical.objects.create(unit_code="B", company=self.company, sales_man=sales_man, client_id="1")
+
+    def _rename(self, pairs):
+        csv_file = io.BytesIO(
+            ("Old Unit Code,New Unit Code\n" + "\n".join(f"{old},{new}" for old, new in pairs)).encode()
+        )
+        result = ImportHubService.rename_units_bulk(self.company.id, csv_file)
+        self.assertTrue(result["success"])
+        return result["stats"]
+
+    def _cities(self):
+        """ unit_code -> city; city holds the original code, so it follows the row through renames. """
+        return dict(Unit.objects.filter(company=self.company).values_list("unit_code", "city"))
+
+    def test_chain_is_applied_tail_first(self):
+        stats = {"skipped_cycle": 0, "skipped_duplicate": 0, "skipped_not_found": 0, "errors": []}
+        waves = ImportHubService._plan_renames(self.company, [(1, "A", "B"), (2, "B", "C")], stats)
+        self.assertEqual(waves, [[("B", "C")], [("A", "B")]])
+
+        stats = self._rename([("A", "B"), ("B", "C")])
+
+        self.assertEqual(stats["renamed"], 2)
+        self.assertEqual(stats["errors"], [])
+        self.assertEqual(self._cities(), {"B": "A", "C": "B", "X": "X", "Y": "Y"})
+        self.assertEqual(SalesRequest.objects.get().unit_id, "B")
+        self.assertEqual(SalesRequestAnalytical.objects.get().unit_code, "C")
+
+    def test_swap_cycle_is_skipped(self):
+        stats = self._rename([("X", "Y"), ("Y", "X")])
+
+        self.assertEqual(stats["renamed"], 0)
+        self.assertEqual(stats["skipped_cycle"], 2)
+        self.assertEqual(len(stats["errors"]), 2)
+        self.assertEqual(self._cities(), {"A": "A", "B": "B", "X": "X", "Y": "Y"})
+
+    def test_cycle_does_not_block_its_tail(self):
+        # Z -> X hangs off the X <-> Y cycle: X never frees up, so Z is a collision, not a rename
+        Unit.objects.create(unit_code="Z", company=self.company, project="P", status="Available", city="Z")
+        stats = self._rename([("X", "Y"), ("Y", "X"), ("Z", "X"), ("A", "M")])
+
+        self.assertEqual(stats["renamed"], 1)
+        self.assertEqual(stats["skipped_cycle"], 2)
+        self.assertEqual(stats["skipped_duplicate"], 1)
+        self.assertEqual(
+            self._cities(), {"M": "A", "B": "B", "X": "X", "Y": "Y", "Z": "Z"}
+        )
+
+    def test_no_op_rename(self):
+        stats = self._rename([("A", "A")])
+
+        self.assertEqual(stats["processed"], 1)
+        self.assertEqual(stats["renamed"], 0)
+        self.assertEqual(stats["errors"], [])
+        self.assertEqual(self._cities(), {"A": "A", "B": "B", "X": "X", "Y": "Y"})
+        self.assertEqual(SalesRequest.objects.get().unit_id, "A")
@@ -10,6 +10,7 @@ urlpatterns = [
     path('create-project/', views.create_project, name='create_project'),
     path('create-company/', views.create_company, name='create_company'),
     path('submit-data/', views.submit_data, name='submit_data'),
+    path('api/pricing-traces/', views.pricing_traces, name='pricing_traces'),
     path('login/', views.login, name = "login"),
     path('logout/', views.logout, name = "logout"),
     path('change-password/', views.change_password, name='change_password'),
@@ -63,6 +64,7 @@ urlpatterns = [
 
     path('sales-dashboard/', views.sales_dashboard, name='sales_dashboard'),
     path('api/sales-data/', views.sales_data_api, name='api_sales_data'),
+    path('api/sales-data/summary/', views.sales_summary_api, name='api_sales_summary'),
     path('api/get-projects-salesmen/', views.get_projects_salesmen, name='api_get_projects_salesmen'),
     
     path('import-company-users/', views.import_company_users, name='import_company_users'),
@@ -156,12 +158,14 @@ urlpatterns = [
     path('employees-attendance/', views.attendance_capture_view, name='attendance_capture_view'),
     
     path('employees-attendance-management/', views.management_dashboard_view, name='management_dashboard_view'),
+    path('employees-attendance-management/data/', views.management_dashboard_data, name='management_dashboard_data'),
     path('employees-attendance/delete/', views.delete_attendance_log, name='delete_attendance_log'),
     path('employees-attendance-management/cleanup/', views.cleanup_images_view, name='cleanup_images_view'),
     
     
     path("historical-sales-requests-analysis/",views.historical_sales_requests_analysis_page,name="historical_sales_requests_analysis_page"),
     path("historical-sales-requests-analysis/data/",views.historical_sales_requests_analysis_data,name="historical_sales_requests_analysis_data"),
+    path("historical-sales-requests-analysis/export/",views.historical_sales_requests_analysis_export,name="historical_sales_requests_analysis_export"),
     
     path('import-hub/', views.import_hub, name='import_hub'),
     path('import-hub/trigger/', views.trigger_unified_import, name='trigger_unified_import'),
@@ -194,6 +198,8 @@ urlpatterns = [
     
     path("pivot/units/", views.pivot_units_builder, name="pivot_units_builder"),
     path("pivot/units/data/<int:company_id>/", views.pivot_units_data, name="pivot_units_data"),
+    path("pivot/units/aggregate/<int:company_id>/", views.pivot_units_aggregate, name="pivot_units_aggregate"),
+    path("pivot/units/values/<int:company_id>/", views.pivot_units_field_values, name="pivot_units_field_values"),
     path("pivot/units/send-managers/<int:company_id>/", views.pivot_units_send_managers, name="pivot_units_send_managers"),
 
     path("pivot/units/managers/", views.pivot_units_managers, name="pivot_units_managers"),
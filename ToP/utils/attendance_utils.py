@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import base64
+from datetime import date
+from typing import Optional, Tuple
+
+from django.utils.dateparse import parse_date
+
+
+def parse_day(value: Optional[str]) -> Optional[date]:
+    """ "YYYY-MM-DD" from a date input, or None when empty / invalid. """
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+# -----------------------------
+# Keyset cursor (day DESC, user DESC)
+# -----------------------------
+def encode_attendance_cursor(day: date, user_id: int) -> str:
+    raw = f"{day.isoformat()}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_attendance_cursor(cursor: str) -> Optional[Tuple[date, int]]:
+    """ (day, user id) of the last row already sent, or None when the cursor is malformed. """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        day_raw, user_raw = raw.split("|", 1)
+        day = parse_date(day_raw)
+        return (day, int(user_raw)) if day else None
+    except (ValueError, UnicodeError):
+        return None
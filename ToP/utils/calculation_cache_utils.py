@@ -0,0 +1,88 @@
+# ToP/utils/calculation_cache_utils.py
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+from django.conf import settings
+
+
+DEFAULT_MAXSIZE = 2048
+DEFAULT_TTL_SECONDS = 300
+
+
+def canonical_calculation_key(parsed: Dict[str, Any], project_id, snapshot_version) -> str:
+    """
+    Stable hash of the parsed calculation inputs + the project's snapshot version.
+    The installment dict has int keys, so it is hashed as a sorted list of pairs.
+    """
+    payload = dict(parsed)
+    payload["installment_percentages_dict"] = sorted(
+        parsed.get("installment_percentages_dict", {}).items(),
+        key=lambda kv: str(kv[0]),
+    )
+    payload["__project_id"] = project_id
+    payload["__snapshot_version"] = snapshot_version
+
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class CalculationResultCache:
+    """
+    In-process LRU + TTL cache for TopCalculationService results.
+
+    - get()/set() deep-copy so callers can never mutate a cached result.
+    - stats() exposes hit/miss counters.
+    Entries go stale automatically when the project's snapshot version changes
+    (the version is part of the key), TTL only bounds memory.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: int = DEFAULT_TTL_SECONDS):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+            }
+
+
+calculation_result_cache = CalculationResultCache(
+    maxsize=getattr(settings, "TOP_CALCULATION_CACHE_SIZE", DEFAULT_MAXSIZE),
+    ttl=getattr(settings, "TOP_CALCULATION_CACHE_TTL", DEFAULT_TTL_SECONDS),
+)
@@ -1,8 +1,8 @@
 # ToP/utils/csv_inventory_utils.py
 
 import csv
-from io import StringIO
-from typing import Dict, Any, List, Optional
+from io import TextIOWrapper
+from typing import Dict, Any, Iterator, Optional
 
 import pandas as pd
 from django.core.cache import cache
@@ -85,8 +85,8 @@ def progress_set_processing(task_id: str, *, index: int, total_rows: int, every:
         cache.set(task_id, {"status": "processing", "progress": progress}, timeout=timeout)
 
 
-def progress_set_completed(task_id: str, timeout: int = 300):
-    cache.set(task_id, {"status": "completed", "progress": 100}, timeout=timeout)
+def progress_set_completed(task_id: str, result: Optional[Dict[str, Any]] = None, timeout: int = 300):
+    cache.set(task_id, {"status": "completed", "progress": 100, **(result or {})}, timeout=timeout)
 
 
 def progress_set_error(task_id: str, error: str, timeout: int = 300):
@@ -119,12 +119,17 @@ def validate_csv_file_or_response(csv_file):
 # CSV reading + row normalization
 # ==========================================
 
-def read_csv_rows(file_path: str) -> List[Dict[str, Any]]:
-    with default_storage.open(file_path) as f:
-        content = f.read().decode("utf-8-sig")
+def iter_csv_rows(file_path: str) -> Iterator[Dict[str, Any]]:
+    """ Streams DictReader rows (utf-8-sig) without loading the whole file. """
+    with default_storage.open(file_path, "rb") as f:
+        yield from csv.DictReader(TextIOWrapper(f, encoding="utf-8-sig", newline=""))
 
-    reader = csv.DictReader(StringIO(content))
-    return list(reader)
+
+def count_csv_rows(file_path: str) -> int:
+    """ Data rows of a CSV (blank lines skipped, like DictReader), counted in one streaming pass. """
+    with default_storage.open(file_path, "rb") as f:
+        rows = sum(1 for row in csv.reader(TextIOWrapper(f, encoding="utf-8-sig", newline="")) if row)
+    return max(rows - 1, 0)
 
 
 def normalize_row(row: Dict[str, Any]) -> Dict[str, str]:
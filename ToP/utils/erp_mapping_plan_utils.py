@@ -0,0 +1,314 @@
+# ToP/utils/erp_mapping_plan_utils.py
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+from .csv_inventory_utils import convert_date_format
+from .erp_mapping_utils import normalize_header
+
+
+# =====================================================
+# ERP -> Unit field aliases (checked in order, first non-None wins)
+# =====================================================
+
+ERP_UNIT_FIELD_ALIASES = (
+    # Primary Key & Basics
+    ("unit_code", ("unit_code", "unitCode", "Unit Code", "id", "Code", "code")),
+    ("city", ("city", "City", "location")),
+    ("project", ("project", "Project", "project_name", "projectName")),
+
+    # Phasing & Type
+    ("sales_phasing", ("sales_phasing", "salesPhasing", "Sales Phasing", "phase")),
+    ("construction_phasing", ("construction_phasing", "constructionPhasing", "Construction Phasing")),
+    ("handover_phasing", ("handover_phasing", "handoverPhasing", "Handover Phasing")),
+    ("plot_type", ("plot_type", "plotType", "Plot Type")),
+    ("building_style", ("building_style", "buildingStyle", "Bld. Style")),
+    ("building_type", ("building_type", "buildingType", "Bld. Type")),
+    ("unit_type", ("unit_type", "unitType", "Unit Type", "type")),
+
+    # Specs
+    ("num_bedrooms", ("num_bedrooms", "bedrooms", "Num Bedrooms", "Bedrooms")),
+    ("num_bathrooms", ("num_bathrooms", "bathrooms", "Num Bathrooms", "Bathrooms")),
+    ("num_parking_slots", ("num_parking_slots", "parking_slots", "No. of Parking Slots")),
+
+    # Areas
+    ("footprint", ("footprint", "Foot print")),
+    ("net_area", ("net_area", "netArea", "Unit Area (Net Area)")),
+    ("gross_area", ("sellable_area", "gross_area", "sellableArea", "Gross Area", "Sellable Area")),
+    ("total_area", ("total_area", "totalArea", "Total Area")),
+    ("internal_area", ("internal_area", "internalArea", "Internal Area")),
+    ("covered_terraces", ("covered_terraces", "coveredTerraces", "Covered Terraces")),
+    ("uncovered_terraces", ("uncovered_terraces", "uncoveredTerraces", "Uncovered Terraces")),
+    ("penthouse_area", ("penthouse_area", "penthouseArea", "Penthouse Area")),
+    ("garage_area", ("garage_area", "garageArea", "Garage Area")),
+    ("basement_area", ("basement_area", "basementArea", "Basement Area")),
+    ("common_area", ("common_area", "commonArea", "Common Area")),
+    ("roof_pergola_area", ("roof_pergola_area", "roofPergolaArea", "Roof Pergola Area")),
+    ("roof_terraces_area", ("roof_terraces_area", "roofTerracesArea", "Roof Terraces Area")),
+    ("bua", ("bua", "BUA", "B.U.A.")),
+    ("land_area", ("land_area", "landArea", "Land Area")),
+    ("garden_area", ("garden_area", "gardenArea", "Garden Area")),
+
+    # Pricing (Base)
+    ("base_price", ("base_price", "basePrice", "Unit Base Price", "price", "list_price")),
+    ("cash_price", ("cash_price", "cashPrice", "Cash Price")),
+    ("final_price", ("final_price", "finalPrice")),
+    ("discount", ("discount",)),
+
+    # Maintenance & Extras
+    ("maintenance_percent", ("maintenance_percent", "maintenancePercent", "Maintenance %")),
+    ("maintenance_value", ("maintenance_value", "maintenanceValue", "Maintenance Value")),
+    ("gas", ("gas", "Gas")),
+    ("parking_price", ("parking_price", "parkingPrice", "Parking Price")),
+    ("club", ("club", "Club")),
+
+    # Status
+    ("status", ("status", "Status", "availability")),
+    ("blocking_reason", ("blocking_reason", "blockingReason", "Blocking Reason")),
+
+    # --- DATES (Converted) ---
+    ("contract_date", ("contract_date", "contractDate", "Contract Date")),
+    ("delivery_date", ("delivery_date", "deliveryDate", "Delivery Date")),
+    ("release_date", ("release_date", "releaseDate", "Release Date")),
+    ("blocking_date", ("blocking_date", "blockingDate", "Blocking Date")),
+    ("reservation_date", ("reservation_date", "reservationDate", "Reservation Date")),
+    ("contract_delivery_date", ("contract_delivery_date", "contractDeliveryDate", "Contract Delivery Date")),
+    ("construction_delivery_date", ("construction_delivery_date", "constructionDeliveryDate", "Construction Delivery Date")),
+    ("development_delivery_date", ("development_delivery_date", "developmentDeliveryDate", "Development Delivery Date")),
+    ("client_handover_date", ("client_handover_date", "clientHandoverDate", "Client Handover Date")),
+
+    # Detailed Specs / Additional Fields
+    ("unit_model", ("unit_model", "unitModel", "Unit Model")),
+    ("mirror", ("mirror", "Mirror")),
+    ("unit_position", ("unit_position", "unitPosition", "Unit Position")),
+    ("building_number", ("building_number", "buildingNumber", "Building Number", "building")),
+    ("floor", ("floor", "Floor")),
+    ("sap_code", ("sap_code", "sapCode", "SAP Code")),
+    ("finishing_specs", ("finishing_specs", "finishingSpecs", "Finishing Specs")),
+
+    # PSM
+    ("net_area_psm", ("net_area_psm", "netAreaPSM", "Net Area PSM")),
+    ("base_psm", ("base_psm", "basePSM", "Base PSM")),
+    ("psm", ("psm", "PSM")),
+
+    # Views & Orientation
+    ("main_view", ("main_view", "mainView", "Main View")),
+    ("secondary_view", ("secondary_view", "secondaryView", "Secondary View")),
+    ("levels", ("levels", "Levels")),
+    ("north_breeze", ("north_breeze", "northBreeze", "North Breeze")),
+    ("corners", ("corners", "Corners")),
+    ("accessibility", ("accessibility", "Accessibility")),
+
+    # Premiums
+    ("special_premiums", ("special_premiums", "specialPremiums")),
+    ("special_discounts", ("special_discounts", "specialDiscounts")),
+    ("phasing", ("phasing",)),
+    ("total_premium_percent", ("total_premium_percent", "totalPremiumPercent", "Total Premium %")),
+    ("total_premium_value", ("total_premium_value", "totalPremiumValue", "Total Premium Value")),
+
+    # Payment Plans / Analytics
+    ("interest_free_unit_price", ("interest_free_unit_price", "interestFreeUnitPrice", "Interest Free Unit Price")),
+    ("interest_free_psm", ("interest_free_psm", "interestFreePSM", "Interest Free PSM")),
+    ("interest_free_years", ("interest_free_years", "interestFreeYears", "Interest Free Yrs.")),
+    ("down_payment_percent", ("down_payment_percent", "downPaymentPercent", "Down Payment %")),
+    ("down_payment", ("down_payment", "downPayment", "Down Payment")),
+    ("contract_percent", ("contract_percent", "contractPercent", "Contract %")),
+    ("contract_payment", ("contract_payment", "contractPayment", "Contract Payment")),
+    ("delivery_percent", ("delivery_percent", "deliveryPercent", "Delivery %")),
+    ("delivery_payment", ("delivery_payment", "deliveryPayment", "Delivery Payment")),
+
+    # Contract Details
+    ("contract_payment_plan", ("contract_payment_plan", "contractPaymentPlan")),
+    ("contract_value", ("contract_value", "contractValue")),
+    ("collected_amount", ("collected_amount", "collectedAmount")),
+    ("collected_percent", ("collected_percent", "collectedPercent")),
+    ("grace_period_months", ("grace_period_months", "gracePeriodMonths")),
+
+    # Stakeholders & Analytics
+    ("contractor_type", ("contractor_type", "contractorType")),
+    ("contractor", ("contractor",)),
+    ("customer", ("customer",)),
+    ("broker", ("broker",)),
+    ("bulks", ("bulks",)),
+    ("direct_indirect_sales", ("direct_indirect_sales", "directIndirectSales")),
+    ("sales_value", ("sales_value", "salesValue")),
+    ("area_range", ("area_range", "areaRange")),
+    ("release_year", ("release_year", "releaseYear")),
+    ("sales_year", ("sales_year", "salesYear")),
+    ("adj_status", ("adj_status", "adjStatus")),
+    ("ams", ("ams", "AMS")),
+)
+
+# Fields whose raw value is converted with convert_date_format
+ERP_UNIT_DATE_FIELDS = frozenset({
+    "contract_date",
+    "delivery_date",
+    "release_date",
+    "blocking_date",
+    "reservation_date",
+    "contract_delivery_date",
+    "construction_delivery_date",
+    "development_delivery_date",
+    "client_handover_date",
+})
+
+
+PLAN_CACHE_SIZE = 256
+
+
+# =====================================================
+# Company header mapping (ERPUnit / ERPLeads / ERPHoldPost field mappings)
+# =====================================================
+
+class HeaderMapper:
+    """
+    Compiled form of apply_header_mapping for one company mapping {provided_name: needed_name}.
+    Header normalization runs once per distinct key set instead of once per key per item.
+    """
+
+    def __init__(self, mapping: Dict[str, str]):
+        self.mapping = dict(mapping or {})
+        self._normalized_map = {normalize_header(k): v for k, v in self.mapping.items()}
+        # {needed_name: provided_name}, used to build outgoing payloads (hold / unblock posts)
+        self.inverted = {v: k for k, v in self.mapping.items()}
+        self._renames: Dict[Tuple, Tuple] = {}
+
+    def target_keys(self, keys: Tuple) -> Tuple:
+        renamed = self._renames.get(keys)
+        if renamed is None:
+            renamed = tuple(self._normalized_map.get(normalize_header(k), k) for k in keys)
+            if len(self._renames) < PLAN_CACHE_SIZE:
+                self._renames[keys] = renamed
+        return renamed
+
+    def apply(self, item: Any) -> Any:
+        """ Same result as apply_header_mapping(item, mapping). """
+        if not self.mapping:
+            return item
+
+        if isinstance(item, dict):
+            keys = tuple(item)
+            return {
+                target: (self.apply(v) if isinstance(v, (dict, list)) else v)
+                for target, v in zip(self.target_keys(keys), item.values())
+            }
+
+        if isinstance(item, list):
+            return [self.apply(x) for x in item]
+
+        return item
+
+
+# =====================================================
+# Compiled ERP item -> Unit plan
+# =====================================================
+
+class UnitMappingPlan:
+    """
+    Fixed source-key -> Unit field plan for one (company mapping, item key set).
+
+    For each Unit field only the aliases that exist in the key set are kept, already
+    translated back to the raw ERP key, so mapping an item is one pass over ~100 fields
+    with (almost always) a single dict lookup each.
+    """
+
+    def __init__(self, keys: Tuple, mapper: HeaderMapper):
+        # target (after company mapping) -> raw ERP key; later duplicates win, like dict assignment
+        raw_by_target: Dict[str, str] = {}
+        for raw, target in zip(keys, mapper.target_keys(keys)):
+            raw_by_target[target] = raw
+
+        # values that are nested dict/list still need the company mapping applied inside them
+        self._mapper = mapper if mapper.mapping else None
+
+        self.steps: List[Tuple[str, Tuple[str, ...], bool]] = []
+        for field, aliases in ERP_UNIT_FIELD_ALIASES:
+            sources = tuple(raw_by_target[a] for a in aliases if a in raw_by_target)
+            if sources:
+                self.steps.append((field, sources, field in ERP_UNIT_DATE_FIELDS))
+
+    def apply(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        mapped = {}
+        for field, sources, is_date in self.steps:
+            value = None
+            for raw in sources:
+                value = item[raw]
+                if value is not None:
+                    break
+            if is_date:
+                value = convert_date_format(value)
+            if value is None:
+                continue
+            if self._mapper is not None and isinstance(value, (dict, list)):
+                value = self._mapper.apply(value)
+            mapped[field] = value
+        return mapped
+
+
+def map_erp_unit_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """ Reference (uncompiled) mapping: probes every alias of every field. """
+    mapped = {}
+    for field, aliases in ERP_UNIT_FIELD_ALIASES:
+        value = None
+        for k in aliases:
+            if k in item and item[k] is not None:
+                value = item[k]
+                break
+        if field in ERP_UNIT_DATE_FIELDS:
+            value = convert_date_format(value)
+        if value is not None:
+            mapped[field] = value
+    return mapped
+
+
+# =====================================================
+# Plan cache (per process)
+# =====================================================
+
+class ERPMappingPlanCache:
+    """
+    Caches compiled HeaderMappers per (kind, company, mapping) and UnitMappingPlans
+    per (company, mapping, key-set signature). The mapping contents are part of the
+    key, so editing a company's mapping simply compiles a new plan.
+    """
+
+    def __init__(self, maxsize: int = PLAN_CACHE_SIZE):
+        self._mappers = LRUCache(maxsize=maxsize)
+        self._plans = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _mapping_signature(mapping: Optional[Dict[str, str]]) -> Tuple:
+        return tuple(sorted((mapping or {}).items()))
+
+    def header_mapper(self, kind: str, company_id, mapping: Optional[Dict[str, str]]) -> HeaderMapper:
+        key = (kind, company_id, self._mapping_signature(mapping))
+        with self._lock:
+            mapper = self._mappers.get(key)
+            if mapper is None:
+                mapper = HeaderMapper(mapping or {})
+                self._mappers[key] = mapper
+        return mapper
+
+    def unit_plan(self, company_id, mapping: Optional[Dict[str, str]], keys: Iterable[str]) -> UnitMappingPlan:
+        keys = tuple(keys)
+        mapper = self.header_mapper("unit", company_id, mapping)
+        key = (company_id, self._mapping_signature(mapping), keys)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                plan = UnitMappingPlan(keys, mapper)
+                self._plans[key] = plan
+        return plan
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mappers.clear()
+            self._plans.clear()
+
+
+erp_mapping_plan_cache = ERPMappingPlanCache()
@@ -0,0 +1,160 @@
+# ToP/utils/erp_stream_utils.py
+
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class ERPStreamFormatError(ValueError):
+    pass
+
+
+def iter_text_chunks(byte_chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """ Decodes a byte stream without ever splitting a multi-byte character. """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for chunk in byte_chunks:
+        if chunk:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class JsonArrayStream:
+    """
+    Incrementally yields the items of a JSON array while the body is still downloading.
+
+    Accepted shapes (same as the non-streaming ERP fetch):
+      [ {...}, {...} ]
+      { "results": [ ... ], "next": ... }     (any key in `array_keys`)
+      { ...single object... }                 (yielded as one item)
+
+    Only the current item and the unread tail of the buffer are kept in memory.
+    After iteration, `envelope` holds the non-array keys of an object body
+    (pagination cursors / next links live there).
+    """
+
+    def __init__(self, chunks: Iterable[str], array_keys: Sequence[str] = ("results", "data")):
+        self._chunks = iter(chunks)
+        self._array_keys = tuple(array_keys)
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.envelope: Optional[Dict[str, Any]] = None
+        self.single_object: Optional[Dict[str, Any]] = None
+
+    # -----------------------------
+    # Buffer helpers
+    # -----------------------------
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            return False
+        # drop consumed text so memory stays bounded by one item + one chunk
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        ch = self._peek()
+        if not ch or ch not in chars:
+            raise ERPStreamFormatError(f"ERP response is not valid JSON (expected one of {chars!r}, got {ch!r}).")
+        self._pos += 1
+        return ch
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise ERPStreamFormatError("ERP response ended in the middle of a JSON value.")
+                continue
+            # a bare number touching the end of the buffer may continue in the next chunk
+            if end == len(self._buf) and not self._eof and not isinstance(value, (dict, list, str)):
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+    # -----------------------------
+    # Iteration
+    # -----------------------------
+    def __iter__(self) -> Iterator[Any]:
+        first = self._peek()
+        if first == "[":
+            self._pos += 1
+            yield from self._array_items()
+            return
+        if first != "{":
+            raise ERPStreamFormatError("ERP response format not recognized. Expected list or {'results': []}.")
+
+        self._pos += 1
+        envelope: Dict[str, Any] = {}
+        found_array = False
+
+        if self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                key = self._value()
+                self._expect(":")
+                if not found_array and key in self._array_keys and self._peek() == "[":
+                    self._pos += 1
+                    found_array = True
+                    yield from self._array_items()
+                else:
+                    envelope[key] = self._value()
+                if self._expect(",}") == "}":
+                    break
+
+        if found_array:
+            self.envelope = envelope
+        else:
+            # not an envelope: a single unit object
+            self.single_object = envelope
+            self.envelope = {}
+            yield envelope
+
+    def _array_items(self) -> Iterator[Any]:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """ Groups an iterator into lists of at most `size` items. """
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
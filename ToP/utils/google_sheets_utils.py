@@ -1,20 +1,37 @@
 import logging
+import threading
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
 
 import gspread
+from cachetools import TTLCache
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 
 from ..models import GoogleServiceAccount
+from .integration_clients_utils import integration_clients
 
 
 logger = logging.getLogger(__name__)
 
 
+# Header spellings the sheet may use for the unit code column (first match wins)
+UNIT_CODE_HEADERS = ("Unit Code", "Unit Code ", "UnitCode", "unit_code", "Code")
+
+SHEET_INDEX_CACHE_SIZE = 256
+SHEET_INDEX_TTL_SECONDS = 900
+
+
 def gspread_client(company):
     """
     Returns an authorized gspread client for a company
     using its active GoogleServiceAccount.
+
+    Clients are pooled per company + service-account fingerprint, so the OAuth
+    token is minted once and refreshed by google-auth instead of on every call.
     """
     try:
         service_account = GoogleServiceAccount.objects.get(
@@ -26,6 +43,17 @@ def gspread_client(company):
             f"No active Google Service Account configured for company '{company.name}'"
         )
 
+    key = (
+        "gspread",
+        company.id,
+        service_account.pk,
+        service_account.private_key_id,
+        service_account.updated_at,
+    )
+    return integration_clients.get_or_create(key, lambda: _authorize(service_account))
+
+
+def _authorize(service_account):
     credentials_info = service_account.get_service_account_data()
 
     # Fix multiline private key if stored with escaped newlines
@@ -60,93 +88,238 @@ def resolve_worksheet(sheet, gid=None, title=None):
     return sheet.get_worksheet(0)
 
 
+# =====================================================
+# Write-back index (unit code -> row, header -> column)
+# =====================================================
+
+def _cell_key(value) -> str:
+    return str(value).strip() if value is not None else ""
+
+
+def _trimmed(row: Iterable[Any]) -> List[str]:
+    """ Header row without trailing blanks (the API omits them, get_all_values pads them). """
+    cells = [str(v) for v in row]
+    while cells and not cells[-1].strip():
+        cells.pop()
+    return cells
+
+
+@dataclass
+class SheetIndex:
+    headers: List[str]               # raw header row, trailing blanks trimmed
+    columns: Dict[str, int]          # stripped header -> 1-based column
+    rows: Dict[str, int]             # unit code -> 1-based sheet row
+    unit_code_col: Optional[int]
+
+    @staticmethod
+    def _locate(headers: List[str]):
+        columns: Dict[str, int] = {}
+        for idx, header in enumerate(headers, start=1):
+            columns.setdefault(header.strip(), idx)
+
+        unit_code_col = None
+        for name in UNIT_CODE_HEADERS:
+            if name in headers:
+                unit_code_col = headers.index(name) + 1
+                break
+        return columns, unit_code_col
+
+    @classmethod
+    def from_values(cls, values: List[List[Any]]) -> "SheetIndex":
+        """ Built from ws.get_all_values() (header row + data rows). """
+        headers = _trimmed(values[0]) if values else []
+        columns, unit_code_col = cls._locate(headers)
+
+        rows: Dict[str, int] = {}
+        if unit_code_col:
+            for row_idx, row in enumerate(values[1:], start=2):
+                code = _cell_key(row[unit_code_col - 1]) if len(row) >= unit_code_col else ""
+                if code:
+                    rows.setdefault(code, row_idx)
+        return cls(headers=headers, columns=columns, rows=rows, unit_code_col=unit_code_col)
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "SheetIndex":
+        """ Built from the ws.get_all_records() a sync already fetched (no extra API call). """
+        headers = _trimmed(records[0].keys()) if records else []
+        columns, unit_code_col = cls._locate(headers)
+
+        rows: Dict[str, int] = {}
+        for row_idx, record in enumerate(records, start=2):  # start=2 because header row
+            code = _cell_key(next((record.get(k) for k in UNIT_CODE_HEADERS if record.get(k)), ""))
+            if code:
+                rows.setdefault(code, row_idx)
+        return cls(headers=headers, columns=columns, rows=rows, unit_code_col=unit_code_col)
+
+
+class SheetIndexCache:
+    """
+    Per-worksheet SheetIndex, keyed by company + sheet location so pointing a company
+    at another sheet never reuses an old index. Primed by the inventory syncs and
+    verified cheaply before every write (see write_unit_updates).
+    """
+
+    def __init__(self, maxsize: int = SHEET_INDEX_CACHE_SIZE, ttl: int = SHEET_INDEX_TTL_SECONDS):
+        self._indexes = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(company):
+        return (company.id, company.google_sheet_url, company.google_sheet_gid, company.google_sheet_title)
+
+    def get(self, company) -> Optional[SheetIndex]:
+        with self._lock:
+            return self._indexes.get(self._key(company))
+
+    def set(self, company, index: SheetIndex) -> None:
+        with self._lock:
+            self._indexes[self._key(company)] = index
+
+    def prime(self, company, records: List[Dict[str, Any]]) -> None:
+        self.set(company, SheetIndex.from_records(records))
+
+    def invalidate(self, company) -> None:
+        with self._lock:
+            self._indexes.pop(self._key(company), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+sheet_index_cache = SheetIndexCache(
+    ttl=getattr(settings, "GOOGLE_SHEET_INDEX_TTL_SECONDS", SHEET_INDEX_TTL_SECONDS),
+)
+
+
+def _verified_index(company, ws, unit_codes: List[str]) -> SheetIndex:
+    """
+    Returns the cached index if one batch_get (header row + the target unit code cells)
+    confirms it still matches the sheet; otherwise rebuilds it with a single get_all_values().
+    """
+    index = sheet_index_cache.get(company)
+
+    if index and index.unit_code_col and all(code in index.rows for code in unit_codes):
+        target_rows = [index.rows[code] for code in unit_codes]
+        ranges = ["1:1"] + [rowcol_to_a1(row, index.unit_code_col) for row in target_rows]
+        try:
+            results = ws.batch_get(ranges)
+        except Exception:
+            results = None
+
+        if results is not None and len(results) == len(ranges):
+            header_row = results[0][0] if results[0] else []
+            found_codes = [_cell_key(r[0][0]) if r and r[0] else "" for r in results[1:]]
+            if _trimmed(header_row) == index.headers and found_codes == list(unit_codes):
+                return index
+
+        logger.debug(f"Google Sheet index for company '{company.name}' is stale, rebuilding")
+
+    index = SheetIndex.from_values(ws.get_all_values())
+    sheet_index_cache.set(company, index)
+    return index
+
+
+def write_unit_updates(company, updates: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Writes {unit_code: {column header: value}} for one or many units with a single
+    batch_update (USER_ENTERED, same as update_cell). Unknown units / columns are skipped
+    and reported back: {"updated": [...], "missing_units": [...], "missing_columns": [...]}.
+    """
+    updates = {_cell_key(code): values for code, values in updates.items() if _cell_key(code)}
+    result = {"updated": [], "missing_units": [], "missing_columns": []}
+    if not updates:
+        return result
+
+    gc = gspread_client(company)
+    sh = gc.open_by_url(company.google_sheet_url)
+    ws = resolve_worksheet(sh, company.google_sheet_gid, company.google_sheet_title)
+
+    index = _verified_index(company, ws, list(updates))
+
+    data = []
+    for unit_code, values in updates.items():
+        row = index.rows.get(unit_code)
+        if not row:
+            result["missing_units"].append(unit_code)
+            continue
+
+        for column_name, new_value in values.items():
+            col = index.columns.get(column_name.strip())
+            if not col:
+                if column_name not in result["missing_columns"]:
+                    result["missing_columns"].append(column_name)
+                continue
+            data.append({"range": rowcol_to_a1(row, col), "values": [[new_value]]})
+        result["updated"].append(unit_code)
+
+    if data:
+        ws.batch_update(data, raw=False)
+    return result
+
+
 # ---------------------------------------------- Update all sales data in Google Sheet for the approved sales request
+def build_sales_data_updates(sales_request, cached_data) -> Dict[str, Any]:
+    """ Sheet columns written when a sales request is approved. """
+    today = datetime.now()
+    reservation_date = f"{today.month}/{today.day}/{today.year}"
+
+    # Keep the same logic you had (index [0] is expected to exist)
+    if cached_data.get("payments", "")[0] == 100:
+        contract_payment_plan = "Cash"
+    else:
+        contract_payment_plan = f"{cached_data.get('tenor_years', '')} Yrs"
+
+    return {
+        "Status": "Reserved",
+        "Salesman Name": sales_request.sales_man.full_name if sales_request.sales_man else "Unknown",
+        "Salesman Email": sales_request.sales_man.email if sales_request.sales_man else "",
+        "Client Id": sales_request.client_id,
+        "Client Phone Number": sales_request.client_phone_number or "",
+        "Sales Value": cached_data.get("final_price", ""),
+        "Currency": cached_data.get("selected_currency_name", ""),
+        "Contract Payment Plan": contract_payment_plan,
+        "Reservation Date": reservation_date
+    }
+
+
 def update_google_sheet_sales_data(company, sales_request, cached_data):
     """
-    Update all sales data in Google Sheet for the approved sales request.
-    (Logic preserved from your helper, but now uses gspread_client + resolve_worksheet in this module.)
+    Update all sales data in Google Sheet for the approved sales request
+    (one batched write through write_unit_updates).
     """
+    update_google_sheet_sales_data_many(company, [(sales_request, cached_data)])
+
+
+def update_google_sheet_sales_data_many(company, approvals):
+    """ Writes several approvals [(sales_request, cached_data), ...] in one batch_update. """
     if not company.google_sheet_url:
         logger.warning(f"Company {company.name} has no Google Sheet URL configured")
         return
 
-    # Get the unit code to search for
-    unit_code = sales_request.unit.unit_code if sales_request.unit else ""
+    updates = {}
+    for sales_request, cached_data in approvals:
+        # Get the unit code to search for
+        unit_code = sales_request.unit.unit_code if sales_request.unit else ""
+        if not unit_code:
+            logger.warning("No unit code found in sales request")
+            continue
+        updates[unit_code] = build_sales_data_updates(sales_request, cached_data)
 
-    if not unit_code:
-        logger.warning("No unit code found in sales request")
+    if not updates:
         return
 
     try:
-        # Get Google Sheets client
-        gc = gspread_client(company)
-
-        # Open the company's spreadsheet
-        sh = gc.open_by_url(company.google_sheet_url)
-        ws = resolve_worksheet(sh, company.google_sheet_gid, company.google_sheet_title)
-
-        # Get all data and headers
-        all_data = ws.get_all_records()
-        headers = ws.row_values(1)  # header row
-
-        # Find the target unit row
-        found_row = None
-        for row_idx, row_data in enumerate(all_data, start=2):  # start=2 because header row
-            sheet_unit_code = (
-                row_data.get("Unit Code")
-                or row_data.get("Unit Code ")
-                or row_data.get("UnitCode")
-                or row_data.get("unit_code")
-                or row_data.get("Code")
-            )
-            if sheet_unit_code == unit_code:
-                found_row = row_idx
-                break
+        result = write_unit_updates(company, updates)
 
-        if not found_row:
+        for unit_code in result["missing_units"]:
             logger.warning(f"Unit '{unit_code}' not found in company '{company.name}' Google Sheet")
-            return
-
-        today = datetime.now()
-        reservation_date = f"{today.month}/{today.day}/{today.year}"
-
-        contract_payment_plan = None
-
-        # Keep the same logic you had (index [0] is expected to exist)
-        logger.debug(f"cached_data.get('payments', '')[0] = {cached_data.get('payments', '')[0]}")
-        if cached_data.get("payments", "")[0] == 100:
-            contract_payment_plan = "Cash"
-        else:
-            contract_payment_plan = f"{cached_data.get('tenor_years', '')} Yrs"
-
-        updates = {
-            "Status": "Reserved",
-            "Salesman Name": sales_request.sales_man.full_name if sales_request.sales_man else "Unknown",
-            "Salesman Email": sales_request.sales_man.email if sales_request.sales_man else "",
-            "Client Id": sales_request.client_id,
-            "Client Phone Number": sales_request.client_phone_number or "",
-            "Sales Value": cached_data.get("final_price", ""),
-            "Currency": cached_data.get("selected_currency_name", ""),
-            "Contract Payment Plan": contract_payment_plan,
-            "Reservation Date": reservation_date
-        }
-
-        # Find column indices and update each field
-        for column_name, new_value in updates.items():
-            col_index = None
-
-            for idx, header in enumerate(headers):
-                if header.strip() == column_name:
-                    col_index = idx + 1  # gspread is 1-based
-                    break
-
-            if col_index:
-                ws.update_cell(found_row, col_index, new_value)
-                logger.debug(f"Updated {column_name} to '{new_value}' for unit {unit_code}")
-            else:
-                logger.warning(f"Column '{column_name}' not found in sheet headers")
-
-        logger.info(f"✅ Successfully updated Google Sheet for company '{company.name}' - Unit '{unit_code}'")
+        for column_name in result["missing_columns"]:
+            logger.warning(f"Column '{column_name}' not found in sheet headers")
+        if result["updated"]:
+            logger.info(
+                f"✅ Successfully updated Google Sheet for company '{company.name}' - Units {result['updated']}"
+            )
 
     except Exception as e:
         logger.error(f"Failed to update Google Sheet for company {company.name}: {str(e)}")
@@ -166,72 +339,31 @@ def cancel_google_sheet_reservation(company, unit_code, interest_free_price):
         logger.warning("No unit code provided for cancellation")
         return
 
+    updates = {
+        "Status": "Blocked Cancellation",
+        "Salesman Name": "",
+        "Salesman Email": "",
+        "Client Id": "",
+        "Client Phone Number": "",
+        "Sales Value": interest_free_price if interest_free_price is not None else "",
+        "Currency": "",
+        "Contract Payment Plan": "",
+        "Reservation Date": ""
+    }
+
     try:
-        # 1. Get Google Sheets client
-        gc = gspread_client(company)
-
-        # 2. Open the company's spreadsheet
-        sh = gc.open_by_url(company.google_sheet_url)
-        ws = resolve_worksheet(sh, company.google_sheet_gid, company.google_sheet_title)
-
-        # 3. Get all data and headers
-        all_data = ws.get_all_records()
-        headers = ws.row_values(1)  # header row
-
-        # 4. Find the target unit row
-        found_row = None
-        # start=2 because sheet rows are 1-based and header is row 1
-        for row_idx, row_data in enumerate(all_data, start=2):
-            sheet_unit_code = (
-                row_data.get("Unit Code")
-                or row_data.get("Unit Code ")
-                or row_data.get("UnitCode")
-                or row_data.get("unit_code")
-                or row_data.get("Code")
-            )
-            # Compare as strings to be safe
-            if str(sheet_unit_code).strip() == str(unit_code).strip():
-                found_row = row_idx
-                break
+        result = write_unit_updates(company, {unit_code: updates})
 
-        if not found_row:
+        if result["missing_units"]:
             logger.warning(f"Unit '{unit_code}' not found in company '{company.name}' Google Sheet")
             return
-
-        # 5. Define updates
-        updates = {
-            "Status": "Blocked Cancellation",
-            "Salesman Name": "",
-            "Salesman Email": "",
-            "Client Id": "",
-            "Client Phone Number": "",
-            "Sales Value": interest_free_price if interest_free_price is not None else "",
-            "Currency": "",
-            "Contract Payment Plan": "",
-            "Reservation Date": ""
-        }
-
-        # 6. Apply updates
-        for column_name, new_value in updates.items():
-            col_index = None
-            
-            # Find column index for this specific field
-            for idx, header in enumerate(headers):
-                if header.strip() == column_name:
-                    col_index = idx + 1  # gspread is 1-based
-                    break
-            
-            if col_index:
-                ws.update_cell(found_row, col_index, new_value)
-                logger.debug(f"Cancelled: Updated {column_name} to '{new_value}' for unit {unit_code}")
-            else:
-                # Log a debug message if a column is missing (e.g., 'Currency' might not exist in all sheets)
-                logger.debug(f"Column '{column_name}' not found in sheet headers (skipped).")
+        for column_name in result["missing_columns"]:
+            # e.g. 'Currency' might not exist in all sheets
+            logger.debug(f"Column '{column_name}' not found in sheet headers (skipped).")
 
         logger.info(f"✅ Successfully cancelled unit '{unit_code}' in Google Sheet for '{company.name}'")
 
     except Exception as e:
         logger.error(f"Failed to cancel unit in Google Sheet for company {company.name}: {str(e)}")
         # Re-raise if you want the main transaction to fail, otherwise suppress.
-        # usually for external APIs we might want to log only:
-        raise e
\ No newline at end of file
+        raise e
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import base64
 from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.utils.dateparse import parse_datetime
 
 from ..models import Company, Sales, Manager, SalesHead
 
@@ -39,3 +43,22 @@ def resolve_historical_analysis_scope(*, user) -> HistoricalAnalysisScope:
         return HistoricalAnalysisScope(role="sales", company=cu.company if cu else None)
 
     return HistoricalAnalysisScope(role="other", company=None)
+
+
+# -----------------------------
+# Keyset cursor (date DESC, id DESC)
+# -----------------------------
+def encode_report_cursor(date, pk: int) -> str:
+    raw = f"{date.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_report_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """ (date, id) of the last row already sent, or None when the cursor is malformed. """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        date_raw, pk_raw = raw.split("|", 1)
+        date = parse_datetime(date_raw)
+        return (date, int(pk_raw)) if date else None
+    except (ValueError, UnicodeError):
+        return None
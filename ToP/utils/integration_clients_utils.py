@@ -0,0 +1,148 @@
+# ToP/utils/integration_clients_utils.py
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+INTEGRATION_CLIENT_POOL_SIZE = 128        # max live clients + sessions per process
+INTEGRATION_CLIENT_IDLE_SECONDS = 600     # unused longer than this -> closed
+HTTP_RETRY_TOTAL = 3
+HTTP_RETRY_BACKOFF = 0.5                  # 0.5s, 1s, 2s ...
+HTTP_RETRY_STATUSES = (429, 502, 503, 504)
+HTTP_POOL_MAXSIZE = 10                    # keep-alive connections per host per session
+
+
+def build_retrying_session() -> requests.Session:
+    """
+    Keep-alive session with retry/backoff.
+
+    Connection failures are retried for every method (nothing reached the server).
+    Read errors and retryable statuses are only retried for idempotent methods, so an
+    ERP block / approve POST is never sent twice. After the last retry the response is
+    returned as-is, so callers keep using raise_for_status().
+    """
+    retry = Retry(
+        total=HTTP_RETRY_TOTAL,
+        connect=HTTP_RETRY_TOTAL,
+        read=HTTP_RETRY_TOTAL,
+        status=HTTP_RETRY_TOTAL,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=HTTP_POOL_MAXSIZE, pool_maxsize=HTTP_POOL_MAXSIZE)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _close_quietly(value: Any) -> None:
+    # requests.Session has close(); a gspread client keeps its AuthorizedSession on .http_client.session
+    http_client = getattr(value, "http_client", None)
+    for target in (value, getattr(http_client, "session", None), getattr(value, "session", None)):
+        close = getattr(target, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+            return
+
+
+class _PoolEntry:
+    __slots__ = ("value", "last_used")
+
+    def __init__(self, value):
+        self.value = value
+        self.last_used = time.monotonic()
+
+
+class IntegrationClientRegistry:
+    """
+    Per-process registry of reusable integration clients, keyed per company.
+
+    - session(company, kind): keep-alive requests.Session with retry/backoff (ERP, leads, ...)
+    - get_or_create(key, factory): any other client, e.g. an authorized gspread client whose
+      key carries the service-account fingerprint so edited credentials build a new one
+    - bounded (LRU) and idle entries are closed and dropped on access
+    """
+
+    def __init__(self, maxsize: int = INTEGRATION_CLIENT_POOL_SIZE, idle_seconds: float = INTEGRATION_CLIENT_IDLE_SECONDS):
+        self.maxsize = maxsize
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[Hashable, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def session(self, company, kind: str = "erp") -> requests.Session:
+        return self.get_or_create((f"http:{kind}", company.id), build_retrying_session)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            evicted = self._evict_locked()
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(key)
+                self.hits += 1
+        for value in evicted:
+            _close_quietly(value)
+        if entry is not None:
+            return entry.value
+
+        # build outside the lock (OAuth / TLS setup can be slow); first writer wins
+        value = factory()
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is None:
+                self._entries[key] = _PoolEntry(value)
+                self.misses += 1
+                evicted = self._evict_locked()
+            else:
+                existing.last_used = time.monotonic()
+                evicted = [value]
+                value = existing.value
+        for stale in evicted:
+            _close_quietly(stale)
+        return value
+
+    def _evict_locked(self):
+        evicted = []
+        cutoff = time.monotonic() - self.idle_seconds
+        for key in [k for k, e in self._entries.items() if e.last_used < cutoff]:
+            evicted.append(self._entries.pop(key).value)
+        while len(self._entries) > self.maxsize:
+            _, entry = self._entries.popitem(last=False)
+            evicted.append(entry.value)
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            evicted = [e.value for e in self._entries.values()]
+            self._entries.clear()
+        for value in evicted:
+            _close_quietly(value)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+integration_clients = IntegrationClientRegistry(
+    maxsize=getattr(settings, "INTEGRATION_CLIENT_POOL_SIZE", INTEGRATION_CLIENT_POOL_SIZE),
+    idle_seconds=getattr(settings, "INTEGRATION_CLIENT_IDLE_SECONDS", INTEGRATION_CLIENT_IDLE_SECONDS),
+)
@@ -0,0 +1,56 @@
+# ToP/utils/inventory_delta_utils.py
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict
+
+from django.core.exceptions import ValidationError
+from django.db import models
+
+
+def normalize_field_value(field: models.Field, value: Any) -> Any:
+    """
+    Converts a raw source value to the python value the DB would hand back,
+    so "1200", 1200 and Decimal("1200.00") all compare equal for a DecimalField.
+    Values the field cannot parse are returned unchanged (the DB write decides).
+    """
+    if value is None:
+        return None
+
+    try:
+        value = field.to_python(value)
+    except (ValidationError, TypeError, ValueError):
+        return value
+
+    if isinstance(field, models.DecimalField) and isinstance(value, Decimal):
+        try:
+            value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+        except InvalidOperation:
+            pass
+    return value
+
+
+def _hashable(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, float)):
+        return str(value)
+    if isinstance(value, (int, bool, str)):
+        return value
+    return str(value)
+
+
+def row_content_hash(values: Dict[str, Any]) -> str:
+    """
+    SHA-1 of one normalized source row ({attname: value}).
+    Stored on Unit.source_hash so unchanged rows are skipped without a column diff.
+    """
+    payload = sorted((k, _hashable(v)) for k, v in values.items())
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
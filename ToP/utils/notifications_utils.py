@@ -1,3 +1,4 @@
+import logging
 import traceback
 import csv
 from io import BytesIO, StringIO
@@ -16,8 +17,11 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 
 from ..models import SalesOperation, Manager
+from .pdf_render_utils import pdf_content_key, pdf_render_pool
 from django.db import connection
 
+logger = logging.getLogger(__name__)
+
 
 
 # =========================================================
@@ -32,31 +36,36 @@ DEBUG_VERBOSE_PDF = True
 # 1) PUSHER NOTIFICATIONS
 # =========================================================
 
-def send_pusher_notification(payload: dict):
+def trigger_pusher_notification(payload: dict):
     """
-    Runs in a separate thread to avoid blocking the HTTP response.
+    Triggers the Pusher event; raises on failure (the background job retries it).
     Expects 'channel' in payload, defaults to 'my-channel' if missing.
-    Preserves original behavior/logs.
     """
-    try:
-        print(f"DEBUG: [Thread] Preparing to trigger Pusher for ID {payload.get('id')}...")
-
-        pusher_client = pusher.Pusher(
-            app_id=settings.PUSHER_APP_ID,
-            key=settings.PUSHER_KEY,
-            secret=settings.PUSHER_SECRET,
-            cluster=settings.PUSHER_CLUSTER,
-            ssl=True
-        )
+    logger.debug("[Job] Preparing to trigger Pusher for ID %s", payload.get("id"))
+
+    pusher_client = pusher.Pusher(
+        app_id=settings.PUSHER_APP_ID,
+        key=settings.PUSHER_KEY,
+        secret=settings.PUSHER_SECRET,
+        cluster=settings.PUSHER_CLUSTER,
+        ssl=True
+    )
 
-        channel_name = payload.get("channel", "my-channel")
-        pusher_client.trigger(channel_name, "my-event", payload)
+    channel_name = payload.get("channel", "my-channel")
+    pusher_client.trigger(channel_name, "my-event", payload)
 
-        print(f"DEBUG: [Thread] Pusher Triggered on '{channel_name}' for ID {payload.get('id')}")
+    logger.debug("[Job] Pusher triggered on '%s' for ID %s", channel_name, payload.get("id"))
 
-    except Exception as e:
-        print(f"ERROR: [Thread] Pusher Failed: {e}")
-        traceback.print_exc()
+
+def send_pusher_notification(payload: dict):
+    """
+    Fire-and-forget variant: same as trigger_pusher_notification() but never raises.
+    Preserves original behavior/logs.
+    """
+    try:
+        trigger_pusher_notification(payload)
+    except Exception:
+        logger.exception("[Thread] Pusher failed for ID %s", payload.get("id"))
 
 
 # =========================================================
@@ -205,7 +214,25 @@ def create_hold_request_pdf(company, sales_request, unit_code, project_name, cli
     """
     Create a PDF document for the hold request with payment plan details.
     Supports both basic hold requests and approved plans with cached_data.
+    Rendered in the PDF worker pool and cached by content (see pdf_render_utils).
+    """
+    key = pdf_content_key(
+        "hold_request",
+        getattr(company, "name", None),
+        sales_request.client_id,
+        getattr(sales_request, "final_price", None),
+        getattr(sales_request, "date", None),
+        unit_code, project_name, client_name, client_phone_number, salesman_name,
+        cached_data,
+    )
+    return pdf_render_pool.render(
+        key, _render_hold_request_pdf,
+        company, sales_request, unit_code, project_name, client_name, client_phone_number, salesman_name, cached_data,
+    )
 
+
+def _render_hold_request_pdf(company, sales_request, unit_code, project_name, client_name, client_phone_number, salesman_name, cached_data=None):
+    """
     IMPORTANT: Preserves original logic/output (tables, styles, total row behavior).
     """
     buffer = BytesIO()
@@ -375,7 +402,16 @@ def create_hold_request_pdf(company, sales_request, unit_code, project_name, cli
 
 def _build_payment_plan_pdf_from_cached(cached_data, unit_code_display: str, project_name: str):
     """
-    Builds the payment plan PDF used in notify_salesman_with_cached_plan().
+    Builds the payment plan PDF used in notify_salesman_with_cached_plan() and
+    notify_company_managers_approval(). Keyed by the plan content, so both approval
+    emails share one render.
+    """
+    key = pdf_content_key("payment_plan", cached_data, unit_code_display, project_name)
+    return pdf_render_pool.render(key, _render_payment_plan_pdf, cached_data, unit_code_display, project_name)
+
+
+def _render_payment_plan_pdf(cached_data, unit_code_display: str, project_name: str):
+    """
     Preserves original styling/tables/total logic.
     """
     client_phone_number = _safe_get(cached_data, "client_phone", "-")
@@ -2,11 +2,16 @@
 
 from __future__ import annotations
 
-from typing import Dict, Any, List, Tuple
+import struct
+from typing import Dict, Any, List, Optional, Tuple
 
 
 INSTALLMENTS_COUNT = 48  # you use installment_1 .. installment_48
 CUMULATIVES_COUNT = 48   # you use cumulative_1 .. cumulative_48
+PAYMENT_ROWS_COUNT = INSTALLMENTS_COUNT + 2  # dp1, dp2, installment_1 .. installment_48
+
+# compiled_rows layout: values[50] then cumulatives[50] (prefix sums), little-endian float64
+_COMPILED_ROWS_FORMAT = f"<{PAYMENT_ROWS_COUNT * 2}d"
 
 
 def normalize_updates(payload: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
@@ -70,3 +75,35 @@ def recalc_dual_cumulatives(model_obj) -> None:
         val = getattr(model_obj, f"installment_{i}", 0) or 0
         cum += val
         setattr(model_obj, f"cumulative_{i}", cum)
+
+
+# ==========================================
+# Compiled payment rows (ProjectExtendedPayments / SpecialOffer)
+# ==========================================
+
+def build_payment_rows(model_obj) -> Tuple[List[float], List[float]]:
+    """
+    (values, cumulatives) in apply_constraints order:
+      index 0 -> dp1, index 1 -> dp2, index >=2 -> installment_(index-1)
+    """
+    values = [model_obj.dp1 or 0, model_obj.dp2 or 0]
+    cumulatives = [model_obj.cumulative_dp1 or 0, model_obj.cumulative_dp2 or 0]
+    for i in range(1, INSTALLMENTS_COUNT + 1):
+        values.append(getattr(model_obj, f"installment_{i}", 0) or 0)
+        cumulatives.append(getattr(model_obj, f"cumulative_{i}", 0) or 0)
+    return values, cumulatives
+
+
+def pack_payment_rows(values: List[float], cumulatives: List[float]) -> bytes:
+    return struct.pack(_COMPILED_ROWS_FORMAT, *[float(v) for v in values], *[float(c) for c in cumulatives])
+
+
+def unpack_payment_rows(blob) -> Optional[Tuple[List[float], List[float]]]:
+    """ Returns None when blob is empty or not in the current layout. """
+    if not blob:
+        return None
+    blob = bytes(blob)  # memoryview on PostgreSQL
+    if len(blob) != struct.calcsize(_COMPILED_ROWS_FORMAT):
+        return None
+    packed = struct.unpack(_COMPILED_ROWS_FORMAT, blob)
+    return list(packed[:PAYMENT_ROWS_COUNT]), list(packed[PAYMENT_ROWS_COUNT:])
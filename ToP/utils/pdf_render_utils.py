@@ -0,0 +1,115 @@
+# ToP/utils/pdf_render_utils.py
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from xhtml2pdf import pisa
+
+logger = logging.getLogger(__name__)
+
+
+PDF_RENDER_WORKERS = 2              # concurrent renders per process (xhtml2pdf / reportlab are CPU bound)
+PDF_CACHE_TTL_SECONDS = 60 * 60
+PDF_CACHE_PREFIX = "pdf:"
+PDF_RENDER_TIMEOUT_SECONDS = 120
+
+
+def pdf_content_key(kind: str, *parts: Any) -> str:
+    """
+    Content address of a PDF: sha256 over the renderer kind and everything it renders from
+    (template / html, context, display values). Equal inputs -> equal key -> one render.
+    """
+    raw = json.dumps([kind, parts], sort_keys=True, default=str, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def html_to_pdf_bytes(html: str) -> Optional[bytes]:
+    """ xhtml2pdf render; None when pisa reports errors. """
+    buffer = io.BytesIO()
+    status = pisa.CreatePDF(io.BytesIO(html.encode("UTF-8")), dest=buffer, encoding="UTF-8")
+    if status.err:
+        return None
+    return buffer.getvalue()
+
+
+class PdfRenderPool:
+    """
+    Renders PDFs in a bounded worker pool with a content-addressed cache.
+
+    - Bytes are cached under pdf_content_key(...) in the default cache, so repeated
+      downloads / emails of the same document skip rendering entirely.
+    - Concurrent callers asking for the same key share one in-flight render
+      (e.g. the salesman and manager approval emails sent from two threads).
+    - A renderer returning None (render error) is never cached.
+    """
+
+    def __init__(self, workers: int = PDF_RENDER_WORKERS, ttl: int = PDF_CACHE_TTL_SECONDS):
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pdf-render")
+        return self._pool
+
+    def submit(self, key: str, render: Callable[..., Optional[bytes]], *args, **kwargs) -> Future:
+        """ Returns a Future resolving to the PDF bytes (or None on render error). """
+        cached = cache.get(PDF_CACHE_PREFIX + key)
+        if cached is not None:
+            self.hits += 1
+            done: Future = Future()
+            done.set_result(cached)
+            return done
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.hits += 1
+                return future
+            future = self._executor().submit(self._render, key, render, args, kwargs)
+            self._inflight[key] = future
+        return future
+
+    def render(self, key: str, render: Callable[..., Optional[bytes]], *args, timeout: float = None, **kwargs) -> Optional[bytes]:
+        """ Blocking variant of submit() for request / email threads. """
+        timeout = timeout or getattr(settings, "PDF_RENDER_TIMEOUT_SECONDS", PDF_RENDER_TIMEOUT_SECONDS)
+        return self.submit(key, render, *args, **kwargs).result(timeout=timeout)
+
+    def _render(self, key: str, render: Callable[..., Optional[bytes]], args, kwargs) -> Optional[bytes]:
+        try:
+            pdf_bytes = render(*args, **kwargs)
+            self.renders += 1
+            if pdf_bytes is not None:
+                cache.set(PDF_CACHE_PREFIX + key, pdf_bytes, self.ttl)
+            return pdf_bytes
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            # renderers may touch the ORM (lazy relations); don't leak the worker's connection
+            connection.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            inflight = len(self._inflight)
+        return {"workers": self.workers, "hits": self.hits, "renders": self.renders, "inflight": inflight}
+
+
+pdf_render_pool = PdfRenderPool(
+    workers=getattr(settings, "PDF_RENDER_WORKERS", PDF_RENDER_WORKERS),
+    ttl=getattr(settings, "PDF_CACHE_TTL_SECONDS", PDF_CACHE_TTL_SECONDS),
+)
@@ -0,0 +1,136 @@
+# ToP/utils/pricing_trace_utils.py
+
+from __future__ import annotations
+
+import contextvars
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils.timezone import now
+
+
+DEFAULT_SAMPLE_RATE = 0.0   # opt-in: nothing is traced unless configured or forced
+DEFAULT_BUFFER_SIZE = 200
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("pricing_trace", default=None)
+
+
+# -----------------------------
+# Trace object
+# -----------------------------
+class PricingTrace:
+    """
+    Structured record of one pricing / hold request.
+    Events are kept in memory only; nothing is written to stdout.
+    """
+
+    def __init__(self, label: str, meta: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.meta = meta
+        self.started_at = now()
+        self.events: List[Dict[str, Any]] = []
+        self.duration_ms: Optional[float] = None
+        self._t0 = time.perf_counter()
+
+    def event(self, name: str, **data) -> None:
+        # copy containers so later in-place mutation does not rewrite history
+        for key, value in data.items():
+            if isinstance(value, list):
+                data[key] = list(value)
+            elif isinstance(value, dict):
+                data[key] = dict(value)
+        self.events.append({
+            "name": name,
+            "t_ms": round((time.perf_counter() - self._t0) * 1000, 3),
+            **data,
+        })
+
+    def finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "label": self.label,
+            "meta": self.meta,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "events": self.events,
+        }
+
+
+# -----------------------------
+# Ring buffer (per process)
+# -----------------------------
+class PricingTraceBuffer:
+    def __init__(self, size: int = DEFAULT_BUFFER_SIZE, sample_rate: float = DEFAULT_SAMPLE_RATE):
+        self._traces = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.sample_rate = float(sample_rate)
+
+    def push(self, trace: PricingTrace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces)
+        traces.reverse()  # newest first
+        if limit:
+            traces = traces[:limit]
+        return [t.as_dict() for t in traces]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+    def should_sample(self, force: bool = False) -> bool:
+        if force:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+pricing_trace_buffer = PricingTraceBuffer(
+    size=getattr(settings, "PRICING_TRACE_BUFFER_SIZE", DEFAULT_BUFFER_SIZE),
+    sample_rate=getattr(settings, "PRICING_TRACE_SAMPLE_RATE", DEFAULT_SAMPLE_RATE),
+)
+
+
+# -----------------------------
+# Public helpers
+# -----------------------------
+@contextmanager
+def pricing_trace(label: str, *, force: bool = False, **meta):
+    """
+    Opens a trace for the enclosed block if sampled (or forced).
+    Yields the PricingTrace, or None when this request is not sampled.
+    """
+    if _current_trace.get() is not None or not pricing_trace_buffer.should_sample(force):
+        yield _current_trace.get()
+        return
+
+    trace = PricingTrace(label, meta)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except Exception as e:
+        trace.event("error", error=repr(e))
+        raise
+    finally:
+        trace.finish()
+        _current_trace.reset(token)
+        pricing_trace_buffer.push(trace)
+
+
+def trace_event(name: str, **data) -> None:
+    """ Records an event on the current trace; a no-op (one ContextVar read) otherwise. """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.event(name, **data)
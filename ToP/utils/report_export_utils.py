@@ -0,0 +1,54 @@
+# ToP/utils/report_export_utils.py
+
+from __future__ import annotations
+
+import csv
+import tempfile
+from typing import Any, Iterable, Sequence
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class _Echo:
+    """ csv.writer target that hands each formatted line straight back. """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_stream_response(*, filename: str, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> StreamingHttpResponse:
+    """ Rows are formatted and sent as they are produced; nothing is buffered server-side. """
+    writer = csv.writer(_Echo())
+
+    def _lines():
+        yield "\ufeff"  # BOM: Excel opens the UTF-8 file with the right encoding
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(_lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_file_response(
+    *, filename: str, header: Sequence[str], rows: Iterable[Sequence[Any]], sheet_title: str = "Report"
+) -> FileResponse:
+    """
+    write_only workbook: openpyxl spills rows to disk as they are appended, and the finished
+    file is streamed from a temporary file, so memory stays flat for any row count.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(list(header))
+    for row in rows:
+        sheet.append(list(row))
+
+    spool = tempfile.TemporaryFile()
+    workbook.save(spool)
+    spool.seek(0)
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,52 @@
+# ToP/utils/sales_dashboard_utils.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Mapping, Optional, Tuple
+
+from django.utils.dateparse import parse_date
+from django.utils.timezone import get_current_timezone, make_aware
+
+
+@dataclass
+class SalesDashboardFilters:
+    company_id: Optional[int] = None
+    project_id: Optional[int] = None
+    sales_man_id: Optional[int] = None
+    start: Optional[date] = None   # local days, both inclusive
+    end: Optional[date] = None
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _parse_day(value: Optional[str]) -> Optional[date]:
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_sales_dashboard_filters(params: Mapping[str, str]) -> SalesDashboardFilters:
+    """ Dashboard filters from query params (company_id, project_id, sales_man_id, start, end); bad values are dropped. """
+    return SalesDashboardFilters(
+        company_id=_parse_int(params.get("company_id")),
+        project_id=_parse_int(params.get("project_id")),
+        sales_man_id=_parse_int(params.get("sales_man_id")),
+        start=_parse_day(params.get("start")),
+        end=_parse_day(params.get("end")),
+    )
+
+
+def local_day_range(start: Optional[date], end: Optional[date]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """ [start 00:00, end + 1 day 00:00) in TIME_ZONE, so raw timestamps match the rollup days. """
+    tz = get_current_timezone()
+    lower = make_aware(datetime.combine(start, time.min), tz) if start else None
+    upper = make_aware(datetime.combine(end + timedelta(days=1), time.min), tz) if end else None
+    return lower, upper
@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
-from typing import Dict, Any
-from django.db.models import Q
+from typing import Any, Dict, Optional
+
+from django.db.models import Count, Q
 
 
 PREMIUM_FIELD_MAPPING: Dict[str, str] = {
@@ -17,26 +18,46 @@ PREMIUM_FIELD_MAPPING: Dict[str, str] = {
 }
 
 
+# released = Available / Contracted / Reserved
+RELEASED_STATUSES = ("Available", "Contracted", "Reserved")
+STATUS_COUNT_KEYS = ("all", "released", "available", "sold_booked")
+
+
+def status_count_aggregates(prefix: str = "", within: Optional[Q] = None) -> Dict[str, Count]:
+    """
+    The status histogram as conditional aggregates, so one aggregate() / GROUP BY returns
+    the counts of every bucket or group at once. `within` narrows all four counts (e.g. a
+    price range); aliases are "<prefix>n_<key>", read back with pop_status_counts().
+    """
+    conditions = {
+        "all": Q(),
+        "released": Q(status__in=RELEASED_STATUSES),
+        "available": Q(status="Available"),
+        "sold_booked": Q(status="Contracted"),
+    }
+
+    aggregates: Dict[str, Count] = {}
+    for key, condition in conditions.items():
+        if within is not None:
+            condition &= within
+        aggregates[f"{prefix}n_{key}"] = Count("pk", filter=condition) if condition else Count("pk")
+    return aggregates
+
+
+def pop_status_counts(row: Dict[str, Any], prefix: str = "") -> Dict[str, int]:
+    return {key: row.pop(f"{prefix}n_{key}") or 0 for key in STATUS_COUNT_KEYS}
+
+
 def build_status_counts(qs, price_mode: bool = False) -> Dict[str, int]:
     """
     Preserves your exact status logic:
-    - released = Available or Contracted
+    - released = Available or Contracted or Reserved
     - available = Available
     - sold_booked = Contracted
 
     price_mode is only to keep naming consistent; logic is identical.
     """
-    all_count = qs.count()
-    released_count = qs.filter(Q(status="Available") | Q(status="Contracted") | Q(status="Reserved")).count()
-    available_count = qs.filter(status="Available").count()
-    sold_booked_count = qs.filter(status="Contracted").count()
-
-    return {
-        "all": all_count,
-        "released": released_count,
-        "available": available_count,
-        "sold_booked": sold_booked_count,
-    }
+    return pop_status_counts(qs.aggregate(**status_count_aggregates()))
 
 
 def attach_percentages(rows: list[Dict[str, Any]], total_all: int) -> None:
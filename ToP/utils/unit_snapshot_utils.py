@@ -0,0 +1,142 @@
+# ToP/utils/unit_snapshot_utils.py
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+SNAPSHOT_GZIP_LEVEL = 6
+SNAPSHOT_BROTLI_QUALITY = 5
+
+
+# ==========================================
+# Columnar encoding
+# ==========================================
+#
+# A snapshot ships one array per column instead of one object per unit:
+#   plain column:       [v0, v1, ...]
+#   dictionary column:  {"dict": [distinct values], "codes": [index into dict per unit]}
+# Unit tables are dominated by repeated strings (project, status, type, phasing ...),
+# so dictionary columns shrink them to small ints. The client decodes with decodeColumnar().
+
+def number_value(value: Any) -> Any:
+    """ Decimal -> float (the pivot's row format did the same per cell). """
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def json_value(value: Any) -> Any:
+    """ Same representation DjangoJSONEncoder gives (Decimal -> str, dates -> ISO). """
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iso_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def plain_column(values: Iterable[Any], convert: Callable[[Any], Any] = number_value) -> List[Any]:
+    return [None if v is None else convert(v) for v in values]
+
+
+def dictionary_column(values: Iterable[Any], convert: Callable[[Any], Any] = iso_value) -> Dict[str, List[Any]]:
+    index: Dict[Any, int] = {}
+    codes: List[int] = []
+    for v in values:
+        v = convert(v)
+        key = tuple(v) if isinstance(v, list) else v
+        code = index.get(key)
+        if code is None:
+            code = index[key] = len(index)
+        codes.append(code)
+    return {"dict": [list(k) if isinstance(k, tuple) else k for k in index], "codes": codes}
+
+
+def encode_columns(names: Sequence[str], rows: Sequence[Sequence[Any]], encoders: Dict[str, Callable]) -> Dict[str, Any]:
+    """
+    rows: tuples in `names` order (values_list output). One transpose, then one
+    encoder pass per column (encoders[name], default dictionary_column).
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return {
+        name: encoders.get(name, dictionary_column)(column)
+        for name, column in zip(names, columns)
+    }
+
+
+# ==========================================
+# Serialized snapshot + HTTP
+# ==========================================
+
+@dataclass
+class EncodedSnapshot:
+    etag: str
+    body: bytes
+    gzip_body: bytes
+    brotli_body: Optional[bytes] = None
+
+
+def encode_snapshot(payload: Dict[str, Any], etag_seed: str) -> EncodedSnapshot:
+    """ Serializes and compresses once; the cached result is served as-is to every client. """
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha1(f"{etag_seed}:{len(body)}".encode("utf-8")).hexdigest() + '"'
+    return EncodedSnapshot(
+        etag=etag,
+        body=body,
+        gzip_body=gzip.compress(body, compresslevel=SNAPSHOT_GZIP_LEVEL, mtime=0),
+        brotli_body=brotli.compress(body, quality=SNAPSHOT_BROTLI_QUALITY) if brotli is not None else None,
+    )
+
+
+def _etag_matches(request, etag: str) -> bool:
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # a proxy may weaken the tag when it re-encodes the body
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def snapshot_response(request, snapshot: EncodedSnapshot) -> HttpResponse:
+    """ 304 when the client already has this version, else the pre-compressed body it accepts. """
+    if _etag_matches(request, snapshot.etag):
+        response = HttpResponseNotModified()
+    else:
+        accept = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if snapshot.brotli_body is not None and "br" in accept:
+            response = HttpResponse(snapshot.brotli_body, content_type="application/json")
+            response["Content-Encoding"] = "br"
+        elif "gzip" in accept:
+            response = HttpResponse(snapshot.gzip_body, content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(snapshot.body, content_type="application/json")
+
+    response["ETag"] = snapshot.etag
+    # per-user data: browsers may keep it but must revalidate, shared caches must not store it
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ("Accept-Encoding", "Cookie"))
+    return response
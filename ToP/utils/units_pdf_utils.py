@@ -1,11 +1,11 @@
 # ToP/utils/units_pdf_utils.py
 
-import io
 from collections import defaultdict
 from datetime import datetime
 
 from django.template.loader import get_template
-from xhtml2pdf import pisa
+
+from .pdf_render_utils import html_to_pdf_bytes, pdf_content_key, pdf_render_pool
 
 # If you already have month_map elsewhere, keep it there and import it.
 # Otherwise define it here.
@@ -106,19 +106,14 @@ def render_units_pdf_bytes(*, units: list, template_path: str) -> tuple[bool, by
       (False, html_string) on error (preserves the ability to debug HTML)
 
     NOTE: This avoids returning HttpResponse from utils.
+    The same saved-units selection is served from the PDF cache on repeat downloads.
     """
     summary = summarize_by_date(units)
     template = get_template(template_path)
     html = template.render({"units": units, "summary": summary})
 
-    pdf_buffer = io.BytesIO()
-    pisa_status = pisa.CreatePDF(
-        io.BytesIO(html.encode("UTF-8")),
-        dest=pdf_buffer,
-        encoding="UTF-8",
-    )
-
-    if pisa_status.err:
+    pdf_bytes = pdf_render_pool.render(pdf_content_key("units", template_path, html), html_to_pdf_bytes, html)
+    if pdf_bytes is None:
         return False, html
 
-    return True, pdf_buffer.getvalue()
+    return True, pdf_bytes
@@ -10,6 +10,7 @@ from .services.inventory_sync_service import InventorySyncService
 from .services.top_calculation_service import TopCalculationService
 from .services.unit_catalog_service import UnitCatalogService
 from .services.market_units_performance_report_service import MarketUnitsPerformanceReportService
+from .services.market_research_cube_service import MarketResearchCubeService
 from .services.company_management_services import CompanyManagementService
 from .services.csv_inventory_service import CsvInventoryService
 from .services.modification_records_service import ModificationRecordsService
@@ -32,7 +33,7 @@ from .services.market_research_units_management_service import MarketResearchUni
 from .services.sales_performance_service import SalesPerformanceService
 from .services.unit_mapping_service import UnitMappingService
 from .services.home_service import TOPHomeService
-from .services.unit_auto_unblock_service import UnitAutoUnblockService
+from .services.hold_expiry_service import HoldExpiryService
 from .services.market_research_service import MarketResearchService
 from .services.admin_dashboard_service import AdminDashboardService
 from .services.pricing_service import PricingService
@@ -48,6 +49,12 @@ from .services.erp_hold_post_mapping_service import ERPHoldPostMappingService
 
 
 from .utils.admin_dashboard_utils import is_superuser_check
+from .utils.pricing_trace_utils import pricing_trace_buffer
+from .utils.calculation_cache_utils import calculation_result_cache
+from .utils.unit_snapshot_utils import snapshot_response
+from .utils.report_export_utils import csv_stream_response, xlsx_file_response
+from .utils.attendance_utils import parse_day
+from .utils.sales_dashboard_utils import parse_sales_dashboard_filters
 from .strategies.inventory_strategy import get_inventory_strategy
 
 from .forms import *
@@ -61,6 +68,7 @@ from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.exceptions import ValidationError
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie   
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_POST,require_GET, require_http_methods
 from django.urls import reverse
 from django.template.loader import render_to_string
@@ -223,7 +231,7 @@ def manage_companies(request):
 
 
 
-# ---------------------------------------------- DELETE all Units for the given company, then IMPORT from its Google Sheet.
+# ---------------------------------------------- Re-sync the given company's Units from its Google Sheet (delta: create / update / delete only what changed).
 
 @login_required(login_url='login')
 @allowed_users(allowed_roles=["Admin", "Developer", "TeamMember"])
@@ -240,8 +248,8 @@ def sync_company_units_from_sheet(request, company_id):
 
 @login_required(login_url="login")
 def home(request):
-    # preserve: auto-unblock runs at the start
-    UnitAutoUnblockService.run()
+    # preserve: auto-unblock runs at the start (throttled; the expire_holds worker does the bulk of it)
+    HoldExpiryService.run_if_due()
 
     # preserve: SalesOperation redirect
     if request.user.groups.filter(name="SalesOperation").exists():
@@ -284,6 +292,7 @@ def home(request):
 @login_required(login_url='login')
 @allowed_users(allowed_roles=["Admin", "Developer", "TeamMember", "Sales", "Manager", "SalesHead", "Viewer"])
 @viewer_page_required(PAGE_MASTERPLANS)
+@gzip_page
 def unit_catalog_view(request):
     # combine GET + POST params safely
     params = request.GET if request.method == "GET" else request.POST
@@ -1154,7 +1163,35 @@ def submit_data(request):
     return JsonResponse(result)
 
 
+# ---------------------------------------------- Pricing Traces (superuser)
+@user_passes_test(is_superuser_check, login_url="login")
+@require_http_methods(["GET", "POST"])
+def pricing_traces(request):
+    """
+    GET  -> most recent sampled pricing traces (?limit=N) + result-cache stats.
+    POST -> sample_rate=<0..1> to change sampling, clear=1 to drop buffered traces.
+    """
+    if request.method == "POST":
+        if "sample_rate" in request.POST:
+            try:
+                rate = float(request.POST["sample_rate"])
+            except (TypeError, ValueError):
+                return JsonResponse({"success": False, "error": "sample_rate must be a number."}, status=400)
+            pricing_trace_buffer.sample_rate = min(max(rate, 0.0), 1.0)
+        if request.POST.get("clear") == "1":
+            pricing_trace_buffer.clear()
 
+    try:
+        limit = int(request.GET.get("limit", 50))
+    except (TypeError, ValueError):
+        limit = 50
+
+    return JsonResponse({
+        "success": True,
+        "sample_rate": pricing_trace_buffer.sample_rate,
+        "traces": pricing_trace_buffer.recent(limit),
+        "result_cache": calculation_result_cache.stats(),
+    })
 
 
 
@@ -1520,7 +1557,30 @@ def sales_dashboard(request):
 @login_required(login_url="login")
 @allowed_users(allowed_roles=["Admin", "Developer", "Manager"])
 def sales_data_api(request):
-    result = SalesRequestAnalyticalService.get_sales_data(user=request.user)
+    try:
+        limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+    except ValueError:
+        limit = None
+
+    result = SalesRequestAnalyticalService.get_sales_rows(
+        user=request.user,
+        filters=parse_sales_dashboard_filters(request.GET),
+        cursor=request.GET.get("cursor") or None,
+        limit=limit,
+    )
+    if not result.success:
+        return JsonResponse({"success": False, "error": result.error or "Error"}, status=result.status)
+    return JsonResponse(result.payload, status=result.status)
+
+
+# ---------------------------------------------- Sales Summary Api
+@login_required(login_url="login")
+@allowed_users(allowed_roles=["Admin", "Developer", "Manager"])
+def sales_summary_api(request):
+    result = SalesRequestAnalyticalService.get_sales_summary(
+        user=request.user,
+        filters=parse_sales_dashboard_filters(request.GET),
+    )
     return JsonResponse(result.payload, status=result.status)
 
 
@@ -1776,6 +1836,7 @@ def clear_market_units(request):
         )
 
     deleted_count, _ = MarketUnitData.objects.all().delete()
+    MarketResearchCubeService.schedule_rebuild()
     return JsonResponse({"success": True, "deleted": deleted_count}, status=200)
 
 
@@ -2198,7 +2259,7 @@ def get_project_masterplan(request, project_id):
     if not result.success:
         return JsonResponse({"error": result.error, "trace": result.trace}, status=result.status)
 
-    return JsonResponse(result.payload, status=result.status)
+    return snapshot_response(request, result.payload["snapshot"])
 
 
 
@@ -2482,19 +2543,41 @@ def attendance_capture_view(request):
 @login_required(login_url="login")
 @allowed_users(allowed_roles=["Admin", "Developer"])
 def management_dashboard_view(request):
-    
-    # 1. Get ALL Data (No filtering on backend)
-    all_records = AttendanceQueryService.get_all_grouped_data()
+    # first page embedded; filters and further pages come from management_dashboard_data
+    first_page = AttendanceQueryService.get_grouped_page()
 
-    # 2. Serialize to JSON string for the frontend
-    # Use Django's safe filter in template, but here we prep the list
-    
     context = {
-        # Convert list of dicts to JSON string
-        'attendance_data_json': json.dumps(all_records), 
+        'attendance_page_json': json.dumps(first_page),
     }
     return render(request, 'attendance/dashboard.html', context)
 
+
+@login_required(login_url="login")
+@allowed_users(allowed_roles=["Admin", "Developer"])
+def management_dashboard_data(request):
+    """
+    AJAX: one page of grouped attendance rows.
+    GET: start_date, end_date (YYYY-MM-DD), user_id, name, cursor, limit.
+    """
+    try:
+        user_id = int(request.GET["user_id"]) if request.GET.get("user_id") else None
+        limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid user_id / limit.'}, status=400)
+
+    try:
+        page = AttendanceQueryService.get_grouped_page(
+            start=parse_day(request.GET.get("start_date")),
+            end=parse_day(request.GET.get("end_date")),
+            user_id=user_id,
+            name=(request.GET.get("name") or "").strip(),
+            cursor=request.GET.get("cursor") or None,
+            limit=limit,
+        )
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', **page})
+
 # --- Delete Log ---
 @login_required(login_url="login")
 @allowed_users(allowed_roles=["Admin", "Developer"])
@@ -2722,9 +2805,16 @@ def historical_sales_requests_analysis_data(request):
     except ValueError:
         company_id_int = None
 
+    try:
+        limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+    except ValueError:
+        limit = None
+
     result = HistoricalSalesRequestsAnalysisService.get_approved_rows(
         user=request.user,
         company_id=company_id_int,
+        cursor=request.GET.get("cursor") or None,
+        limit=limit,
     )
 
     if not result.success:
@@ -2733,6 +2823,34 @@ def historical_sales_requests_analysis_data(request):
     return JsonResponse(result.payload, status=200)
 
 
+@login_required(login_url="login")
+@allowed_users(allowed_roles=["Admin", "Developer", "TeamMember","Manager", "Sales", "SalesHead"])
+def historical_sales_requests_analysis_export(request):
+    company_id = request.GET.get("company_id")
+    try:
+        company_id_int = int(company_id) if company_id else None
+    except ValueError:
+        company_id_int = None
+
+    result = HistoricalSalesRequestsAnalysisService.export_approved_rows(
+        user=request.user,
+        company_id=company_id_int,
+    )
+
+    if not result.success:
+        return JsonResponse({"success": False, "error": result.error or "Error"}, status=result.status)
+
+    payload = result.payload
+    if request.GET.get("format") == "xlsx":
+        return xlsx_file_response(
+            filename=f"{payload['filename']}.xlsx",
+            header=payload["header"],
+            rows=payload["rows"],
+            sheet_title="Approved Sales",
+        )
+    return csv_stream_response(filename=f"{payload['filename']}.csv", header=payload["header"], rows=payload["rows"])
+
+
 
 from .services.sales_team_report_service import SalesTeamReportService
 
@@ -2907,10 +3025,14 @@ def pivot_units_data(request, company_id):
         if user_company and not _is_admin(request.user) and int(company_id) != int(user_company.id):
             return JsonResponse({"success": False, "error": "Forbidden (company scope)."}, status=403)
 
-        result = PivotUnitsService.get_pivot_units_data(user=request.user, company_id=company_id)
+        result = PivotUnitsService.get_pivot_units_snapshot(
+            user=request.user,
+            company_id=company_id,
+            fmt=request.GET.get("format") or "rows",
+        )
         if not result.success:
             return JsonResponse({"success": False, "error": result.error}, status=result.status)
-        return JsonResponse(result.payload, status=result.status)
+        return snapshot_response(request, result.payload["snapshot"])
     
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=500)
@@ -2960,6 +3082,51 @@ def pivot_units_snapshot_data(request, company_id):
         return JsonResponse({"success": False, "error": str(e)}, status=500)
 
 
+@login_required(login_url="login")
+@require_POST
+@allowed_users(allowed_roles=["Admin", "Uploader", "TeamMember", "Manager"])
+def pivot_units_aggregate(request, company_id):
+    """
+    AJAX: server-side pivot. Body: {rows, cols, measures: [{field, agg}], filters: {field: [labels]}};
+    answers the aggregated cells only.
+    """
+    try:
+        user_company = _resolve_user_company(request.user)
+        if user_company and not _is_admin(request.user) and int(company_id) != int(user_company.id):
+            return JsonResponse({"success": False, "error": "Forbidden (company scope)."}, status=403)
+
+        data = json.loads(request.body.decode("utf-8") or "{}")
+        result = PivotUnitsService.get_pivot_aggregate(user=request.user, company_id=company_id, data=data)
+        if not result.success:
+            return JsonResponse({"success": False, "error": result.error}, status=result.status)
+        return snapshot_response(request, result.payload["snapshot"])
+
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+
+@login_required(login_url="login")
+@allowed_users(allowed_roles=["Admin", "Uploader", "TeamMember", "Manager"])
+def pivot_units_field_values(request, company_id):
+    """
+    AJAX: distinct labels of ?field= for the report filter lists.
+    """
+    try:
+        user_company = _resolve_user_company(request.user)
+        if user_company and not _is_admin(request.user) and int(company_id) != int(user_company.id):
+            return JsonResponse({"success": False, "error": "Forbidden (company scope)."}, status=403)
+
+        result = PivotUnitsService.get_pivot_field_values(
+            user=request.user, company_id=company_id, field=request.GET.get("field", "")
+        )
+        if not result.success:
+            return JsonResponse({"success": False, "error": result.error}, status=result.status)
+        return snapshot_response(request, result.payload["snapshot"])
+
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+
 @login_required(login_url="login")
 @require_POST
 @allowed_users(allowed_roles=["Admin", "Uploader", "TeamMember"])
@@ -0,0 +1,19 @@
+// Decodes a columnar unit snapshot ({count, columns}) into an array of row objects.
+// A column is either a plain array or {dict: [...distinct values], codes: [...indexes]}.
+function decodeColumnar(snapshot) {
+    const count = snapshot.count || 0;
+    const names = Object.keys(snapshot.columns || {});
+    const columns = names.map(name => {
+        const col = snapshot.columns[name];
+        if (Array.isArray(col)) return col;
+        return col.codes.map(code => col.dict[code]);
+    });
+
+    const rows = new Array(count);
+    for (let i = 0; i < count; i++) {
+        const row = {};
+        for (let c = 0; c < names.length; c++) row[names[c]] = columns[c][i];
+        rows[i] = row;
+    }
+    return rows;
+}